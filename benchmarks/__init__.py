@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""同步、归档重建和渲染路径的性能基准"""
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟 Mastodon 实例，用于离线的端到端压测。
+
+statuses 接口按 Mastodon 的规则处理 max_id / since_id / min_id 和 Link 分页头，
+返回速率限制响应头并在超限时返回 429；媒体接口可以设置延迟、带宽、失败和连接重置。
+数据来自 benchmarks.synthetic 的合成账户。
+
+用法：
+    python -m benchmarks.fake_mastodon --posts 10k                 # 只启动服务器
+    python -m benchmarks.fake_mastodon --posts 10k --sync-into /tmp/vault --full --profile
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+import yaml
+from aiohttp import web
+
+from benchmarks.synthetic import (
+    ACCOUNT_ID,
+    INSTANCE_URL,
+    generate_posts,
+    get_account,
+    parse_size,
+)
+
+ACCESS_TOKEN = "fake-mastodon-token"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 40
+# 与 mastodon.social 默认值一致：每个令牌 5 分钟 300 次
+DEFAULT_RATE_LIMIT = 300
+DEFAULT_RATE_LIMIT_WINDOW = 300.0
+DEFAULT_MEDIA_SIZE = 64 * 1024
+MEDIA_CHUNK_SIZE = 16 * 1024
+# Link 头中的下一页/上一页保留的查询参数，与 Mastodon 相同，since_id 不会被保留
+PAGINATION_PARAMS = ("limit", "only_media", "exclude_replies", "exclude_reblogs")
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _id_key(status_id: str) -> Tuple[int, str]:
+    # Mastodon 的 id 是数字字符串，先比长度再比字典序即可按数值排序
+    return len(status_id), status_id
+
+
+def _selected(key: str, ratio: float, salt: str) -> bool:
+    """按路径哈希确定性地挑出一部分请求注入故障，重试同一路径时结果不变"""
+    if ratio <= 0:
+        return False
+    digest = hashlib.sha256(f"{salt}:{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < ratio
+
+
+class FakeMastodon:
+    """模拟实例；stats 记录请求数和注入的故障，供测试和压测报告使用"""
+
+    def __init__(
+        self,
+        posts: List[Dict[str, Any]],
+        access_token: str = ACCESS_TOKEN,
+        rate_limit: int = DEFAULT_RATE_LIMIT,
+        rate_limit_window: float = DEFAULT_RATE_LIMIT_WINDOW,
+        api_failure_rate: float = 0.0,
+        media_latency: float = 0.0,
+        media_bandwidth: Optional[float] = None,
+        media_size: int = DEFAULT_MEDIA_SIZE,
+        media_failure_rate: float = 0.0,
+        media_reset_rate: float = 0.0,
+    ):
+        self.posts: List[Dict[str, Any]] = []
+        self.media_paths: Set[str] = set()
+        self.add_posts(posts)
+        self.access_token = access_token
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.api_failure_rate = api_failure_rate
+        self.media_latency = media_latency
+        self.media_bandwidth = media_bandwidth
+        self.media_size = media_size
+        self.media_failure_rate = media_failure_rate
+        self.media_reset_rate = media_reset_rate
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.attempts: Dict[str, int] = {}
+        self.stats = dict.fromkeys(
+            (
+                "api_requests",
+                "rate_limited",
+                "api_failures",
+                "media_requests",
+                "media_failures",
+                "media_resets",
+                "media_bytes",
+            ),
+            0,
+        )
+
+    def add_posts(self, posts: List[Dict[str, Any]]) -> None:
+        """加入新帖子（如模拟两次同步之间发布的内容）"""
+        self.posts = sorted(
+            [*self.posts, *posts], key=lambda post: _id_key(post["id"]), reverse=True
+        )
+        self.media_paths.update(
+            media["url"][len(INSTANCE_URL) :]
+            for post in posts
+            for media in post["media_attachments"]
+        )
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(
+            "/api/v1/accounts/{account_id}/statuses", self.handle_statuses
+        )
+        app.router.add_get("/api/v1/instance", self.handle_instance)
+        app.router.add_get("/media_attachments/{path:.*}", self.handle_media)
+        app.router.add_get("/emoji/{name}", self.handle_media)
+        app.router.add_get("/avatars/{name}", self.handle_media)
+        return app
+
+    def _first_attempt(self, key: str) -> bool:
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        return self.attempts[key] == 1
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        now = time.monotonic()
+        if now - self.window_start >= self.rate_limit_window:
+            self.window_start = now
+            self.window_count = 0
+        reset_at = time.time() + self.rate_limit_window - (now - self.window_start)
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - self.window_count)),
+            "X-RateLimit-Reset": datetime.fromtimestamp(reset_at, timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+        }
+
+    def _json_response(
+        self, request: web.Request, data: Any, headers: Dict[str, str]
+    ) -> web.Response:
+        # 数据集中的链接指向占位域名，按实际监听地址改写，媒体下载也会落到本服务器
+        body = json.dumps(data, ensure_ascii=False).replace(
+            INSTANCE_URL, str(request.url.origin())
+        )
+        return web.Response(text=body, content_type="application/json", headers=headers)
+
+    def select_statuses(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        """按 Mastodon 规则分页：max_id/since_id 取最新的一页，min_id 取紧挨着的较旧一页"""
+        limit = min(int(query.get("limit") or DEFAULT_LIMIT), MAX_LIMIT)
+        max_id, since_id, min_id = (
+            query.get("max_id"),
+            query.get("since_id"),
+            query.get("min_id"),
+        )
+        statuses = [
+            post
+            for post in self.posts
+            if (max_id is None or _id_key(post["id"]) < _id_key(max_id))
+            and (since_id is None or _id_key(post["id"]) > _id_key(since_id))
+            and (min_id is None or _id_key(post["id"]) > _id_key(min_id))
+            and not (query.get("exclude_replies") == "true" and post["in_reply_to_id"])
+            and not (
+                query.get("only_media") == "true" and not post["media_attachments"]
+            )
+        ]
+        if min_id is not None:
+            return statuses[-limit:]
+        return statuses[:limit]
+
+    def _link_header(
+        self, request: web.Request, query: Dict[str, str], page: List[Dict[str, Any]]
+    ) -> str:
+        if not page:
+            return ""
+        kept = {key: query[key] for key in PAGINATION_PARAMS if key in query}
+        base = str(request.url.with_query(None))
+        links = []
+        limit = min(int(query.get("limit") or DEFAULT_LIMIT), MAX_LIMIT)
+        # 与 Mastodon 相同：只有整页时才给出下一页
+        if len(page) == limit:
+            links.append(
+                f'<{base}?{urlencode({**kept, "max_id": page[-1]["id"]})}>; rel="next"'
+            )
+        links.append(
+            f'<{base}?{urlencode({**kept, "min_id": page[0]["id"]})}>; rel="prev"'
+        )
+        return ", ".join(links)
+
+    async def handle_statuses(self, request: web.Request) -> web.Response:
+        self.stats["api_requests"] += 1
+        if request.headers.get("Authorization") != f"Bearer {self.access_token}":
+            return web.json_response(
+                {"error": "The access token is invalid"}, status=401
+            )
+        if request.match_info["account_id"] != ACCOUNT_ID:
+            return web.json_response({"error": "Record not found"}, status=404)
+
+        headers = self._rate_limit_headers()
+        if self.window_count >= self.rate_limit:
+            self.stats["rate_limited"] += 1
+            retry_after = self.rate_limit_window - (
+                time.monotonic() - self.window_start
+            )
+            headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+            return web.json_response(
+                {"error": "Too many requests"}, status=429, headers=headers
+            )
+        self.window_count += 1
+        headers["X-RateLimit-Remaining"] = str(self.rate_limit - self.window_count)
+
+        if _selected(request.path_qs, self.api_failure_rate, "api") and (
+            self._first_attempt(request.path_qs)
+        ):
+            self.stats["api_failures"] += 1
+            return web.json_response({"error": "Service unavailable"}, status=503)
+
+        query = dict(request.query)
+        page = self.select_statuses(query)
+        link = self._link_header(request, query, page)
+        if link:
+            headers["Link"] = link
+        return self._json_response(request, page, headers)
+
+    async def handle_instance(self, request: web.Request) -> web.Response:
+        return self._json_response(
+            request,
+            {"uri": "bench.example", "title": "Fake Mastodon", "urls": {}},
+            {},
+        )
+
+    def media_bytes(self, path: str) -> bytes:
+        seed = hashlib.sha256(path.encode("utf-8")).digest()
+        return (seed * (self.media_size // len(seed) + 1))[: self.media_size]
+
+    async def handle_media(self, request: web.Request) -> web.StreamResponse:
+        self.stats["media_requests"] += 1
+        path = request.path
+        if path.startswith("/media_attachments/") and path not in self.media_paths:
+            raise web.HTTPNotFound()
+        if self.media_latency:
+            await asyncio.sleep(self.media_latency)
+
+        first_attempt = self._first_attempt(path)
+        if first_attempt and _selected(path, self.media_failure_rate, "media"):
+            self.stats["media_failures"] += 1
+            raise web.HTTPServiceUnavailable()
+
+        data = self.media_bytes(path)
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Length": str(len(data)),
+            }
+        )
+        await response.prepare(request)
+        reset = first_attempt and _selected(path, self.media_reset_rate, "reset")
+        for offset in range(0, len(data), MEDIA_CHUNK_SIZE):
+            if reset and offset >= len(data) // 2:
+                # 发送到一半时断开连接，客户端收到的是不完整的响应体
+                self.stats["media_resets"] += 1
+                request.transport.close()
+                return response
+            chunk = data[offset : offset + MEDIA_CHUNK_SIZE]
+            await response.write(chunk)
+            self.stats["media_bytes"] += len(chunk)
+            if self.media_bandwidth:
+                await asyncio.sleep(len(chunk) / self.media_bandwidth)
+        await response.write_eof()
+        return response
+
+
+def write_sync_config(backup_path: Path, instance_url: str) -> Path:
+    """在 backup_path 中写入指向模拟实例的 config.yaml"""
+    backup_path.mkdir(parents=True, exist_ok=True)
+    config_path = backup_path / "config.yaml"
+    config_path.write_text(
+        yaml.safe_dump(
+            {
+                "mastodon": {
+                    "instance_url": instance_url,
+                    "user_id": ACCOUNT_ID,
+                    "access_token": ACCESS_TOKEN,
+                },
+                "backup": {"path": "."},
+            },
+            allow_unicode=True,
+        ),
+        encoding="utf-8",
+    )
+    return config_path
+
+
+async def run_sync_against(
+    fake: FakeMastodon, backup_path: Path, full: bool, profile: bool, port: int
+) -> int:
+    """启动模拟实例，在子进程中运行 main.py sync，结束后输出耗时和服务器统计"""
+    runner = web.AppRunner(fake.build_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        write_sync_config(backup_path, f"http://127.0.0.1:{port}")
+        command = [sys.executable, str(REPO_ROOT / "main.py"), "sync"]
+        command += ["--full"] if full else []
+        command += ["--profile"] if profile else []
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=backup_path, env={**os.environ, "GITHUB_ACTIONS": ""}
+        )
+        returncode = await process.wait()
+        elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+    print(f"⏱️ main.py sync 用时 {elapsed:.2f} 秒，退出码 {returncode}")
+    print(f"📊 服务器统计：{json.dumps(fake.stats, ensure_ascii=False)}")
+    return returncode
+
+
+async def serve(fake: FakeMastodon, host: str, port: int) -> None:
+    runner = web.AppRunner(fake.build_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"🐘 模拟实例已启动：http://{host}:{port}")
+    print(f"   user_id: {ACCOUNT_ID}  access_token: {ACCESS_TOKEN}")
+    print(f"   账户：{get_account()['display_name']}，{len(fake.posts)} 条帖子")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="本地模拟 Mastodon 实例")
+    parser.add_argument("--posts", default="1k", help="帖子数，如 1k、10k、100k")
+    parser.add_argument("--seed", type=int, default=0, help="合成账户的随机种子")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 表示随机端口")
+    parser.add_argument("--rate-limit", type=int, default=DEFAULT_RATE_LIMIT)
+    parser.add_argument(
+        "--rate-limit-window", type=float, default=DEFAULT_RATE_LIMIT_WINDOW, help="秒"
+    )
+    parser.add_argument(
+        "--api-failure-rate", type=float, default=0.0, help="首次请求返回 503 的比例"
+    )
+    parser.add_argument(
+        "--media-latency", type=float, default=0.0, help="每个媒体请求的延迟秒数"
+    )
+    parser.add_argument(
+        "--media-bandwidth", type=float, help="每个媒体连接的带宽（字节/秒）"
+    )
+    parser.add_argument("--media-size", type=int, default=DEFAULT_MEDIA_SIZE)
+    parser.add_argument(
+        "--media-failure-rate", type=float, default=0.0, help="首次下载返回 503 的比例"
+    )
+    parser.add_argument(
+        "--media-reset-rate", type=float, default=0.0, help="首次下载中途断开的比例"
+    )
+    parser.add_argument(
+        "--sync-into", type=Path, help="在该目录运行一次 main.py sync 后退出"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="配合 --sync-into：全量同步"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="配合 --sync-into：记录 cProfile"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    fake = FakeMastodon(
+        generate_posts(parse_size(args.posts), args.seed),
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        api_failure_rate=args.api_failure_rate,
+        media_latency=args.media_latency,
+        media_bandwidth=args.media_bandwidth,
+        media_size=args.media_size,
+        media_failure_rate=args.media_failure_rate,
+        media_reset_rate=args.media_reset_rate,
+    )
+    if args.sync_into:
+        return asyncio.run(
+            run_sync_against(
+                fake, args.sync_into.resolve(), args.full, args.profile, args.port
+            )
+        )
+    try:
+        asyncio.run(serve(fake, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
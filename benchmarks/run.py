@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准：在合成账户上逐阶段计时，结果写成 JSON，并与保存的基线比较。
+
+用法：
+    python -m benchmarks.run                          # 1k、10k 两档，与基线比较
+    python -m benchmarks.run --sizes 1k,10k,100k --repeat 5
+    python -m benchmarks.run --update-baseline        # 把本次结果保存为新基线
+
+任一阶段的中位耗时超过基线的 (1 + threshold) 倍时以状态 1 退出；基线不存在且没有
+--update-baseline 时以状态 2 退出，避免在 CI 中把「没有比较」当成通过。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+from benchmarks.synthetic import build_media_file_map, generate_posts, parse_size
+from src.backup import (
+    _rebuild_archive_from_post_files,
+    cleanup_deleted_posts,
+    get_media_local_filename,
+    save_posts,
+)
+from src.layout import FLAT_LAYOUT, get_media_relative_path
+from src.models import as_statuses
+from src.render import generate_activity_summary, generate_mastodon_html
+from src.render.archive import format_post_for_single_file
+
+RESULTS_VERSION = 1
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE_PATH = BENCHMARKS_DIR / "baseline.json"
+DEFAULT_OUTPUT_PATH = BENCHMARKS_DIR / "results" / "latest.json"
+DEFAULT_SIZES = "1k,10k"
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+# 耗时很短的阶段受系统噪声影响大，差值低于该秒数时不算回退
+MIN_REGRESSION_SECONDS = 0.05
+# cleanup 阶段删除服务器上「已删除」的帖子比例
+CLEANUP_DELETE_EVERY = 20
+# 自定义表情的图片，基准运行时代替网络下载
+EMOJI_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000005000155a2a0d40000000049454e44ae426082"
+)
+
+
+def make_config(backup_path: Path) -> Dict[str, Any]:
+    return {
+        "mastodon": {
+            "instance_url": "https://bench.example",
+            "user_id": "10001",
+            "access_token": "benchmark",
+        },
+        "backup": {
+            "path": str(backup_path),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+            "layout": FLAT_LAYOUT,
+        },
+        "sync": {"state_file": "sync_state.json", "china_timezone": False},
+    }
+
+
+@contextmanager
+def offline_remote_assets() -> Iterator[None]:
+    """网页生成中的自定义表情和背景图下载改为返回本地图片，计时不受网络影响"""
+    response = mock.Mock(
+        status_code=200,
+        content=EMOJI_PNG,
+        headers={"Content-Type": "image/png"},
+    )
+    response.iter_content.return_value = [EMOJI_PNG]
+    with mock.patch("src.render.html.requests.get", return_value=response):
+        yield
+
+
+@contextmanager
+def quiet_logging() -> Iterator[None]:
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def sync_backup(posts: List[Dict[str, Any]], backup_path: Path) -> None:
+    """把帖子写成一份完整备份；媒体写成占位文件，不真正下载"""
+    media_file_map = build_media_file_map(posts)
+    media_folder = backup_path / "media"
+    for post in posts:
+        for media in post["media_attachments"]:
+            media_path = media_folder / get_media_relative_path(
+                get_media_local_filename(media), FLAT_LAYOUT
+            )
+            media_path.parent.mkdir(parents=True, exist_ok=True)
+            media_path.write_bytes(b"\0")
+    asyncio.run(
+        save_posts(posts, make_config(backup_path), backup_path, media_file_map)
+    )
+
+
+@dataclass
+class BenchmarkContext:
+    posts: List[Dict[str, Any]]
+    work_dir: Path
+    synced_path: Path
+
+
+@dataclass
+class Stage:
+    name: str
+    # setup 返回计时的函数；setup 本身不计时
+    setup: Callable[[BenchmarkContext, Path], Callable[[], Any]]
+
+
+def _setup_format_post(context: BenchmarkContext, run_dir: Path) -> Callable[[], Any]:
+    statuses = as_statuses(context.posts)
+    media_file_map = build_media_file_map(context.posts)
+    return lambda: [
+        format_post_for_single_file(post, "media", media_file_map) for post in statuses
+    ]
+
+
+def _setup_save_posts(context: BenchmarkContext, run_dir: Path) -> Callable[[], Any]:
+    media_file_map = build_media_file_map(context.posts)
+    return lambda: asyncio.run(
+        save_posts(context.posts, make_config(run_dir), run_dir, media_file_map)
+    )
+
+
+def _setup_rebuild_archive(
+    context: BenchmarkContext, run_dir: Path
+) -> Callable[[], Any]:
+    # 不带渲染缓存，测量逐个解析全部帖子文件的冷启动重建
+    return lambda: _rebuild_archive_from_post_files(
+        context.synced_path / "mastodon", run_dir / "archive.md", "media"
+    )
+
+
+def _setup_activity_summary(
+    context: BenchmarkContext, run_dir: Path
+) -> Callable[[], Any]:
+    config = make_config(context.synced_path)
+    config["backup"]["summary_filename"] = str(run_dir / "activity_summary.md")
+    return lambda: generate_activity_summary(config, context.synced_path)
+
+
+def _setup_html(context: BenchmarkContext, run_dir: Path) -> Callable[[], Any]:
+    def run() -> None:
+        with offline_remote_assets():
+            generate_mastodon_html(context.posts, make_config(run_dir), run_dir)
+
+    return run
+
+
+def _setup_cleanup(context: BenchmarkContext, run_dir: Path) -> Callable[[], Any]:
+    shutil.rmtree(run_dir)
+    shutil.copytree(context.synced_path, run_dir)
+    server_posts = [
+        post for index, post in enumerate(context.posts) if index % CLEANUP_DELETE_EVERY
+    ]
+    return lambda: cleanup_deleted_posts(server_posts, make_config(run_dir), run_dir)
+
+
+STAGES = (
+    Stage("format_post", _setup_format_post),
+    Stage("save_posts", _setup_save_posts),
+    Stage("rebuild_archive", _setup_rebuild_archive),
+    Stage("activity_summary", _setup_activity_summary),
+    Stage("html", _setup_html),
+    Stage("cleanup", _setup_cleanup),
+)
+STAGE_NAMES = tuple(stage.name for stage in STAGES)
+
+
+def time_stage(stage: Stage, context: BenchmarkContext, repeat: int) -> Dict[str, Any]:
+    runs = []
+    for attempt in range(repeat):
+        run_dir = context.work_dir / f"{stage.name}-{attempt}"
+        run_dir.mkdir(parents=True)
+        func = stage.setup(context, run_dir)
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+        shutil.rmtree(run_dir, ignore_errors=True)
+    median = statistics.median(runs)
+    return {
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(runs), 4),
+        "posts_per_second": round(len(context.posts) / median) if median else None,
+        "runs": [round(value, 4) for value in runs],
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    stage_names: Optional[List[str]] = None,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = 0,
+    progress: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """对每档帖子数依次运行各阶段，返回可写入 JSON 的结果"""
+    stages = [
+        stage for stage in STAGES if stage_names is None or stage.name in stage_names
+    ]
+    results: Dict[str, Dict[str, Any]] = {}
+    with quiet_logging():
+        for size in sizes:
+            posts = generate_posts(size, seed)
+            with tempfile.TemporaryDirectory(prefix="vault-bench-") as tmp:
+                work_dir = Path(tmp)
+                synced_path = work_dir / "synced"
+                synced_path.mkdir()
+                sync_backup(posts, synced_path)
+                context = BenchmarkContext(posts, work_dir, synced_path)
+                results[str(size)] = {}
+                for stage in stages:
+                    result = time_stage(stage, context, repeat)
+                    results[str(size)][stage.name] = result
+                    progress(
+                        f"{size:>7} 条  {stage.name:<17} {result['median_seconds']:>9.3f} 秒"
+                    )
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_seconds: float = MIN_REGRESSION_SECONDS,
+) -> List[Dict[str, Any]]:
+    """列出中位耗时超过基线 (1 + threshold) 倍的阶段；基线中没有的组合跳过"""
+    regressions = []
+    for size, stages in current["results"].items():
+        for stage_name, result in stages.items():
+            base = baseline.get("results", {}).get(size, {}).get(stage_name)
+            if base is None:
+                continue
+            base_seconds = base["median_seconds"]
+            seconds = result["median_seconds"]
+            if (
+                seconds > base_seconds * (1 + threshold)
+                and seconds - base_seconds > min_seconds
+            ):
+                regressions.append(
+                    {
+                        "size": size,
+                        "stage": stage_name,
+                        "baseline_seconds": base_seconds,
+                        "current_seconds": seconds,
+                        "ratio": (
+                            round(seconds / base_seconds, 2) if base_seconds else None
+                        ),
+                    }
+                )
+    return regressions
+
+
+def write_json(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="同步、归档重建和渲染路径的性能基准")
+    parser.add_argument(
+        "--sizes", default=DEFAULT_SIZES, help="帖子数，逗号分隔，如 1k,10k,100k"
+    )
+    parser.add_argument(
+        "--stages", help=f"只运行指定阶段，逗号分隔；可选：{','.join(STAGE_NAMES)}"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="每个阶段的重复次数，取中位数",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="合成账户的随机种子")
+    parser.add_argument(
+        "--output", type=Path, default=DEFAULT_OUTPUT_PATH, help="结果 JSON 路径"
+    )
+    parser.add_argument(
+        "--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="基线 JSON 路径"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="允许的相对回退，0.25 表示慢 25%%",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="把本次结果保存为基线"
+    )
+    args = parser.parse_args(argv)
+    if args.stages:
+        args.stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+        unknown = set(args.stages) - set(STAGE_NAMES)
+        if unknown:
+            parser.error(f"未知阶段：{', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    results = run_benchmarks(sizes, args.stages, args.repeat, args.seed)
+    write_json(args.output, results)
+    print(f"📊 结果已写入 {args.output}")
+
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"📌 基线已更新：{args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(
+            f"❌ 基线 {args.baseline} 不存在，无法比较；请先用 --update-baseline 生成"
+        )
+        return 2
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare_results(results, baseline, args.threshold)
+    if not regressions:
+        print(f"✅ 所有阶段都在基线的 {1 + args.threshold:.2f} 倍以内")
+        return 0
+    for regression in regressions:
+        print(
+            f"❌ {regression['size']} 条 {regression['stage']}：{regression['baseline_seconds']:.3f} 秒"
+            f" → {regression['current_seconds']:.3f} 秒（{regression['ratio']} 倍）"
+        )
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+确定性的合成账户生成器。
+
+同一个 seed 和帖子数总是生成完全相同的帖子列表，内容混合中英文、@提及、话题标签、
+Unicode 表情和自定义表情，并按真实账户的大致比例带有媒体附件、回复和引用。
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from src.backup import get_media_local_filename
+from src.layout import FLAT_LAYOUT, get_media_relative_path
+
+INSTANCE_URL = "https://bench.example"
+ACCOUNT_ID = "10001"
+USERNAME = "bench"
+FIRST_POST_ID = 109000000000000000
+FIRST_POST_AT = datetime(2019, 1, 1, tzinfo=timezone.utc)
+
+REPLY_RATIO = 0.15
+QUOTE_RATIO = 0.03
+MEDIA_RATIO = 0.2
+CUSTOM_EMOJI_RATIO = 0.05
+
+CJK_SENTENCES = (
+    "今天天气很好，出门散步的时候看到了很多盛开的樱花。",
+    "刚读完一本关于分布式系统的书，收获很大。",
+    "周末在家整理了一下书架，发现好几本还没读完。",
+    "晚饭做了番茄炒蛋和紫菜汤，简单但是很满足。",
+    "这个版本修复了一个困扰很久的内存泄漏问题。",
+    "地铁上人太多了，下次还是早点出门吧。",
+    "最近在学习日语，ひらがな已经能认全了。",
+    "咖啡喝多了晚上睡不着，明天改喝茶。",
+)
+LATIN_SENTENCES = (
+    "Shipped a small refactor today, the tests are finally green.",
+    "Reading about incremental builds and content hashing.",
+    "The sunset over the harbour was unreal this evening.",
+    "Trying out a new keyboard layout, typing is slow for now.",
+    "Benchmarks first, optimizations second.",
+)
+EMOJIS = ("😀", "🎉", "🌸", "☕", "🐘", "🚀", "📚", "🌧️", "👍🏽", "🇯🇵")
+TAGS = ("日常", "读书", "photography", "Python", "mastodon", "开源", "旅行", "美食")
+MENTIONS = ("alice", "bob", "小明", "carol")
+CUSTOM_EMOJI = {
+    "shortcode": "blobcat",
+    "url": f"{INSTANCE_URL}/emoji/blobcat.png",
+    "static_url": f"{INSTANCE_URL}/emoji/blobcat_static.png",
+}
+MEDIA_TYPES = ("image", "image", "image", "gifv", "video")
+MEDIA_EXTENSIONS = {"image": "jpg", "gifv": "mp4", "video": "mp4"}
+
+
+def parse_size(value: str) -> int:
+    """把 1k、10k、100k 或纯数字解析为帖子数"""
+    value = value.strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    return int(value)
+
+
+def get_account() -> Dict[str, Any]:
+    return {
+        "id": ACCOUNT_ID,
+        "username": USERNAME,
+        "display_name": "基准测试 Bench 🐘",
+        "url": f"{INSTANCE_URL}/@{USERNAME}",
+        "avatar": f"{INSTANCE_URL}/avatars/{USERNAME}.png",
+        # 背景图留空，生成网页时不需要下载
+        "header": "",
+        "note": "<p>用于性能基准的合成账户</p>",
+        "followers_count": 1234,
+        "following_count": 321,
+    }
+
+
+def _mention_html(username: str) -> str:
+    return (
+        f'<span class="h-card"><a href="{INSTANCE_URL}/@{username}" '
+        f'class="u-url mention">@<span>{username}</span></a></span>'
+    )
+
+
+def _tag_html(tag: str) -> str:
+    return (
+        f'<a href="{INSTANCE_URL}/tags/{tag}" class="mention hashtag" rel="tag">'
+        f"#<span>{tag}</span></a>"
+    )
+
+
+def _build_content(
+    rng: random.Random, tags: List[str], custom_emoji: bool, quote_url: str
+) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(1, 3)):
+        sentences = [
+            rng.choice(CJK_SENTENCES if rng.random() < 0.7 else LATIN_SENTENCES)
+            for _ in range(rng.randint(1, 3))
+        ]
+        if rng.random() < 0.3:
+            sentences.insert(0, _mention_html(rng.choice(MENTIONS)))
+        if rng.random() < 0.5:
+            sentences.append("".join(rng.choices(EMOJIS, k=rng.randint(1, 3))))
+        paragraphs.append(" ".join(sentences))
+    if custom_emoji:
+        paragraphs[-1] += f" :{CUSTOM_EMOJI['shortcode']}:"
+    if tags:
+        paragraphs.append(" ".join(_tag_html(tag) for tag in tags))
+    if quote_url:
+        paragraphs.append(f'RE: <a href="{quote_url}">{quote_url}</a>')
+    return "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+
+
+def _build_media(rng: random.Random, post_id: int) -> List[Dict[str, Any]]:
+    media = []
+    for index in range(rng.randint(1, 4)):
+        media_type = rng.choice(MEDIA_TYPES)
+        media_id = f"{post_id}{index}"
+        name = f"{rng.getrandbits(64):016x}.{MEDIA_EXTENSIONS[media_type]}"
+        media.append(
+            {
+                "id": media_id,
+                "type": media_type,
+                "url": f"{INSTANCE_URL}/media_attachments/files/{media_id}/original/{name}",
+                "preview_url": f"{INSTANCE_URL}/media_attachments/files/{media_id}/small/{name}",
+                "description": rng.choice(
+                    ("", "一张照片", "Screenshot of the build log")
+                ),
+            }
+        )
+    return media
+
+
+def generate_posts(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """按时间从新到旧生成 count 条 API 格式的帖子（与 Mastodon API 返回顺序一致）"""
+    rng = random.Random(seed)
+    account = get_account()
+    posts: List[Dict[str, Any]] = []
+    created_at = FIRST_POST_AT
+    for index in range(count):
+        post_id = FIRST_POST_ID + index * 1000 + rng.randint(0, 999)
+        created_at += timedelta(minutes=rng.randint(5, 24 * 60))
+        tags = rng.sample(TAGS, k=rng.choice((0, 0, 1, 2)))
+        in_reply_to_id = None
+        quote_url = ""
+        if posts and rng.random() < REPLY_RATIO:
+            in_reply_to_id = rng.choice(posts[-50:])["id"]
+        elif posts and rng.random() < QUOTE_RATIO:
+            quote_url = rng.choice(posts[-200:])["url"]
+        custom_emoji = rng.random() < CUSTOM_EMOJI_RATIO
+        posts.append(
+            {
+                "id": str(post_id),
+                "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "content": _build_content(rng, tags, custom_emoji, quote_url),
+                "url": f"{INSTANCE_URL}/@{USERNAME}/{post_id}",
+                "media_attachments": (
+                    _build_media(rng, post_id) if rng.random() < MEDIA_RATIO else []
+                ),
+                "tags": [{"name": tag} for tag in tags],
+                "sensitive": rng.random() < 0.05,
+                "spoiler_text": "剧透" if rng.random() < 0.03 else "",
+                "visibility": rng.choice(("public", "public", "unlisted", "private")),
+                "reblogs_count": rng.randint(0, 20),
+                "favourites_count": rng.randint(0, 50),
+                "replies_count": rng.randint(0, 5),
+                "emojis": [dict(CUSTOM_EMOJI)] if custom_emoji else [],
+                "in_reply_to_id": in_reply_to_id,
+                "in_reply_to_account_id": ACCOUNT_ID if in_reply_to_id else None,
+                "account": account,
+            }
+        )
+    posts.reverse()
+    return posts
+
+
+def build_media_file_map(
+    posts: List[Dict[str, Any]], layout: str = FLAT_LAYOUT
+) -> Dict[str, str]:
+    """按下载时的命名规则给出媒体 id 到本地相对路径的映射，基准中不真正下载"""
+    return {
+        media["id"]: get_media_relative_path(get_media_local_filename(media), layout)
+        for post in posts
+        for media in post["media_attachments"]
+    }
@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import contextvars
 import json
 import logging
 import os
+import random
+import signal
 import sys
+import zipfile
 from pathlib import Path
 
-from src.api import fetch_mastodon_posts
-from src.config import get_config
+from src import profiling
+from src.changes import ChangeTracker
+from src.cli import get_account_option, get_option_value
+from src.layout import iter_post_files
+from src.utils import get_state_dir, write_text_if_changed
 
 # 设置日志
 logging.basicConfig(
@@ -16,12 +23,97 @@ logging.basicConfig(
     stream=sys.stdout,
 )
 
+# 多账户并发同步时，每个账户的任务在各自的上下文中设置账户名，日志据此加前缀
+current_account = contextvars.ContextVar("current_account", default=None)
+
+
+class AccountLogFilter(logging.Filter):
+    def filter(self, record):
+        account_name = current_account.get()
+        if account_name:
+            record.msg = f"[{account_name}] {record.msg}"
+        return True
+
+
+logging.getLogger().addFilter(AccountLogFilter())
+
+
+# aiohttp、pydantic 等依赖只在真正需要时导入，version、help 等轻量命令可以快速启动
+def get_config():
+    from src.config import get_config as load_config
+
+    return load_config()
+
+
+async def fetch_mastodon_posts(config, since_id=None, page_limit=None, max_posts=None):
+    from src.api import fetch_mastodon_posts as fetch_posts
+
+    return await fetch_posts(
+        config, since_id=since_id, page_limit=page_limit, max_posts=max_posts
+    )
+
 
 def load_runtime_config():
     # get_config() 内部已完成校验并回填默认值
     return get_config()
 
 
+def load_runtime_config_or_log():
+    try:
+        return load_runtime_config()
+    except ValueError as e:
+        logging.error(f"❌ 配置验证失败：{e}")
+    except (FileNotFoundError, OSError) as e:
+        logging.error(f"❌ 配置加载失败：{e}")
+    return None
+
+
+def select_account_configs(config, single=False):
+    """按 --account 选择要运行的账户；single 为 True 时要求最终只剩一个账户"""
+    from src.config import get_account_configs
+
+    try:
+        account_configs = get_account_configs(config, get_account_option(sys.argv))
+    except ValueError as e:
+        logging.error(f"❌ {e}")
+        return None
+    attach_metrics_accounts(get_account_configs(config), account_configs)
+    if single and len(account_configs) > 1:
+        names = ", ".join(c["account_name"] for c in account_configs)
+        logging.error(f"❌ 已配置多个账户（{names}），请用 --account 名称 指定一个账户")
+        return None
+    return account_configs
+
+
+def attach_metrics_accounts(all_configs, account_configs):
+    """
+    指标文件要包含所有写入它的账户，只同步其中一个（--account）时也不能丢掉其他账户的指标；
+    每个账户记下共用同一 sync.metrics_file 的全部账户及其备份目录
+    """
+    for account_config in account_configs:
+        metrics_file = account_config["sync"].get("metrics_file")
+        if not metrics_file:
+            continue
+        account_config["metrics_accounts"] = {
+            other.get("account_name") or "": other["backup"]["path"]
+            for other in all_configs
+            if other["sync"].get("metrics_file") == metrics_file
+        }
+
+
+def load_single_account_config():
+    """常驻模式和离线导入一次只处理一个账户"""
+    config = load_runtime_config_or_log()
+    if config is None:
+        return None
+    account_configs = select_account_configs(config, single=True)
+    if account_configs is None:
+        return None
+    account_config = account_configs[0]
+    current_account.set(account_config.get("account_name"))
+    return account_config
+
+
 def resolve_runtime_paths(config):
     backup_config = config["backup"]
     backup_path = Path(backup_config["path"])
@@ -58,9 +150,26 @@ def cleanup_for_full_sync(
     posts_folder_path,
     media_folder_path,
     is_first_run,
+    tracker=None,
 ):
     from src.utils import safe_remove_directory, safe_remove_file
 
+    if tracker is not None:
+        # 目录整体重建：把原有文件逐个记为删除，重新写入的同名文件会被归为修改，
+        # 没有再写入的才留在删除列表中
+        for path in (
+            state_file_path,
+            archive_file_path,
+            posts_folder_path,
+            media_folder_path,
+        ):
+            if path.is_dir():
+                for file_path in path.rglob("*"):
+                    if file_path.is_file():
+                        tracker.record_delete(file_path)
+            elif path.exists():
+                tracker.record_delete(path)
+
     if is_first_run:
         logging.info("🆕 检测到首次运行，将开始初始化备份...")
     else:
@@ -85,6 +194,28 @@ def cleanup_for_full_sync(
         logging.error("❌ 无法删除媒体文件夹，但继续执行...")
 
 
+def check_backup_layout(config, backup_path, is_full_sync):
+    """增量同步前确认已有备份与配置的布局一致，避免两种布局的文件混在一起"""
+    if is_full_sync:
+        return True
+
+    from src.backup import detect_backup_layout
+    from src.layout import get_layout
+
+    configured_layout = get_layout(config["backup"])
+    existing_layout = detect_backup_layout(config, backup_path)
+    if existing_layout is None or existing_layout == configured_layout:
+        return True
+
+    logging.error(
+        f"❌ 备份目录当前为 {existing_layout} 布局，但配置为 {configured_layout}。"
+    )
+    logging.error(
+        f"❌ 请先运行 python3 main.py migrate-layout {configured_layout} 迁移已有文件"
+    )
+    return False
+
+
 def load_last_synced_id(state_file_path, is_full_sync):
     if is_full_sync or not state_file_path.exists():
         return None, is_full_sync
@@ -122,14 +253,16 @@ async def collect_posts_for_sync(config, last_synced_id, is_full_sync):
 
 
 def write_sync_state_file(
-    state_file_path, posts_to_process, last_synced_id, is_full_sync
+    state_file_path, posts_to_process, last_synced_id, is_full_sync, tracker=None
 ):
     all_ids = [post["id"] for post in posts_to_process]
     if last_synced_id and not is_full_sync:
         all_ids.append(last_synced_id)
     if all_ids:
-        state_file_path.write_text(
-            json.dumps({"last_synced_id": max(all_ids, key=int)})
+        write_text_if_changed(
+            state_file_path,
+            json.dumps({"last_synced_id": max(all_ids, key=int)}),
+            tracker,
         )
 
 
@@ -141,7 +274,18 @@ async def generate_html_output(
     html_filename = backup_config.get("html_filename", "index.html")
     html_filepath = backup_path / html_filename
 
-    needs_html = not html_filepath.exists() or is_full_sync or new_posts_count > 0
+    site_missing = (
+        backup_config.get("static_site")
+        and not (
+            backup_path / backup_config.get("site_folder", "site") / "index.html"
+        ).exists()
+    )
+    needs_html = (
+        not html_filepath.exists()
+        or site_missing
+        or is_full_sync
+        or new_posts_count > 0
+    )
     if not needs_html:
         logging.info("✅ HTML 文件已存在且无新内容，跳过生成")
         return
@@ -166,7 +310,10 @@ async def generate_html_output(
             logging.error("❌ 无法从 API 获取帖子数据")
             return
 
-    generate_mastodon_html(posts_for_html, config, backup_path)
+    # 渲染在线程中进行，多账户同步时其他账户的网络请求可以继续
+    await profiling.to_thread(
+        generate_mastodon_html, posts_for_html, config, backup_path
+    )
     logging.info(f"✅ HTML 网页已生成，包含 {len(posts_for_html)} 条嘟文")
 
 
@@ -184,15 +331,212 @@ async def main_async():
     logging.info(" Mastodon Sync 开始运行 (Async Mode)")
     logging.info("========================================")
 
+    config = load_runtime_config_or_log()
+    if config is None:
+        return
+    account_configs = select_account_configs(config)
+    if account_configs is None:
+        return
     try:
-        config = load_runtime_config()
-    except ValueError as e:
-        logging.error(f"❌ 配置验证失败：{e}")
+        cassette = load_cassette_option()
+    except (OSError, ValueError) as e:
+        logging.error(f"❌ 无法打开 HTTP 录制文件：{e}")
         return
-    except (FileNotFoundError, OSError) as e:
-        logging.error(f"❌ 配置加载失败：{e}")
+
+    if cassette is None:
+        await sync_selected_accounts(account_configs)
+        return
+    await sync_with_cassette(account_configs, cassette)
+
+
+async def sync_selected_accounts(account_configs):
+    if len(account_configs) == 1:
+        current_account.set(account_configs[0].get("account_name"))
+        await sync_account(account_configs[0])
+    else:
+        await sync_accounts(account_configs)
+
+
+def load_cassette_option():
+    """按 --record / --replay 创建 HTTP 录制或回放；未指定时返回 None"""
+    from src.cassette import RECORD_MODE, Cassette
+
+    record_path = get_option_value(sys.argv, "--record")
+    if record_path:
+        return Cassette(Path(record_path), RECORD_MODE)
+    replay_path = get_option_value(sys.argv, "--replay")
+    if replay_path:
+        speed = float(get_option_value(sys.argv, "--replay-speed") or 1)
+        return Cassette.load(Path(replay_path), speed)
+    return None
+
+
+async def sync_with_cassette(account_configs, cassette):
+    """所有账户共用经过录制/回放包装的 HTTP 会话；网页生成中的下载也经过它"""
+    import aiohttp
+
+    from src.cassette import RECORD_MODE, active_cassette
+
+    if cassette.mode == RECORD_MODE:
+        logging.info(f"📼 录制本次同步的 HTTP 交互：{cassette.path}")
+    else:
+        logging.info(
+            f"📼 回放 {cassette.path} 中的 {len(cassette.interactions)} 个请求，"
+            f"速度 {cassette.speed:g} 倍"
+        )
+    active_cassette.set(cassette)
+    connector = aiohttp.TCPConnector(ssl=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        wrapped_session = cassette.wrap_session(session)
+        for account_config in account_configs:
+            account_config["http_session"] = wrapped_session
+        try:
+            await sync_selected_accounts(account_configs)
+        finally:
+            for account_config in account_configs:
+                account_config.pop("http_session", None)
+            if cassette.mode == RECORD_MODE:
+                cassette.save()
+
+
+async def run_account_sync(account_config):
+    current_account.set(account_config["account_name"])
+    await sync_account(account_config, concurrent=True)
+
+
+async def sync_accounts(account_configs):
+    """
+    多个账户在同一个事件循环中并发同步：共享 HTTP 连接池、按实例和令牌计数的限流器
+    以及媒体下载并发额度；单个账户失败不影响其他账户。
+    """
+    import aiohttp
+
+    from src.backup import SHARED_MEDIA_DOWNLOAD_CONCURRENCY
+    from src.ratelimit import RateLimiter
+
+    logging.info(f"👥 开始并发同步 {len(account_configs)} 个账户...")
+    # CPU 时间按进程统计，各账户的协程和工作线程混在一起，报告中记为不可用
+    if "--profile" in sys.argv:
+        logging.warning(
+            "⚠️ 多个账户并发时 cProfile 和 CPU 时间都无法区分各账户，本次只记录阶段耗时；"
+            "请用 --account 只同步一个账户进行采样"
+        )
+    rate_limiter = RateLimiter()
+    media_download_semaphore = asyncio.Semaphore(SHARED_MEDIA_DOWNLOAD_CONCURRENCY)
+    # 创建带 SSL 验证的 connector，防止中间人攻击
+    connector = aiohttp.TCPConnector(ssl=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for account_config in account_configs:
+            account_config.setdefault("http_session", session)
+            account_config["rate_limiter"] = rate_limiter
+            account_config["media_download_semaphore"] = media_download_semaphore
+            # 指标文件汇总所有账户，等全部账户结束后只写一次
+            account_config["defer_metrics"] = True
+        results = await asyncio.gather(
+            *(run_account_sync(c) for c in account_configs), return_exceptions=True
+        )
+
+    write_metrics_files(account_configs)
+
+    failed = []
+    for account_config, result in zip(account_configs, results):
+        account_config.pop("http_session", None)
+        if isinstance(result, BaseException):
+            failed.append(account_config["account_name"])
+            logging.error(
+                f"❌ 账户 {account_config['account_name']} 同步失败："
+                f"{type(result).__name__}: {result}"
+            )
+    logging.info(
+        f"👥 多账户同步结束：成功 {len(account_configs) - len(failed)} 个，"
+        f"失败 {len(failed)} 个"
+    )
+
+
+def write_metrics_files(account_configs):
+    """每个指标文件只写一次（各账户的 metrics_accounts 已包含共用它的全部账户）"""
+    from src.history import write_metrics_file
+
+    written = set()
+    for account_config in account_configs:
+        metrics_file = account_config["sync"].get("metrics_file")
+        if metrics_file and metrics_file not in written:
+            written.add(metrics_file)
+            write_metrics_file(account_config)
+
+
+async def sync_account(config, concurrent=False):
+    """
+    同步单个账户；config 为该账户的独立配置 dict。每次运行都记录分阶段耗时报告。
+    多账户并发时 concurrent 为 True：同一线程只能有一个 cProfile 在采样，
+    进程级的 CPU 时间也无法分到各账户，两者都不记录。
+    """
+    profile = profiling.RunProfile(
+        with_cprofile=not concurrent and "--profile" in sys.argv,
+        with_tracemalloc="--memprofile" in sys.argv,
+        measure_cpu=not concurrent,
+    )
+    profiling.current_profile.set(profile)
+    status = "failed"
+    try:
+        await run_sync_stages(config)
+        status = "ok"
+    finally:
+        profile.stop()
+        write_run_profile(config, profile)
+        record_run_history(config, profile, get_run_mode(config), status)
+
+
+def get_run_mode(config):
+    if "--cleanup" in sys.argv:
+        return "cleanup"
+    return "full" if config.get("is_full_sync") else "incremental"
+
+
+def write_run_profile(config, profile):
+    backup_path = resolve_runtime_paths(config)[1]
+    if not backup_path.exists():
+        return
+    try:
+        report_path = profile.write_report(get_state_dir(backup_path))
+    except OSError as e:
+        logging.warning(f"⚠️ 运行报告写入失败：{e}")
         return
+    profile.log_summary()
+    logging.info(f"⏱️ 运行报告：{report_path}")
 
+
+def record_run_history(config, profile, mode, status):
+    """向 .vault-sync/history.jsonl 追加本次运行的记录，刷新指标文件和状态快照"""
+    from src.history import record_run, write_metrics_file
+
+    backup_path = resolve_runtime_paths(config)[1]
+    if not backup_path.exists():
+        return
+    report = profile.to_dict()
+    record_run(config, report, mode, status)
+    last_run = {
+        "started_at": report["started_at"],
+        "mode": mode,
+        "status": status,
+        "wall_seconds": report["wall_seconds"],
+    }
+    update_status_snapshot(config, backup_path, mode, last_run)
+    if not config.get("defer_metrics"):
+        write_metrics_file(config)
+
+
+def update_status_snapshot(config, backup_path, mode, last_run=None):
+    """更新 status 命令读取的快照；失败只记录警告，不影响同步结果"""
+    from src.snapshot import update_snapshot
+
+    try:
+        update_snapshot(config, backup_path, mode, last_run)
+    except OSError as e:
+        logging.warning(f"⚠️ 状态快照更新失败：{e}")
+
+
+async def run_sync_stages(config):
     (
         backup_config,
         backup_path,
@@ -205,6 +549,8 @@ async def main_async():
     if not os.environ.get("GITHUB_ACTIONS") and base_path_str != ".":
         logging.info(f"💾 所有备份文件将保存到指定目录：{backup_path.resolve()}")
     backup_path.mkdir(parents=True, exist_ok=True)
+    tracker = ChangeTracker(backup_path)
+    config["change_tracker"] = tracker
 
     sync_flags = resolve_sync_flags(archive_file_path)
     is_cleanup_mode = sync_flags["is_cleanup_mode"]
@@ -217,47 +563,67 @@ async def main_async():
         from src.render import generate_activity_summary, generate_mastodon_html
 
         logging.info("🧹 正在检查服务器帖子，清理本地已删除内容...")
-        server_posts = await fetch_mastodon_posts(config)
-        local_post_files = list(posts_folder_path.glob("*.md"))
+        with profiling.span("fetch"):
+            server_posts = await fetch_mastodon_posts(config)
+        local_post_files = iter_post_files(posts_folder_path)
         if local_post_files and not server_posts:
             logging.error("❌ 未获取到服务器帖子，已停止清理，避免误删本地备份。")
             return
 
-        deleted_posts, deleted_media = cleanup_deleted_posts(
-            server_posts, config, backup_path
-        )
+        with profiling.span("cleanup"):
+            deleted_posts, deleted_media = cleanup_deleted_posts(
+                server_posts, config, backup_path
+            )
         logging.info(
             f"✅ 清理完成：删除 {deleted_posts} 个帖子文件，"
             f"删除 {deleted_media} 个媒体文件。"
         )
 
-        generate_activity_summary(config, backup_path)
+        with profiling.span("summary"):
+            await profiling.to_thread(generate_activity_summary, config, backup_path)
         if server_posts:
-            generate_mastodon_html(server_posts, config, backup_path)
+            with profiling.span("html"):
+                await profiling.to_thread(
+                    generate_mastodon_html, server_posts, config, backup_path
+                )
+        tracker.write_manifest(get_state_dir(backup_path))
+        return
+
+    if not check_backup_layout(config, backup_path, is_full_sync):
         return
 
     if is_full_sync:
-        cleanup_for_full_sync(
-            state_file_path,
-            archive_file_path,
-            posts_folder_path,
-            media_folder_path,
-            is_first_run,
-        )
+        with profiling.span("cleanup"):
+            cleanup_for_full_sync(
+                state_file_path,
+                archive_file_path,
+                posts_folder_path,
+                media_folder_path,
+                is_first_run,
+                tracker,
+            )
+            from src.store import reset_status_store
+
+            reset_status_store(backup_path)
 
     last_synced_id, is_full_sync = load_last_synced_id(state_file_path, is_full_sync)
     config["is_full_sync"] = is_full_sync
 
-    posts_to_process, new_posts_count = await collect_posts_for_sync(
-        config, last_synced_id, is_full_sync
-    )
+    with profiling.span("fetch"):
+        posts_to_process, new_posts_count = await collect_posts_for_sync(
+            config, last_synced_id, is_full_sync
+        )
 
     if posts_to_process:
         from src.backup import save_posts
 
         await save_posts(posts_to_process, config, backup_path)
         write_sync_state_file(
-            state_file_path, posts_to_process, last_synced_id, is_full_sync
+            state_file_path,
+            posts_to_process,
+            last_synced_id,
+            is_full_sync,
+            tracker,
         )
     else:
         logging.info("✨ 没有新内容需要同步。")
@@ -269,33 +635,413 @@ async def main_async():
             logging.info("🔄 全量同步模式，生成活动总结...")
         else:
             logging.info("📊 检测到新内容，更新活动总结...")
-        generate_activity_summary(config, backup_path)
+        with profiling.span("summary"):
+            await profiling.to_thread(generate_activity_summary, config, backup_path)
     else:
         logging.info("📊 没有新内容需要更新，跳过活动总结生成。")
 
     try:
-        await generate_html_output(
-            config,
-            backup_path,
-            backup_config,
-            is_full_sync,
-            new_posts_count,
-            posts_to_process,
-        )
+        with profiling.span("html"):
+            await generate_html_output(
+                config,
+                backup_path,
+                backup_config,
+                is_full_sync,
+                new_posts_count,
+                posts_to_process,
+            )
     except (OSError, ValueError) as e:
         logging.error(f"❌ HTML 网页生成失败：{e}")
     except Exception:
         logging.exception("❌ HTML 网页生成失败")
 
+    tracker.write_manifest(get_state_dir(backup_path))
+
     logging.info("========================================")
     logging.info("同步完成！")
     logging.info("========================================")
 
 
+async def import_archive_async(zip_path):
+    """从 Mastodon 账户导出的 ZIP 离线导入，之后的增量同步从导入的最新帖子继续"""
+    logging.info("========================================")
+    logging.info(" Mastodon Sync 离线导入")
+    logging.info("========================================")
+
+    config = load_single_account_config()
+    if config is None:
+        return
+
+    backup_config, backup_path, state_file_path, *_, media_folder_path = (
+        resolve_runtime_paths(config)
+    )
+    backup_path.mkdir(parents=True, exist_ok=True)
+    tracker = ChangeTracker(backup_path)
+    config["change_tracker"] = tracker
+    config["is_full_sync"] = False
+    if not check_backup_layout(config, backup_path, False):
+        return
+
+    from src.backup import save_posts
+    from src.importer import extract_archive_media, read_archive_posts
+    from src.layout import get_layout
+
+    logging.info(f"📦 正在读取导出文件：{zip_path}")
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            posts = read_archive_posts(archive, config["mastodon"]["user_id"])
+            logging.info(f"📊 导出文件中共有 {len(posts)} 条帖子，正在复制媒体...")
+            media_file_map, missing_media = extract_archive_media(
+                archive,
+                posts,
+                media_folder_path,
+                get_layout(backup_config),
+                tracker,
+            )
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        logging.error(f"❌ 读取导出文件失败：{e}")
+        return
+
+    if missing_media:
+        logging.warning(f"⚠️ 导出文件中缺少 {missing_media} 个媒体文件，已跳过")
+    if not posts:
+        logging.info("✨ 导出文件中没有可导入的帖子。")
+        return
+
+    await save_posts(posts, config, backup_path, media_file_map)
+    last_synced_id, _ = load_last_synced_id(state_file_path, False)
+    write_sync_state_file(state_file_path, posts, last_synced_id, False, tracker)
+
+    from src.render import generate_activity_summary, generate_mastodon_html
+
+    generate_activity_summary(config, backup_path)
+    try:
+        generate_mastodon_html(posts, config, backup_path)
+    except (OSError, ValueError) as e:
+        logging.error(f"❌ HTML 网页生成失败：{e}")
+
+    tracker.write_manifest(get_state_dir(backup_path))
+    update_status_snapshot(config, backup_path, "import")
+    logging.info(f"✅ 离线导入完成，共 {len(posts)} 条帖子；之后运行 sync 即可增量同步")
+
+
+def get_watch_delay(sync_config, interval=None):
+    """下一轮轮询前的等待秒数；加入随机抖动，避免多个实例同时请求"""
+    from src.config import DEFAULT_WATCH_INTERVAL_SECONDS, DEFAULT_WATCH_JITTER
+
+    base_interval = interval or sync_config.get(
+        "watch_interval", DEFAULT_WATCH_INTERVAL_SECONDS
+    )
+    jitter = sync_config.get("watch_jitter", DEFAULT_WATCH_JITTER)
+    return max(1.0, base_interval * (1 + random.uniform(-jitter, jitter)))
+
+
+async def run_watch_iteration(
+    config, backup_path, state_file_path, last_synced_id, html_posts
+):
+    """执行一轮增量同步，返回 (最新的 last_synced_id, 网页使用的帖子表)"""
+    from src.backup import save_posts
+
+    tracker = config["change_tracker"]
+    new_posts = await fetch_mastodon_posts(config, since_id=last_synced_id)
+    if not new_posts:
+        logging.info("✨ 没有新内容需要同步。")
+        return last_synced_id, html_posts
+
+    logging.info(f"📊 发现 {len(new_posts)} 条新帖子，正在增量写入...")
+    await save_posts(new_posts, config, backup_path)
+    write_sync_state_file(state_file_path, new_posts, last_synced_id, False, tracker)
+    last_synced_id = max([post["id"] for post in new_posts] + [last_synced_id], key=int)
+    html_posts = await refresh_live_outputs(
+        config, backup_path, html_posts, changed_posts=new_posts
+    )
+    return last_synced_id, html_posts
+
+
+async def refresh_live_outputs(
+    config, backup_path, html_posts, changed_posts=(), deleted_ids=()
+):
+    """常驻模式下增量更新后刷新活动总结和网页，返回内存中的网页帖子表"""
+    from src.render import generate_activity_summary, generate_mastodon_html
+
+    generate_activity_summary(config, backup_path)
+    if html_posts is None:
+        # 只在第一次需要时拉取全部帖子，之后在内存中合并变化
+        all_posts = await fetch_mastodon_posts(config)
+        if all_posts:
+            html_posts = {post["id"]: post for post in all_posts}
+    else:
+        html_posts.update((post["id"], post) for post in changed_posts)
+    if html_posts is not None:
+        for post_id in deleted_ids:
+            html_posts.pop(post_id, None)
+    if html_posts:
+        try:
+            generate_mastodon_html(
+                sorted(html_posts.values(), key=lambda post: post["created_at"]),
+                config,
+                backup_path,
+            )
+        except (OSError, ValueError) as e:
+            logging.error(f"❌ HTML 网页生成失败：{e}")
+    return html_posts
+
+
+def install_stop_handlers(stop_event):
+    """收到 SIGINT/SIGTERM 时在两轮之间优雅退出，返回已安装的信号"""
+    loop = asyncio.get_running_loop()
+    installed = []
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop_event.set)
+            installed.append(signal_number)
+        except (NotImplementedError, RuntimeError):
+            # Windows 不支持 add_signal_handler，Ctrl+C 仍会直接中断进程
+            pass
+    return installed
+
+
+async def watch_async(interval=None, max_iterations=None):
+    """
+    常驻轮询模式：HTTP 会话、渲染缓存、哈希索引和归档条目都保留在内存中，
+    每轮只按 since_id 拉取新帖子并增量更新。状态每轮写回磁盘，重启后可直接继续。
+    """
+    import aiohttp
+
+    logging.info("========================================")
+    logging.info(" Mastodon Sync watch 模式")
+    logging.info("========================================")
+
+    config = load_single_account_config()
+    if config is None:
+        return
+
+    _, backup_path, state_file_path, archive_file_path, *_ = resolve_runtime_paths(
+        config
+    )
+    last_synced_id, _ = load_last_synced_id(state_file_path, False)
+    if not archive_file_path.exists() or not last_synced_id:
+        logging.error("❌ 尚未完成首次备份，请先运行 sync --full 或 import-archive")
+        return
+    if not check_backup_layout(config, backup_path, False):
+        return
+    config["is_full_sync"] = False
+    config["archive_stat_cache"] = {}
+
+    stop_event = asyncio.Event()
+    stop_signals = install_stop_handlers(stop_event)
+    html_posts = None
+    iteration = 0
+    # 创建带 SSL 验证的 connector，防止中间人攻击
+    connector = aiohttp.TCPConnector(ssl=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        config["http_session"] = session
+        while not stop_event.is_set():
+            iteration += 1
+            tracker = ChangeTracker(backup_path)
+            config["change_tracker"] = tracker
+            profile = profiling.RunProfile()
+            profiling.current_profile.set(profile)
+            status = "failed"
+            try:
+                last_synced_id, html_posts = await run_watch_iteration(
+                    config, backup_path, state_file_path, last_synced_id, html_posts
+                )
+                status = "ok"
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                OSError,
+                ValueError,
+            ) as e:
+                logging.error(f"❌ 本轮同步失败，将在下一轮重试：{e}")
+            tracker.write_manifest(get_state_dir(backup_path))
+            record_run_history(config, profile, "watch", status)
+
+            if max_iterations and iteration >= max_iterations:
+                break
+            delay = get_watch_delay(config["sync"], interval)
+            logging.info(f"💤 {delay:.0f} 秒后进行下一轮检查...")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        config.pop("http_session", None)
+
+    for signal_number in stop_signals:
+        asyncio.get_running_loop().remove_signal_handler(signal_number)
+    logging.info("👋 watch 模式已停止")
+
+
+async def apply_stream_event(event, data, config, backup_path, state_file_path, state):
+    """把一个流式事件增量写入本地备份；state 保存 last_synced_id 和网页帖子表"""
+    from src.backup import delete_posts, save_posts
+    from src.streaming import parse_own_status
+
+    if event == "delete":
+        post_id = data.strip().strip('"')
+        deleted_posts, deleted_media = delete_posts([post_id], config, backup_path)
+        if not deleted_posts:
+            return
+        logging.info(f"🗑️ 实时删除帖子 {post_id}，同时删除 {deleted_media} 个媒体文件")
+        state["html_posts"] = await refresh_live_outputs(
+            config, backup_path, state["html_posts"], deleted_ids=[post_id]
+        )
+        return
+
+    status = parse_own_status(data, config["mastodon"]["user_id"])
+    if status is None:
+        return
+    if event == "status.update":
+        logging.info(f"✏️ 实时更新已编辑的帖子 {status['id']}")
+    else:
+        logging.info(f"🆕 实时写入新帖子 {status['id']}")
+    await save_posts([status], config, backup_path)
+    if event == "update":
+        write_sync_state_file(
+            state_file_path,
+            [status],
+            state["last_synced_id"],
+            False,
+            config["change_tracker"],
+        )
+        state["last_synced_id"] = max([status["id"], state["last_synced_id"]], key=int)
+    state["html_posts"] = await refresh_live_outputs(
+        config, backup_path, state["html_posts"], changed_posts=[status]
+    )
+
+
+async def consume_stream(session, streaming_base_url, config, backup_path, state):
+    from src.streaming import STREAM_EVENTS, iter_stream_events
+
+    state_file_path = Path(config["sync"]["state_file"])
+    async for event, data in iter_stream_events(
+        session, streaming_base_url, config["mastodon"]["access_token"]
+    ):
+        if event not in STREAM_EVENTS:
+            continue
+        state["reconnect_attempt"] = 0
+        tracker = ChangeTracker(backup_path)
+        config["change_tracker"] = tracker
+        try:
+            await apply_stream_event(
+                event, data, config, backup_path, state_file_path, state
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # 单个异常事件只记录日志，不中断流式连接
+            logging.error(f"❌ 处理流式事件 {event} 失败：{e}")
+        tracker.write_manifest(get_state_dir(backup_path))
+        update_status_snapshot(config, backup_path, "stream")
+
+
+async def stream_async(max_connections=None):
+    """
+    实时模式：订阅用户流的 update、status.update、delete 事件并逐个增量应用。
+    每次（重新）连接前先按 since_id 补齐断线期间错过的新帖子。
+    """
+    import aiohttp
+
+    from src.streaming import get_reconnect_delay, get_streaming_base_url
+
+    logging.info("========================================")
+    logging.info(" Mastodon Sync 实时模式 (Streaming)")
+    logging.info("========================================")
+
+    config = load_single_account_config()
+    if config is None:
+        return
+
+    _, backup_path, state_file_path, archive_file_path, *_ = resolve_runtime_paths(
+        config
+    )
+    last_synced_id, _ = load_last_synced_id(state_file_path, False)
+    if not archive_file_path.exists() or not last_synced_id:
+        logging.error("❌ 尚未完成首次备份，请先运行 sync --full 或 import-archive")
+        return
+    if not check_backup_layout(config, backup_path, False):
+        return
+    config["is_full_sync"] = False
+    config["archive_stat_cache"] = {}
+
+    stop_event = asyncio.Event()
+    stop_signals = install_stop_handlers(stop_event)
+    state = {
+        "last_synced_id": last_synced_id,
+        "html_posts": None,
+        "reconnect_attempt": 0,
+    }
+    connections = 0
+    # 创建带 SSL 验证的 connector，防止中间人攻击
+    connector = aiohttp.TCPConnector(ssl=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        config["http_session"] = session
+        streaming_base_url = await get_streaming_base_url(session, config)
+        while not stop_event.is_set():
+            tracker = ChangeTracker(backup_path)
+            config["change_tracker"] = tracker
+            try:
+                state["last_synced_id"], state["html_posts"] = (
+                    await run_watch_iteration(
+                        config,
+                        backup_path,
+                        state_file_path,
+                        state["last_synced_id"],
+                        state["html_posts"],
+                    )
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logging.error(f"❌ 补齐断线期间的帖子失败：{e}")
+            tracker.write_manifest(get_state_dir(backup_path))
+            update_status_snapshot(config, backup_path, "stream")
+
+            connections += 1
+            consumer = asyncio.create_task(
+                consume_stream(session, streaming_base_url, config, backup_path, state)
+            )
+            stopper = asyncio.create_task(stop_event.wait())
+            await asyncio.wait({consumer, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            stopper.cancel()
+            if not consumer.done():
+                consumer.cancel()
+                break
+            try:
+                consumer.result()
+                logging.warning("⚠️ 流式连接已被服务器关闭，准备重连...")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"⚠️ 流式连接中断：{e}")
+
+            if max_connections and connections >= max_connections:
+                break
+            state["reconnect_attempt"] += 1
+            delay = get_reconnect_delay(state["reconnect_attempt"])
+            logging.info(f"🔁 {delay:.0f} 秒后重新连接并补齐错过的帖子...")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        config.pop("http_session", None)
+
+    for signal_number in stop_signals:
+        asyncio.get_running_loop().remove_signal_handler(signal_number)
+    logging.info("👋 实时模式已停止")
+
+
 def main():
     asyncio.run(main_async())
 
 
+def watch(interval=None):
+    asyncio.run(watch_async(interval))
+
+
+def stream():
+    asyncio.run(stream_async())
+
+
+def import_archive(zip_path):
+    asyncio.run(import_archive_async(zip_path))
+
+
 def resolve_venv_python():
     project_root = Path(__file__).resolve().parent
     venv_root = project_root / "venv"
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import json
 import logging
 import time
+from contextlib import AsyncExitStack, nullcontext
 from typing import Any, Dict, List, Optional
 
 import aiohttp
 
+from . import profiling
+from .cassette import scale_wait
+from .models import Status, as_statuses
 from .utils import parse_rate_limit_reset
 
 # --- API 请求配置常量 ---
@@ -14,6 +19,27 @@ RATE_LIMIT_THRESHOLD = 10  # 速率限制安全阈值，低于此值时触发等
 DEFAULT_WAIT_TIME = 300  # 默认等待时间（秒），当无法解析速率限制重置时间时使用
 REQUEST_RETRY_ATTEMPTS = 3
 RETRY_BASE_DELAY_SECONDS = 1
+MAX_RATE_LIMIT_WAIT = 300  # 429 时按重置时间等待的上限（秒）
+
+
+def _status_id_key(status_id: str) -> tuple[int, str]:
+    # 帖子 id 是数字字符串，先比长度再比字典序即可按数值比较
+    return len(status_id), status_id
+
+
+def get_retry_wait(exc: BaseException, attempt: int) -> float:
+    """429 时等到服务器给出的速率限制重置时间，其他错误线性退避"""
+    wait_time = RETRY_BASE_DELAY_SECONDS * attempt
+    if not (isinstance(exc, aiohttp.ClientResponseError) and exc.status == 429):
+        return wait_time
+    headers = exc.headers or {}
+    retry_after = headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(max(wait_time, int(retry_after)), MAX_RATE_LIMIT_WAIT)
+    reset_at = parse_rate_limit_reset(headers.get("X-RateLimit-Reset"))
+    if reset_at is None:
+        return wait_time
+    return min(max(wait_time, reset_at - time.time()), MAX_RATE_LIMIT_WAIT)
 
 
 async def _fetch_posts_page(
@@ -25,16 +51,19 @@ async def _fetch_posts_page(
     for attempt in range(1, REQUEST_RETRY_ATTEMPTS + 1):
         try:
             async with session.get(api_url, headers=headers, params=params) as response:
+                profiling.count("api_calls")
                 response.raise_for_status()
-                posts = await response.json()
-                return posts, response.headers
+                body = await response.read()
+                profiling.count("bytes_downloaded", len(body))
+                return json.loads(body), response.headers
         except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
             if attempt == REQUEST_RETRY_ATTEMPTS:
                 raise
-            wait_time = RETRY_BASE_DELAY_SECONDS * attempt
+            wait_time = scale_wait(get_retry_wait(exc, attempt))
             logging.warning(
-                f"⚠️ API 请求失败，第 {attempt} 次重试前等待 {wait_time} 秒：{exc}"
+                f"⚠️ API 请求失败，第 {attempt} 次重试前等待 {wait_time:.1f} 秒：{exc}"
             )
+            profiling.count("rate_limit_wait_seconds", wait_time)
             await asyncio.sleep(wait_time)
 
     return [], {}
@@ -45,7 +74,7 @@ async def fetch_mastodon_posts(
     since_id: Optional[str] = None,
     page_limit: Optional[int] = None,
     max_posts: Optional[int] = None,
-) -> List[Dict[str, Any]]:
+) -> List[Status]:
     mastodon_config = config["mastodon"]
     instance_url, user_id, access_token = (
         mastodon_config["instance_url"],
@@ -62,14 +91,22 @@ async def fetch_mastodon_posts(
     if since_id:
         params["since_id"] = since_id
 
-    all_posts: List[Dict[str, Any]] = []
+    all_posts: List[Status] = []
     page_count = 1
     requests_in_window = 0
     window_start_time = time.time()
 
-    # 创建带 SSL 验证的 connector，防止中间人攻击
-    connector = aiohttp.TCPConnector(ssl=True)
-    async with aiohttp.ClientSession(connector=connector) as session:
+    async with AsyncExitStack() as stack:
+        # watch 模式会在 config 中放入长期复用的会话，避免每轮重新建立连接
+        session = config.get("http_session")
+        if session is None:
+            # 创建带 SSL 验证的 connector，防止中间人攻击
+            connector = aiohttp.TCPConnector(ssl=True)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector)
+            )
+        # 多账户同步时由共享的限流器按实例和令牌统一控制请求节奏
+        rate_limiter = config.get("rate_limiter")
         while api_url:
             try:
                 # 智能速率限制管理
@@ -80,11 +117,12 @@ async def fetch_mastodon_posts(
                     logging.info("🔄 重置 API 调用计数器（5 分钟窗口）")
 
                 # 检查速率限制
-                if requests_in_window >= 280:  # 留 20 次缓冲
-                    wait_time = 300 - (current_time - window_start_time)
+                if rate_limiter is None and requests_in_window >= 280:  # 留 20 次缓冲
+                    wait_time = scale_wait(300 - (current_time - window_start_time))
                     if wait_time > 0:
                         logging.info(f"⏱️ 接近 API 限制，等待 {wait_time:.1f} 秒...")
                         # 简单的异步等待，不显示复杂进度条以免阻塞
+                        profiling.count("rate_limit_wait_seconds", wait_time)
                         await asyncio.sleep(wait_time)
                         logging.info("✅ API 限制已重置，继续获取帖子...")
                         requests_in_window = 0
@@ -99,9 +137,14 @@ async def fetch_mastodon_posts(
                     f"📄 正在获取第 {page_count} 页...（window: {requests_in_window}/300）"
                 )
 
-                posts, response_headers = await _fetch_posts_page(
-                    session, api_url, headers, params
-                )
+                async with (
+                    rate_limiter.slot(instance_url, access_token)
+                    if rate_limiter is not None
+                    else nullcontext()
+                ):
+                    posts, response_headers = await _fetch_posts_page(
+                        session, api_url, headers, params
+                    )
 
                 # 检查 API 返回的速率限制头
                 rate_limit_remaining = int(
@@ -112,6 +155,15 @@ async def fetch_mastodon_posts(
                 reset_header = response_headers.get("X-RateLimit-Reset", "0")
                 rate_limit_reset = parse_rate_limit_reset(reset_header)
 
+                if rate_limiter is not None:
+                    remaining_header = response_headers.get("X-RateLimit-Remaining")
+                    rate_limiter.record_response(
+                        instance_url,
+                        access_token,
+                        int(remaining_header) if remaining_header else None,
+                        rate_limit_reset,
+                    )
+
                 # 如果解析失败，使用默认值
                 if rate_limit_reset is None:
                     rate_limit_reset = int(time.time()) + DEFAULT_WAIT_TIME
@@ -119,12 +171,26 @@ async def fetch_mastodon_posts(
                 # 获取 Link header 用于分页
                 link_header = response_headers.get("Link", "")
 
+                reached_synced = False
+                if since_id:
+                    # Mastodon 的下一页链接不保留 since_id，翻到已同步的帖子时停止
+                    new_posts = [
+                        post
+                        for post in posts
+                        if _status_id_key(str(post["id"])) > _status_id_key(since_id)
+                    ]
+                    reached_synced = len(new_posts) < len(posts)
+                    posts = new_posts
+
                 if not posts:
                     break
-                all_posts.extend(posts)
+                # 逐页转换为精简模型，原始 JSON 随即释放，不在内存中累积
+                all_posts.extend(as_statuses(posts))
                 requests_in_window += 1
 
                 # 检查是否达到限制
+                if reached_synced:
+                    break
                 if page_limit and page_count >= page_limit:
                     break
                 if max_posts and len(all_posts) >= max_posts:
@@ -133,12 +199,13 @@ async def fetch_mastodon_posts(
 
                 # 如果剩余调用次数很少，等待重置
                 current_time = time.time()
-                if rate_limit_remaining < RATE_LIMIT_THRESHOLD:
-                    reset_wait = max(0, rate_limit_reset - current_time)
+                if rate_limiter is None and rate_limit_remaining < RATE_LIMIT_THRESHOLD:
+                    reset_wait = scale_wait(max(0, rate_limit_reset - current_time))
                     if reset_wait > 0 and reset_wait < 300:
                         logging.info(
                             f"⏱️ API 调用即将用完，等待 {reset_wait:.1f} 秒重置..."
                         )
+                        profiling.count("rate_limit_wait_seconds", reset_wait)
                         await asyncio.sleep(reset_wait)
                         logging.info("✅ API 限制已重置，继续获取帖子...")
                         requests_in_window = 0
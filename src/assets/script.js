@@ -1,11 +1,13 @@
 const POSTS_PER_PAGE = 40;
+// postsData 保持紧凑记录，只有渲染到当前页（或作为引用卡片）时才解码为完整帖子；
+// 记录已按时间倒序排列，引用卡片的原帖下标也在生成时算好
+const postsData = postsPayload.posts;
+const decodedPosts = new WeakMap();
 let currentPage = 1;
 let currentPosts = [];
 let filteredPosts = [];
-let postLookup = null;
 
 document.addEventListener('DOMContentLoaded', function () {
-    postsData.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
     currentPosts = [...postsData];
     filteredPosts = [...currentPosts];
 
@@ -32,7 +34,7 @@ function renderCurrentPage() {
     const endIndex = startIndex + POSTS_PER_PAGE;
     const postsToShow = filteredPosts.slice(startIndex, endIndex);
 
-    timeline.innerHTML = postsToShow.map(post => createPostHTML(post)).join('');
+    timeline.innerHTML = postsToShow.map(record => createPostHTML(decodePost(record))).join('');
     updatePaginationUI();
 
     // 重新绑定图片点击事件
@@ -40,7 +42,7 @@ function renderCurrentPage() {
 }
 
 function renderPosts(posts) {
-    currentPosts = [...posts].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+    currentPosts = [...posts];
     filteredPosts = [...currentPosts];
     currentPage = 1;
     renderCurrentPage();
@@ -101,13 +103,62 @@ function setupPagination() {
     });
 }
 
+function getPostAccount(record) {
+    return postsPayload.accounts[record.a || 0];
+}
+
+function getPostUrl(record) {
+    return record.u || `${getPostAccount(record).url}/${record.i}`;
+}
+
+function formatPostTime(timestamp) {
+    // 时间戳为 UTC 秒数，加上生成时配置的时区偏移后按 UTC 格式化，与服务器端显示一致
+    const offsetSeconds = (postsPayload.utc_offset || 0) * 60;
+    return new Date((timestamp + offsetSeconds) * 1000).toISOString().slice(0, 19).replace('T', ' ');
+}
+
+function decodeMedia(media) {
+    return {
+        url: media.u || postsPayload.media_prefix + media.p,
+        type: media.y || 'image',
+        description: media.d || '',
+    };
+}
+
+function decodePost(record) {
+    let post = decodedPosts.get(record);
+    if (post) return post;
+
+    post = {
+        id: record.i,
+        content: record.c || '',
+        created_at: formatPostTime(record.t),
+        url: getPostUrl(record),
+        sensitive: Boolean(record.s),
+        spoiler_text: record.w || '',
+        visibility: record.v || 'public',
+        media_attachments: (record.m || []).map(decodeMedia),
+        reblogs_count: record.rb || 0,
+        favourites_count: record.fv || 0,
+        replies_count: record.rp || 0,
+        in_reply_to_id: record.r || null,
+        in_reply_to_account_id: record.ra || null,
+        account: getPostAccount(record),
+        tags: (record.g || []).map(name => ({ name })),
+        reply_index: record.rx ?? null,
+        quote_index: record.qx ?? null,
+        has_quote_link: Boolean(record.q),
+    };
+    decodedPosts.set(record, post);
+    return post;
+}
+
 function createPostHTML(post) {
     const reference = getReferencePost(post);
     const mediaHTML = createMediaHTML(post.media_attachments);
     const referenceHTML = reference
         ? createReferenceCardHTML(reference.post, reference.label)
         : '';
-    const contentHTML = referenceHTML ? removeReferenceLine(post.content) : post.content;
     const statsHTML = `
         <span class="stat-item">
             <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" class="stat-icon">
@@ -148,7 +199,7 @@ function createPostHTML(post) {
                 </div>
             </div>
             <div class="status-content">
-                ${contentHTML}
+                ${post.content}
             </div>
             ${mediaHTML}
             ${referenceHTML}
@@ -163,65 +214,24 @@ function createPostHTML(post) {
 }
 
 function getReferencePost(post) {
-    const lookup = getPostLookup();
-
-    if (post.in_reply_to_id) {
-        const referencePost = lookup.byId.get(String(post.in_reply_to_id));
-        if (referencePost && referencePost.id !== post.id) {
-            return { label: '回复内容', post: referencePost, type: 'reply' };
-        }
+    if (post.reply_index !== null) {
+        return { label: '回复内容', post: decodePost(postsData[post.reply_index]), type: 'reply' };
+    }
+    if (post.quote_index !== null) {
+        return { label: '引用内容', post: decodePost(postsData[post.quote_index]), type: 'quote' };
     }
 
-    const referenceUrl = extractReferenceUrl(post.content);
-    if (!referenceUrl) return null;
-
-    const referencePost = lookup.byUrl.get(normalizeUrl(referenceUrl));
-    if (!referencePost || referencePost.id === post.id) return null;
-
-    return { label: '引用内容', post: referencePost, type: 'quote' };
+    return null;
 }
 
 function getPostActionText(post, reference) {
     if (post.in_reply_to_id) return '查看回复';
     if (reference && reference.type === 'quote') return '查看引用';
-    if (extractReferenceUrl(post.content)) return '查看引用';
+    if (post.has_quote_link) return '查看引用';
 
     return '查看原文';
 }
 
-function removeReferenceLine(content) {
-    if (!content) return '';
-
-    const wrapper = document.createElement('div');
-    wrapper.innerHTML = content;
-
-    Array.from(wrapper.children).forEach(child => {
-        if (isReferenceLine(child.textContent.trim())) {
-            child.remove();
-        }
-    });
-
-    return wrapper.innerHTML;
-}
-
-function isReferenceLine(text) {
-    return /^RE:\s*https?:\/\/[^\s]+\/@[^\s]+\/\d+$/i.test(text);
-}
-
-function extractReferenceUrl(content) {
-    if (!content || !/re:/i.test(content)) return '';
-
-    const hrefMatch = content.match(/href="(https?:\/\/[^"]+\/@[^"]+\/\d+)"/i);
-    if (hrefMatch) return hrefMatch[1];
-
-    const textMatch = content.match(/https?:\/\/[^\s<"]+\/@[^\s<"]+\/\d+/i);
-    return textMatch ? textMatch[0] : '';
-}
-
-function normalizeUrl(url) {
-    return String(url || '').replace(/\/+$/, '');
-}
-
 function createReferenceCardHTML(post, label) {
     const mediaHTML = createMediaHTML(post.media_attachments);
     const dateParts = post.created_at.split(' ');
@@ -252,21 +262,6 @@ function createReferenceCardHTML(post, label) {
     `;
 }
 
-function getPostLookup() {
-    if (postLookup) return postLookup;
-
-    postLookup = {
-        byId: new Map(),
-        byUrl: new Map(),
-    };
-
-    postsData.forEach(post => {
-        postLookup.byId.set(String(post.id), post);
-        postLookup.byUrl.set(normalizeUrl(post.url), post);
-    });
-
-    return postLookup;
-}
 function createMediaHTML(mediaAttachments) {
     if (!mediaAttachments || mediaAttachments.length === 0) return '';
 
@@ -362,12 +357,14 @@ function setupSearch() {
 
 function filterPosts(posts, query) {
     const lowerQuery = query.toLowerCase();
-    return posts.filter(post =>
-        post.content.toLowerCase().includes(lowerQuery) ||
-        post.account.display_name.toLowerCase().includes(lowerQuery) ||
-        post.account.username.toLowerCase().includes(lowerQuery) ||
-        post.tags.some(tag => tag.name.toLowerCase().includes(lowerQuery))
-    );
+    // 直接在紧凑记录上匹配，搜索时不需要解码全部帖子
+    return posts.filter(record => {
+        const account = getPostAccount(record);
+        return (record.c || '').toLowerCase().includes(lowerQuery) ||
+            account.display_name.toLowerCase().includes(lowerQuery) ||
+            account.username.toLowerCase().includes(lowerQuery) ||
+            (record.g || []).some(name => name.toLowerCase().includes(lowerQuery));
+    });
 }
 
 function setupThemeToggle() {
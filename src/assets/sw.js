@@ -0,0 +1,179 @@
+// 备份网页的离线缓存。生成网页时替换下面的占位符；清单变化会改变本文件内容，
+// 浏览器据此安装新版本，安装时只下载哈希变化的条目。
+const PRECACHE_VERSION = '__PRECACHE_VERSION__';
+const PRECACHE_MANIFEST_URL = '__PRECACHE_MANIFEST_URL__';
+const MEDIA_PREFIX = '__MEDIA_PREFIX__';
+
+const PRECACHE = 'vault-precache';
+const MEDIA_CACHE = 'vault-media';
+const PAGE_CACHE = 'vault-pages';
+const META_CACHE = 'vault-meta';
+const MANIFEST_KEY = '__precache-manifest__';
+const MEDIA_INDEX_KEY = '__media-index__';
+
+// 最近浏览的媒体按最近使用顺序淘汰，同时限制条数和总字节数
+const MEDIA_MAX_ENTRIES = 500;
+const MEDIA_MAX_BYTES = 200 * 1024 * 1024;
+const PAGE_MAX_ENTRIES = 100;
+
+const scopeUrl = new URL(self.registration.scope);
+const mediaPrefixUrl = new URL(MEDIA_PREFIX, scopeUrl).href;
+
+function resolveUrl(url) {
+    return new URL(url, scopeUrl).href;
+}
+
+async function readMeta(key, fallback) {
+    const meta = await caches.open(META_CACHE);
+    const response = await meta.match(key);
+    return response ? response.json() : fallback;
+}
+
+async function writeMeta(key, value) {
+    const meta = await caches.open(META_CACHE);
+    await meta.put(key, new Response(JSON.stringify(value), {
+        headers: { 'Content-Type': 'application/json' },
+    }));
+}
+
+async function updatePrecache() {
+    const response = await fetch(resolveUrl(PRECACHE_MANIFEST_URL), { cache: 'no-cache' });
+    const manifest = await response.json();
+    const previous = await readMeta(MANIFEST_KEY, { entries: [] });
+    const previousHashes = new Map(previous.entries.map(entry => [resolveUrl(entry.url), entry.hash]));
+    const cache = await caches.open(PRECACHE);
+
+    // 只下载新增或哈希变化的条目，未变化的条目沿用已有缓存
+    const wanted = new Set();
+    await Promise.all(manifest.entries.map(async entry => {
+        const url = resolveUrl(entry.url);
+        wanted.add(url);
+        if (previousHashes.get(url) === entry.hash && await cache.match(url)) return;
+        const fresh = await fetch(url, { cache: 'no-cache' });
+        if (!fresh.ok) throw new Error(`预缓存失败：${url}`);
+        await cache.put(url, fresh);
+    }));
+
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .filter(request => !wanted.has(request.url))
+        .map(request => cache.delete(request)));
+    await writeMeta(MANIFEST_KEY, manifest);
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(updatePrecache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    const known = [PRECACHE, MEDIA_CACHE, PAGE_CACHE, META_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name.startsWith('vault-') && !known.includes(name))
+                .map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// 媒体索引的读写串行执行，避免并发请求互相覆盖
+let mediaIndexQueue = Promise.resolve();
+
+function withMediaIndex(update) {
+    mediaIndexQueue = mediaIndexQueue
+        .then(async () => {
+            const index = await readMeta(MEDIA_INDEX_KEY, []);
+            const result = await update(index);
+            await writeMeta(MEDIA_INDEX_KEY, index);
+            return result;
+        })
+        .catch(() => undefined);
+    return mediaIndexQueue;
+}
+
+function touchMedia(url, size) {
+    return withMediaIndex(async index => {
+        const position = index.findIndex(entry => entry[0] === url);
+        if (position !== -1) {
+            size = size ?? index[position][1];
+            index.splice(position, 1);
+        }
+        index.push([url, size || 0]);
+
+        const cache = await caches.open(MEDIA_CACHE);
+        let totalBytes = index.reduce((sum, entry) => sum + entry[1], 0);
+        while (index.length > MEDIA_MAX_ENTRIES || (totalBytes > MEDIA_MAX_BYTES && index.length > 1)) {
+            const [evictedUrl, evictedSize] = index.shift();
+            totalBytes -= evictedSize;
+            await cache.delete(evictedUrl);
+        }
+    });
+}
+
+async function handleMedia(request) {
+    const cache = await caches.open(MEDIA_CACHE);
+    const cached = await cache.match(request.url);
+    if (cached) {
+        touchMedia(request.url);
+        return cached;
+    }
+
+    const response = await fetch(request);
+    // Range 请求（视频拖动）返回的部分内容不缓存
+    if (response.status === 200) {
+        const body = await response.clone().blob();
+        await cache.put(request.url, response.clone());
+        touchMedia(request.url, body.size);
+    }
+    return response;
+}
+
+async function trimPages(cache) {
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .slice(0, Math.max(0, keys.length - PAGE_MAX_ENTRIES))
+        .map(request => cache.delete(request)));
+}
+
+async function handlePage(request) {
+    // 静态站点页面优先使用网络，离线时回退到最近访问过的副本
+    const cache = await caches.open(PAGE_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.delete(request.url);
+            await cache.put(request.url, response.clone());
+            trimPages(cache);
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request.url);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+async function matchPrecache(url) {
+    const cache = await caches.open(PRECACHE);
+    return (await cache.match(url)) || (url.endsWith('/') ? cache.match(`${url}index.html`) : undefined);
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET' || request.headers.has('range')) return;
+
+    const url = new URL(request.url);
+    if (url.origin !== scopeUrl.origin) return;
+    url.search = '';
+    url.hash = '';
+
+    if (url.href.startsWith(mediaPrefixUrl)) {
+        event.respondWith(handleMedia(request));
+        return;
+    }
+
+    event.respondWith(matchPrecache(url.href).then(cached => {
+        if (cached) return cached;
+        return request.mode === 'navigate' ? handlePage(request) : fetch(request);
+    }));
+});
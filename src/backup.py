@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import json
 import logging
-import re
+import os
 from collections import defaultdict
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import aiofiles
@@ -13,43 +15,88 @@ import aiohttp
 import yaml
 from tqdm.asyncio import tqdm_asyncio
 
-from .render import format_post_for_single_file
-from .utils import get_timezone_aware_datetime, safe_remove_file
+from . import profiling
+from .cassette import scale_wait
+from .changes import ChangeTracker, get_change_tracker
+from .layout import (
+    FLAT_LAYOUT,
+    get_layout,
+    get_media_link_pattern,
+    get_media_relative_path,
+    get_post_media_prefix,
+    get_post_relative_path,
+    iter_media_files,
+    iter_post_files,
+    scan_layouts,
+)
+from .models import PostLike, as_statuses
+from .render import render_post_files
+from .render.cache import ARCHIVE_ENTRY, RenderCache, fingerprint, get_render_cache
+from .render.executor import map_in_process_pool, should_use_process_pool, split_batches
+from .store import append_statuses, delete_statuses
+from .utils import (
+    content_hash,
+    file_digest,
+    get_state_dir,
+    safe_remove_file,
+    write_text_files,
+    write_text_if_changed,
+)
 
 MEDIA_DOWNLOAD_CONCURRENCY = 8
+# 多账户并发同步时所有账户共享的媒体下载并发数
+SHARED_MEDIA_DOWNLOAD_CONCURRENCY = 32
 MEDIA_DOWNLOAD_RETRY_ATTEMPTS = 3
 MEDIA_DOWNLOAD_RETRY_BASE_DELAY_SECONDS = 1
+POST_HASH_INDEX_FILENAME = "post_hashes.json"
+MEDIA_INDEX_FILENAME = "media_index.json"
+LAYOUT_STATE_FILENAME = "layout.json"
+
+
+def get_media_local_filename(media_item: Dict[str, Any]) -> str:
+    original_filename = Path(urlparse(media_item["url"]).path).name
+    return f"{media_item['id']}-{original_filename}"
 
 
 async def download_media(
-    session: aiohttp.ClientSession, media_item: Dict[str, Any], media_folder_path: Path
+    session: aiohttp.ClientSession,
+    media_item: Dict[str, Any],
+    media_folder_path: Path,
+    replace: bool = False,
 ) -> Optional[str]:
+    """replace 为 True 时重新下载已存在的文件，下载成功后才替换旧文件"""
     url = media_item["url"]
-    original_filename = Path(urlparse(url).path).name
-    local_filename = f"{media_item['id']}-{original_filename}"
+    local_filename = get_media_local_filename(media_item)
     local_file_path = media_folder_path / local_filename
 
-    if local_file_path.exists():
+    if not replace and local_file_path.exists():
         return local_filename
 
+    # 先写入临时文件，下载完整后再改名；进程被中断或下载失败时，正式文件名下
+    # 不会出现半截文件，已有的旧文件也保持原样
+    part_file_path = local_file_path.with_name(f".{local_filename}.part")
     for attempt in range(1, MEDIA_DOWNLOAD_RETRY_ATTEMPTS + 1):
         try:
             async with session.get(url) as response:
                 response.raise_for_status()
-                async with aiofiles.open(local_file_path, "wb") as f:
+                async with aiofiles.open(part_file_path, "wb") as f:
                     while True:
                         chunk = await response.content.read(8192)
                         if not chunk:
                             break
                         await f.write(chunk)
+                        profiling.count("bytes_downloaded", len(chunk))
+            os.replace(part_file_path, local_file_path)
+            profiling.count("files_written")
+            profiling.count("media_downloaded")
             return local_filename
         except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
-            if local_file_path.exists():
-                local_file_path.unlink(missing_ok=True)
+            part_file_path.unlink(missing_ok=True)
             if attempt == MEDIA_DOWNLOAD_RETRY_ATTEMPTS:
                 logging.error(f"❌ 下载媒体文件失败：{media_item.get('url')} - {e}")
+                profiling.count("media_failed")
                 return None
-            wait_time = MEDIA_DOWNLOAD_RETRY_BASE_DELAY_SECONDS * attempt
+            wait_time = scale_wait(MEDIA_DOWNLOAD_RETRY_BASE_DELAY_SECONDS * attempt)
             logging.warning(
                 f"⚠️ 媒体下载失败，第 {attempt} 次重试前等待 {wait_time} 秒：{e}"
             )
@@ -62,8 +109,21 @@ async def download_all_media(
     media_items: List[Dict[str, Any]],
     media_folder_path: Path,
     is_full_sync: bool = False,
+    tracker: Optional[ChangeTracker] = None,
+    layout: str = FLAT_LAYOUT,
+    session: Optional[aiohttp.ClientSession] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    media_index: Optional[Dict[str, Dict[str, Any]]] = None,
+    replace: bool = False,
 ) -> Dict[str, str]:
-    """并发下载所有媒体文件"""
+    """
+    并发下载所有媒体文件，返回媒体 ID 到媒体目录内相对路径的映射。
+    replace 为 True 时已存在的文件也重新下载（verify --repair 替换损坏的文件）。
+
+    传入 session 时复用已有连接（watch 模式），否则临时创建一个会话；
+    传入 semaphore 时与其他账户共享下载并发额度；传入 media_index 时记录
+    新下载文件的来源、大小和哈希，供 verify 判断文件是否被截断或损坏。
+    """
     media_file_map = {}
     if not media_items:
         return media_file_map
@@ -72,13 +132,18 @@ async def download_all_media(
 
     # 统计需要下载的文件数量
     files_to_download = 0
+    missing_paths = set()
+    existing_paths = set()
     for media in media_items:
-        url = media["url"]
-        original_filename = Path(urlparse(url).path).name
-        local_filename = f"{media['id']}-{original_filename}"
-        local_file_path = media_folder_path / local_filename
-        if not local_file_path.exists():
-            files_to_download += 1
+        relative_path = get_media_relative_path(get_media_local_filename(media), layout)
+        local_file_path = media_folder_path / relative_path
+        if local_file_path.exists():
+            if not replace:
+                continue
+            existing_paths.add(relative_path)
+        files_to_download += 1
+        missing_paths.add(relative_path)
+        local_file_path.parent.mkdir(parents=True, exist_ok=True)
 
     # 根据同步类型显示不同的日志信息
     if is_full_sync:
@@ -91,43 +156,88 @@ async def download_all_media(
         else:
             logging.info("✅ 所有媒体文件已存在，无需下载")
 
-    # 创建带 SSL 验证的 connector，防止中间人攻击
-    connector = aiohttp.TCPConnector(ssl=True)
-    semaphore = asyncio.Semaphore(MEDIA_DOWNLOAD_CONCURRENCY)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MEDIA_DOWNLOAD_CONCURRENCY)
 
     async def download_with_limit(
         session: aiohttp.ClientSession, media_item: Dict[str, Any]
     ) -> Optional[str]:
+        relative_path = get_media_relative_path(
+            get_media_local_filename(media_item), layout
+        )
+        target_folder_path = (media_folder_path / relative_path).parent
         async with semaphore:
-            return await download_media(session, media_item, media_folder_path)
+            local_filename = await download_media(
+                session, media_item, target_folder_path, replace
+            )
+        if not local_filename:
+            return None
+        return get_media_relative_path(local_filename, layout)
 
-    async with aiohttp.ClientSession(connector=connector) as session:
+    async def download_all(session: aiohttp.ClientSession) -> List[Optional[str]]:
         tasks = [download_with_limit(session, media_item) for media_item in media_items]
-
         # 使用 tqdm 显示下载进度
-        results = await tqdm_asyncio.gather(*tasks, desc="Downloading Media")
-
-        for media, local_filename in zip(media_items, results):
-            if local_filename:
-                media_file_map[media["id"]] = local_filename
+        return await tqdm_asyncio.gather(*tasks, desc="Downloading Media")
 
+    if session is None:
+        # 创建带 SSL 验证的 connector，防止中间人攻击
+        connector = aiohttp.TCPConnector(ssl=True)
+        async with aiohttp.ClientSession(connector=connector) as own_session:
+            results = await download_all(own_session)
+    else:
+        results = await download_all(session)
+
+    downloaded = []
+    for media, relative_path in zip(media_items, results):
+        if relative_path:
+            media_file_map[media["id"]] = relative_path
+            if relative_path in missing_paths:
+                missing_paths.discard(relative_path)
+                downloaded.append((relative_path, media["url"]))
+                if tracker is not None:
+                    tracker.record_write(
+                        media_folder_path / relative_path,
+                        relative_path in existing_paths,
+                    )
+
+    if media_index is not None and downloaded:
+        await profiling.to_thread(
+            record_media_digests, media_index, media_folder_path, downloaded
+        )
     return media_file_map
 
 
-def _build_archive_entry_from_post_file(
-    post_file_path: Path, media_folder_name: str
-) -> Optional[Dict[str, Any]]:
+def record_media_digests(
+    media_index: Dict[str, Dict[str, Any]],
+    media_folder_path: Path,
+    downloaded: List[Tuple[str, str]],
+) -> None:
+    """把 (媒体目录内相对路径, 来源 URL) 对应文件的大小和 SHA-256 写入媒体索引"""
+    for relative_path, url in downloaded:
+        try:
+            size, sha256 = file_digest(media_folder_path / relative_path)
+        except OSError as e:
+            logging.warning(f"⚠️ 无法计算媒体文件哈希 {relative_path}: {e}")
+            continue
+        media_index[relative_path] = {"url": url, "size": size, "sha256": sha256}
+
+
+def _read_post_file(post_file_path: Path) -> Optional[str]:
     try:
         content = post_file_path.read_text(encoding="utf-8")
     except OSError as exc:
         logging.error(f"❌ 读取帖子文件失败 {post_file_path.name}: {exc}")
         return None
+    profiling.count("files_read")
+    return content
+
 
+def _build_archive_entry(
+    post_file_name: str, content: str, media_folder_name: str
+) -> Optional[Dict[str, Any]]:
     parts = content.split("---", 2)
     if len(parts) < 3:
-        logging.warning(
-            f"⚠️ 帖子文件 frontmatter 格式无效，已跳过：{post_file_path.name}"
-        )
+        logging.warning(f"⚠️ 帖子文件 frontmatter 格式无效，已跳过：{post_file_name}")
         return None
 
     try:
@@ -135,11 +245,14 @@ def _build_archive_entry_from_post_file(
         date_str = frontmatter.get("date") or frontmatter.get("createdAt")
         created_at = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
     except (KeyError, TypeError, ValueError, yaml.YAMLError) as exc:
-        logging.warning(f"⚠️ 无法解析帖子文件 {post_file_path.name}: {exc}")
+        logging.warning(f"⚠️ 无法解析帖子文件 {post_file_name}: {exc}")
         return None
 
     body = parts[2].strip()
-    body = body.replace("../media/", f"{media_folder_name}/")
+    # 归档文件位于备份根目录，任意层级的 ../ 媒体链接都改为从根目录出发
+    body = get_media_link_pattern(media_folder_name).sub(
+        lambda match: f"{media_folder_name}/{match.group(1)}", body
+    )
     body = body.replace("\n## 附件\n", "\n\n", 1)
 
     post_type = frontmatter.get("type", "toot")
@@ -154,22 +267,107 @@ def _build_archive_entry_from_post_file(
         f"**内容**：{body}\n\n"
         f"{source_label}：{source_url}\n\n---"
     )
+    # created_at 使用可排序的字符串，便于跨进程传递和写入渲染缓存
     return {
         "date": created_at.strftime("%Y-%m-%d"),
-        "created_at": created_at,
+        "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
         "content": archive_content,
     }
 
 
+def _build_archive_entry_from_post_file(
+    post_file_path: Path, media_folder_name: str
+) -> Optional[Dict[str, Any]]:
+    content = _read_post_file(post_file_path)
+    if content is None:
+        return None
+    return _build_archive_entry(post_file_path.name, content, media_folder_name)
+
+
+def _build_archive_entries(
+    post_files: List[Tuple[str, str]], media_folder_name: str
+) -> List[Optional[Dict[str, Any]]]:
+    return [
+        _build_archive_entry(post_file_name, content, media_folder_name)
+        for post_file_name, content in post_files
+    ]
+
+
 def _rebuild_archive_from_post_files(
-    posts_folder_path: Path, archive_file_path: Path, media_folder_name: str
+    posts_folder_path: Path,
+    archive_file_path: Path,
+    media_folder_name: str,
+    cache: Optional[RenderCache] = None,
+    tracker: Optional[ChangeTracker] = None,
+    stat_cache: Optional[Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]]] = None,
 ) -> None:
+    """
+    基于所有单帖文件重建归档。
+
+    stat_cache 是常驻进程（watch 模式）使用的内存缓存：文件的 mtime 和大小
+    都未变化时直接复用上次的归档条目，不再读取文件。
+    """
     rebuilt_posts_by_day = defaultdict(list)
 
-    for post_file_path in sorted(posts_folder_path.glob("*.md")):
-        archive_entry = _build_archive_entry_from_post_file(
-            post_file_path, media_folder_name
+    archive_entries: List[Optional[Dict[str, Any]]] = []
+    stat_keys: List[Optional[Tuple[int, int]]] = []
+    pending_files: List[Tuple[str, str]] = []
+    pending_fingerprints: List[str] = []
+    pending_indexes: List[int] = []
+    post_file_paths = iter_post_files(posts_folder_path)
+    for post_file_path in post_file_paths:
+        archive_entries.append(None)
+        stat_keys.append(None)
+        if stat_cache is not None:
+            try:
+                file_stat = post_file_path.stat()
+                stat_keys[-1] = (file_stat.st_mtime_ns, file_stat.st_size)
+            except OSError:
+                pass
+            stat_cached = stat_cache.get(post_file_path.name)
+            if stat_cached is not None and stat_cached[0] == stat_keys[-1]:
+                archive_entries[-1] = stat_cached[1]
+                continue
+        content = _read_post_file(post_file_path)
+        if content is None:
+            continue
+        entry_fingerprint = ""
+        if cache is not None:
+            entry_fingerprint = fingerprint(content, media_folder_name)
+            cached = cache.get(ARCHIVE_ENTRY, post_file_path.name, entry_fingerprint)
+            if cached is not None:
+                archive_entries[-1] = cached
+                continue
+        pending_indexes.append(len(archive_entries) - 1)
+        pending_files.append((post_file_path.name, content))
+        pending_fingerprints.append(entry_fingerprint)
+
+    parsed_entries = None
+    if should_use_process_pool(len(pending_files)):
+        parsed_entries = map_in_process_pool(
+            partial(_build_archive_entries, media_folder_name=media_folder_name),
+            split_batches(pending_files),
+            len(pending_files),
         )
+    if parsed_entries is None:
+        parsed_entries = _build_archive_entries(pending_files, media_folder_name)
+
+    for index, (post_file_name, _), entry_fingerprint, archive_entry in zip(
+        pending_indexes, pending_files, pending_fingerprints, parsed_entries
+    ):
+        archive_entries[index] = archive_entry
+        if cache is not None and archive_entry is not None:
+            cache.put(ARCHIVE_ENTRY, post_file_name, entry_fingerprint, archive_entry)
+
+    if stat_cache is not None:
+        stat_cache.clear()
+        for post_file_path, stat_key, archive_entry in zip(
+            post_file_paths, stat_keys, archive_entries
+        ):
+            if stat_key is not None and archive_entry is not None:
+                stat_cache[post_file_path.name] = (stat_key, archive_entry)
+
+    for archive_entry in archive_entries:
         if archive_entry is None:
             continue
         rebuilt_posts_by_day[archive_entry["date"]].append(archive_entry)
@@ -184,7 +382,128 @@ def _rebuild_archive_from_post_files(
         )
         final_content += "\n\n".join(post["content"] for post in day_posts) + "\n\n"
 
-    archive_file_path.write_text(final_content, encoding="utf-8")
+    write_text_if_changed(archive_file_path, final_content, tracker)
+
+
+def rebuild_archive(config: Dict[str, Any], backup_path: Path) -> None:
+    """只基于本地单帖文件重建归档，不改动帖子文件"""
+    backup_config = config["backup"]
+    render_cache = get_render_cache(config, backup_path)
+    _rebuild_archive_from_post_files(
+        backup_path / backup_config["posts_folder"],
+        backup_path / backup_config["filename"],
+        backup_config["media_folder"],
+        render_cache,
+        get_change_tracker(config),
+        config.get("archive_stat_cache"),
+    )
+    render_cache.save()
+
+
+def get_post_hash_index(config: Dict[str, Any], backup_path: Path) -> Dict[str, str]:
+    """读取帖子相对路径到内容哈希的索引，用于不读文件即可判断是否需要重写"""
+    hash_index = config.get("post_hash_index")
+    if hash_index is not None:
+        return hash_index
+
+    hash_index = {}
+    index_path = get_state_dir(backup_path) / POST_HASH_INDEX_FILENAME
+    if index_path.exists():
+        try:
+            hash_index = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ 帖子哈希索引无法读取，将逐个比对文件：{e}")
+            hash_index = {}
+    config["post_hash_index"] = hash_index
+    return hash_index
+
+
+def save_post_hash_index(config: Dict[str, Any], backup_path: Path) -> None:
+    hash_index = config.get("post_hash_index")
+    if hash_index is None:
+        return
+    try:
+        write_text_if_changed(
+            get_state_dir(backup_path) / POST_HASH_INDEX_FILENAME,
+            json.dumps(hash_index, sort_keys=True, separators=(",", ":")),
+        )
+    except OSError as e:
+        logging.warning(f"⚠️ 保存帖子哈希索引失败：{e}")
+
+
+def get_media_index(
+    config: Dict[str, Any], backup_path: Path
+) -> Dict[str, Dict[str, Any]]:
+    """读取媒体相对路径到来源 URL、大小和哈希的索引"""
+    media_index = config.get("media_index")
+    if media_index is not None:
+        return media_index
+
+    media_index = {}
+    index_path = get_state_dir(backup_path) / MEDIA_INDEX_FILENAME
+    if index_path.exists():
+        try:
+            media_index = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ 媒体索引无法读取，将重新记录：{e}")
+            media_index = {}
+    config["media_index"] = media_index
+    return media_index
+
+
+def save_media_index(config: Dict[str, Any], backup_path: Path) -> None:
+    media_index = config.get("media_index")
+    if media_index is None:
+        return
+    try:
+        write_text_if_changed(
+            get_state_dir(backup_path) / MEDIA_INDEX_FILENAME,
+            json.dumps(media_index, sort_keys=True, separators=(",", ":")),
+        )
+    except OSError as e:
+        logging.warning(f"⚠️ 保存媒体索引失败：{e}")
+
+
+def _write_post_files(
+    rendered_posts: List[Tuple[str, str]],
+    posts_folder_path: Path,
+    hash_index: Dict[str, str],
+    tracker: Optional[ChangeTracker] = None,
+    layout: str = FLAT_LAYOUT,
+) -> int:
+    """只写入内容有变化的帖子文件，未变化的文件保持原有 mtime"""
+    files_to_write = []
+    pending_hashes = {}
+    for filename, new_content in rendered_posts:
+        relative_path = get_post_relative_path(filename, layout)
+        file_path = posts_folder_path / relative_path
+        new_hash = content_hash(new_content)
+        existed = file_path.exists()
+        if existed:
+            if hash_index.get(relative_path) == new_hash:
+                continue
+            if relative_path not in hash_index:
+                # 旧版本生成的文件没有哈希记录，读取一次比对后补录
+                try:
+                    if file_path.read_text(encoding="utf-8") == new_content:
+                        hash_index[relative_path] = new_hash
+                        continue
+                except OSError as e:
+                    logging.warning(
+                        f"⚠️ 读取已有帖子文件失败，将覆盖写入 {file_path}: {e}"
+                    )
+        files_to_write.append((file_path, new_content))
+        pending_hashes[file_path] = (relative_path, new_hash, existed)
+
+    failures = write_text_files(files_to_write)
+    for file_path, error in failures:
+        logging.error(f"❌ 无法写入文件 {file_path}: {error}")
+        pending_hashes.pop(file_path, None)
+    for file_path, (relative_path, new_hash, existed) in pending_hashes.items():
+        hash_index[relative_path] = new_hash
+        if tracker is not None:
+            tracker.record_write(file_path, existed)
+    return len(pending_hashes)
 
 
 def _sync_posts_for_archive(
@@ -193,29 +512,28 @@ def _sync_posts_for_archive(
     backup_config: Dict[str, Any],
     sync_config: Dict[str, Any],
     media_file_map: Dict[str, str],
+    cache: Optional[RenderCache] = None,
+    hash_index: Optional[Dict[str, str]] = None,
+    tracker: Optional[ChangeTracker] = None,
 ) -> None:
     posts_folder_path.mkdir(parents=True, exist_ok=True)
+    layout = get_layout(backup_config)
 
-    for post in posts_to_update:
-        local_dt = get_timezone_aware_datetime(
-            post["created_at"], sync_config["china_timezone"]
-        )
-        filename = f"{local_dt.strftime('%Y-%m-%d_%H%M%S')}_{post['id']}.md"
-        file_path = posts_folder_path / filename
-        new_content = format_post_for_single_file(
-            post,
-            backup_config["media_folder"],
-            media_file_map,
-            sync_config["china_timezone"],
-        )
-        if file_path.exists():
-            try:
-                existing_content = file_path.read_text(encoding="utf-8")
-                if existing_content == new_content:
-                    continue
-            except OSError:
-                pass
-        file_path.write_text(new_content, encoding="utf-8")
+    rendered_posts = render_post_files(
+        posts_to_update,
+        backup_config["media_folder"],
+        media_file_map,
+        sync_config["china_timezone"],
+        cache,
+        layout,
+    )
+    _write_post_files(
+        rendered_posts,
+        posts_folder_path,
+        {} if hash_index is None else hash_index,
+        tracker,
+        layout,
+    )
 
 
 def update_archive_file(
@@ -229,6 +547,8 @@ def update_archive_file(
     posts_folder_name = backup_config.get("posts_folder", "mastodon")
     archive_file_path = backup_path / archive_filename
     posts_folder_path = backup_path / posts_folder_name
+    render_cache = get_render_cache(config, backup_path)
+    tracker = get_change_tracker(config)
 
     _sync_posts_for_archive(
         posts_to_update,
@@ -236,14 +556,93 @@ def update_archive_file(
         backup_config,
         config["sync"],
         config.get("media_file_map", {}),
+        render_cache,
+        get_post_hash_index(config, backup_path),
+        tracker,
     )
     logging.info("📝 正在基于本地单帖文件重建归档，确保增量同步不丢历史...")
     _rebuild_archive_from_post_files(
-        posts_folder_path, archive_file_path, media_folder_name
+        posts_folder_path,
+        archive_file_path,
+        media_folder_name,
+        render_cache,
+        tracker,
+        config.get("archive_stat_cache"),
     )
+    render_cache.save()
+    save_post_hash_index(config, backup_path)
     logging.info(f"✍️  已更新归档文件：{archive_file_path}")
 
 
+def rebuild_post_files(
+    posts: List[PostLike], config: Dict[str, Any], backup_path: Path
+) -> Tuple[int, int, int]:
+    """
+    按本地原始数据重新渲染全部帖子文件，媒体只引用本地已存在的文件。
+
+    只写入内容有变化的文件；时区设置变化后文件名随之改变，原始数据中有记录的旧文件
+    会被删除，没有记录的帖子文件保持不变。返回 (写入数, 删除数, 没有原始数据的文件数)。
+    """
+    backup_config = config["backup"]
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    media_folder_path = backup_path / backup_config["media_folder"]
+    layout = get_layout(backup_config)
+    tracker = get_change_tracker(config)
+    posts = as_statuses(posts)
+
+    local_media = {
+        path.relative_to(media_folder_path).as_posix()
+        for path in iter_media_files(media_folder_path)
+    }
+    media_file_map = {}
+    for post in posts:
+        for media in post.media_attachments:
+            relative_path = get_media_relative_path(
+                get_media_local_filename(media), layout
+            )
+            if relative_path in local_media:
+                media_file_map[media.id] = relative_path
+
+    render_cache = get_render_cache(config, backup_path)
+    rendered_posts = render_post_files(
+        posts,
+        backup_config["media_folder"],
+        media_file_map,
+        config["sync"]["china_timezone"],
+        render_cache,
+        layout,
+    )
+    hash_index = get_post_hash_index(config, backup_path)
+    written = _write_post_files(
+        rendered_posts, posts_folder_path, hash_index, tracker, layout
+    )
+
+    expected_paths = {
+        get_post_relative_path(filename, layout) for filename, _ in rendered_posts
+    }
+    stored_ids = {str(post.id) for post in posts}
+    removed = 0
+    unmatched = 0
+    for post_file_path in iter_post_files(posts_folder_path):
+        relative_path = post_file_path.relative_to(posts_folder_path).as_posix()
+        if relative_path in expected_paths:
+            continue
+        if post_file_path.stem.rsplit("_", 1)[-1] not in stored_ids:
+            unmatched += 1
+            continue
+        if safe_remove_file(post_file_path):
+            hash_index.pop(relative_path, None)
+            if tracker is not None:
+                tracker.record_delete(post_file_path)
+            removed += 1
+    if removed:
+        _remove_empty_dirs(posts_folder_path)
+
+    render_cache.save()
+    save_post_hash_index(config, backup_path)
+    return written, removed, unmatched
+
+
 def cleanup_deleted_posts(
     server_posts: List[Dict[str, Any]],
     config: Dict[str, Any],
@@ -254,101 +653,336 @@ def cleanup_deleted_posts(
     posts_folder_path = backup_path / backup_config["posts_folder"]
     media_folder_path = backup_path / backup_config["media_folder"]
     server_post_ids = {str(post["id"]) for post in server_posts}
-    deleted_posts = 0
+    hash_index = get_post_hash_index(config, backup_path)
+    tracker = get_change_tracker(config)
+    deleted_ids = []
 
-    for post_file_path in posts_folder_path.glob("*.md"):
+    for post_file_path in iter_post_files(posts_folder_path):
         post_id = post_file_path.stem.rsplit("_", 1)[-1]
         if post_id in server_post_ids:
             continue
         if safe_remove_file(post_file_path):
-            deleted_posts += 1
+            hash_index.pop(
+                post_file_path.relative_to(posts_folder_path).as_posix(), None
+            )
+            if tracker is not None:
+                tracker.record_delete(post_file_path)
+            deleted_ids.append(post_id)
+    deleted_posts = len(deleted_ids)
+    delete_statuses(backup_path, deleted_ids)
 
     referenced_media = set()
-    media_prefix = f"../{backup_config['media_folder']}/"
-    for post_file_path in posts_folder_path.glob("*.md"):
+    media_link_pattern = get_media_link_pattern(backup_config["media_folder"])
+    for post_file_path in iter_post_files(posts_folder_path):
         try:
             content = post_file_path.read_text(encoding="utf-8")
         except OSError as exc:
             logging.warning(f"⚠️ 无法读取帖子文件，跳过媒体检查 {post_file_path}: {exc}")
             continue
-        referenced_media.update(
-            re.findall(rf"{re.escape(media_prefix)}([^\s)]+)", content)
-        )
+        referenced_media.update(media_link_pattern.findall(content))
 
     deleted_media = 0
-    if media_folder_path.exists():
-        for media_file_path in media_folder_path.iterdir():
-            if (
-                not media_file_path.is_file()
-                or media_file_path.name in referenced_media
-            ):
-                continue
-            if safe_remove_file(media_file_path):
+    media_index = get_media_index(config, backup_path)
+    for media_file_path in iter_media_files(media_folder_path):
+        relative_path = media_file_path.relative_to(media_folder_path).as_posix()
+        if relative_path in referenced_media:
+            continue
+        if safe_remove_file(media_file_path):
+            media_index.pop(relative_path, None)
+            if tracker is not None:
+                tracker.record_delete(media_file_path)
+            deleted_media += 1
+
+    render_cache = get_render_cache(config, backup_path)
+    _rebuild_archive_from_post_files(
+        posts_folder_path,
+        backup_path / backup_config["filename"],
+        backup_config["media_folder"],
+        render_cache,
+        tracker,
+        config.get("archive_stat_cache"),
+    )
+    render_cache.save()
+    save_post_hash_index(config, backup_path)
+    save_media_index(config, backup_path)
+    return deleted_posts, deleted_media
+
+
+def delete_posts(
+    post_ids: List[str], config: Dict[str, Any], backup_path: Path
+) -> Tuple[int, int]:
+    """按 ID 删除本地帖子文件及其引用的媒体，并重建归档；用于实时删除事件"""
+    backup_config = config["backup"]
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    media_folder_path = backup_path / backup_config["media_folder"]
+    media_link_pattern = get_media_link_pattern(backup_config["media_folder"])
+    target_ids = {str(post_id) for post_id in post_ids}
+    hash_index = get_post_hash_index(config, backup_path)
+    media_index = get_media_index(config, backup_path)
+    tracker = get_change_tracker(config)
+
+    deleted_posts = 0
+    deleted_media = 0
+    for post_file_path in iter_post_files(posts_folder_path):
+        if post_file_path.stem.rsplit("_", 1)[-1] not in target_ids:
+            continue
+        content = _read_post_file(post_file_path) or ""
+        if not safe_remove_file(post_file_path):
+            continue
+        hash_index.pop(post_file_path.relative_to(posts_folder_path).as_posix(), None)
+        if tracker is not None:
+            tracker.record_delete(post_file_path)
+        deleted_posts += 1
+        # 媒体文件名以附件 ID 开头，只会被这一条帖子引用
+        for relative_path in media_link_pattern.findall(content):
+            media_file_path = media_folder_path / relative_path
+            if media_file_path.exists() and safe_remove_file(media_file_path):
+                media_index.pop(relative_path, None)
+                if tracker is not None:
+                    tracker.record_delete(media_file_path)
                 deleted_media += 1
 
+    if not deleted_posts:
+        return 0, 0
+    delete_statuses(backup_path, target_ids)
+
+    render_cache = get_render_cache(config, backup_path)
     _rebuild_archive_from_post_files(
         posts_folder_path,
         backup_path / backup_config["filename"],
         backup_config["media_folder"],
+        render_cache,
+        tracker,
+        config.get("archive_stat_cache"),
     )
+    render_cache.save()
+    save_post_hash_index(config, backup_path)
+    save_media_index(config, backup_path)
     return deleted_posts, deleted_media
 
 
+def get_recorded_layout(backup_path: Path) -> Optional[str]:
+    """读取备份目录上次迁移/写入时记录的布局，没有记录时返回 None"""
+    layout_path = get_state_dir(backup_path) / LAYOUT_STATE_FILENAME
+    if not layout_path.exists():
+        return None
+    try:
+        return json.loads(layout_path.read_text(encoding="utf-8")).get("layout")
+    except (OSError, ValueError, AttributeError) as e:
+        logging.warning(f"⚠️ 布局记录无法读取：{e}")
+        return None
+
+
+def detect_backup_layout(config: Dict[str, Any], backup_path: Path) -> Optional[str]:
+    """
+    按磁盘上的文件返回已有备份的实际布局，还没有帖子时返回 None。
+
+    .vault-sync 可能被删除或从旧缓存恢复，布局记录只在两种布局的文件同时存在
+    （migrate-layout 被中断）时作为参考；此时记录仍是迁移前的布局，没有记录时视为 flat。
+    """
+    backup_config = config["backup"]
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    if not iter_post_files(posts_folder_path):
+        return None
+    layouts = scan_layouts(
+        posts_folder_path, backup_path / backup_config["media_folder"]
+    )
+    if len(layouts) == 1:
+        return layouts.pop()
+    logging.warning("⚠️ 备份目录中两种布局的文件混在一起，上次迁移可能没有完成")
+    recorded_layout = get_recorded_layout(backup_path)
+    return recorded_layout if recorded_layout in layouts else FLAT_LAYOUT
+
+
+def record_layout(backup_path: Path, layout: str) -> None:
+    write_text_if_changed(
+        get_state_dir(backup_path) / LAYOUT_STATE_FILENAME,
+        json.dumps({"layout": layout}) + "\n",
+    )
+
+
+def _remove_empty_dirs(folder_path: Path) -> None:
+    if not folder_path.exists():
+        return
+    # 先处理最深的目录，父目录在子目录删除后才可能变空
+    for dir_path in sorted(
+        (path for path in folder_path.rglob("*") if path.is_dir()),
+        key=lambda path: len(path.parts),
+        reverse=True,
+    ):
+        try:
+            dir_path.rmdir()
+        except OSError:
+            pass
+
+
+def migrate_backup_layout(
+    config: Dict[str, Any], backup_path: Path, target_layout: str
+) -> Tuple[int, int]:
+    """
+    把已有备份迁移到目标布局，返回 (移动的帖子数, 移动的媒体数)。
+
+    每个文件先写入/移动到新位置再删除旧文件，中断后重新运行会继续处理剩余文件；
+    已处于目标布局的文件会被跳过，因此可以重复执行。
+    """
+    backup_config = config["backup"]
+    media_folder_name = backup_config["media_folder"]
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    media_folder_path = backup_path / media_folder_name
+    tracker = get_change_tracker(config)
+    media_index = get_media_index(config, backup_path)
+
+    moved_media = 0
+    for media_file_path in iter_media_files(media_folder_path):
+        relative_path = media_file_path.relative_to(media_folder_path).as_posix()
+        target_relative_path = get_media_relative_path(
+            media_file_path.name, target_layout
+        )
+        if relative_path == target_relative_path:
+            continue
+        target_path = media_folder_path / target_relative_path
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(media_file_path, target_path)
+        except OSError as e:
+            logging.error(f"❌ 移动媒体文件失败 {media_file_path}: {e}")
+            continue
+        if relative_path in media_index:
+            media_index[target_relative_path] = media_index.pop(relative_path)
+        if tracker is not None:
+            tracker.record_delete(media_file_path)
+            tracker.record_write(target_path, False)
+        moved_media += 1
+
+    media_link_pattern = get_media_link_pattern(media_folder_name)
+    media_prefix = get_post_media_prefix(media_folder_name, target_layout)
+    hash_index = get_post_hash_index(config, backup_path)
+    moved_posts = 0
+    for post_file_path in iter_post_files(posts_folder_path):
+        content = _read_post_file(post_file_path)
+        if content is None:
+            continue
+        relative_path = post_file_path.relative_to(posts_folder_path).as_posix()
+        target_relative_path = get_post_relative_path(
+            post_file_path.name, target_layout
+        )
+        new_content = media_link_pattern.sub(
+            lambda match: media_prefix
+            + get_media_relative_path(Path(match.group(1)).name, target_layout),
+            content,
+        )
+        if relative_path == target_relative_path and new_content == content:
+            continue
+        target_path = posts_folder_path / target_relative_path
+        try:
+            write_text_if_changed(target_path, new_content, tracker)
+        except OSError as e:
+            logging.error(f"❌ 写入帖子文件失败 {target_path}: {e}")
+            continue
+        hash_index.pop(relative_path, None)
+        hash_index[target_relative_path] = content_hash(new_content)
+        if relative_path != target_relative_path and safe_remove_file(post_file_path):
+            if tracker is not None:
+                tracker.record_delete(post_file_path)
+        moved_posts += 1
+
+    _remove_empty_dirs(posts_folder_path)
+    _remove_empty_dirs(media_folder_path)
+
+    render_cache = get_render_cache(config, backup_path)
+    _rebuild_archive_from_post_files(
+        posts_folder_path,
+        backup_path / backup_config["filename"],
+        media_folder_name,
+        render_cache,
+        tracker,
+    )
+    render_cache.save()
+    save_post_hash_index(config, backup_path)
+    save_media_index(config, backup_path)
+    record_layout(backup_path, target_layout)
+    return moved_posts, moved_media
+
+
 async def save_posts(
-    posts: List[Dict[str, Any]],
+    posts: List[PostLike],
     config: Dict[str, Any],
     backup_path: Path,
+    media_file_map: Optional[Dict[str, str]] = None,
 ) -> None:
+    """写入帖子文件并更新归档；media_file_map 已给出时（如离线导入）跳过媒体下载"""
+    posts = as_statuses(posts)
+    profiling.count("posts_processed", len(posts))
     backup_config = config["backup"]
     posts_folder_path = backup_path / backup_config["posts_folder"]
     media_folder_path = backup_path / backup_config["media_folder"]
-
-    # 收集所有需要下载的媒体
-    all_media_items = []
-    for post in posts:
-        if post.get("media_attachments"):
-            all_media_items.extend(post["media_attachments"])
-
-    # 并发下载媒体
-    media_file_map = await download_all_media(
-        all_media_items, media_folder_path, config.get("is_full_sync", False)
-    )
+    tracker = get_change_tracker(config)
+
+    if media_file_map is None:
+        # 收集所有需要下载的媒体
+        all_media_items = []
+        for post in posts:
+            all_media_items.extend(post.media_attachments)
+
+        # 并发下载媒体
+        with profiling.span("media"):
+            media_file_map = await download_all_media(
+                all_media_items,
+                media_folder_path,
+                config.get("is_full_sync", False),
+                tracker,
+                get_layout(backup_config),
+                config.get("http_session"),
+                config.get("media_download_semaphore"),
+                get_media_index(config, backup_path),
+            )
+        save_media_index(config, backup_path)
+        # 下载失败的媒体记入状态快照，status 命令可以直接列出
+        config["failed_media"] = [
+            {
+                "url": media["url"],
+                "path": get_media_relative_path(
+                    get_media_local_filename(media), get_layout(backup_config)
+                ),
+            }
+            for media in all_media_items
+            if media["id"] not in media_file_map
+        ]
     config["media_file_map"] = media_file_map
+    # 保存渲染所需的原始数据，之后可以用 rebuild 离线重新生成全部输出
+    append_statuses(backup_path, posts)
 
     posts_folder_path.mkdir(parents=True, exist_ok=True)
 
     logging.info(f"📄 正在写入 {len(posts)} 个帖子文件...")
 
-    for post in posts:
-        local_dt = get_timezone_aware_datetime(
-            post["created_at"], config["sync"]["china_timezone"]
-        )
-        filename = f"{local_dt.strftime('%Y-%m-%d_%H%M%S')}_{post['id']}.md"
-        file_path = posts_folder_path / filename
-        new_content = format_post_for_single_file(
-            post,
+    # 渲染是 CPU 密集型任务，放到线程中调度进程池，避免阻塞事件循环
+    with profiling.span("render"):
+        rendered_posts = await profiling.to_thread(
+            render_post_files,
+            posts,
             backup_config["media_folder"],
             media_file_map,
             config["sync"]["china_timezone"],
+            get_render_cache(config, backup_path),
+            get_layout(backup_config),
         )
 
-        if not file_path.exists():
-            should_write = True
-        else:
-            try:
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    existing_content = await f.read()
-                should_write = existing_content != new_content
-            except OSError as e:
-                logging.warning(f"⚠️ 读取已有帖子文件失败，将覆盖写入 {file_path}: {e}")
-                should_write = True
-
-        if should_write:
-            try:
-                async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-                    await f.write(new_content)
-            except OSError as e:
-                logging.error(f"❌ 无法写入文件 {file_path}: {e}")
+    with profiling.span("write"):
+        written_count = await profiling.to_thread(
+            _write_post_files,
+            rendered_posts,
+            posts_folder_path,
+            get_post_hash_index(config, backup_path),
+            tracker,
+            get_layout(backup_config),
+        )
+    logging.info(
+        f"📄 {written_count} 个帖子文件有变化，{len(posts) - written_count} 个保持不变"
+    )
 
-    update_archive_file(posts, config, backup_path)
+    # 归档重建需要读取全部帖子文件，放到线程中执行，多账户同步时不阻塞其他账户
+    with profiling.span("archive"):
+        await profiling.to_thread(update_archive_file, posts, config, backup_path)
+    record_layout(backup_path, get_layout(backup_config))
     logging.info("✅ 所有帖子文件写入完成")
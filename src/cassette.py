@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 录制与回放（cassette）。
+
+录制模式下，拉取帖子、下载媒体和生成网页时下载表情/背景图的请求照常发出，同时把
+请求、响应状态、响应头、响应体和耗时写入一个 gzip 压缩的 JSONL 文件；访问令牌等
+敏感信息在写入前替换掉，相同的响应体只保存一份。回放模式不访问网络，按录制顺序
+返回同样的响应，可以按原速、加速或不等待回放，用于离线复现线上同步的流量形态。
+"""
+import asyncio
+import base64
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+import requests
+from multidict import CIMultiDict, CIMultiDictProxy
+from requests.structures import CaseInsensitiveDict
+from yarl import URL
+
+CASSETTE_VERSION = 1
+REDACTED = "REDACTED"
+SECRET_HEADERS = {"authorization", "proxy-authorization", "cookie", "set-cookie"}
+SECRET_PARAMS = {"access_token", "client_secret", "code", "password", "token"}
+RECORD_MODE = "record"
+REPLAY_MODE = "replay"
+
+# 同步运行期间生效的 cassette；线程中的网页生成通过复制的上下文读取
+active_cassette: contextvars.ContextVar[Optional["Cassette"]] = contextvars.ContextVar(
+    "active_cassette", default=None
+)
+
+
+def scale_wait(seconds: float) -> float:
+    """
+    重试和速率限制的等待时间。回放时按 --replay-speed 缩放，录制中的 429 和
+    Retry-After 不会让回放真的等上几分钟；录制或未启用 cassette 时原样返回
+    """
+    cassette = active_cassette.get()
+    if cassette is None or cassette.mode != REPLAY_MODE:
+        return seconds
+    return cassette.delay(seconds)
+
+
+class CassetteMissError(aiohttp.ClientConnectionError):
+    """回放时找不到对应的录制；按连接失败处理，调用方的重试和降级逻辑照常生效"""
+
+
+def redact_url(url: Any) -> str:
+    """去掉查询参数中的敏感值，并按参数名排序，作为匹配请求的键"""
+    url = URL(str(url))
+    query = sorted(
+        (key, REDACTED if key.lower() in SECRET_PARAMS else value)
+        for key, value in url.query.items()
+    )
+    return str(url.with_query(query) if query else url.with_query(None))
+
+
+def redact_headers(headers: Any) -> List[Tuple[str, str]]:
+    return [
+        (key, REDACTED if key.lower() in SECRET_HEADERS else str(value))
+        for key, value in (headers or {}).items()
+    ]
+
+
+def _build_url(url: Any, params: Any) -> URL:
+    url = URL(str(url))
+    return url.extend_query(params) if params else url
+
+
+class Cassette:
+    """一次同步的全部 HTTP 交互；录制时线程和协程都会写入，用锁保护"""
+
+    def __init__(self, path: Path, mode: str, speed: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.started = time.monotonic()
+        self.interactions: List[Dict[str, Any]] = []
+        self.bodies: Dict[str, bytes] = {}
+        self._queues: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, speed: float = 1.0) -> "Cassette":
+        cassette = cls(path, REPLAY_MODE, speed)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"不支持的 cassette 版本：{header.get('version')}")
+            for line in f:
+                record = json.loads(line)
+                if record["type"] == "body":
+                    cassette.bodies[record["sha"]] = base64.b64decode(record["data"])
+                else:
+                    cassette.interactions.append(record)
+        for interaction in cassette.interactions:
+            key = (interaction["method"], interaction["url"])
+            cassette._queues[key].append(interaction)
+        return cassette
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            header = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            f.write(json.dumps(header) + "\n")
+            for sha, data in self.bodies.items():
+                record = {
+                    "type": "body",
+                    "sha": sha,
+                    "data": base64.b64encode(data).decode("ascii"),
+                }
+                f.write(json.dumps(record) + "\n")
+            for interaction in sorted(self.interactions, key=lambda i: i["offset"]):
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+        temp_path.replace(self.path)
+        logging.info(
+            f"📼 已录制 {len(self.interactions)} 个请求（{len(self.bodies)} 个不同响应体）到 {self.path}"
+        )
+
+    def record(
+        self,
+        method: str,
+        url: Any,
+        request_headers: Any,
+        start: float,
+        elapsed: float,
+        status: Optional[int] = None,
+        reason: str = "",
+        response_headers: Any = None,
+        body: bytes = b"",
+        duration: Optional[float] = None,
+        error: str = "",
+    ) -> None:
+        sha = hashlib.sha256(body).hexdigest()[:16] if body else ""
+        interaction = {
+            "type": "interaction",
+            "method": method,
+            "url": redact_url(url),
+            "request_headers": redact_headers(request_headers),
+            "offset": round(start - self.started, 4),
+            "elapsed": round(elapsed, 4),
+            "duration": round(duration if duration is not None else elapsed, 4),
+            "status": status,
+            "reason": reason,
+            "response_headers": redact_headers(response_headers),
+            "body": sha,
+            "error": error,
+        }
+        with self._lock:
+            if sha:
+                self.bodies[sha] = body
+            self.interactions.append(interaction)
+
+    def next_interaction(self, method: str, url: Any) -> Dict[str, Any]:
+        """按录制顺序取出同一请求的下一次响应；重复次数超过录制时沿用最后一次"""
+        key = (method, redact_url(url))
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise CassetteMissError(
+                    f"cassette 中没有该请求的录制：{method} {key[1]}"
+                )
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def body_of(self, interaction: Dict[str, Any]) -> bytes:
+        return self.bodies.get(interaction["body"], b"")
+
+    def delay(self, seconds: float) -> float:
+        """回放时实际等待的秒数；speed 为 0 时不等待"""
+        return seconds / self.speed if self.speed > 0 else 0.0
+
+    def wrap_session(self, session: Optional[aiohttp.ClientSession]) -> Any:
+        if self.mode == RECORD_MODE:
+            return RecordingSession(session, self)
+        return ReplaySession(self)
+
+
+class _RecordingContent:
+    def __init__(self, content: Any, chunks: List[bytes]):
+        self._content = content
+        self._chunks = chunks
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk = await self._content.read(n)
+        self._chunks.append(chunk)
+        return chunk
+
+
+class _RecordingResponse:
+    """转发到真实响应，同时保存读取到的响应体"""
+
+    def __init__(self, response: aiohttp.ClientResponse):
+        self._response = response
+        self.chunks: List[bytes] = []
+        self.content = _RecordingContent(response.content, self.chunks)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    async def read(self) -> bytes:
+        body = await self._response.read()
+        self.chunks.append(body)
+        return body
+
+    async def json(self, **kwargs: Any) -> Any:
+        return json.loads(await self.read())
+
+
+class _RecordingRequest:
+    def __init__(self, session: "RecordingSession", url: URL, kwargs: Dict[str, Any]):
+        self._session = session
+        self._url = url
+        self._kwargs = kwargs
+        self._context: Any = None
+        self._response: Optional[_RecordingResponse] = None
+        self._start = 0.0
+        self._elapsed = 0.0
+
+    async def __aenter__(self) -> _RecordingResponse:
+        cassette = self._session.cassette
+        self._start = time.monotonic()
+        self._context = self._session.session.get(self._url, **self._kwargs)
+        try:
+            response = await self._context.__aenter__()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            cassette.record(
+                "GET",
+                self._url,
+                self._kwargs.get("headers"),
+                self._start,
+                time.monotonic() - self._start,
+                error=f"{type(exc).__name__}: {exc}",
+            )
+            raise
+        self._elapsed = time.monotonic() - self._start
+        self._response = _RecordingResponse(response)
+        return self._response
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        response = self._response
+        if response is not None:
+            self._session.cassette.record(
+                "GET",
+                self._url,
+                self._kwargs.get("headers"),
+                self._start,
+                self._elapsed,
+                response.status,
+                response.reason or "",
+                response.headers,
+                b"".join(response.chunks),
+                time.monotonic() - self._start,
+                # 读取响应体时连接中断等错误，回放时在读完已录制的部分后重现
+                f"{exc_type.__name__}: {exc}" if exc_type is not None else "",
+            )
+        return await self._context.__aexit__(exc_type, exc, tb)
+
+
+class RecordingSession:
+    """包装真实的 aiohttp 会话；只实现同步流程用到的 get"""
+
+    def __init__(self, session: Optional[aiohttp.ClientSession], cassette: Cassette):
+        self.session = session
+        self.cassette = cassette
+
+    def get(self, url: Any, **kwargs: Any) -> _RecordingRequest:
+        params = kwargs.pop("params", None)
+        return _RecordingRequest(self, _build_url(url, params), kwargs)
+
+
+class _ReplayContent:
+    def __init__(self, response: "ReplayResponse"):
+        self._response = response
+        self._offset = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        await self._response.wait_for_body()
+        body = self._response.body
+        end = len(body) if n < 0 else self._offset + n
+        chunk = body[self._offset : end]
+        self._offset += len(chunk)
+        if not chunk and self._response.error:
+            raise aiohttp.ClientPayloadError(self._response.error)
+        return chunk
+
+
+class ReplayResponse:
+    def __init__(self, cassette: Cassette, interaction: Dict[str, Any], url: URL):
+        self.cassette = cassette
+        self.url = url
+        self.status = interaction["status"]
+        self.reason = interaction["reason"]
+        self.headers = CIMultiDictProxy(CIMultiDict(interaction["response_headers"]))
+        self.body = cassette.body_of(interaction)
+        self.error = interaction["error"]
+        self._body_delay = cassette.delay(
+            interaction["duration"] - interaction["elapsed"]
+        )
+        self.content = _ReplayContent(self)
+
+    async def wait_for_body(self) -> None:
+        if self._body_delay > 0:
+            delay, self._body_delay = self._body_delay, 0.0
+            await asyncio.sleep(delay)
+
+    def raise_for_status(self) -> None:
+        if self.status < 400:
+            return
+        request_info = aiohttp.RequestInfo(
+            self.url, "GET", CIMultiDictProxy(CIMultiDict()), self.url
+        )
+        raise aiohttp.ClientResponseError(
+            request_info,
+            (),
+            status=self.status,
+            message=self.reason,
+            headers=self.headers,
+        )
+
+    async def read(self) -> bytes:
+        await self.wait_for_body()
+        if self.error:
+            raise aiohttp.ClientPayloadError(self.error)
+        return self.body
+
+    async def json(self, **kwargs: Any) -> Any:
+        return json.loads(await self.read())
+
+
+class _ReplayRequest:
+    def __init__(self, cassette: Cassette, url: URL):
+        self._cassette = cassette
+        self._url = url
+
+    async def __aenter__(self) -> ReplayResponse:
+        interaction = self._cassette.next_interaction("GET", self._url)
+        delay = self._cassette.delay(interaction["elapsed"])
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if interaction["status"] is None:
+            raise aiohttp.ClientConnectionError(interaction["error"])
+        return ReplayResponse(self._cassette, interaction, self._url)
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        return False
+
+
+class ReplaySession:
+    """不访问网络，按录制内容应答的会话"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def get(self, url: Any, **kwargs: Any) -> _ReplayRequest:
+        return _ReplayRequest(self.cassette, _build_url(url, kwargs.get("params")))
+
+
+class ReplaySyncResponse:
+    """requests.Response 的回放替身，只提供网页生成用到的属性"""
+
+    def __init__(self, cassette: Cassette, interaction: Dict[str, Any]):
+        self.status_code = interaction["status"]
+        self.headers = CaseInsensitiveDict(interaction["response_headers"])
+        self.content = cassette.body_of(interaction)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        for offset in range(0, len(self.content), chunk_size):
+            yield self.content[offset : offset + chunk_size]
+
+
+def http_get(url: str, **kwargs: Any) -> Any:
+    """
+    网页生成中下载远程资源使用的 requests.get；有录制或回放中的 cassette 时经过它。
+    """
+    cassette = active_cassette.get()
+    if cassette is None:
+        return requests.get(url, **kwargs)
+
+    if cassette.mode == REPLAY_MODE:
+        try:
+            interaction = cassette.next_interaction("GET", url)
+        except CassetteMissError as exc:
+            raise requests.ConnectionError(str(exc)) from exc
+        total_delay = cassette.delay(interaction["duration"])
+        if total_delay > 0:
+            time.sleep(total_delay)
+        if interaction["status"] is None:
+            raise requests.ConnectionError(interaction["error"])
+        return ReplaySyncResponse(cassette, interaction)
+
+    start = time.monotonic()
+    try:
+        response = requests.get(url, **kwargs)
+        elapsed = time.monotonic() - start
+        body = response.content
+    except requests.RequestException as exc:
+        cassette.record(
+            "GET",
+            url,
+            kwargs.get("headers"),
+            start,
+            time.monotonic() - start,
+            error=f"{type(exc).__name__}: {exc}",
+        )
+        raise
+    cassette.record(
+        "GET",
+        url,
+        kwargs.get("headers"),
+        start,
+        elapsed,
+        response.status_code,
+        response.reason or "",
+        response.headers,
+        body,
+        time.monotonic() - start,
+    )
+    return response
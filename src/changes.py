@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""记录本次运行新增、修改和删除的文件，供工作流只提交变化的路径"""
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .utils import atomic_write_text
+
+CHANGES_MANIFEST_FILENAME = "changes.json"
+CHANGED_PATHS_FILENAME = "changed_paths.txt"
+
+
+class ChangeTracker:
+    def __init__(self, root: Path):
+        self.root = root
+        self.added: Set[str] = set()
+        self.modified: Set[str] = set()
+        self.deleted: Set[str] = set()
+
+    def _relative(self, path: Path) -> Optional[str]:
+        try:
+            return path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            # 备份目录之外的文件（如自定义位置的状态文件）不纳入清单
+            return None
+
+    def record_write(self, path: Path, existed: bool) -> None:
+        relative_path = self._relative(path)
+        if relative_path is None:
+            return
+        if relative_path in self.deleted:
+            self.deleted.discard(relative_path)
+            self.modified.add(relative_path)
+        elif relative_path not in self.added:
+            (self.modified if existed else self.added).add(relative_path)
+
+    def record_delete(self, path: Path) -> None:
+        relative_path = self._relative(path)
+        if relative_path is None:
+            return
+        if relative_path in self.added:
+            # 本次新增后又删除，对仓库来说等于没有变化
+            self.added.discard(relative_path)
+            return
+        self.modified.discard(relative_path)
+        self.deleted.add(relative_path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "added": sorted(self.added),
+            "modified": sorted(self.modified),
+            "deleted": sorted(self.deleted),
+        }
+
+    def changed_paths(self) -> List[str]:
+        return sorted(self.added | self.modified | self.deleted)
+
+    def write_manifest(self, state_dir: Path) -> None:
+        """写出 JSON 清单和逐行路径列表（供 git add --pathspec-from-file 使用）"""
+        try:
+            atomic_write_text(
+                state_dir / CHANGES_MANIFEST_FILENAME,
+                json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + "\n",
+            )
+            changed_paths = self.changed_paths()
+            atomic_write_text(
+                state_dir / CHANGED_PATHS_FILENAME,
+                "".join(f"{path}\n" for path in changed_paths),
+            )
+        except OSError as e:
+            logging.warning(f"⚠️ 写入变更清单失败：{e}")
+            return
+        logging.info(
+            f"🧾 本次变更：新增 {len(self.added)}，修改 {len(self.modified)}，"
+            f"删除 {len(self.deleted)} 个文件"
+        )
+
+
+def get_change_tracker(config: Dict[str, Any]) -> Optional[ChangeTracker]:
+    return config.get("change_tracker")
@@ -3,6 +3,7 @@
 import getpass
 import json
 import sys
+import time
 from pathlib import Path
 
 from src import __version__
@@ -76,6 +77,8 @@ backup:
   media_folder: "media"
   summary_filename: "README.md"
   html_filename: "index.html"
+  layout: "flat"
+  static_site: false
 
 sync:
   state_file: "sync_state.json"
@@ -116,15 +119,23 @@ def check_config():
         return
 
     # 显示配置信息
-    instance_url = config["mastodon"]["instance_url"]
-    user_id = config["mastodon"]["user_id"]
-    backup_path = Path(config["backup"]["path"])
-
-    print(f"✅ 实例地址：{instance_url}")
-    print(f"✅ 用户 ID: {user_id}")
-    print(f"✅ 备份路径：{backup_path.resolve()}")
-    if is_cloud_storage_path(backup_path):
-        print("⚠️  检测到云盘路径；如遇权限错误，请确认 OneDrive/Obsidian 未占用该目录")
+    from src.config import get_account_configs
+
+    for account_config in get_account_configs(config):
+        account_name = account_config.get("account_name")
+        if account_name:
+            print(f"\n👤 账户：{account_name}")
+        instance_url = account_config["mastodon"]["instance_url"]
+        user_id = account_config["mastodon"]["user_id"]
+        backup_path = Path(account_config["backup"]["path"])
+
+        print(f"✅ 实例地址：{instance_url}")
+        print(f"✅ 用户 ID: {user_id}")
+        print(f"✅ 备份路径：{backup_path.resolve()}")
+        if is_cloud_storage_path(backup_path):
+            print(
+                "⚠️  检测到云盘路径；如遇权限错误，请确认 OneDrive/Obsidian 未占用该目录"
+            )
 
     print("\n🎉 配置正确！可以开始同步了")
     print(f"  {PYTHON_COMMAND} main.py sync")
@@ -157,18 +168,93 @@ def print_config_error(error):
     print(f"  {PYTHON_COMMAND} main.py init")
 
 
-def show_status():
-    """显示同步状态"""
+def get_option_value(args, name):
+    """读取 name 后面的值；未指定时返回 None，缺少值时返回空字符串"""
+    if name not in args:
+        return None
+    index = args.index(name)
+    return args[index + 1] if index + 1 < len(args) else ""
+
+
+def get_account_option(args):
+    """读取 --account 名称；未指定时返回 None"""
+    return get_option_value(args, "--account")
+
+
+CASSETTE_OPTIONS = ("--record", "--replay", "--replay-speed")
+
+
+def get_cassette_argv(args):
+    """原样转发 HTTP 录制/回放相关的选项"""
+    argv = []
+    for name in CASSETTE_OPTIONS:
+        value = get_option_value(args, name)
+        if value is not None:
+            argv += [name, value]
+    return argv
+
+
+def show_status(account_name=None, deep=False):
+    """显示同步状态；默认读取同步时写入的快照，deep 为 True 时重新扫描备份目录"""
     print("📊 同步状态\n")
 
     try:
-        from src.config import get_config
+        from src.config import get_account_configs, get_config
 
-        config = get_config()
-        state_file = Path(config["sync"]["state_file"])
+        account_configs = get_account_configs(get_config(), account_name)
     except Exception:
+        show_account_status(None)
+        return
+
+    for account_config in account_configs:
+        if account_config.get("account_name"):
+            print(f"\n👤 账户：{account_config['account_name']}")
+        show_account_status(account_config, deep)
+
+
+def format_post_name(name):
+    """把帖子文件名（YYYY-MM-DD_HHMMSS_id.md）转成便于阅读的时间和 ID"""
+    stem = name[: -len(".md")] if name.endswith(".md") else name
+    parts = stem.split("_", 2)
+    if len(parts) != 3 or len(parts[1]) != 6:
+        return name
+    date, time_part, post_id = parts
+    return f"{date} {time_part[:2]}:{time_part[2:4]}:{time_part[4:]}（ID {post_id}）"
+
+
+def print_snapshot(snapshot):
+    print(f"目录布局：{snapshot['layout']}")
+    print(f"帖子总数：{snapshot['posts']} 条")
+    print(
+        f"媒体文件：{snapshot['media']} 个 ({snapshot['media_bytes'] / 1024 / 1024:.1f} MB)"
+    )
+    if snapshot["newest_post"]:
+        print(f"最新帖子：{format_post_name(snapshot['newest_post'])}")
+        print(f"最早帖子：{format_post_name(snapshot['oldest_post'])}")
+    last_run = snapshot.get("last_run")
+    if last_run:
+        result = "成功" if last_run["status"] == "ok" else "失败"
+        print(
+            f"上次运行：{last_run['started_at']}，{last_run['mode']}，{result}，"
+            f"耗时 {last_run['wall_seconds']:.1f} 秒"
+        )
+    failed_media = snapshot.get("failed_media") or []
+    if failed_media:
+        print(f"⚠️  下载失败的媒体：{len(failed_media)} 个")
+        for item in failed_media[:5]:
+            print(f"   {item['url']}")
+        if len(failed_media) > 5:
+            print(f"   ……其余 {len(failed_media) - 5} 个见 .vault-sync/status.json")
+    print(
+        f"快照更新于：{snapshot['updated_at']}（最近一次完整扫描：{snapshot['scanned_at']}）"
+    )
+
+
+def show_account_status(config, deep=False):
+    if config is None:
         state_file = Path("sync_state.json")
-        config = None
+    else:
+        state_file = Path(config["sync"]["state_file"])
 
     if not state_file.exists():
         print("⚠️  尚未进行过同步")
@@ -188,33 +274,194 @@ def show_status():
     if not config:
         return
 
+    from src.snapshot import load_snapshot, update_snapshot
+
     backup_path = Path(config["backup"]["path"])
-    posts_folder = backup_path / config["backup"]["posts_folder"]
-    media_folder = backup_path / config["backup"]["media_folder"]
+    snapshot = None if deep else load_snapshot(backup_path)
+    if snapshot is None:
+        if not deep and is_cloud_storage_path(backup_path):
+            print("⏳ 尚无状态快照，正在扫描云盘中的备份目录，可能需要一些时间...")
+        try:
+            # 重新扫描并写回快照，之后的 status 直接读取
+            snapshot = update_snapshot(config, backup_path, "status", deep=True)
+        except PermissionError:
+            print_cloud_storage_hint(backup_path)
+            return
+        except OSError as e:
+            print(f"⚠️  无法扫描备份目录或写入状态快照：{e}")
+            return
+    print_snapshot(snapshot)
 
-    try:
-        post_count = (
-            sum(1 for _ in posts_folder.glob("*.md")) if posts_folder.exists() else 0
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_seconds(value):
+    return "N/A" if value is None else f"{value:.1f} 秒"
+
+
+def print_history_summary(summary):
+    print(f"记录的运行：{summary['runs']} 次（失败 {summary['failed_runs']} 次）")
+    print(f"时间范围：{summary['first_run']} ~ {summary['last_run']}")
+    print(
+        f"运行耗时：p50 {format_seconds(summary['wall_seconds_p50'])}，"
+        f"p95 {format_seconds(summary['wall_seconds_p95'])}"
+    )
+    if summary["wall_seconds_trend"] is not None:
+        print(f"耗时趋势：近半数运行的 p50 为之前的 {summary['wall_seconds_trend']} 倍")
+    print(
+        f"每次下载：p50 {format_bytes(summary['bytes_downloaded_p50'] or 0)}，"
+        f"p95 {format_bytes(summary['bytes_downloaded_p95'] or 0)}"
+    )
+    print(
+        f"处理帖子 {summary['posts_processed']} 条，下载媒体 {summary['media_downloaded']} 个"
+        f"（失败 {summary['media_failed']} 个），API 调用 {summary['api_calls']} 次"
+    )
+    print(
+        f"速率限制：{summary['rate_limited_runs']} 次运行共等待 "
+        f"{summary['rate_limit_wait_seconds']} 秒"
+    )
+    if summary["archive_bytes"] is not None:
+        print(
+            f"归档大小：{format_bytes(summary['archive_bytes'])}"
+            f"（期间增长 {format_bytes(summary['archive_growth_bytes'])}）"
         )
-        print(f"帖子总数：{post_count} 条")
-    except PermissionError:
-        print_cloud_storage_hint(posts_folder)
-    except OSError as e:
-        print(f"⚠️  无法读取帖子目录：{e}")
 
+
+def show_stats(args):
+    """汇总同步历史中的耗时、下载量和归档增长；--prometheus 导出指标文件"""
+    from src.config import get_account_configs, get_config
+    from src.history import load_history, summarize, write_prometheus
+
+    last = get_option_value(args, "--last")
     try:
-        media_count = 0
-        media_size = 0
-        if media_folder.exists():
-            for f in media_folder.iterdir():
-                if f.is_file():
-                    media_count += 1
-                    media_size += f.stat().st_size
-        print(f"媒体文件：{media_count} 个 ({media_size / 1024 / 1024:.1f} MB)")
-    except PermissionError:
-        print_cloud_storage_hint(media_folder)
-    except OSError as e:
-        print(f"⚠️  无法读取媒体目录：{e}")
+        last = int(last) if last is not None else None
+    except ValueError:
+        print("❌ --last 需要一个整数")
+        return
+    account_configs = get_account_configs(get_config(), get_account_option(args))
+
+    history_by_account = {}
+    for account_config in account_configs:
+        account_name = account_config.get("account_name") or ""
+        records = load_history(Path(account_config["backup"]["path"]))
+        if last:
+            records = records[-last:]
+        history_by_account[account_name] = records
+        if account_name:
+            print(f"\n👤 账户：{account_name}")
+        if not records:
+            print("⚠️  尚无同步历史，完成一次同步后再查看")
+            continue
+        print(f"📈 同步历史（最近 {len(records)} 次）")
+        print_history_summary(summarize(records))
+        modes = sorted({record.get("mode", "") for record in records})
+        if len(modes) > 1:
+            for mode in modes:
+                mode_summary = summarize([r for r in records if r.get("mode") == mode])
+                print(
+                    f"  {mode}: {mode_summary['runs']} 次，"
+                    f"p50 {format_seconds(mode_summary['wall_seconds_p50'])}，"
+                    f"p95 {format_seconds(mode_summary['wall_seconds_p95'])}"
+                )
+
+    prometheus_path = get_option_value(args, "--prometheus")
+    if prometheus_path:
+        write_prometheus(Path(prometheus_path), history_by_account)
+        print(f"\n✅ 已导出 Prometheus 指标：{prometheus_path}")
+
+
+def print_verify_issues(issues):
+    from src.verify import ISSUE_KINDS
+
+    for kind, label in ISSUE_KINDS.items():
+        items = issues[kind]
+        if not items:
+            continue
+        print(f"⚠️  {label}：{len(items)} 项")
+        for item in items[:5]:
+            print(f"   {item['path']}：{item['detail']}")
+        if len(items) > 5:
+            print(f"   ……其余 {len(items) - 5} 项")
+
+
+def run_verify(args):
+    """校验备份完整性；--repair 只修复发现的问题。返回是否已没有问题"""
+    from src.config import get_account_configs, get_config
+    from src.verify import ISSUE_KINDS, repair_backup, verify_backup
+
+    repair = "--repair" in args
+    quick = "--quick" in args
+    clean = True
+    for account_config in get_account_configs(get_config(), get_account_option(args)):
+        if account_config.get("account_name"):
+            print(f"\n👤 账户：{account_config['account_name']}")
+        backup_path = Path(account_config["backup"]["path"])
+        print(f"🔍 正在校验备份：{backup_path.resolve()}")
+        report = verify_backup(account_config, backup_path, quick)
+        issues = report["issues"]
+        print(f"已检查 {report['posts']} 个帖子文件、{report['media']} 个媒体文件")
+        if not any(issues.values()):
+            print("✅ 未发现问题")
+            continue
+        print_verify_issues(issues)
+        if not repair:
+            print(
+                f"\n运行 {PYTHON_COMMAND} main.py verify --repair 修复可在本地处理的问题"
+            )
+            clean = False
+            continue
+
+        repaired = repair_backup(account_config, backup_path, issues)
+        for kind, count in repaired.items():
+            if count:
+                print(f"🔧 已修复{ISSUE_KINDS[kind]}：{count} 项")
+        remaining = verify_backup(account_config, backup_path, quick)["issues"]
+        if any(remaining.values()):
+            print("\n修复后仍有以下问题：")
+            print_verify_issues(remaining)
+            print(
+                f"过期的网页可运行 {PYTHON_COMMAND} main.py rebuild --only html 离线重新生成，"
+                f"其余需要服务器数据的问题请运行 {PYTHON_COMMAND} main.py sync --full"
+            )
+            clean = False
+        else:
+            print("✅ 修复完成，未发现其他问题")
+    return clean
+
+
+def run_rebuild(args):
+    """不访问网络，按本地保存的原始数据和媒体重新生成输出。返回是否成功"""
+    from src.config import get_account_configs, get_config
+    from src.rebuild import parse_targets, rebuild_backup
+
+    try:
+        targets = parse_targets(get_option_value(args, "--only"))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    succeeded = True
+    for account_config in get_account_configs(get_config(), get_account_option(args)):
+        if account_config.get("account_name"):
+            print(f"\n👤 账户：{account_config['account_name']}")
+        backup_path = Path(account_config["backup"]["path"])
+        print(f"🔁 正在离线重建 {', '.join(targets)}：{backup_path.resolve()}")
+        started = time.perf_counter()
+        try:
+            timings = rebuild_backup(account_config, backup_path, targets)
+        except ValueError as e:
+            print(f"❌ {e}")
+            succeeded = False
+            continue
+        for target, seconds in timings.items():
+            print(f"   {target}：{seconds:.1f} 秒")
+        print(f"✅ 重建完成，耗时 {time.perf_counter() - started:.1f} 秒")
+    return succeeded
 
 
 def show_help():
@@ -229,12 +476,39 @@ def show_help():
   init              初始化配置
   sync              同步帖子（增量）
   sync --full       全量同步
+  sync --profile    同步并用 cProfile 采样各阶段，导出最慢阶段的 .pstats
+  sync --memprofile
+                    同步并在各阶段结束时做 tracemalloc 快照，报告内存峰值和增长最多的分配位置
+  sync --record <文件>
+                    同步并把 API、媒体和网页资源的 HTTP 交互录制到文件（令牌已脱敏）
+  sync --replay <文件> [--replay-speed 倍数]
+                    不访问网络，按录制内容回放一次同步；倍数为 0 时不等待
   cleanup           清理已删除的帖子
-  status            查看同步状态
+  watch [--interval 秒]
+                    常驻运行，按间隔轮询新帖子并增量更新
+  stream            常驻运行，通过流式 API 实时同步新增、编辑和删除
+  import-archive <zip>
+                    从 Mastodon 账户导出的 ZIP 离线导入全部帖子和媒体
+  status [--deep]   查看同步状态（读取同步时写入的快照；--deep 重新扫描备份目录并刷新快照）
+  stats [--last N] [--prometheus <文件>]
+                    汇总同步历史中的耗时 p50/p95、下载量、速率限制等待和归档增长，
+                    可导出为 Prometheus textfile 指标
+  migrate-layout <flat|sharded>
+                    把已有备份迁移到指定目录布局
+  verify [--repair] [--quick]
+                    并行校验帖子、媒体、归档、网页和同步状态是否一致；--repair 只修复
+                    发现的问题，--quick 只比较媒体大小、不计算哈希
+  rebuild [--only posts,archive,summary,html]
+                    不访问网络，按本地保存的原始数据和媒体重新生成帖子文件、归档、
+                    活动总结和网页；修改时区、目录名称或升级渲染器后使用
   check             检查配置
   version           显示版本号
   help              显示此帮助
 
+选项：
+  --account 名称    配置了多个账户时只处理指定账户；sync/cleanup 未指定时并发处理全部账户，
+                    watch/stream/import-archive/migrate-layout 必须指定
+
 示例：
   {PYTHON_COMMAND} main.py               # 打开交互式菜单
   {PYTHON_COMMAND} main.py menu          # 打开交互式菜单
@@ -242,30 +516,122 @@ def show_help():
   {PYTHON_COMMAND} main.py check         # 检查配置是否正确
   {PYTHON_COMMAND} main.py sync --full   # 首次同步，获取所有历史帖子
   {PYTHON_COMMAND} main.py sync          # 日常增量同步
+  {PYTHON_COMMAND} main.py sync --account alice  # 多账户配置中只同步 alice
   {PYTHON_COMMAND} main.py status        # 查看同步状态
+  {PYTHON_COMMAND} main.py stats --last 30  # 最近 30 次同步的耗时趋势
   {PYTHON_COMMAND} main.py cleanup       # 清理已删除的帖子
+  {PYTHON_COMMAND} main.py watch --interval 600  # 自建服务器上替代定时任务
+  {PYTHON_COMMAND} main.py import-archive archive.zip  # 首次备份时离线导入
+  {PYTHON_COMMAND} main.py migrate-layout sharded  # 帖子按年月、媒体按哈希分目录
+  {PYTHON_COMMAND} main.py verify --repair  # 校验备份并修复缺失或损坏的文件
+  {PYTHON_COMMAND} main.py rebuild --only posts,archive  # 修改时区后离线重新生成
 
 更多信息：https://github.com/Eyozy/mastodon-vault-sync
 """
     )
 
 
-def run_sync(full_sync=False):
-    """执行同步"""
+def get_account_argv(account_name):
+    return ["--account", account_name] if account_name is not None else []
+
+
+def run_sync(
+    full_sync=False,
+    account_name=None,
+    profile=False,
+    cassette_argv=(),
+    memprofile=False,
+):
+    """执行同步；配置了多个账户且未指定 account_name 时并发同步全部账户"""
     sys.argv = ["main.py", "--full-sync"] if full_sync else ["main.py"]
+    sys.argv += get_account_argv(account_name)
+    if profile:
+        sys.argv.append("--profile")
+    if memprofile:
+        sys.argv.append("--memprofile")
+    sys.argv += list(cassette_argv)
     from main import main
 
     main()
 
 
-def run_cleanup():
+def run_cleanup(account_name=None):
     """执行清理"""
-    sys.argv = ["main.py", "--cleanup"]
+    sys.argv = ["main.py", "--cleanup", *get_account_argv(account_name)]
     from main import main
 
     main()
 
 
+def run_watch(args):
+    """常驻轮询模式"""
+    interval = None
+    if "--interval" in args:
+        index = args.index("--interval")
+        try:
+            interval = int(args[index + 1])
+        except (IndexError, ValueError):
+            print("❌ --interval 需要一个整数秒数")
+            return
+        if interval < 10:
+            print("❌ --interval 不能小于 10 秒")
+            return
+    from main import watch
+
+    watch(interval)
+
+
+def run_import_archive(zip_path):
+    """从账户导出文件离线导入"""
+    if not Path(zip_path).is_file():
+        print(f"❌ 找不到导出文件：{zip_path}")
+        return
+    from main import import_archive
+
+    import_archive(zip_path)
+
+
+def regenerate_after_migration(config, backup_path, target_layout):
+    """帖子和媒体路径变了，离线重新生成网页和活动总结，旧页面里的链接不再有效"""
+    from src.rebuild import rebuild_backup
+
+    config = dict(config, backup=dict(config["backup"], layout=target_layout))
+    try:
+        rebuild_backup(config, backup_path, ["summary", "html"])
+        print("✅ 已按新布局重新生成网页和活动总结")
+    except ValueError as e:
+        print(f"⚠️  {e}；网页将在下次同步时更新")
+        rebuild_backup(config, backup_path, ["summary"])
+        print("✅ 已按新布局重新生成活动总结")
+
+
+def run_migrate_layout(target_layout, account_name=None):
+    """把已有备份迁移到目标布局，并同步更新配置中的 layout 提示"""
+    from src.layout import LAYOUTS
+
+    if target_layout not in LAYOUTS:
+        print(f"❌ 未知布局：{target_layout}，可选：{', '.join(LAYOUTS)}")
+        return
+
+    from src.backup import migrate_backup_layout
+    from src.config import get_account_configs, get_config
+
+    account_configs = get_account_configs(get_config(), account_name)
+    if len(account_configs) > 1:
+        print("❌ 已配置多个账户，请用 --account 名称 指定要迁移的账户")
+        return
+    config = account_configs[0]
+    backup_path = Path(config["backup"]["path"])
+    print(f"🚚 正在迁移到 {target_layout} 布局：{backup_path.resolve()}")
+    moved_posts, moved_media = migrate_backup_layout(config, backup_path, target_layout)
+    print(f"✅ 迁移完成：移动 {moved_posts} 个帖子文件，{moved_media} 个媒体文件")
+    regenerate_after_migration(config, backup_path, target_layout)
+    if config["backup"].get("layout") != target_layout:
+        print(
+            f"⚠️  请把配置中的 backup.layout 改为 {target_layout}，之后的同步才会沿用新布局"
+        )
+
+
 def show_menu():
     """显示交互式菜单"""
     print(f"\n{'=' * 42}")
@@ -348,11 +714,41 @@ def main_cli():
     elif command == "check":
         check_config()
     elif command == "status":
-        show_status()
+        show_status(get_account_option(args), deep="--deep" in args)
+    elif command == "stats":
+        show_stats(args)
     elif command == "sync":
-        run_sync(full_sync="--full" in args)
+        run_sync(
+            full_sync="--full" in args,
+            account_name=get_account_option(args),
+            profile="--profile" in args,
+            cassette_argv=get_cassette_argv(args),
+            memprofile="--memprofile" in args,
+        )
     elif command == "cleanup":
-        run_cleanup()
+        run_cleanup(get_account_option(args))
+    elif command == "watch":
+        run_watch(args[1:])
+    elif command == "stream":
+        from main import stream
+
+        stream()
+    elif command == "import-archive":
+        if len(args) < 2:
+            print(f"❌ 用法：{PYTHON_COMMAND} main.py import-archive <导出的 zip 文件>")
+            return
+        run_import_archive(args[1])
+    elif command == "migrate-layout":
+        if len(args) < 2:
+            print(f"❌ 用法：{PYTHON_COMMAND} main.py migrate-layout <flat|sharded>")
+            return
+        run_migrate_layout(args[1], get_account_option(args))
+    elif command == "verify":
+        if not run_verify(args):
+            sys.exit(1)
+    elif command == "rebuild":
+        if not run_rebuild(args):
+            sys.exit(1)
     else:
         print(f"❌ 未知命令：{command}\n")
         show_help()
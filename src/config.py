@@ -1,10 +1,22 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import yaml
-from pydantic import BaseModel, Field, ValidationError, field_validator
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
+
+from .layout import FLAT_LAYOUT, LAYOUTS
+
+DEFAULT_WATCH_INTERVAL_SECONDS = 300
+DEFAULT_WATCH_JITTER = 0.1
 
 
 class MastodonConfig(BaseModel):
@@ -27,20 +39,133 @@ class BackupConfig(BaseModel):
     media_folder: str = "media"
     summary_filename: str = "README.md"
     html_filename: str = "index.html"
+    # flat：所有帖子/媒体放在同一目录；sharded：帖子按年/月、媒体按哈希前缀分目录
+    layout: str = FLAT_LAYOUT
+    # 额外生成多页静态站点（分页时间线、归档、标签、单帖页面）到备份目录下的 site_folder
+    static_site: bool = False
+    site_folder: str = "site"
+    # 压缩 CSS/JS 并按内容哈希写成外部文件，同时为网页写入 .gz/.br 预压缩副本
+    optimize_assets: bool = False
+    # 生成 Service Worker 和预缓存清单，通过 http(s) 访问时支持离线浏览
+    service_worker: bool = False
+
+    @field_validator("layout")
+    @classmethod
+    def validate_layout(cls, v: str) -> str:
+        if v not in LAYOUTS:
+            raise ValueError(f"must be one of: {', '.join(LAYOUTS)}")
+        return v
+
+    @field_validator("site_folder")
+    @classmethod
+    def validate_site_folder(cls, v: str) -> str:
+        path = Path(v)
+        if not v or path.is_absolute() or ".." in path.parts:
+            raise ValueError("must be a relative folder inside the backup path")
+        return v
 
 
 class SyncConfig(BaseModel):
     state_file: str = "sync_state.json"
     china_timezone: bool = False
+    # watch 模式的轮询间隔（秒）和随机抖动比例
+    watch_interval: int = Field(default=DEFAULT_WATCH_INTERVAL_SECONDS, ge=10)
+    watch_jitter: float = Field(default=DEFAULT_WATCH_JITTER, ge=0, le=1)
+    # 每次同步后刷新的 Prometheus textfile 指标文件（供 node_exporter 读取）
+    metrics_file: Optional[str] = None
 
 
-class AppConfig(BaseModel):
+class AccountConfig(BaseModel):
+    name: str = Field(..., min_length=1, description="Account name used in logs/CLI")
     mastodon: MastodonConfig
     backup: BackupConfig = Field(default_factory=BackupConfig)
     sync: SyncConfig = Field(default_factory=SyncConfig)
+
+
+class AppConfig(BaseModel):
+    # 单账户使用 mastodon；多账户使用 accounts，两者至少填写一个
+    mastodon: Optional[MastodonConfig] = None
+    backup: BackupConfig = Field(default_factory=BackupConfig)
+    sync: SyncConfig = Field(default_factory=SyncConfig)
+    accounts: List[AccountConfig] = Field(default_factory=list)
     # 运行时字段（如 is_full_sync、media_file_map）允许透传
     model_config = {"extra": "allow"}
 
+    @model_validator(mode="after")
+    def validate_accounts(self) -> "AppConfig":
+        if self.mastodon is None and not self.accounts:
+            raise ValueError("either mastodon or accounts must be configured")
+        for field, values in (
+            ("name", [account.name for account in self.accounts]),
+            (
+                "backup.path",
+                [str(Path(a.backup.path).resolve()) for a in self.accounts],
+            ),
+            (
+                "sync.state_file",
+                [str(Path(a.sync.state_file).resolve()) for a in self.accounts],
+            ),
+        ):
+            duplicates = sorted({value for value in values if values.count(value) > 1})
+            if duplicates:
+                raise ValueError(
+                    f"accounts {field} must be unique: {', '.join(duplicates)}"
+                )
+        return self
+
+
+def expand_accounts(config_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    多账户配置中，每个账户的 backup/sync 在顶层设置的基础上覆盖；
+    未单独指定 state_file 时放在该账户的备份目录中，避免账户之间互相覆盖。
+    """
+    accounts = config_data.get("accounts")
+    if not isinstance(accounts, list):
+        return config_data
+
+    expanded = []
+    for account in accounts:
+        if not isinstance(account, dict):
+            expanded.append(account)
+            continue
+        backup = {**(config_data.get("backup") or {}), **(account.get("backup") or {})}
+        sync = {**(config_data.get("sync") or {}), **(account.get("sync") or {})}
+        if not (account.get("sync") or {}).get("state_file"):
+            sync["state_file"] = str(
+                Path(backup.get("path", ".")) / SyncConfig().state_file
+            )
+        expanded.append({**account, "backup": backup, "sync": sync})
+    return {**config_data, "accounts": expanded}
+
+
+def get_account_configs(
+    config: Dict[str, Any], name: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    返回要运行的账户配置列表，每个都是与单账户相同结构的独立 dict。
+    name 指定时只返回该账户；找不到时抛出 ValueError。
+    """
+    accounts = config.get("accounts") or []
+    if not accounts:
+        if name is not None:
+            raise ValueError(f"未配置多账户，无法选择账户：{name}")
+        return [config]
+
+    account_configs = [
+        {
+            "account_name": account["name"],
+            "mastodon": dict(account["mastodon"]),
+            "backup": dict(account["backup"]),
+            "sync": dict(account["sync"]),
+        }
+        for account in accounts
+        if name is None or account["name"] == name
+    ]
+    if not account_configs:
+        names = ", ".join(account["name"] for account in accounts)
+        raise ValueError(f"找不到账户：{name}（已配置：{names}）")
+    return account_configs
+
 
 def validate_config(config: Dict[str, Any]) -> AppConfig:
     """入口校验：只在加载配置时用 pydantic，业务层继续使用 dict。"""
@@ -70,6 +195,13 @@ def get_config() -> Dict[str, Any]:
                 "media_folder": os.environ.get("MEDIA_FOLDER") or "media",
                 "summary_filename": os.environ.get("SUMMARY_FILENAME") or "README.md",
                 "html_filename": os.environ.get("HTML_FILENAME") or "index.html",
+                "layout": os.environ.get("BACKUP_LAYOUT") or FLAT_LAYOUT,
+                "static_site": os.environ.get("STATIC_SITE", "false").lower() == "true",
+                "site_folder": os.environ.get("SITE_FOLDER") or "site",
+                "optimize_assets": os.environ.get("OPTIMIZE_ASSETS", "false").lower()
+                == "true",
+                "service_worker": os.environ.get("SERVICE_WORKER", "false").lower()
+                == "true",
             },
             "sync": {
                 "state_file": "sync_state.json",
@@ -90,4 +222,4 @@ def get_config() -> Dict[str, Any]:
             logging.error(f"❌ 错误：配置文件格式错误：{e}")
             raise
 
-    return validate_config(config_data).model_dump()
+    return validate_config(expand_accounts(config_data)).model_dump()
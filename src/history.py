@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+同步历史与指标导出。
+
+每次同步结束时向备份目录的 .vault-sync/history.jsonl 追加一行精简记录（耗时、处理的
+帖子和媒体数、API 调用、下载字节、速率限制等待、归档大小），只保留最近若干条；
+历史可以汇总成 p50/p95 等趋势，也可以导出为 Prometheus textfile 格式的指标。
+"""
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .utils import atomic_write_text, get_state_dir
+
+HISTORY_FILENAME = "history.jsonl"
+HISTORY_KEEP = 1000
+METRIC_PREFIX = "vault_sync"
+# 写入历史并导出为 last_run 指标的计数
+RUN_FIELDS = (
+    "wall_seconds",
+    "cpu_seconds",
+    "peak_rss_mb",
+    "posts_processed",
+    "media_downloaded",
+    "media_failed",
+    "api_calls",
+    "bytes_downloaded",
+    "rate_limit_wait_seconds",
+    "files_written",
+    "archive_bytes",
+)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def build_record(
+    config: Dict[str, Any], report: Dict[str, Any], mode: str, status: str
+) -> Dict[str, Any]:
+    """由运行报告生成一条历史记录；阶段只保留耗时"""
+    backup_config = config["backup"]
+    backup_path = Path(backup_config["path"])
+    tracker = config.get("change_tracker")
+    return {
+        "started_at": report["started_at"],
+        "account": config.get("account_name") or "",
+        "mode": mode,
+        "status": status,
+        "wall_seconds": report["wall_seconds"],
+        "cpu_seconds": report["cpu_seconds"],
+        "peak_rss_mb": report["peak_rss_mb"],
+        **report["totals"],
+        "files_added": len(tracker.added) if tracker is not None else 0,
+        "files_deleted": len(tracker.deleted) if tracker is not None else 0,
+        "archive_bytes": _file_size(backup_path / backup_config["filename"]),
+        "stages": {stage["name"]: stage["wall_seconds"] for stage in report["stages"]},
+    }
+
+
+def append_record(state_dir: Path, record: Dict[str, Any]) -> Path:
+    """追加一条记录；超过 HISTORY_KEEP 条时丢弃最早的记录"""
+    path = state_dir / HISTORY_FILENAME
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+    if len(lines) >= HISTORY_KEEP:
+        kept = lines[len(lines) - HISTORY_KEEP + 1 :]
+        atomic_write_text(path, "\n".join(kept + [line]) + "\n")
+    else:
+        state_dir.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return path
+
+
+def load_history(backup_path: Path) -> List[Dict[str, Any]]:
+    """按时间顺序读取历史；损坏的行（如写入中断）跳过"""
+    path = get_state_dir(backup_path) / HISTORY_FILENAME
+    if not path.exists():
+        return []
+    records = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """最近秩法的百分位数；没有数据时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _values(records: Sequence[Dict[str, Any]], field: str) -> List[float]:
+    return [
+        record[field]
+        for record in records
+        if isinstance(record.get(field), (int, float))
+    ]
+
+
+def summarize(records: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """运行次数、耗时和下载量的 p50/p95、总量，以及近半数运行相对之前的耗时变化"""
+    wall = _values(records, "wall_seconds")
+    downloaded = _values(records, "bytes_downloaded")
+    archive = _values(records, "archive_bytes")
+    half = len(wall) // 2
+    older_p50 = percentile(wall[:half], 50)
+    recent_p50 = percentile(wall[half:], 50)
+    return {
+        "runs": len(records),
+        "failed_runs": sum(1 for record in records if record.get("status") != "ok"),
+        "first_run": records[0]["started_at"] if records else None,
+        "last_run": records[-1]["started_at"] if records else None,
+        "wall_seconds_p50": percentile(wall, 50),
+        "wall_seconds_p95": percentile(wall, 95),
+        "bytes_downloaded_p50": percentile(downloaded, 50),
+        "bytes_downloaded_p95": percentile(downloaded, 95),
+        "posts_processed": sum(_values(records, "posts_processed")),
+        "media_downloaded": sum(_values(records, "media_downloaded")),
+        "media_failed": sum(_values(records, "media_failed")),
+        "api_calls": sum(_values(records, "api_calls")),
+        "rate_limit_wait_seconds": round(
+            sum(_values(records, "rate_limit_wait_seconds")), 1
+        ),
+        "rate_limited_runs": sum(
+            1 for value in _values(records, "rate_limit_wait_seconds") if value > 0
+        ),
+        "archive_bytes": archive[-1] if archive else None,
+        "archive_growth_bytes": archive[-1] - archive[0] if archive else None,
+        "wall_seconds_trend": (
+            round(recent_p50 / older_p50, 2) if older_p50 and recent_p50 else None
+        ),
+    }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(history_by_account: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Prometheus textfile 格式：最近一次运行的各项数值，以及历史中的耗时分位数"""
+    metrics: Dict[str, List[str]] = {}
+    helps: Dict[str, str] = {}
+
+    def add(name: str, help_text: str, account: str, value: Any, **labels: str):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return
+        full_name = f"{METRIC_PREFIX}_{name}"
+        helps[full_name] = help_text
+        label_text = ",".join(
+            f'{key}="{_escape_label(str(label))}"'
+            for key, label in {"account": account, **labels}.items()
+        )
+        metrics.setdefault(full_name, []).append(f"{full_name}{{{label_text}}} {value}")
+
+    for account, records in sorted(history_by_account.items()):
+        if not records:
+            continue
+        last = records[-1]
+        summary = summarize(records)
+        add(
+            "last_run_success",
+            "最近一次同步是否成功（1 为成功）",
+            account,
+            int(last.get("status") == "ok"),
+        )
+        add(
+            "last_run_timestamp_seconds",
+            "最近一次同步的开始时间（Unix 时间戳）",
+            account,
+            datetime.fromisoformat(last["started_at"]).timestamp(),
+        )
+        for field in RUN_FIELDS:
+            add(
+                f"last_run_{field}",
+                f"最近一次同步的 {field}",
+                account,
+                last.get(field),
+            )
+        add("history_runs", "历史中记录的同步次数", account, summary["runs"])
+        add(
+            "history_failed_runs",
+            "历史中失败的同步次数",
+            account,
+            summary["failed_runs"],
+        )
+        for quantile in ("50", "95"):
+            add(
+                "run_wall_seconds",
+                "历史中同步耗时的分位数",
+                account,
+                summary[f"wall_seconds_p{quantile}"],
+                quantile=f"0.{quantile}",
+            )
+
+    lines = []
+    for name, samples in metrics.items():
+        lines.append(f"# HELP {name} {helps[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(
+    path: Path, history_by_account: Dict[str, List[Dict[str, Any]]]
+) -> None:
+    """原子写入，避免 node_exporter 读到写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, format_prometheus(history_by_account))
+
+
+def record_run(
+    config: Dict[str, Any], report: Dict[str, Any], mode: str, status: str
+) -> Optional[Dict[str, Any]]:
+    """写入历史，失败只记录警告；指标文件由 write_metrics_file 单独刷新"""
+    backup_path = Path(config["backup"]["path"])
+    record = build_record(config, report, mode, status)
+    try:
+        append_record(get_state_dir(backup_path), record)
+    except OSError as e:
+        logging.warning(f"⚠️ 同步历史写入失败：{e}")
+        return None
+    return record
+
+
+def write_metrics_file(config: Dict[str, Any]) -> None:
+    """
+    配置了 sync.metrics_file 时，把使用同一指标文件的全部账户（config["metrics_accounts"]，
+    账户名 -> 备份目录）的历史一起写入，账户之间不会互相覆盖。失败只记录警告。
+    """
+    metrics_file = config["sync"].get("metrics_file")
+    if not metrics_file:
+        return
+    accounts = config.get("metrics_accounts") or {
+        config.get("account_name") or "": config["backup"]["path"]
+    }
+    try:
+        write_prometheus(
+            Path(metrics_file),
+            {name: load_history(Path(path)) for name, path in accounts.items()},
+        )
+    except OSError as e:
+        logging.warning(f"⚠️ 指标文件写入失败：{e}")
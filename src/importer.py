@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""从 Mastodon 账户导出的 ZIP（outbox.json + 媒体）离线导入帖子"""
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+from urllib.parse import urlparse
+
+from .changes import ChangeTracker
+from .layout import get_media_relative_path
+from .models import Status, as_status
+from .utils import content_hash
+
+OUTBOX_FILENAME = "outbox.json"
+ACTOR_FILENAME = "actor.json"
+OUTBOX_READ_CHUNK_SIZE = 1024 * 1024
+PUBLIC_AUDIENCE = "https://www.w3.org/ns/activitystreams#Public"
+MEDIA_ID_PATTERN = re.compile(r"/files/((?:\d+/)+)")
+_JSON_SEPARATORS = " \t\r\n,"
+
+
+def iter_outbox_items(
+    stream: TextIO, chunk_size: int = OUTBOX_READ_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """逐条解析 outbox.json 中的 orderedItems，内存占用只与单条活动的大小相关"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    while True:
+        key_index = buffer.find('"orderedItems"')
+        bracket_index = buffer.find("[", key_index) if key_index >= 0 else -1
+        if bracket_index >= 0:
+            buffer = buffer[bracket_index + 1 :]
+            break
+        if eof:
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in _JSON_SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                if isinstance(item, dict):
+                    yield item
+                continue
+        elif eof:
+            raise ValueError("outbox.json 在 orderedItems 结束前意外截断")
+
+        # 当前缓冲区不足以解析出完整的一条活动，丢弃已处理部分后继续读取
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _as_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _get_visibility(note: Dict[str, Any]) -> str:
+    to = _as_list(note.get("to"))
+    cc = _as_list(note.get("cc"))
+    if PUBLIC_AUDIENCE in to:
+        return "public"
+    if PUBLIC_AUDIENCE in cc:
+        return "unlisted"
+    if any(target.endswith("/followers") for target in to + cc):
+        return "private"
+    return "direct"
+
+
+def _to_api_timestamp(published: str) -> str:
+    """ActivityStreams 的 2024-01-01T12:00:00Z 转为 API 的 2024-01-01T12:00:00.000Z"""
+    timestamp = published.rstrip("Z")
+    if "." not in timestamp:
+        timestamp += ".000"
+    return timestamp + "Z"
+
+
+def _get_last_path_segment(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    return urlparse(url).path.rstrip("/").rsplit("/", 1)[-1] or None
+
+
+def _get_media_id(media_path: str) -> str:
+    # 导出中的路径形如 media_attachments/files/110/123/456/original/x.jpg，数字段拼接即为媒体 ID；
+    # 分段按三位补零，较小的 ID 会以 000/000/123 开头，去掉前导零才与 API 返回的 ID 一致
+    match = MEDIA_ID_PATTERN.search(f"/{media_path}")
+    if match:
+        return str(int(match.group(1).replace("/", "")))
+    return content_hash(media_path)[:16]
+
+
+def _get_media_type(media_type: str) -> str:
+    if media_type.startswith("image/"):
+        return "image"
+    if media_type.startswith("video/"):
+        return "video"
+    if media_type.startswith("audio/"):
+        return "audio"
+    return "unknown"
+
+
+def build_account(actor: Dict[str, Any], user_id: Any) -> Dict[str, Any]:
+    """由 actor.json 构造 API 风格的账户信息；导出中没有的统计数据记为 0"""
+    username = actor.get("preferredUsername", "")
+    avatar = (actor.get("icon") or {}).get("url", "")
+    return {
+        "id": str(user_id),
+        "username": username,
+        "display_name": actor.get("name") or username,
+        # 导出中的头像是 ZIP 内的相对路径，网页无法直接引用
+        "avatar": avatar if avatar.startswith(("http://", "https://")) else "",
+        "header": "",
+        "url": actor.get("url") or actor.get("id", ""),
+        "note": actor.get("summary") or "",
+        "followers_count": 0,
+        "following_count": 0,
+    }
+
+
+def activity_to_status(
+    activity: Dict[str, Any], account: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """把一条 Create 活动转换为与 API 返回一致的帖子结构；转嘟和私信返回 None"""
+    note = activity.get("object")
+    if activity.get("type") != "Create" or not isinstance(note, dict):
+        return None
+    visibility = _get_visibility(note)
+    if visibility == "direct":
+        # API 同步不会返回私信，导入时保持一致
+        return None
+
+    media_attachments = []
+    for attachment in note.get("attachment") or []:
+        media_url = attachment.get("url") or ""
+        media_path = urlparse(media_url).path.lstrip("/")
+        if not media_path:
+            continue
+        media_attachments.append(
+            {
+                "id": _get_media_id(media_path),
+                "type": _get_media_type(attachment.get("mediaType") or ""),
+                "url": media_url,
+                "description": attachment.get("name") or "",
+                "preview_url": "",
+            }
+        )
+
+    tags = []
+    emojis = []
+    for tag in note.get("tag") or []:
+        if tag.get("type") == "Hashtag":
+            tags.append(
+                {"name": tag.get("name", "").lstrip("#"), "url": tag.get("href", "")}
+            )
+        elif tag.get("type") == "Emoji":
+            emoji_url = (tag.get("icon") or {}).get("url", "")
+            emojis.append(
+                {
+                    "shortcode": tag.get("name", "").strip(":"),
+                    "url": emoji_url,
+                    "static_url": emoji_url,
+                }
+            )
+
+    in_reply_to = note.get("inReplyTo")
+    return {
+        "id": _get_last_path_segment(note.get("id")),
+        "created_at": _to_api_timestamp(note.get("published") or activity["published"]),
+        "content": note.get("content") or "",
+        "url": note.get("url") or note.get("id"),
+        "sensitive": bool(note.get("sensitive")),
+        "spoiler_text": note.get("summary") or "",
+        "visibility": visibility,
+        "media_attachments": media_attachments,
+        "tags": tags,
+        "emojis": emojis,
+        "reblogs_count": 0,
+        "favourites_count": 0,
+        "replies_count": 0,
+        "in_reply_to_id": _get_last_path_segment(in_reply_to),
+        # 导出中只有被回复帖子的 URL，只有回复自己时才能确定账户 ID
+        "in_reply_to_account_id": (
+            account["id"]
+            if in_reply_to
+            and note.get("attributedTo")
+            and in_reply_to.startswith(f"{note['attributedTo']}/")
+            else None
+        ),
+        "account": account,
+    }
+
+
+def _find_member(archive: zipfile.ZipFile, filename: str) -> Optional[str]:
+    for name in archive.namelist():
+        if name == filename or name.endswith(f"/{filename}"):
+            return name
+    return None
+
+
+def read_archive_posts(archive: zipfile.ZipFile, user_id: Any) -> List[Status]:
+    """流式读取导出 ZIP 中的 outbox.json，返回按时间升序排列的帖子"""
+    outbox_name = _find_member(archive, OUTBOX_FILENAME)
+    if outbox_name is None:
+        raise ValueError(f"导出文件中找不到 {OUTBOX_FILENAME}")
+
+    actor = {}
+    actor_name = _find_member(archive, ACTOR_FILENAME)
+    if actor_name is not None:
+        with archive.open(actor_name) as f:
+            actor = json.load(f)
+    account = build_account(actor, user_id)
+
+    posts = []
+    skipped = 0
+    with archive.open(outbox_name) as raw:
+        stream = io.TextIOWrapper(raw, encoding="utf-8")
+        for activity in iter_outbox_items(stream):
+            status = activity_to_status(activity, account)
+            if status is None or not status["id"]:
+                skipped += 1
+                continue
+            posts.append(as_status(status))
+    if skipped:
+        logging.info(f"ℹ️ 跳过 {skipped} 条转嘟、私信或无法识别的活动")
+    return sorted(posts, key=lambda post: post["created_at"])
+
+
+def extract_archive_media(
+    archive: zipfile.ZipFile,
+    posts: List[Status],
+    media_folder_path: Path,
+    layout: str,
+    tracker: Optional[ChangeTracker] = None,
+) -> Tuple[Dict[str, str], int]:
+    """把帖子引用的媒体直接从 ZIP 复制到媒体目录，返回 (媒体映射, 缺失数量)"""
+    members = set(archive.namelist())
+    prefix = ""
+    outbox_name = _find_member(archive, OUTBOX_FILENAME)
+    if outbox_name and "/" in outbox_name:
+        # 导出被再次打包时所有文件会多一层目录
+        prefix = outbox_name.rsplit("/", 1)[0] + "/"
+
+    media_file_map = {}
+    missing = 0
+    for post in posts:
+        for media in post.media_attachments:
+            member = prefix + urlparse(media.url).path.lstrip("/")
+            if member not in members:
+                missing += 1
+                continue
+            local_filename = f"{media.id}-{Path(member).name}"
+            relative_path = get_media_relative_path(local_filename, layout)
+            target_path = media_folder_path / relative_path
+            if not target_path.exists():
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+                # 先写临时文件再替换，中断后不会留下被当作已导入的半截文件
+                temp_path = target_path.with_name(f".{target_path.name}.tmp")
+                with archive.open(member) as source, open(temp_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(temp_path, target_path)
+                if tracker is not None:
+                    tracker.record_write(target_path, False)
+            media_file_map[media.id] = relative_path
+    return media_file_map, missing
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""备份目录布局：flat 为单层目录，sharded 按年月存放帖子、按哈希前缀存放媒体"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+FLAT_LAYOUT = "flat"
+SHARDED_LAYOUT = "sharded"
+LAYOUTS = (FLAT_LAYOUT, SHARDED_LAYOUT)
+MEDIA_SHARD_PREFIX_LENGTH = 2
+
+
+def get_layout(backup_config: Dict[str, Any]) -> str:
+    return backup_config.get("layout") or FLAT_LAYOUT
+
+
+def get_post_relative_path(filename: str, layout: str) -> str:
+    """帖子文件相对于帖子目录的路径；文件名以 YYYY-MM-DD 开头"""
+    if layout != SHARDED_LAYOUT:
+        return filename
+    return f"{filename[:4]}/{filename[5:7]}/{filename}"
+
+
+def get_media_relative_path(local_filename: str, layout: str) -> str:
+    """媒体文件相对于媒体目录的路径"""
+    if layout != SHARDED_LAYOUT:
+        return local_filename
+    digest = hashlib.sha1(local_filename.encode("utf-8")).hexdigest()
+    return f"{digest[:MEDIA_SHARD_PREFIX_LENGTH]}/{local_filename}"
+
+
+def get_post_depth(layout: str) -> int:
+    """帖子文件到备份根目录需要的 ../ 层数"""
+    return 3 if layout == SHARDED_LAYOUT else 1
+
+
+def get_post_media_prefix(media_folder_name: str, layout: str) -> str:
+    return "../" * get_post_depth(layout) + f"{media_folder_name}/"
+
+
+def get_media_link_pattern(media_folder_name: str) -> "re.Pattern[str]":
+    """匹配帖子中任意布局的媒体相对链接，捕获媒体目录内的相对路径"""
+    return re.compile(rf"(?:\.\./)+{re.escape(media_folder_name)}/([^\s)]+)")
+
+
+def iter_post_files(posts_folder_path: Path) -> List[Path]:
+    """列出所有帖子文件（兼容两种布局），按文件名排序"""
+    if not posts_folder_path.exists():
+        return []
+    return sorted(posts_folder_path.rglob("*.md"), key=lambda path: path.name)
+
+
+def iter_media_files(media_folder_path: Path) -> List[Path]:
+    if not media_folder_path.exists():
+        return []
+    return [path for path in media_folder_path.rglob("*") if path.is_file()]
+
+
+def _has_file(paths: Any) -> bool:
+    return any(path.is_file() for path in paths)
+
+
+def scan_layouts(posts_folder_path: Path, media_folder_path: Path) -> Set[str]:
+    """
+    按磁盘上的文件判断备份使用了哪些布局：帖子在 YYYY/MM/ 下、媒体在两位前缀目录下为
+    sharded，直接放在目录第一层为 flat。找到一个文件即停止，不遍历整个目录。
+    """
+    layouts = set()
+    if _has_file(posts_folder_path.glob("*.md")):
+        layouts.add(FLAT_LAYOUT)
+    if _has_file(posts_folder_path.glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]/*.md")):
+        layouts.add(SHARDED_LAYOUT)
+    if media_folder_path.is_dir():
+        for entry in os.scandir(media_folder_path):
+            if entry.is_file():
+                layouts.add(FLAT_LAYOUT)
+            elif (
+                entry.is_dir()
+                and len(entry.name) == MEDIA_SHARD_PREFIX_LENGTH
+                and _has_file(Path(entry.path).iterdir())
+            ):
+                layouts.add(SHARDED_LAYOUT)
+            if len(layouts) == len(LAYOUTS):
+                break
+    return layouts
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+帖子的精简内存模型。
+
+API 返回的帖子 dict 带有完整的账户信息（简介 HTML、资料字段、表情等），
+全量同步时每条帖子各持有一份。这里只保留渲染用到的字段：账户、标签、表情按内容
+复用同一个对象，可见性、媒体类型等重复字符串做驻留。模型同时支持 post["id"]、
+post.get("tags") 形式的访问，沿用 dict 的既有代码无需修改。
+"""
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# 共享对象缓存的上限；常驻模式下账户统计数变化会产生新快照，超过上限时整体清空
+INTERN_CACHE_MAX_ENTRIES = 4096
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _MappingAccess:
+    """按 dict 的方式读取字段，兼容把帖子当作 API dict 使用的代码"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__dataclass_fields__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.__dataclass_fields__:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换回 API 风格的 dict，用于序列化和计算渲染指纹"""
+        return {
+            field.name: _to_plain(getattr(self, field.name)) for field in fields(self)
+        }
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, _MappingAccess):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+class _InternCache:
+    def __init__(self) -> None:
+        self.entries: Dict[Tuple[Any, ...], Any] = {}
+
+    def get_or_create(self, key: Tuple[Any, ...], factory: Any) -> Any:
+        value = self.entries.get(key)
+        if value is None:
+            if len(self.entries) >= INTERN_CACHE_MAX_ENTRIES:
+                self.entries.clear()
+            value = self.entries[key] = factory(*key)
+        return value
+
+
+_accounts = _InternCache()
+_tags = _InternCache()
+_emojis = _InternCache()
+
+
+@dataclass(frozen=True, slots=True)
+class Account(_MappingAccess):
+    id: Any
+    username: str
+    display_name: str
+    url: str
+    avatar: str
+    header: str
+    note: str
+    followers_count: int
+    following_count: int
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Account":
+        username = data.get("username", "")
+        key = tuple(
+            _intern(value)
+            for value in (
+                data.get("id"),
+                username,
+                data.get("display_name", username),
+                data.get("url", ""),
+                data.get("avatar", ""),
+                data.get("header", ""),
+                data.get("note", ""),
+                data.get("followers_count", 0),
+                data.get("following_count", 0),
+            )
+        )
+        return _accounts.get_or_create(key, cls)
+
+
+@dataclass(frozen=True, slots=True)
+class Tag(_MappingAccess):
+    name: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Tag":
+        return _tags.get_or_create((_intern(data["name"]),), cls)
+
+
+@dataclass(frozen=True, slots=True)
+class Emoji(_MappingAccess):
+    shortcode: str
+    url: str
+    static_url: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Emoji":
+        url = data.get("url", "")
+        key = (
+            _intern(data.get("shortcode", "")),
+            _intern(url),
+            _intern(data.get("static_url", url)),
+        )
+        return _emojis.get_or_create(key, cls)
+
+
+@dataclass(frozen=True, slots=True)
+class Media(_MappingAccess):
+    id: str
+    type: str
+    url: str
+    description: Optional[str]
+    preview_url: Optional[str]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Media":
+        return cls(
+            id=data["id"],
+            type=_intern(data.get("type", "unknown")),
+            url=data["url"],
+            description=data.get("description", ""),
+            preview_url=data.get("preview_url", ""),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Status(_MappingAccess):
+    id: str
+    created_at: str
+    content: str
+    url: str
+    sensitive: bool
+    spoiler_text: str
+    visibility: str
+    media_attachments: Tuple[Media, ...]
+    tags: Tuple[Tag, ...]
+    emojis: Tuple[Emoji, ...]
+    reblogs_count: int
+    favourites_count: int
+    replies_count: int
+    in_reply_to_id: Optional[str]
+    in_reply_to_account_id: Optional[str]
+    account: Account
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Status":
+        """由 API 返回的帖子 dict 构造；缺失的可选字段取渲染时的默认值"""
+        return cls(
+            id=data["id"],
+            created_at=data["created_at"],
+            content=data.get("content", ""),
+            url=data.get("url", ""),
+            sensitive=data.get("sensitive", False),
+            spoiler_text=_intern(data.get("spoiler_text", "")),
+            visibility=_intern(data.get("visibility", "public")),
+            media_attachments=tuple(
+                Media.from_dict(media) for media in data.get("media_attachments") or ()
+            ),
+            tags=tuple(Tag.from_dict(tag) for tag in data.get("tags") or ()),
+            emojis=tuple(Emoji.from_dict(emoji) for emoji in data.get("emojis") or ()),
+            reblogs_count=data.get("reblogs_count", 0),
+            favourites_count=data.get("favourites_count", 0),
+            replies_count=data.get("replies_count", 0),
+            in_reply_to_id=data.get("in_reply_to_id"),
+            in_reply_to_account_id=_intern(data.get("in_reply_to_account_id")),
+            account=Account.from_dict(data.get("account") or {}),
+        )
+
+
+PostLike = Union[Status, Dict[str, Any]]
+
+
+def as_status(post: PostLike) -> Status:
+    """渲染器入口使用的适配器：已是 Status 时原样返回，dict 则转换"""
+    if isinstance(post, Status):
+        return post
+    return Status.from_dict(post)
+
+
+def as_statuses(posts: Iterable[PostLike]) -> List[Status]:
+    return [as_status(post) for post in posts]
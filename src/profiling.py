@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+同步运行的分阶段耗时与资源统计。
+
+每次同步都会记录各阶段的墙钟时间、CPU 时间、API 调用次数、下载字节数、读写文件数
+和峰值内存，写成 JSON 报告。CPU 时间取自整个进程，多个账户并发时无法分到各账户，
+此时记为 None；--profile 模式下另外用 cProfile 采样每个阶段（包括放到
+线程中执行的部分），并把最慢阶段的统计导出为 .pstats 文件；--memprofile 模式下在每个
+阶段结束时做 tracemalloc 快照，记录该阶段的内存峰值、占用最多的分配位置和相对上一个
+快照增长最多的位置。
+"""
+import asyncio
+import contextvars
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_REPORTS_FOLDER = "profiles"
+PROFILE_REPORTS_KEEP = 20
+COUNTERS = (
+    "api_calls",
+    "bytes_downloaded",
+    "files_read",
+    "files_written",
+    "rate_limit_wait_seconds",
+    "posts_processed",
+    "media_downloaded",
+    "media_failed",
+)
+TRACEMALLOC_FRAMES = 10
+MEMORY_TOP_SITES = 10
+# 不统计 tracemalloc 自身和导入机制的分配
+TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+current_profile: contextvars.ContextVar[Optional["RunProfile"]] = (
+    contextvars.ContextVar("current_profile", default=None)
+)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+# tracemalloc 是进程级的：并发账户各自的 MemoryTracker 按引用计数共用一次追踪，
+# 最后一个结束时才停止；启动前已在追踪（如 -X tracemalloc）时不由这里停止
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started_here = False
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """进程启动以来的峰值常驻内存（MB）；Windows 上没有 resource 模块时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _to_mb(size: int) -> float:
+    return round(size / (1024 * 1024), 2)
+
+
+def _site_of(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryTracker:
+    """--memprofile 模式的 tracemalloc 快照；多个账户并发时共用追踪，最后一个停止时才结束"""
+
+    def __init__(self) -> None:
+        global _tracing_users, _tracing_started_here
+        with _tracing_lock:
+            if _tracing_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                _tracing_started_here = True
+            _tracing_users += 1
+        self.active = True
+        self.previous = self.take_snapshot()
+
+    @staticmethod
+    def take_snapshot() -> Optional[tracemalloc.Snapshot]:
+        if not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+
+    def start_stage(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def end_stage(self) -> Optional[Dict[str, Any]]:
+        """阶段内的峰值、阶段结束时占用最多的位置，以及相对上一个快照增长最多的位置"""
+        snapshot = self.take_snapshot()
+        if snapshot is None:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        top = snapshot.statistics("lineno")[:MEMORY_TOP_SITES]
+        growth = []
+        if self.previous is not None:
+            growth = [
+                diff
+                for diff in snapshot.compare_to(self.previous, "lineno")
+                if diff.size_diff > 0
+            ][:MEMORY_TOP_SITES]
+        self.previous = snapshot
+        return {
+            "traced_current_mb": _to_mb(current),
+            "traced_peak_mb": _to_mb(peak),
+            "top_allocations": [
+                {
+                    "site": _site_of(stat.traceback),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in top
+            ],
+            "growth": [
+                {
+                    "site": _site_of(diff.traceback),
+                    "size_diff_kb": round(diff.size_diff / 1024, 1),
+                    "count_diff": diff.count_diff,
+                }
+                for diff in growth
+            ],
+        }
+
+    def stop(self) -> None:
+        global _tracing_users, _tracing_started_here
+        self.previous = None
+        if not self.active:
+            return
+        self.active = False
+        with _tracing_lock:
+            _tracing_users -= 1
+            if _tracing_users == 0 and _tracing_started_here:
+                _tracing_started_here = False
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+
+
+def _round_optional(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+def _format_cpu(value: Optional[float], digits: int) -> str:
+    return f"CPU {value:.{digits}f} 秒" if value is not None else "CPU 时间不可用"
+
+
+class Span:
+    def __init__(self, name: str, with_cprofile: bool, measure_cpu: bool = True):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds: Optional[float] = 0.0 if measure_cpu else None
+        self.counters: Dict[str, float] = dict.fromkeys(COUNTERS, 0)
+        self.peak_rss_mb: Optional[float] = None
+        self.memory: Optional[Dict[str, Any]] = None
+        self.profilers: List[cProfile.Profile] = []
+        self.with_cprofile = with_cprofile
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "cpu_seconds": _round_optional(self.cpu_seconds),
+            **{
+                key: round(value, 3) if isinstance(value, float) else value
+                for key, value in self.counters.items()
+            },
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+        if self.memory is not None:
+            result["memory"] = self.memory
+        return result
+
+    def record_memory(self, memory: Optional[Dict[str, Any]]) -> None:
+        """同名阶段多次出现时保留峰值更高的那次"""
+        if memory is None:
+            return
+        if self.memory is None or memory["traced_peak_mb"] >= self.memory.get(
+            "traced_peak_mb", 0
+        ):
+            self.memory = memory
+
+
+class RunProfile:
+    """
+    一次同步运行的阶段记录；计数器可能在线程中累加，用锁保护。
+    process_time 统计的是整个进程（含其他账户的协程和工作线程），多账户并发时
+    measure_cpu 为 False，报告中的 CPU 时间记为 None。
+    """
+
+    def __init__(
+        self,
+        with_cprofile: bool = False,
+        with_tracemalloc: bool = False,
+        measure_cpu: bool = True,
+    ):
+        self.with_cprofile = with_cprofile
+        self.measure_cpu = measure_cpu
+        self.memory_tracker = MemoryTracker() if with_tracemalloc else None
+        self.started_at = datetime.now(timezone.utc)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.spans: List[Span] = []
+        self.totals: Dict[str, float] = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: float = 1) -> None:
+        span = _current_span.get()
+        with self._lock:
+            self.totals[name] += amount
+            if span is not None:
+                span.counters[name] += amount
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        """记录一个阶段；同名阶段多次出现时（如增量同步的两次拉取）累加"""
+        span = next((s for s in self.spans if s.name == name), None)
+        if span is None:
+            span = Span(name, self.with_cprofile, self.measure_cpu)
+            self.spans.append(span)
+        token = _current_span.set(span)
+        profiler = cProfile.Profile() if self.with_cprofile else None
+        if self.memory_tracker is not None:
+            self.memory_tracker.start_stage()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12 起同一时间只能有一个 cProfile 在采样，与 _profiled 的处理一致
+                profiler = None
+        try:
+            yield span
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                span.profilers.append(profiler)
+            span.wall_seconds += time.perf_counter() - start_wall
+            if span.cpu_seconds is not None:
+                span.cpu_seconds += time.process_time() - start_cpu
+            span.peak_rss_mb = get_peak_rss_mb()
+            if self.memory_tracker is not None:
+                # 快照本身较慢，放在计时之后
+                span.record_memory(self.memory_tracker.end_stage())
+            _current_span.reset(token)
+
+    def stop(self) -> None:
+        """结束运行时停止 tracemalloc，释放快照"""
+        if self.memory_tracker is not None:
+            self.memory_tracker.stop()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": round(time.perf_counter() - self.start_wall, 3),
+            "cpu_seconds": (
+                round(time.process_time() - self.start_cpu, 3)
+                if self.measure_cpu
+                else None
+            ),
+            "peak_rss_mb": get_peak_rss_mb(),
+            "totals": {key: round(value, 3) for key, value in self.totals.items()},
+            "stages": [span.to_dict() for span in self.spans],
+        }
+
+    def slowest_span(self) -> Optional[Span]:
+        return max(self.spans, key=lambda span: span.wall_seconds, default=None)
+
+    def write_report(self, state_dir: Path) -> Path:
+        """写入 JSON 报告（--profile 时附带最慢阶段的 .pstats），只保留最近的若干份"""
+        reports_dir = state_dir / PROFILE_REPORTS_FOLDER
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"run-{self.started_at:%Y%m%dT%H%M%S%fZ}"
+        report = self.to_dict()
+
+        slowest = self.slowest_span()
+        if slowest is not None and slowest.profilers:
+            pstats_path = reports_dir / f"{stem}-{slowest.name}.pstats"
+            pstats.Stats(*slowest.profilers).dump_stats(str(pstats_path))
+            report["pstats"] = {"stage": slowest.name, "path": pstats_path.name}
+
+        report_path = reports_dir / f"{stem}.json"
+        report_path.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        for old_report in sorted(reports_dir.glob("run-*.json"))[
+            :-PROFILE_REPORTS_KEEP
+        ]:
+            for path in reports_dir.glob(f"{old_report.stem}*"):
+                path.unlink(missing_ok=True)
+        return report_path
+
+    def log_summary(self) -> None:
+        report = self.to_dict()
+        logging.info(
+            f"⏱️ 本次运行耗时 {report['wall_seconds']:.1f} 秒（{_format_cpu(report['cpu_seconds'], 1)}），"
+            f"峰值内存 {report['peak_rss_mb']} MB"
+        )
+        for stage in report["stages"]:
+            logging.info(
+                f"⏱️   {stage['name']}: {stage['wall_seconds']:.2f} 秒，"
+                f"{_format_cpu(stage['cpu_seconds'], 2)}，API {stage['api_calls']} 次，"
+                f"下载 {stage['bytes_downloaded'] / 1024:.0f} KB，"
+                f"读 {stage['files_read']} / 写 {stage['files_written']} 个文件"
+            )
+            memory = stage.get("memory")
+            if memory:
+                growth = memory["growth"][0] if memory["growth"] else None
+                logging.info(
+                    f"🧠   {stage['name']}: Python 内存峰值 {memory['traced_peak_mb']} MB，"
+                    f"结束时 {memory['traced_current_mb']} MB"
+                    + (
+                        f"，增长最多 {growth['site']}（+{growth['size_diff_kb']} KB）"
+                        if growth
+                        else ""
+                    )
+                )
+
+
+def count(name: str, amount: float = 1) -> None:
+    """累加当前运行的计数器；没有进行中的运行时不做任何事"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count(name, amount)
+
+
+def span(name: str) -> Any:
+    """当前运行中的阶段计时上下文；没有进行中的运行时为空操作"""
+    profile = current_profile.get()
+    return profile.span(name) if profile is not None else nullcontext()
+
+
+def _profiled(func: Callable[..., Any]) -> Callable[..., Any]:
+    # 线程中的代码不在事件循环线程的 cProfile 范围内，单独采样后并入当前阶段
+    def run(*args: Any, **kwargs: Any) -> Any:
+        current = _current_span.get()
+        if current is None or not current.with_cprofile:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12 起 cProfile 对所有线程生效，阶段的采样已经覆盖这里
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            current.profilers.append(profiler)
+
+    return run
+
+
+async def to_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """asyncio.to_thread 的替代：--profile 模式下线程内的执行也计入当前阶段的采样"""
+    return await asyncio.to_thread(_profiled(func), *args, **kwargs)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""多账户同步时共享的 API 速率限制"""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from . import profiling
+from .utils import content_hash
+
+# Mastodon 默认每个令牌 5 分钟 300 次请求，留 20 次缓冲
+RATE_LIMIT_MAX_REQUESTS = 280
+RATE_LIMIT_WINDOW_SECONDS = 300
+RATE_LIMIT_REMAINING_THRESHOLD = 10
+# 同一实例上同时进行的 API 请求数，避免多个账户一起压向同一台服务器
+INSTANCE_CONCURRENCY = 4
+
+
+class RateLimiter:
+    """按 (实例, 令牌) 统计滑动窗口内的请求数，并限制每个实例的并发请求"""
+
+    def __init__(
+        self,
+        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
+        window_seconds: float = RATE_LIMIT_WINDOW_SECONDS,
+        instance_concurrency: int = INSTANCE_CONCURRENCY,
+    ):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.instance_concurrency = instance_concurrency
+        self._windows: Dict[Tuple[str, str], Deque[float]] = defaultdict(deque)
+        self._blocked_until: Dict[Tuple[str, str], float] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._instance_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @staticmethod
+    def _key(instance_url: str, access_token: str) -> Tuple[str, str]:
+        # 不在内存结构中保留明文令牌
+        return instance_url, content_hash(access_token)[:16]
+
+    @asynccontextmanager
+    async def slot(self, instance_url: str, access_token: str) -> AsyncIterator[None]:
+        """获取一次请求的配额；窗口已满或服务器要求等待时在此处排队"""
+        semaphore = self._instance_semaphores.setdefault(
+            instance_url, asyncio.Semaphore(self.instance_concurrency)
+        )
+        async with semaphore:
+            await self._acquire(self._key(instance_url, access_token))
+            yield
+
+    async def _acquire(self, key: Tuple[str, str]) -> None:
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            while True:
+                now = time.monotonic()
+                window = self._windows[key]
+                while window and now - window[0] >= self.window_seconds:
+                    window.popleft()
+                wait_time = self._blocked_until.get(key, 0) - now
+                if len(window) >= self.max_requests:
+                    wait_time = max(wait_time, window[0] + self.window_seconds - now)
+                if wait_time <= 0:
+                    window.append(now)
+                    return
+                logging.info(f"⏱️ {key[0]} 接近 API 限制，等待 {wait_time:.1f} 秒...")
+                profiling.count("rate_limit_wait_seconds", wait_time)
+                await asyncio.sleep(wait_time)
+
+    def record_response(
+        self,
+        instance_url: str,
+        access_token: str,
+        remaining: Optional[int],
+        reset_at: Optional[int],
+    ) -> None:
+        """根据响应头中的剩余次数和重置时间，必要时暂停该令牌后续的请求"""
+        if remaining is None or reset_at is None:
+            return
+        if remaining >= RATE_LIMIT_REMAINING_THRESHOLD:
+            return
+        wait_time = min(max(0, reset_at - time.time()), self.window_seconds)
+        self._blocked_until[self._key(instance_url, access_token)] = (
+            time.monotonic() + wait_time
+        )
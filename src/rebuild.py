@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+离线重建。
+
+修改时区、目录名称或渲染器之后，按 .vault-sync/statuses.jsonl 中保存的原始数据和本地
+已有的媒体重新生成帖子文件、归档、活动总结和网页，全程不访问网络。帖子渲染和归档重建
+在进程池中跨核进行；活动总结只读取帖子文件，与归档和网页在不同线程中同时生成。
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .backup import detect_backup_layout, rebuild_archive, rebuild_post_files
+from .changes import ChangeTracker
+from .layout import get_layout, iter_post_files
+from .render import generate_activity_summary, generate_mastodon_html
+from .snapshot import update_snapshot
+from .store import load_statuses
+from .utils import get_state_dir
+
+REBUILD_TARGETS = ("posts", "archive", "summary", "html")
+
+
+def parse_targets(value: Optional[str]) -> List[str]:
+    """解析 --only 的逗号分隔列表，未指定时重建全部目标"""
+    if not value:
+        return list(REBUILD_TARGETS)
+    targets = [target.strip() for target in value.split(",") if target.strip()]
+    unknown = [target for target in targets if target not in REBUILD_TARGETS]
+    if unknown or not targets:
+        raise ValueError(
+            f"未知的重建目标：{', '.join(unknown) or value}，可选：{', '.join(REBUILD_TARGETS)}"
+        )
+    return [target for target in REBUILD_TARGETS if target in targets]
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def rebuild_backup(
+    config: Dict[str, Any], backup_path: Path, targets: List[str]
+) -> Dict[str, float]:
+    """
+    离线重建指定目标，返回各目标的耗时（秒）。
+
+    没有保存原始数据或备份目录布局与配置不一致时抛出 ValueError。
+    """
+    backup_config = config["backup"]
+    recorded_layout = detect_backup_layout(config, backup_path)
+    if recorded_layout is not None and recorded_layout != get_layout(backup_config):
+        raise ValueError(
+            f"备份目录当前为 {recorded_layout} 布局，配置为 {get_layout(backup_config)}，"
+            "请先运行 migrate-layout"
+        )
+
+    statuses = []
+    if "posts" in targets or "html" in targets:
+        statuses = load_statuses(backup_path)
+        if not statuses:
+            raise ValueError(
+                "没有保存帖子原始数据，请先运行一次 sync --full 或 import-archive"
+            )
+        # 网页生成时也会写入这两项；活动总结与网页并行生成，提前写入保证结果一致
+        account = statuses[0].account
+        config["username"] = account.username
+        config["instance"] = (
+            account.url.split("//")[1].split("/")[0] if "//" in account.url else ""
+        )
+
+    config["offline"] = True
+    tracker = ChangeTracker(backup_path)
+    config["change_tracker"] = tracker
+    timings: Dict[str, float] = {}
+
+    if "posts" in targets:
+        started = time.perf_counter()
+        written, removed, unmatched = rebuild_post_files(statuses, config, backup_path)
+        timings["posts"] = time.perf_counter() - started
+        logging.info(
+            f"📄 已重新渲染 {len(statuses)} 条帖子：{written} 个文件有变化，"
+            f"删除 {removed} 个旧文件"
+        )
+        if unmatched:
+            logging.warning(f"⚠️ {unmatched} 个帖子文件没有原始数据，保持原样")
+
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    if "html" in targets and len(iter_post_files(posts_folder_path)) > len(statuses):
+        # 网页完全由原始数据生成，缺少的帖子会从网页上消失
+        logging.warning(
+            "⚠️ 部分帖子文件没有原始数据，已跳过网页重建；请先运行一次 sync --full"
+        )
+        targets = [target for target in targets if target != "html"]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        summary_future = None
+        if "summary" in targets:
+            summary_future = executor.submit(
+                _timed, generate_activity_summary, config, backup_path
+            )
+        if "archive" in targets:
+            timings["archive"] = _timed(rebuild_archive, config, backup_path)
+        if "html" in targets:
+            timings["html"] = _timed(
+                generate_mastodon_html, statuses, config, backup_path
+            )
+        if summary_future is not None:
+            timings["summary"] = summary_future.result()
+
+    tracker.write_manifest(get_state_dir(backup_path))
+    try:
+        update_snapshot(config, backup_path, "rebuild", deep=True)
+    except OSError as e:
+        logging.warning(f"⚠️ 更新状态快照失败：{e}")
+    return timings
@@ -1,31 +1,42 @@
 # -*- coding: utf-8 -*-
-from .archive import (
-    format_post_for_single_file,
-    format_single_post_for_archive,
-    strip_autolinks,
-)
-from .html import (
-    generate_html_template,
-    generate_mastodon_html,
-    get_default_css,
-    get_html_body_template,
-    load_css_styles,
-    load_javascript,
-    validate_post_data,
-)
-from .summary import generate_activity_summary, generate_heatmap_svg
+"""
+渲染相关函数的统一入口。
 
-__all__ = [
-    "strip_autolinks",
-    "format_single_post_for_archive",
-    "format_post_for_single_file",
-    "generate_heatmap_svg",
-    "generate_activity_summary",
-    "validate_post_data",
-    "generate_mastodon_html",
-    "get_html_body_template",
-    "generate_html_template",
-    "load_css_styles",
-    "load_javascript",
-    "get_default_css",
-]
+子模块依赖较重（html 需要 requests，archive 需要 markdownify 和 yaml），这里按名称在
+第一次访问时才导入对应子模块，只查看状态或帮助的命令不必加载整个渲染栈。
+"""
+import importlib
+from typing import Any
+
+_EXPORTS = {
+    "strip_autolinks": "archive",
+    "format_single_post_for_archive": "archive",
+    "format_post_for_single_file": "archive",
+    "get_post_filename": "archive",
+    "render_post_files": "executor",
+    "generate_heatmap_svg": "summary",
+    "generate_activity_summary": "summary",
+    "validate_post_data": "html",
+    "generate_mastodon_html": "html",
+    "get_html_body_template": "html",
+    "generate_html_template": "html",
+    "load_css_styles": "html",
+    "load_javascript": "html",
+    "get_default_css": "html",
+    "generate_static_site": "site",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> Any:
+    return sorted(list(globals()) + __all__)
@@ -1,79 +1,101 @@
 # -*- coding: utf-8 -*-
 import re
-from typing import Any, Dict
+from typing import Dict
 
 import yaml
 from markdownify import markdownify as md
 
+from ..layout import FLAT_LAYOUT, get_post_media_prefix
+from ..models import PostLike, as_status
 from ..utils import get_timezone_aware_datetime
 
+# 单帖 Markdown 渲染读取的帖子字段，缓存指纹只覆盖这些字段
+SINGLE_FILE_FIELDS = (
+    "id",
+    "created_at",
+    "url",
+    "visibility",
+    "content",
+    "spoiler_text",
+    "sensitive",
+    "tags",
+    "emojis",
+    "media_attachments",
+    "in_reply_to_id",
+    "in_reply_to_account_id",
+)
+
 
 def strip_autolinks(text: str) -> str:
     return re.sub(r"<(https?://[^>]+)>", r"\1", text)
 
 
+def get_post_filename(post: PostLike, china_timezone: bool = False) -> str:
+    local_dt = get_timezone_aware_datetime(post["created_at"], china_timezone)
+    return f"{local_dt.strftime('%Y-%m-%d_%H%M%S')}_{post['id']}.md"
+
+
 def format_single_post_for_archive(
-    post: Dict[str, Any],
+    post: PostLike,
     media_folder_name: str,
     media_file_map: Dict[str, str],
     china_timezone: bool = False,
 ) -> str:
-    local_dt = get_timezone_aware_datetime(post["created_at"], china_timezone)
+    post = as_status(post)
+    local_dt = get_timezone_aware_datetime(post.created_at, china_timezone)
     time_str = local_dt.strftime("%H:%M")
-    is_reply = post.get("in_reply_to_id")
+    is_reply = post.in_reply_to_id
     icon = "💬" if is_reply else "📝"
     heading = f"## {time_str} {icon} {'回复' if is_reply else '嘟文'}"
     source_link_text = "**回复嘟文**" if is_reply else "**原始嘟文**"
-    content_md = strip_autolinks(md(post["content"], heading_style="ATX")).strip()
+    content_md = strip_autolinks(md(post.content, heading_style="ATX")).strip()
     attachments_md = ""
-    if post["media_attachments"]:
+    if post.media_attachments:
         media_parts = []
-        for media in post["media_attachments"]:
-            if local_filename := media_file_map.get(media["id"]):
+        for media in post.media_attachments:
+            if local_filename := media_file_map.get(media.id):
                 media_path = f"{media_folder_name}/{local_filename}"
-                media_parts.append(
-                    f"![{media.get('description') or 'Image'}]({media_path})"
-                )
+                media_parts.append(f"![{media.description or 'Image'}]({media_path})")
         if media_parts:
             attachments_md = ("\n\n" if content_md else "") + "\n".join(media_parts)
-    return f"{heading}\n\n**内容**：{content_md}{attachments_md}\n\n{source_link_text}：{post['url']}\n\n---\n\n"
+    return f"{heading}\n\n**内容**：{content_md}{attachments_md}\n\n{source_link_text}：{post.url}\n\n---\n\n"
 
 
 def format_post_for_single_file(
-    post: Dict[str, Any],
+    post: PostLike,
     media_folder_name: str,
     media_file_map: Dict[str, str],
     china_timezone: bool = False,
+    layout: str = FLAT_LAYOUT,
 ) -> str:
-    local_dt = get_timezone_aware_datetime(post["created_at"], china_timezone)
-    in_reply_to_id = post.get("in_reply_to_id")
+    post = as_status(post)
+    local_dt = get_timezone_aware_datetime(post.created_at, china_timezone)
+    in_reply_to_id = post.in_reply_to_id
     frontmatter = {
-        "id": post["id"],
+        "id": post.id,
         "date": local_dt.strftime("%Y-%m-%d %H:%M:%S"),
-        "source": post["url"],
+        "source": post.url,
         "type": "reply" if in_reply_to_id else "toot",
-        "visibility": post.get("visibility", "public"),
-        "hasMedia": bool(post.get("media_attachments", [])),
-        "tags": [tag["name"] for tag in post.get("tags", [])],
+        "visibility": post.visibility,
+        "hasMedia": bool(post.media_attachments),
+        "tags": [tag.name for tag in post.tags],
     }
     if in_reply_to_id:
         frontmatter.update(
             {
                 "inReplyToId": in_reply_to_id,
-                "inReplyToAccountId": post.get("in_reply_to_account_id"),
+                "inReplyToAccountId": post.in_reply_to_account_id,
             }
         )
     yaml_frontmatter = "---\n" + yaml.dump(frontmatter, allow_unicode=True) + "---\n\n"
-    content_md = strip_autolinks(md(post["content"], heading_style="ATX"))
+    content_md = strip_autolinks(md(post.content, heading_style="ATX"))
     attachments_md = ""
-    if post["media_attachments"]:
+    if post.media_attachments:
         media_parts = []
-        for media in post["media_attachments"]:
-            if local_filename := media_file_map.get(media["id"]):
-                media_path = f"../{media_folder_name}/{local_filename}"
-                media_parts.append(
-                    f"![{media.get('description') or 'Image'}]({media_path})\n"
-                )
+        for media in post.media_attachments:
+            if local_filename := media_file_map.get(media.id):
+                media_path = f"{get_post_media_prefix(media_folder_name, layout)}{local_filename}"
+                media_parts.append(f"![{media.description or 'Image'}]({media_path})\n")
         if media_parts:
             attachments_md = "\n## 附件\n" + "".join(media_parts)
     return yaml_frontmatter + content_md + attachments_md
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+网页静态资源处理：压缩 CSS/JS，按内容哈希命名为外部文件，并生成预压缩副本。
+
+数据变化时只有 HTML 改变，带哈希的 CSS/JS 文件名不变，静态托管可以长期缓存；
+支持预压缩文件的服务器（nginx gzip_static/brotli_static 等）可直接返回 .gz/.br。
+"""
+import gzip
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict
+
+from ..utils import content_hash, safe_remove_file, write_bytes_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS_FOLDER = "assets"
+ASSET_HASH_LENGTH = 10
+PRECOMPRESSED_SUFFIXES = (".gz", ".br")
+
+_CSS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.S)
+_CSS_PUNCTUATION_PATTERN = re.compile(r"\s*([{};,>])\s*")
+_CSS_COLON_PATTERN = re.compile(r"([{;])\s*([-\w]+)\s*:\s*")
+
+
+def minify_css(css: str) -> str:
+    """去掉注释和多余空白；选择器中的空格（后代选择器）保留为单个空格"""
+    css = _CSS_COMMENT_PATTERN.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    css = _CSS_PUNCTUATION_PATTERN.sub(r"\1", css)
+    css = _CSS_COLON_PATTERN.sub(r"\1\2:", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(js: str) -> str:
+    """
+    保守压缩：只去掉整行注释、行首缩进和空行。
+    不改写语句本身，模板字符串中的 HTML 只会少掉缩进，渲染结果不变。
+    """
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines) + "\n"
+
+
+def write_precompressed(path: Path, data: bytes, tracker: Any = None) -> None:
+    """在 path 旁边写入 .gz（以及安装了 brotli 时的 .br）预压缩副本"""
+    # mtime 固定为 0，内容不变时压缩结果逐字节相同，不会产生多余的写入
+    write_bytes_if_changed(
+        path.with_name(path.name + ".gz"),
+        gzip.compress(data, compresslevel=9, mtime=0),
+        tracker,
+    )
+    if brotli is not None:
+        write_bytes_if_changed(
+            path.with_name(path.name + ".br"), brotli.compress(data), tracker
+        )
+
+
+def has_precompressed(path: Path) -> bool:
+    """每种预压缩副本（.gz，安装了 brotli 时还有 .br）是否都已存在"""
+    suffixes = PRECOMPRESSED_SUFFIXES if brotli is not None else (".gz",)
+    return all(path.with_name(path.name + suffix).exists() for suffix in suffixes)
+
+
+def remove_precompressed(path: Path, tracker: Any = None) -> None:
+    for suffix in PRECOMPRESSED_SUFFIXES:
+        variant = path.with_name(path.name + suffix)
+        if variant.exists() and safe_remove_file(variant) and tracker is not None:
+            tracker.record_delete(variant)
+
+
+def write_hashed_asset(
+    directory: Path, stem: str, suffix: str, content: str, tracker: Any = None
+) -> str:
+    """
+    写入 <stem>.<哈希><suffix> 及其预压缩副本，删除同名的旧版本，返回文件名。
+    """
+    data = content.encode("utf-8")
+    filename = f"{stem}.{content_hash(content)[:ASSET_HASH_LENGTH]}{suffix}"
+    asset_path = directory / filename
+    if write_bytes_if_changed(asset_path, data, tracker) or not has_precompressed(
+        asset_path
+    ):
+        write_precompressed(asset_path, data, tracker)
+    _remove_hashed_assets(directory, stem, suffix, filename, tracker)
+    return filename
+
+
+def _remove_hashed_assets(
+    directory: Path, stem: str, suffix: str, keep: str = "", tracker: Any = None
+) -> None:
+    """删除 <stem>.<哈希><suffix> 的旧版本及其预压缩副本"""
+    for old_path in directory.glob(f"{stem}.*{suffix}"):
+        if old_path.name == keep or old_path.name.count(".") != 2:
+            continue
+        if safe_remove_file(old_path) and tracker is not None:
+            tracker.record_delete(old_path)
+        remove_precompressed(old_path, tracker)
+
+
+def remove_page_assets(backup_path: Path, tracker: Any = None) -> None:
+    """关闭资源优化后删除 build_page_assets 写出的 CSS/JS 和预压缩副本，网页改回内联资源"""
+    directory = backup_path / ASSETS_FOLDER
+    if not directory.is_dir():
+        return
+    _remove_hashed_assets(directory, "style", ".css", tracker=tracker)
+    _remove_hashed_assets(directory, "script", ".js", tracker=tracker)
+
+
+def build_page_assets(
+    backup_path: Path, css: str, js: str, tracker: Any = None
+) -> Dict[str, str]:
+    """压缩并写出网页使用的 CSS/JS，返回相对备份根目录的引用路径"""
+    directory = backup_path / ASSETS_FOLDER
+    minified_css = minify_css(css)
+    minified_js = minify_js(js)
+    css_filename = write_hashed_asset(directory, "style", ".css", minified_css, tracker)
+    js_filename = write_hashed_asset(directory, "script", ".js", minified_js, tracker)
+    logging.info(
+        f"📦 静态资源已压缩：CSS {len(css)} → {len(minified_css)} 字符，"
+        f"JS {len(js)} → {len(minified_js)} 字符"
+    )
+    return {
+        "css": f"{ASSETS_FOLDER}/{css_filename}",
+        "js": f"{ASSETS_FOLDER}/{js_filename}",
+    }
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from ..utils import atomic_write_text, get_state_dir
+
+# 渲染输出格式变化时递增，使旧缓存整体失效
+RENDERER_VERSION = 2
+RENDER_CACHE_FILENAME = "render_cache.json"
+RENDER_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+SINGLE_FILE = "single_file"
+ARCHIVE_ENTRY = "archive"
+HTML_RECORD = "html"
+
+
+def _to_json_value(value: Any) -> Any:
+    # 帖子模型按字段转为 dict，其余未知类型退化为字符串
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+def fingerprint(*parts: Any) -> str:
+    """计算渲染输入的指纹：帖子内容、媒体映射、时区开关和渲染器版本"""
+    payload = json.dumps(
+        [RENDERER_VERSION, *parts],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=_to_json_value,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def select_fields(post: Any, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """只取渲染器实际读取的字段参与指纹，互动数、粉丝数等变化不会让缓存失效"""
+    return {field: post.get(field) for field in fields}
+
+
+def _estimate_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class RenderCache:
+    """按帖子 ID + 输入指纹缓存渲染结果，按总大小做 LRU 淘汰"""
+
+    def __init__(
+        self, cache_path: Optional[Path] = None, max_bytes: int = RENDER_CACHE_MAX_BYTES
+    ):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[str, Any, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    @classmethod
+    def load(
+        cls, cache_path: Path, max_bytes: int = RENDER_CACHE_MAX_BYTES
+    ) -> "RenderCache":
+        cache = cls(cache_path, max_bytes)
+        if not cache_path.exists():
+            return cache
+        try:
+            data = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ 渲染缓存无法读取，将重新生成：{e}")
+            return cache
+        if data.get("version") != RENDERER_VERSION:
+            return cache
+        for key, entry_fingerprint, value in data.get("entries", []):
+            cache._store(key, entry_fingerprint, value)
+        cache.dirty = False
+        return cache
+
+    def get(self, kind: str, post_id: Any, entry_fingerprint: str) -> Optional[Any]:
+        key = f"{kind}:{post_id}"
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != entry_fingerprint:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, kind: str, post_id: Any, entry_fingerprint: str, value: Any) -> None:
+        self._store(f"{kind}:{post_id}", entry_fingerprint, value)
+
+    def _store(self, key: str, entry_fingerprint: str, value: Any) -> None:
+        size = _estimate_size(value)
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[2]
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (entry_fingerprint, value, size)
+        self.total_bytes += size
+        self.dirty = True
+        while self.total_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def save(self) -> None:
+        if not self.dirty or self.cache_path is None:
+            return
+        data = {
+            "version": RENDERER_VERSION,
+            # 按 LRU 顺序保存，重新加载后淘汰顺序不变
+            "entries": [
+                [key, entry_fingerprint, value]
+                for key, (entry_fingerprint, value, _) in self.entries.items()
+            ],
+        }
+        try:
+            atomic_write_text(
+                self.cache_path,
+                json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+            )
+            self.dirty = False
+        except OSError as e:
+            logging.warning(f"⚠️ 保存渲染缓存失败：{e}")
+
+
+def get_render_cache(config: Dict[str, Any], backup_path: Path) -> RenderCache:
+    """从运行时配置中取出渲染缓存，不存在时从备份目录加载"""
+    cache = config.get("render_cache")
+    if cache is None:
+        cache = RenderCache.load(get_state_dir(backup_path) / RENDER_CACHE_FILENAME)
+        config["render_cache"] = cache
+    return cache
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..layout import FLAT_LAYOUT
+from ..models import PostLike, Status, as_statuses
+from .archive import (
+    SINGLE_FILE_FIELDS,
+    format_post_for_single_file,
+    get_post_filename,
+)
+from .cache import SINGLE_FILE, RenderCache, fingerprint, select_fields
+
+# 帖子较少时进程启动和序列化开销高于并行收益，直接在当前进程渲染
+PARALLEL_RENDER_THRESHOLD = 200
+RENDER_BATCH_SIZE = 100
+
+
+def get_render_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def _render_post_batch(
+    posts: List[Status],
+    media_folder_name: str,
+    media_file_map: Dict[str, str],
+    china_timezone: bool,
+    layout: str = FLAT_LAYOUT,
+) -> List[Tuple[str, str]]:
+    return [
+        (
+            get_post_filename(post, china_timezone),
+            format_post_for_single_file(
+                post, media_folder_name, media_file_map, china_timezone, layout
+            ),
+        )
+        for post in posts
+    ]
+
+
+def _slice_media_file_map(
+    posts: List[Status], media_file_map: Dict[str, str]
+) -> Dict[str, str]:
+    """只把当前批次引用到的媒体映射发给子进程，减少序列化体积"""
+    batch_map = {}
+    for post in posts:
+        for media in post.media_attachments:
+            if media.id in media_file_map:
+                batch_map[media.id] = media_file_map[media.id]
+    return batch_map
+
+
+def _render_batch_with_map(
+    job: Tuple[List[Status], Dict[str, str]],
+    media_folder_name: str,
+    china_timezone: bool,
+    layout: str,
+) -> List[Tuple[str, str]]:
+    posts, media_file_map = job
+    return _render_post_batch(
+        posts, media_folder_name, media_file_map, china_timezone, layout
+    )
+
+
+def map_in_process_pool(
+    func: Callable[[Any], List[Any]], jobs: List[Any], total: int
+) -> Optional[List[Any]]:
+    """在进程池中按批次执行 func，结果按提交顺序拼接；进程池不可用时返回 None"""
+    workers = get_render_workers()
+    logging.info(f"🧵 使用 {workers} 个进程并行处理 {total} 个帖子...")
+    results: List[Any] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # executor.map 按提交顺序返回结果，保证输出顺序与输入一致
+            for batch_result in executor.map(func, jobs):
+                results.extend(batch_result)
+    except (BrokenProcessPool, OSError) as e:
+        logging.warning(f"⚠️ 并行处理不可用，改为单进程执行：{e}")
+        return None
+    return results
+
+
+def should_use_process_pool(item_count: int) -> bool:
+    return item_count >= PARALLEL_RENDER_THRESHOLD and get_render_workers() > 1
+
+
+def split_batches(items: List[Any]) -> List[List[Any]]:
+    return [
+        items[index : index + RENDER_BATCH_SIZE]
+        for index in range(0, len(items), RENDER_BATCH_SIZE)
+    ]
+
+
+def render_post_files(
+    posts: List[PostLike],
+    media_folder_name: str,
+    media_file_map: Dict[str, str],
+    china_timezone: bool = False,
+    cache: Optional[RenderCache] = None,
+    layout: str = FLAT_LAYOUT,
+) -> List[Tuple[str, str]]:
+    """批量渲染单帖 Markdown，返回与输入顺序一致的 (文件名, 内容) 列表"""
+    posts = as_statuses(posts)
+    rendered: List[Optional[Tuple[str, str]]] = [None] * len(posts)
+    fingerprints: List[str] = []
+    pending_indexes = list(range(len(posts)))
+    if cache is not None:
+        pending_indexes = []
+        for index, post in enumerate(posts):
+            post_fingerprint = fingerprint(
+                select_fields(post, SINGLE_FILE_FIELDS),
+                media_folder_name,
+                _slice_media_file_map([post], media_file_map),
+                china_timezone,
+                layout,
+            )
+            fingerprints.append(post_fingerprint)
+            cached = cache.get(SINGLE_FILE, post.id, post_fingerprint)
+            if cached is None:
+                pending_indexes.append(index)
+            else:
+                rendered[index] = tuple(cached)
+
+    pending_posts = [posts[index] for index in pending_indexes]
+    for index, result in zip(
+        pending_indexes,
+        _render_uncached_posts(
+            pending_posts, media_folder_name, media_file_map, china_timezone, layout
+        ),
+    ):
+        rendered[index] = result
+        if cache is not None:
+            cache.put(SINGLE_FILE, posts[index].id, fingerprints[index], result)
+    return rendered
+
+
+def _render_uncached_posts(
+    posts: List[Status],
+    media_folder_name: str,
+    media_file_map: Dict[str, str],
+    china_timezone: bool,
+    layout: str,
+) -> List[Tuple[str, str]]:
+    if should_use_process_pool(len(posts)):
+        render_batch = partial(
+            _render_batch_with_map,
+            media_folder_name=media_folder_name,
+            china_timezone=china_timezone,
+            layout=layout,
+        )
+        jobs = [
+            (batch, _slice_media_file_map(batch, media_file_map))
+            for batch in split_batches(posts)
+        ]
+        rendered = map_in_process_pool(render_batch, jobs, len(posts))
+        if rendered is not None:
+            return rendered
+
+    return _render_post_batch(
+        posts, media_folder_name, media_file_map, china_timezone, layout
+    )
@@ -5,14 +5,74 @@ import json
 import logging
 import re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
 
-from ..utils import get_timezone_aware_datetime
+from ..cassette import http_get
+from ..layout import FLAT_LAYOUT, get_layout, get_media_relative_path
+from ..models import PostLike, Status, as_status
+from ..utils import (
+    get_timezone_aware_datetime,
+    write_bytes_if_changed,
+    write_text_if_changed,
+)
+from .assets import (
+    build_page_assets,
+    has_precompressed,
+    remove_page_assets,
+    remove_precompressed,
+    write_precompressed,
+)
+from .cache import HTML_RECORD, fingerprint, get_render_cache, select_fields
+from .offline import (
+    SERVICE_WORKER_REGISTRATION,
+    retire_service_worker,
+    write_service_worker,
+)
+from .site import SITE_STYLESHEET_PATH, generate_static_site
 
 REMOTE_ASSET_TIMEOUT = 10
+CHINA_UTC_OFFSET_MINUTES = 8 * 60
+
+# 网页内嵌数据的格式版本和字段缩写。账户表和媒体目录前缀只存一次，
+# 等于默认值的字段省略，时间存为 UTC 秒级时间戳，由 script.js 按需解码：
+# i=id t=时间戳 c=内容 a=账户序号 u=原文链接（与「账户主页/id」相同时省略）
+# m=媒体 g=标签 s=敏感 w=内容警告 v=可见性 rb/fv/rp=转嘟/喜欢/回复数
+# r/ra=回复的帖子 ID/账户 ID；媒体中 p=相对媒体目录的路径 u=完整地址 y=类型 d=描述
+# 引用关系在生成时解析：rx/qx=回复/引用卡片对应帖子在 posts 中的下标 q=内容含引用链接，
+# posts 已按时间倒序排列，网页端不再排序，也不再解析 HTML 查找引用
+POSTS_PAYLOAD_VERSION = 2
+_PAYLOAD_ACCOUNT_FIELDS = ("username", "display_name", "url", "avatar")
+# 网页记录读取的帖子字段（含互动数），账户只取 _PAYLOAD_ACCOUNT_FIELDS
+_HTML_RECORD_FIELDS = (
+    "id",
+    "created_at",
+    "url",
+    "visibility",
+    "content",
+    "spoiler_text",
+    "sensitive",
+    "tags",
+    "emojis",
+    "media_attachments",
+    "in_reply_to_id",
+    "in_reply_to_account_id",
+    "reblogs_count",
+    "favourites_count",
+    "replies_count",
+)
+_PAYLOAD_OPTIONAL_FIELDS = (
+    ("s", "sensitive", False),
+    ("w", "spoiler_text", ""),
+    ("v", "visibility", "public"),
+    ("rb", "reblogs_count", 0),
+    ("fv", "favourites_count", 0),
+    ("rp", "replies_count", 0),
+    ("r", "in_reply_to_id", None),
+    ("ra", "in_reply_to_account_id", None),
+)
 
 
 def load_css_styles() -> str:
@@ -69,15 +129,145 @@ def _strip_html_tags(value: str) -> str:
     return re.sub(r"<[^<]+?>", "", value).strip()
 
 
+# 与 Mastodon 引用格式「RE: 原帖链接」对应
+_REFERENCE_HREF_PATTERN = re.compile(r'href="(https?://[^"]+/@[^"]+/\d+)"', re.I)
+_REFERENCE_TEXT_PATTERN = re.compile(r'https?://[^\s<"]+/@[^\s<"]+/\d+', re.I)
+_REFERENCE_LINE_PATTERN = re.compile(r"^RE:\s*https?://\S+/@\S+/\d+$", re.I)
+_PARAGRAPH_PATTERN = re.compile(r"<p\b[^>]*>(.*?)</p>", re.I | re.S)
+
+
+def extract_reference_url(content: str) -> str:
+    """提取帖子内容中「RE:」引用的原帖链接，没有时返回空字符串"""
+    if not content or "re:" not in content.lower():
+        return ""
+    match = _REFERENCE_HREF_PATTERN.search(content)
+    if match:
+        return match.group(1)
+    match = _REFERENCE_TEXT_PATTERN.search(content)
+    return match.group(0) if match else ""
+
+
+def remove_reference_line(content: str) -> str:
+    """删除只包含「RE: 链接」的段落，已经渲染引用卡片时不再重复显示"""
+
+    def replace(match: re.Match) -> str:
+        text = html.unescape(_strip_html_tags(match.group(1)))
+        return "" if _REFERENCE_LINE_PATTERN.match(text) else match.group(0)
+
+    return _PARAGRAPH_PATTERN.sub(replace, content)
+
+
+def _normalize_url(url: str) -> str:
+    return str(url or "").rstrip("/")
+
+
 def _escape_text(value: Any) -> str:
     return html.escape(str(value), quote=True)
 
 
-def _serialize_posts_json(posts_data: List[Dict[str, Any]]) -> str:
-    return json.dumps(posts_data, ensure_ascii=False).replace("</", "<\\/")
+def _serialize_posts_json(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).replace(
+        "</", "<\\/"
+    )
+
+
+def _compact_media(media: Dict[str, Any], media_prefix: str) -> Dict[str, Any]:
+    url = media.get("url", "")
+    item = {}
+    if media_prefix and url.startswith(media_prefix):
+        item["p"] = url[len(media_prefix) :]
+    else:
+        item["u"] = url
+    if media.get("type", "image") != "image":
+        item["y"] = media["type"]
+    if media.get("description"):
+        item["d"] = media["description"]
+    return item
+
+
+def build_posts_payload(
+    posts_data: List[Dict[str, Any]], media_folder: str, utc_offset_minutes: int = 0
+) -> Dict[str, Any]:
+    """把网页帖子记录压缩为归一化的内嵌数据，字段含义见 POSTS_PAYLOAD_VERSION 处的说明"""
+    media_prefix = f"{media_folder}/" if media_folder else ""
+    accounts: List[Dict[str, Any]] = []
+    account_indexes: Dict[Tuple[Any, ...], int] = {}
+    records = []
+    for post in posts_data:
+        account = post.get("account") or {}
+        account_entry = {
+            field: account.get(field, "") for field in _PAYLOAD_ACCOUNT_FIELDS
+        }
+        account_key = tuple(account_entry.values())
+        account_index = account_indexes.get(account_key)
+        if account_index is None:
+            account_index = account_indexes[account_key] = len(accounts)
+            accounts.append(account_entry)
+
+        record = {
+            "i": post["id"],
+            "t": int(get_timezone_aware_datetime(post["timestamp"]).timestamp()),
+            "c": post.get("content", ""),
+        }
+        if account_index:
+            record["a"] = account_index
+        url = post.get("url", "")
+        if url != f"{account_entry['url']}/{post['id']}":
+            record["u"] = url
+        for key, field, default in _PAYLOAD_OPTIONAL_FIELDS:
+            value = post.get(field, default)
+            if value != default:
+                record[key] = value
+        if post.get("media_attachments"):
+            record["m"] = [
+                _compact_media(media, media_prefix)
+                for media in post["media_attachments"]
+            ]
+        if post.get("tags"):
+            record["g"] = [tag["name"] for tag in post["tags"]]
+        records.append((record, post))
+
+    # 按时间倒序排列，同一秒内按 ID 倒序，保证网页端可以直接使用
+    records.sort(
+        key=lambda item: (item[0]["t"], len(item[0]["i"]), item[0]["i"]), reverse=True
+    )
+    _link_references(records)
+
+    return {
+        "version": POSTS_PAYLOAD_VERSION,
+        "accounts": accounts,
+        "media_prefix": media_prefix,
+        "utc_offset": utc_offset_minutes,
+        "posts": [record for record, _ in records],
+    }
+
+
+def _link_references(records: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+    """一次性解析回复和引用关系，把卡片对应的帖子下标写入记录"""
+    index_by_id = {}
+    index_by_url = {}
+    for index, (record, post) in enumerate(records):
+        index_by_id[str(record["i"])] = index
+        index_by_url[_normalize_url(post.get("url", ""))] = index
+
+    for index, (record, post) in enumerate(records):
+        content = post.get("content", "")
+        reference_url = extract_reference_url(content)
+        if reference_url:
+            record["q"] = 1
+
+        reply_index = index_by_id.get(str(record.get("r")))
+        quote_index = index_by_url.get(_normalize_url(reference_url))
+        if record.get("r") is not None and reply_index not in (None, index):
+            record["rx"] = reply_index
+        elif reference_url and quote_index not in (None, index):
+            record["qx"] = quote_index
+        else:
+            continue
+        record["c"] = remove_reference_line(content)
 
 
-def validate_post_data(post_data: Dict[str, Any]) -> bool:
+def validate_post_data(post_data: PostLike) -> bool:
     """
     验证帖子数据的安全性
     """
@@ -115,52 +305,159 @@ def validate_post_data(post_data: Dict[str, Any]) -> bool:
         return False
 
 
+def _build_html_post_record(
+    post: Status,
+    media_folder: str,
+    china_timezone: bool,
+    user_id: Any,
+    layout: str = FLAT_LAYOUT,
+    offline: bool = False,
+) -> Tuple[Dict[str, Any], bool]:
+    """转换单条帖子为网页数据；emoji 下载失败或离线时引用远程地址，结果不可缓存"""
+    cacheable = True
+    # 处理媒体附件
+    media_items = []
+    for media in post.media_attachments:
+        media_filename = get_media_relative_path(
+            f"{media.id}-{Path(urlparse(media.url).path).name}", layout
+        )
+        media_items.append(
+            {
+                "id": media.id,
+                "type": media.type,
+                "url": f"{media_folder}/{media_filename}",
+                "description": media.description,
+                "preview_url": media.preview_url,
+            }
+        )
+
+    # 处理内容 HTML 和表情符号
+    content_html = post.content
+
+    # 处理 Mastodon 表情符号 - 转换为 base64 嵌入
+    for emoji in post.emojis:
+        shortcode = emoji.shortcode
+        static_url = emoji.static_url
+        if shortcode and static_url and offline:
+            cacheable = False
+            emoji_img_tag = f'<img src="{static_url}" alt=":{shortcode}:" class="custom-emoji" title=":{shortcode}:" loading="lazy">'
+            content_html = content_html.replace(f":{shortcode}:", emoji_img_tag)
+        elif shortcode and static_url:
+            # 下载 emoji 图片并转换为 base64
+            try:
+                emoji_response = http_get(static_url, timeout=REMOTE_ASSET_TIMEOUT)
+                if emoji_response.status_code == 200:
+                    emoji_base64 = base64.b64encode(emoji_response.content).decode(
+                        "utf-8"
+                    )
+                    # 检测图片类型
+                    content_type = emoji_response.headers.get(
+                        "Content-Type", "image/png"
+                    )
+                    # 生成 data URI
+                    data_uri = f"data:{content_type};base64,{emoji_base64}"
+                    # 替换 emoji
+                    emoji_pattern = f":{shortcode}:"
+                    emoji_img_tag = f'<img src="{data_uri}" alt=":{shortcode}:" class="custom-emoji" title=":{shortcode}:" loading="lazy">'
+                    content_html = content_html.replace(emoji_pattern, emoji_img_tag)
+                else:
+                    cacheable = False
+            except (requests.RequestException, OSError, ValueError) as e:
+                logging.warning(f"⚠️ 下载 emoji 失败 {shortcode}: {e}")
+                cacheable = False
+                # 失败时使用远程 URL
+                emoji_pattern = f":{shortcode}:"
+                emoji_img_tag = f'<img src="{static_url}" alt=":{shortcode}:" class="custom-emoji" title=":{shortcode}:" loading="lazy">'
+                content_html = content_html.replace(emoji_pattern, emoji_img_tag)
+
+    # 处理时间
+    created_at = post.created_at
+    local_time = get_timezone_aware_datetime(created_at, china_timezone)
+
+    post_data = {
+        "id": post.id,
+        "content": content_html,
+        "created_at": local_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": created_at,  # 使用原始 ISO 格式时间字符串
+        "url": post.url,
+        "sensitive": post.sensitive,
+        "spoiler_text": post.spoiler_text,
+        "visibility": post.visibility,
+        "media_attachments": media_items,
+        "reblogs_count": post.reblogs_count,
+        "favourites_count": post.favourites_count,
+        "replies_count": post.replies_count,
+        "in_reply_to_id": post.in_reply_to_id,
+        "in_reply_to_account_id": post.in_reply_to_account_id,
+        "account": {
+            "id": user_id,
+            "username": post.account.username,
+            "display_name": post.account.display_name,
+            "url": post.account.url,
+            "avatar": post.account.avatar,
+        },
+        "tags": [{"name": tag.name} for tag in post.tags],
+    }
+    return post_data, cacheable
+
+
 def generate_mastodon_html(
-    posts: List[Dict[str, Any]], config: Dict[str, Any], backup_path: Path
+    posts: List[PostLike], config: Dict[str, Any], backup_path: Path
 ) -> None:
-    """生成单文件 HTML 网页，复刻 Mastodon 界面"""
+    """生成单文件 HTML 网页，复刻 Mastodon 界面；config["offline"] 为真时不访问网络"""
     backup_config = config["backup"]
     html_filename = backup_config.get("html_filename", "index.html")
     html_filepath = backup_path / html_filename
     media_folder = backup_config["media_folder"]
+    layout = get_layout(backup_config)
+    offline = config.get("offline", False)
 
     logging.info("正在生成 Mastodon HTML 网页...")
 
     # 提取用户信息
     if posts:
-        user = posts[0]["account"]
-        username = user["username"]
-        display_name = user.get("display_name", username)
-        avatar = user["avatar"]
-        user_id = user["id"]
+        user = as_status(posts[0]).account
+        username = user.username
+        display_name = user.display_name
+        avatar = user.avatar
+        user_id = user.id
         # 从 URL 中提取实例名称
-        user_url = user["url"]
+        user_url = user.url
         account_url = user_url
         instance_name = (
             user_url.split("//")[1].split("/")[0] if "//" in user_url else ""
         )
         # 获取用户简介
-        user_bio = user.get("note", "")  # note 字段包含用户的简介
+        user_bio = user.note  # note 字段包含用户的简介
         # 保存用户信息到配置中，供热力图使用
         config["username"] = username
         config["instance"] = instance_name
         # 获取用户背景图片
-        header = user.get("header", "")
-        if header:
-            header_filename = f"header-{user_id}.jpg"
+        header = user.header
+        if header and offline:
+            # 离线重建时沿用已下载的背景图
+            header_filename = get_media_relative_path(f"header-{user_id}.jpg", layout)
+            background_image = (
+                f"{media_folder}/{header_filename}"
+                if (backup_path / media_folder / header_filename).exists()
+                else ""
+            )
+        elif header:
+            header_filename = get_media_relative_path(f"header-{user_id}.jpg", layout)
             local_header_path = f"{media_folder}/{header_filename}"
 
             # 下载背景图片
             try:
-                header_response = requests.get(
+                header_response = http_get(
                     header, stream=True, timeout=REMOTE_ASSET_TIMEOUT
                 )
                 if header_response.status_code == 200:
                     header_path = backup_path / media_folder / header_filename
-                    header_path.parent.mkdir(exist_ok=True)
-                    with open(header_path, "wb") as f:
-                        for chunk in header_response.iter_content(1024):
-                            f.write(chunk)
+                    write_bytes_if_changed(
+                        header_path,
+                        b"".join(header_response.iter_content(1024)),
+                        config.get("change_tracker"),
+                    )
                     background_image = local_header_path
                 else:
                     background_image = ""
@@ -181,101 +478,56 @@ def generate_mastodon_html(
 
     # 提取统计数据
     total_posts = len(posts)
-    followers_count = posts[0]["account"]["followers_count"] if posts else 0
-    following_count = posts[0]["account"]["following_count"] if posts else 0
+    followers_count = user.followers_count if posts else 0
+    following_count = user.following_count if posts else 0
 
-    # 转换帖子数据为 JSON
+    # 转换帖子数据为 JSON，未变化的帖子直接复用渲染缓存
+    render_cache = get_render_cache(config, backup_path)
+    china_timezone = config["sync"]["china_timezone"]
     posts_data = []
     for post in posts:
         # 验证帖子数据安全性
         if not validate_post_data(post):
             logging.warning(f"跳过无效的帖子数据，ID: {post.get('id', 'unknown')}")
             continue
-        # 处理媒体附件
-        media_items = []
-        for media in post.get("media_attachments", []):
-            media_filename = f"{media['id']}-{Path(urlparse(media['url']).path).name}"
-            media_items.append(
-                {
-                    "id": media["id"],
-                    "type": media["type"],
-                    "url": f"{media_folder}/{media_filename}",
-                    "description": media.get("description", ""),
-                    "preview_url": media.get("preview_url", ""),
-                }
+        post = as_status(post)
+        record_fingerprint = fingerprint(
+            select_fields(post, _HTML_RECORD_FIELDS),
+            select_fields(post.account, _PAYLOAD_ACCOUNT_FIELDS),
+            media_folder,
+            china_timezone,
+            user_id,
+            layout,
+        )
+        post_data = render_cache.get(HTML_RECORD, post.id, record_fingerprint)
+        if post_data is None:
+            post_data, cacheable = _build_html_post_record(
+                post, media_folder, china_timezone, user_id, layout, offline
             )
+            if cacheable:
+                render_cache.put(HTML_RECORD, post.id, record_fingerprint, post_data)
+        posts_data.append(post_data)
+    render_cache.save()
+    posts_payload = build_posts_payload(
+        posts_data,
+        media_folder,
+        CHINA_UTC_OFFSET_MINUTES if china_timezone else 0,
+    )
 
-        # 处理内容 HTML 和表情符号
-        content_html = post.get("content", "")
-
-        # 处理 Mastodon 表情符号 - 转换为 base64 嵌入
-        emojis = post.get("emojis", [])
-        for emoji in emojis:
-            shortcode = emoji.get("shortcode", "")
-            url = emoji.get("url", "")
-            static_url = emoji.get("static_url", url)
-            if shortcode and static_url:
-                # 下载 emoji 图片并转换为 base64
-                try:
-                    emoji_response = requests.get(
-                        static_url, timeout=REMOTE_ASSET_TIMEOUT
-                    )
-                    if emoji_response.status_code == 200:
-                        emoji_base64 = base64.b64encode(emoji_response.content).decode(
-                            "utf-8"
-                        )
-                        # 检测图片类型
-                        content_type = emoji_response.headers.get(
-                            "Content-Type", "image/png"
-                        )
-                        # 生成 data URI
-                        data_uri = f"data:{content_type};base64,{emoji_base64}"
-                        # 替换 emoji
-                        emoji_pattern = f":{shortcode}:"
-                        emoji_img_tag = f'<img src="{data_uri}" alt=":{shortcode}:" class="custom-emoji" title=":{shortcode}:" loading="lazy">'
-                        content_html = content_html.replace(
-                            emoji_pattern, emoji_img_tag
-                        )
-                except (requests.RequestException, OSError, ValueError) as e:
-                    logging.warning(f"⚠️ 下载 emoji 失败 {shortcode}: {e}")
-                    # 失败时使用远程 URL
-                    emoji_pattern = f":{shortcode}:"
-                    emoji_img_tag = f'<img src="{static_url}" alt=":{shortcode}:" class="custom-emoji" title=":{shortcode}:" loading="lazy">'
-                    content_html = content_html.replace(emoji_pattern, emoji_img_tag)
-
-        # 处理时间
-        created_at = post["created_at"]
-        local_time = get_timezone_aware_datetime(
-            created_at, config["sync"]["china_timezone"]
+    # 开启资源优化时，CSS/JS 压缩后按内容哈希写成外部文件，数据变化不影响它们的缓存
+    optimize_assets = backup_config.get("optimize_assets", False)
+    asset_urls = (
+        build_page_assets(
+            backup_path,
+            load_css_styles(),
+            load_javascript(),
+            config.get("change_tracker"),
         )
+        if optimize_assets
+        else None
+    )
 
-        post_data = {
-            "id": post["id"],
-            "content": content_html,
-            "created_at": local_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "timestamp": created_at,  # 使用原始 ISO 格式时间字符串
-            "url": post["url"],
-            "sensitive": post.get("sensitive", False),
-            "spoiler_text": post.get("spoiler_text", ""),
-            "visibility": post.get("visibility", "public"),
-            "media_attachments": media_items,
-            "reblogs_count": post.get("reblogs_count", 0),
-            "favourites_count": post.get("favourites_count", 0),
-            "replies_count": post.get("replies_count", 0),
-            "in_reply_to_id": post.get("in_reply_to_id", None),
-            "in_reply_to_account_id": post.get("in_reply_to_account_id", None),
-            "account": {
-                "id": user_id,
-                "username": post["account"]["username"],
-                "display_name": post["account"].get(
-                    "display_name", post["account"]["username"]
-                ),
-                "url": post["account"]["url"],
-                "avatar": post["account"]["avatar"],
-            },
-            "tags": [{"name": tag["name"]} for tag in post.get("tags", [])],
-        }
-        posts_data.append(post_data)
+    service_worker = backup_config.get("service_worker", False)
 
     # 生成 HTML 内容
     html_content = generate_html_template(
@@ -290,11 +542,52 @@ def generate_mastodon_html(
         following_count=following_count,
         posts_data=posts_data,
         user_bio=user_bio,
+        media_folder=media_folder,
+        posts_payload=posts_payload,
+        asset_urls=asset_urls,
+        service_worker=service_worker,
     )
 
-    # 写入 HTML 文件
-    with open(html_filepath, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    # 写入 HTML 文件（内容未变化时不改动文件）
+    tracker = config.get("change_tracker")
+    html_changed = write_text_if_changed(html_filepath, html_content, tracker)
+    if not optimize_assets:
+        # 关闭资源优化后删除之前生成的副本和外部资源，服务器不会返回过期的 .gz/.br
+        remove_precompressed(html_filepath, tracker)
+        remove_page_assets(backup_path, tracker)
+    elif html_changed or not has_precompressed(html_filepath):
+        write_precompressed(html_filepath, html_content.encode("utf-8"), tracker)
+
+    if backup_config.get("static_site"):
+        profile = {
+            "username": username,
+            "display_name": display_name,
+            "avatar": avatar,
+            "instance_name": instance_name,
+            "background_image": background_image,
+            "account_url": account_url,
+            "total_posts": total_posts,
+            "followers_count": followers_count,
+            "following_count": following_count,
+        }
+        generate_static_site(
+            posts_payload, profile, config, backup_path, load_css_styles()
+        )
+
+    if service_worker:
+        # 页面外壳进入预缓存；媒体由 sw.js 在浏览时按需缓存
+        precache_urls = [html_filename, *(asset_urls or {}).values()]
+        if background_image:
+            precache_urls.append(background_image)
+        if backup_config.get("static_site"):
+            site_folder = backup_config.get("site_folder") or "site"
+            precache_urls += [
+                f"{site_folder}/index.html",
+                f"{site_folder}/{SITE_STYLESHEET_PATH}",
+            ]
+        write_service_worker(backup_path, precache_urls, media_folder, tracker)
+    else:
+        retire_service_worker(backup_path, tracker)
 
     logging.info(f"HTML 网页已生成至：{html_filepath}")
     logging.info(f"包含 {total_posts} 条嘟文")
@@ -430,17 +723,44 @@ def generate_html_template(
     following_count: int,
     posts_data: List[Dict[str, Any]],
     user_bio: str,
+    media_folder: str = "media",
+    utc_offset_minutes: int = 0,
+    posts_payload: Optional[Dict[str, Any]] = None,
+    asset_urls: Optional[Dict[str, str]] = None,
+    service_worker: bool = False,
 ) -> str:
-    """生成完整的 HTML 页面"""
-    posts_json = _serialize_posts_json(posts_data)
+    """
+    生成完整的 HTML 页面；posts_payload 已由调用方构建时直接使用。
+    asset_urls 给出外部 CSS/JS 地址时引用外部文件，否则内联样式和脚本；
+    service_worker 为真时注册离线缓存。
+    """
+    if posts_payload is None:
+        posts_payload = build_posts_payload(
+            posts_data, media_folder, utc_offset_minutes
+        )
+    posts_json = _serialize_posts_json(posts_payload)
     clean_bio = _escape_text(_strip_html_tags(user_bio)[:160])
     escaped_username = _escape_text(username)
     escaped_instance_name = _escape_text(instance_name)
     escaped_avatar = _escape_text(avatar)
 
     # 提取的资源
-    css_content = load_css_styles()
-    js_content = load_javascript()
+    payload_script = 'const postsPayload = JSON.parse(document.getElementById("posts-data").textContent);'
+    if asset_urls:
+        styles_html = (
+            f'<link rel="stylesheet" href="{_escape_text(asset_urls["css"])}">'
+        )
+        scripts_html = f"""<script>{payload_script}</script>
+    <script src="{_escape_text(asset_urls["js"])}"></script>"""
+    else:
+        styles_html = f"""<style>
+{load_css_styles()}
+    </style>"""
+        scripts_html = f"""<script>
+        {payload_script}
+
+{load_javascript()}
+    </script>"""
 
     # 生成 HTML body（包含用户数据）
     html_body = get_html_body_template(
@@ -455,6 +775,8 @@ def generate_html_template(
         following_count=following_count,
     )
 
+    registration_html = f"\n    {SERVICE_WORKER_REGISTRATION}" if service_worker else ""
+
     # 组装完整 HTML
     html_output = f"""<!DOCTYPE html>
 <html lang="zh-CN">
@@ -467,18 +789,12 @@ def generate_html_template(
     <meta property="og:description" content="{clean_bio}">
     <meta property="og:type" content="profile">
     <link rel="icon" type="image/png" href="{escaped_avatar}">
-    <style>
-{css_content}
-    </style>
+    {styles_html}
 </head>
 <body>
 {html_body}
     <script id="posts-data" type="application/json">{posts_json}</script>
-    <script>
-        const postsData = JSON.parse(document.getElementById("posts-data").textContent);
-
-{js_content}
-    </script>
+    {scripts_html}{registration_html}
 </body>
 </html>"""
     return html_output
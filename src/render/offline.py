@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+备份网页的 Service Worker 和预缓存清单。
+
+清单列出页面外壳（index.html、静态资源、静态站点样式和入口页、背景图）及其内容
+哈希；sw.js 中嵌入清单版本，清单变化时浏览器安装新版本并只下载哈希变化的条目。
+最近浏览的媒体由 sw.js 在运行时缓存，按条数和总字节数淘汰。
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+from ..utils import safe_remove_file, write_text_if_changed
+
+SERVICE_WORKER_FILENAME = "sw.js"
+PRECACHE_MANIFEST_FILENAME = "precache-manifest.json"
+
+# 页面通过 http(s) 访问时才注册；直接打开本地文件时浏览器不支持 Service Worker
+SERVICE_WORKER_REGISTRATION = f"""<script>
+        if ('serviceWorker' in navigator && location.protocol.startsWith('http')) {{
+            navigator.serviceWorker.register('{SERVICE_WORKER_FILENAME}');
+        }}
+    </script>"""
+
+
+# 关闭离线缓存后替换旧的 sw.js：已安装的浏览器更新到这个版本时清空 vault-* 缓存、注销自己
+# 并刷新打开的页面，之后直接从服务器读取，不会一直显示关闭前缓存的旧页面
+SERVICE_WORKER_UNREGISTER = """// 备份网页已关闭离线缓存：清除本站的 vault-* 缓存并注销 Service Worker。
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(
+            names.filter(name => name.startsWith('vault-')).map(name => caches.delete(name))
+        );
+        await self.registration.unregister();
+        const windows = await self.clients.matchAll({ type: 'window' });
+        windows.forEach(client => client.navigate(client.url));
+    })());
+});
+"""
+
+
+def load_service_worker_template() -> str:
+    template_path = Path(__file__).resolve().parent.parent / "assets" / "sw.js"
+    return template_path.read_text(encoding="utf-8")
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_precache_manifest(backup_path: Path, urls: List[str]) -> Dict[str, Any]:
+    """按备份根目录下的相对路径列出预缓存条目；不存在的文件跳过"""
+    entries = []
+    for url in dict.fromkeys(urls):
+        path = backup_path / url
+        if not path.is_file():
+            continue
+        entries.append(
+            {"url": url, "hash": _file_hash(path), "size": path.stat().st_size}
+        )
+    version = hashlib.sha256(
+        json.dumps(entries, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    return {"version": version, "entries": entries}
+
+
+def write_service_worker(
+    backup_path: Path, urls: List[str], media_folder: str, tracker: Any = None
+) -> Dict[str, Any]:
+    """写入预缓存清单和 sw.js，返回清单"""
+    manifest = build_precache_manifest(backup_path, urls)
+    write_text_if_changed(
+        backup_path / PRECACHE_MANIFEST_FILENAME,
+        json.dumps(manifest, ensure_ascii=False, indent=2),
+        tracker,
+    )
+    service_worker = (
+        load_service_worker_template()
+        .replace("__PRECACHE_VERSION__", manifest["version"])
+        .replace("__PRECACHE_MANIFEST_URL__", PRECACHE_MANIFEST_FILENAME)
+        .replace("__MEDIA_PREFIX__", f"{media_folder}/")
+    )
+    write_text_if_changed(
+        backup_path / SERVICE_WORKER_FILENAME, service_worker, tracker
+    )
+    total_size = sum(entry["size"] for entry in manifest["entries"])
+    logging.info(
+        f"📴 离线缓存清单已更新：{len(manifest['entries'])} 个条目，"
+        f"共 {total_size / 1024:.1f} KB"
+    )
+    return manifest
+
+
+def retire_service_worker(backup_path: Path, tracker: Any = None) -> None:
+    """
+    关闭离线缓存时调用：之前生成过 sw.js 才把它换成自我注销的版本并删除预缓存清单。
+    sw.js 不能直接删除，浏览器更新失败时会继续使用已安装的旧版本。
+    """
+    service_worker_path = backup_path / SERVICE_WORKER_FILENAME
+    if not service_worker_path.exists():
+        return
+    if write_text_if_changed(service_worker_path, SERVICE_WORKER_UNREGISTER, tracker):
+        logging.info("📴 离线缓存已关闭，sw.js 已替换为自我注销版本")
+    manifest_path = backup_path / PRECACHE_MANIFEST_FILENAME
+    if (
+        manifest_path.exists()
+        and safe_remove_file(manifest_path)
+        and tracker is not None
+    ):
+        tracker.record_delete(manifest_path)
@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+"""
+多页静态站点：时间线分页、按年/月归档、标签页和单帖永久链接。
+
+列表分页从最早的帖子开始编号，新帖子只会进入最新一页，已有分页的内容不变。
+每个页面的输入（帖子记录、导航链接等）计算指纹记入依赖清单，指纹未变化的页面
+直接跳过渲染。所有链接都是相对路径，直接用浏览器打开本地文件即可浏览。
+"""
+import html
+import json
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..utils import (
+    atomic_write_text,
+    get_state_dir,
+    safe_remove_file,
+    write_text_if_changed,
+)
+from .assets import (
+    has_precompressed,
+    minify_css,
+    remove_precompressed,
+    write_precompressed,
+)
+from .cache import fingerprint
+
+# 页面结构变化时递增，使依赖清单整体失效
+SITE_RENDER_VERSION = 1
+SITE_MANIFEST_FILENAME = "site_manifest.json"
+SITE_POSTS_PER_PAGE = 40
+SITE_STYLESHEET_PATH = "assets/style.css"
+
+SITE_CSS = """
+/* 静态站点导航 */
+.site-nav { display: flex; gap: 1rem; align-items: center; }
+.site-nav a { color: inherit; text-decoration: none; font-weight: 600; }
+.site-title { margin: 1.5rem 0 1rem; font-size: 1.25rem; }
+.site-pagination { display: flex; justify-content: space-between; margin: 1.5rem 0; }
+.site-index-list { list-style: none; padding: 0; line-height: 2; }
+.site-index-list ul { list-style: none; padding-left: 1.5rem; }
+.status-links { display: flex; gap: 0.75rem; }
+"""
+
+PageRenderer = Callable[[], str]
+
+
+def _escape(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def get_tag_slug(name: str) -> str:
+    """标签页的文件夹名；大小写不同的同名标签合并到同一页"""
+    return re.sub(r"[^\w-]+", "-", name.lower()).strip("-") or "tag"
+
+
+def _relative_root(page_path: str) -> str:
+    return "../" * page_path.count("/")
+
+
+def _chunk_oldest_first(indexes: List[int]) -> List[List[int]]:
+    """indexes 按时间倒序；返回从最早帖子开始编号的分页，每页内仍按时间倒序"""
+    oldest_first = indexes[::-1]
+    return [
+        oldest_first[start : start + SITE_POSTS_PER_PAGE][::-1]
+        for start in range(0, len(oldest_first), SITE_POSTS_PER_PAGE)
+    ]
+
+
+class StaticSite:
+    """根据网页内嵌数据（build_posts_payload 的结果）规划并生成全部页面"""
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        profile: Dict[str, Any],
+        site_folder: str,
+    ):
+        self.payload = payload
+        self.records = payload["posts"]
+        self.profile = profile
+        # 站点目录到备份根目录的相对路径，媒体文件和背景图都在备份根目录下
+        self.backup_root = "../" * len(Path(site_folder).parts)
+        self.tz = timezone(timedelta(minutes=payload.get("utc_offset") or 0))
+        self.pages: Dict[str, Tuple[str, List[str], PageRenderer]] = {}
+        self.timeline_page_of: Dict[int, int] = {}
+
+    # ---- 记录解码 ----
+
+    def _account(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self.payload["accounts"][record.get("a", 0)]
+
+    def _post_url(self, record: Dict[str, Any]) -> str:
+        return record.get("u") or f"{self._account(record)['url']}/{record['i']}"
+
+    def _local_time(self, record: Dict[str, Any]) -> datetime:
+        return datetime.fromtimestamp(record["t"], self.tz)
+
+    def _referenced(self, index: int) -> List[int]:
+        record = self.records[index]
+        return [record[key] for key in ("rx", "qx") if key in record]
+
+    def _page_inputs(self, indexes: List[int]) -> List[Any]:
+        """页面中出现的帖子记录、被引用的帖子记录和账户，作为页面指纹的输入"""
+        involved = sorted(
+            {i for index in indexes for i in [index, *self._referenced(index)]}
+        )
+        return [
+            [self._stable_record(self.records[i]), self._account(self.records[i])]
+            for i in involved
+        ]
+
+    def _stable_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """rx/qx 是排序后的下标，每条新帖子都会让它们整体移动；指纹里换成被引用帖子的 ID"""
+        stable = {
+            key: value for key, value in record.items() if key not in ("rx", "qx")
+        }
+        for key in ("rx", "qx"):
+            if key in record:
+                stable[key] = self.records[record[key]]["i"]
+        return stable
+
+    # ---- 页面规划 ----
+
+    def add_page(
+        self, path: str, inputs: Any, post_ids: List[str], renderer: PageRenderer
+    ) -> None:
+        self.pages[path] = (
+            fingerprint(SITE_RENDER_VERSION, path, self.backup_root, inputs),
+            post_ids,
+            renderer,
+        )
+
+    def _add_list_pages(
+        self,
+        directory: str,
+        title: str,
+        indexes: List[int],
+        index_path: Optional[str] = None,
+        with_profile: bool = False,
+    ) -> List[List[int]]:
+        """
+        生成 directory/<n>.html 分页和入口页（默认 directory/index.html，内容同最新一页）。
+        旧分页只链接到相邻页，新帖子不会改变它们的指纹。
+        """
+        chunks = _chunk_oldest_first(indexes)
+        total = len(chunks)
+        for number, chunk in enumerate(chunks, start=1):
+            older = f"{directory}/{number - 1}.html" if number > 1 else None
+            newer = f"{directory}/{number + 1}.html" if number < total else None
+            paths = [f"{directory}/{number}.html"]
+            if number == total:
+                paths.append(index_path or f"{directory}/index.html")
+            for path in paths:
+                profile = with_profile and path == index_path
+                self.add_page(
+                    path,
+                    [
+                        title,
+                        older,
+                        newer,
+                        profile and self.profile,
+                        self._page_inputs(chunk),
+                    ],
+                    [self.records[i]["i"] for i in chunk],
+                    self._list_renderer(path, title, chunk, older, newer, profile),
+                )
+        return chunks
+
+    def plan(self) -> None:
+        all_indexes = list(range(len(self.records)))
+        by_month: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        by_tag: Dict[str, List[int]] = defaultdict(list)
+        tag_names: Dict[str, str] = {}
+        for index, record in enumerate(self.records):
+            local_time = self._local_time(record)
+            by_month[(f"{local_time:%Y}", f"{local_time:%m}")].append(index)
+            for name in record.get("g", []):
+                slug = get_tag_slug(name)
+                if not by_tag[slug] or by_tag[slug][-1] != index:
+                    by_tag[slug].append(index)
+                tag_names.setdefault(slug, name)
+
+        if not self.records:
+            self.add_page(
+                "index.html",
+                [self.profile],
+                [],
+                self._list_renderer("index.html", "时间线", [], None, None, True),
+            )
+        chunks = self._add_list_pages(
+            "page", "时间线", all_indexes, index_path="index.html", with_profile=True
+        )
+        for number, chunk in enumerate(chunks, start=1):
+            for index in chunk:
+                self.timeline_page_of[index] = number
+
+        by_year: Dict[str, List[int]] = defaultdict(list)
+        for (year, month), indexes in by_month.items():
+            by_year[year].extend(indexes)
+            self._add_list_pages(
+                f"archive/{year}/{month}", f"{year} 年 {month} 月", indexes
+            )
+        for year, indexes in by_year.items():
+            self._add_list_pages(f"archive/{year}", f"{year} 年", sorted(indexes))
+        for slug, indexes in by_tag.items():
+            self._add_list_pages(f"tags/{slug}", f"#{tag_names[slug]}", indexes)
+
+        months = sorted(
+            (
+                (year, month, len(indexes))
+                for (year, month), indexes in by_month.items()
+            ),
+            reverse=True,
+        )
+        self.add_page(
+            "archive/index.html", months, [], lambda: self._archive_index(months)
+        )
+        tags = sorted(
+            ((slug, tag_names[slug], len(indexes)) for slug, indexes in by_tag.items()),
+            key=lambda item: (-item[2], item[0]),
+        )
+        self.add_page("tags/index.html", tags, [], lambda: self._tags_index(tags))
+
+        for index, record in enumerate(self.records):
+            path = f"posts/{record['i']}.html"
+            month = f"{self._local_time(record):%Y/%m}"
+            timeline_page = self.timeline_page_of[index]
+            self.add_page(
+                path,
+                [month, timeline_page, self._page_inputs([index])],
+                [record["i"]],
+                self._post_renderer(path, index, month, timeline_page),
+            )
+
+    # ---- 页面渲染 ----
+
+    def _shell(self, path: str, title: str, body: str) -> str:
+        root = _relative_root(path)
+        username = _escape(self.profile.get("username", ""))
+        return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{_escape(title)} - @{username}的 Mastodon 备份</title>
+    <link rel="stylesheet" href="{root}{SITE_STYLESHEET_PATH}">
+</head>
+<body>
+<header class="header">
+    <div class="header-content">
+        <nav class="site-nav">
+            <a href="{root}index.html">@{username}</a>
+            <a href="{root}archive/index.html">归档</a>
+            <a href="{root}tags/index.html">标签</a>
+        </nav>
+    </div>
+</header>
+<main class="container">
+{body}
+</main>
+</body>
+</html>
+"""
+
+    def _profile_html(self, root: str) -> str:
+        profile = self.profile
+        display_name = _escape(profile.get("display_name", ""))
+        avatar = _escape(profile.get("avatar", ""))
+        account_url = _escape(profile.get("account_url", ""))
+        handle = _escape(
+            f"{profile.get('username', '')}@{profile.get('instance_name', '')}"
+        )
+        background = profile.get("background_image")
+        bg_style = (
+            f" style=\"background-image: url('{_escape(root + self.backup_root + background)}')\""
+            if background
+            else ""
+        )
+        stats = "".join(
+            f'<div class="stat-item"><span class="stat-number">{profile.get(key, 0)}</span>'
+            f'<span class="stat-label">{label}</span></div>'
+            for key, label in (
+                ("total_posts", "嘟文"),
+                ("following_count", "关注中"),
+                ("followers_count", "关注者"),
+            )
+        )
+        return f"""    <div class="user-profile">
+        <div class="profile-header"{bg_style}></div>
+        <div class="profile-info">
+            <img src="{avatar}" alt="{display_name}" class="user-avatar">
+            <div class="profile-text">
+                <h1 class="user-name">
+                    <a href="{account_url}" class="user-name-link" target="_blank">{display_name}</a>
+                </h1>
+                <div class="user-handle">@{handle}</div>
+            </div>
+            <div class="user-stats">{stats}</div>
+        </div>
+    </div>
+"""
+
+    def _media_html(self, record: Dict[str, Any], root: str) -> str:
+        media_items = record.get("m")
+        if not media_items:
+            return ""
+        gallery_class = {1: "single", 2: "double"}.get(len(media_items), "multiple")
+        items = []
+        for media in media_items:
+            url = media.get("u") or (
+                root + self.backup_root + self.payload["media_prefix"] + media["p"]
+            )
+            url = _escape(url)
+            media_type = media.get("y", "image")
+            if media_type == "video":
+                items.append(
+                    f'<video src="{url}" class="media-item" controls preload="metadata"></video>'
+                )
+            elif media_type == "gifv":
+                items.append(
+                    f'<video src="{url}" class="media-item" autoplay loop muted playsinline preload="metadata"></video>'
+                )
+            elif media_type == "audio":
+                items.append(
+                    f'<audio src="{url}" class="media-item" controls preload="metadata"></audio>'
+                )
+            else:
+                description = _escape(media.get("d") or "Media")
+                items.append(
+                    f'<a href="{url}"><img src="{url}" alt="{description}" class="media-item" loading="lazy"></a>'
+                )
+        return f'<div class="media-gallery {gallery_class}">{"".join(items)}</div>'
+
+    def _post_header_html(self, record: Dict[str, Any], css_prefix: str) -> str:
+        account = self._account(record)
+        local_time = self._local_time(record)
+        return f"""<div class="{css_prefix}-header">
+                <img src="{_escape(account['avatar'])}" alt="{_escape(account['display_name'])}" class="{css_prefix}-avatar">
+                <div class="{css_prefix}-meta">
+                    <span class="status-name">{_escape(account['display_name'])}</span>
+                    <span class="status-handle">@{_escape(account['username'])}</span>
+                </div>
+                <div class="{css_prefix}-time">
+                    <div class="status-full-date">{local_time:%Y-%m-%d}</div>
+                    <div class="status-time-detail">{local_time:%H:%M}</div>
+                </div>
+            </div>"""
+
+    def _reference_html(self, record: Dict[str, Any], root: str) -> str:
+        if "rx" in record:
+            label, reference = "回复内容", self.records[record["rx"]]
+        elif "qx" in record:
+            label, reference = "引用内容", self.records[record["qx"]]
+        else:
+            return ""
+        return f"""<div class="status-reference">
+            <div class="reference-label">{label}</div>
+            {self._post_header_html(reference, "reference")}
+            <div class="status-content reference-content">{reference.get('c', '')}</div>
+            {self._media_html(reference, root)}
+            <div class="reference-footer">
+                <a href="{root}posts/{_escape(reference['i'])}.html" class="status-link">查看原帖</a>
+            </div>
+        </div>"""
+
+    def _post_html(self, index: int, root: str) -> str:
+        record = self.records[index]
+        if record.get("r") is not None:
+            action_text = "查看回复"
+        elif record.get("q"):
+            action_text = "查看引用"
+        else:
+            action_text = "查看原文"
+        return f"""<article class="status" id="post-{_escape(record['i'])}">
+            {self._post_header_html(record, "status")}
+            <div class="status-content">{record.get('c', '')}</div>
+            {self._media_html(record, root)}
+            {self._reference_html(record, root)}
+            <div class="status-footer">
+                <div class="status-stats">
+                    <span class="stat-item">回复 {record.get('rp', 0)}</span>
+                    <span class="stat-item">转嘟 {record.get('rb', 0)}</span>
+                    <span class="stat-item">喜欢 {record.get('fv', 0)}</span>
+                </div>
+                <div class="status-links">
+                    <a href="{root}posts/{_escape(record['i'])}.html" class="status-link">永久链接</a>
+                    <a href="{_escape(self._post_url(record))}" class="status-link" target="_blank">{action_text}</a>
+                </div>
+            </div>
+        </article>"""
+
+    def _list_renderer(
+        self,
+        path: str,
+        title: str,
+        chunk: List[int],
+        older: Optional[str],
+        newer: Optional[str],
+        with_profile: bool,
+    ) -> PageRenderer:
+        def render() -> str:
+            root = _relative_root(path)
+            parts = [self._profile_html(root)] if with_profile else []
+            parts.append(f'    <h2 class="site-title">{_escape(title)}</h2>')
+            parts.append('    <div class="timeline">')
+            parts.extend(self._post_html(index, root) for index in chunk)
+            parts.append("    </div>")
+            if not chunk:
+                parts.append('    <div class="no-results"><p>还没有嘟文</p></div>')
+            newer_link = (
+                f'<a class="pagination-btn" href="{root}{newer}">较新</a>'
+                if newer
+                else "<span></span>"
+            )
+            older_link = (
+                f'<a class="pagination-btn" href="{root}{older}">较早</a>'
+                if older
+                else "<span></span>"
+            )
+            parts.append(
+                f'    <nav class="site-pagination">{newer_link}{older_link}</nav>'
+            )
+            return self._shell(path, title, "\n".join(parts))
+
+        return render
+
+    def _post_renderer(
+        self, path: str, index: int, month: str, timeline_page: int
+    ) -> PageRenderer:
+        def render() -> str:
+            root = _relative_root(path)
+            record = self.records[index]
+            body = f"""    <div class="timeline">
+        {self._post_html(index, root)}
+    </div>
+    <nav class="site-pagination">
+        <a class="pagination-btn" href="{root}page/{timeline_page}.html#post-{_escape(record['i'])}">返回时间线</a>
+        <a class="pagination-btn" href="{root}archive/{month}/index.html">{month.replace('/', ' 年 ')} 月</a>
+    </nav>"""
+            return self._shell(path, f"嘟文 {record['i']}", body)
+
+        return render
+
+    def _archive_index(self, months: List[Tuple[str, str, int]]) -> str:
+        path = "archive/index.html"
+        root = _relative_root(path)
+        by_year: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for year, month, count in months:
+            by_year[year].append((month, count))
+        items = []
+        for year, year_months in by_year.items():
+            month_items = "".join(
+                f'<li><a href="{root}archive/{year}/{month}/index.html">{month} 月</a>（{count}）</li>'
+                for month, count in year_months
+            )
+            total = sum(count for _, count in year_months)
+            items.append(
+                f'<li><a href="{root}archive/{year}/index.html">{year} 年</a>（{total}）<ul>{month_items}</ul></li>'
+            )
+        body = f'    <h2 class="site-title">归档</h2>\n    <ul class="site-index-list">{"".join(items)}</ul>'
+        return self._shell(path, "归档", body)
+
+    def _tags_index(self, tags: List[Tuple[str, str, int]]) -> str:
+        path = "tags/index.html"
+        root = _relative_root(path)
+        items = "".join(
+            f'<li><a href="{root}tags/{_escape(slug)}/index.html">#{_escape(name)}</a>（{count}）</li>'
+            for slug, name, count in tags
+        )
+        body = f'    <h2 class="site-title">标签</h2>\n    <ul class="site-index-list">{items}</ul>'
+        return self._shell(path, "标签", body)
+
+
+def _load_site_manifest(
+    manifest_path: Path, site_folder: str
+) -> Tuple[Dict[str, Any], bool]:
+    """返回 (上次生成的页面, 上次是否写了预压缩副本)；旧清单没有记录时按写过处理"""
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}, False
+    if not isinstance(manifest, dict) or manifest.get("site_folder") != site_folder:
+        return {}, False
+    pages = manifest.get("pages")
+    return (
+        pages if isinstance(pages, dict) else {},
+        manifest.get("precompressed", True),
+    )
+
+
+def generate_static_site(
+    payload: Dict[str, Any],
+    profile: Dict[str, Any],
+    config: Dict[str, Any],
+    backup_path: Path,
+    stylesheet: str,
+) -> Dict[str, int]:
+    """
+    生成多页静态站点。依赖清单记录每个页面的输入指纹，只重新生成指纹变化或文件缺失
+    的页面，并删除不再需要的页面。返回 rendered/skipped/removed 页面数。
+    """
+    site_folder = config["backup"].get("site_folder") or "site"
+    site_path = backup_path / site_folder
+    tracker = config.get("change_tracker")
+    manifest_path = get_state_dir(backup_path) / SITE_MANIFEST_FILENAME
+    previous_pages, was_precompressed = _load_site_manifest(manifest_path, site_folder)
+
+    site = StaticSite(payload, profile, site_folder)
+    site.plan()
+
+    # 开启资源优化时压缩样式表，并为样式表和页面写入 .gz/.br 预压缩副本
+    optimize_assets = config["backup"].get("optimize_assets", False)
+    stylesheet += SITE_CSS
+    if optimize_assets:
+        stylesheet = minify_css(stylesheet)
+    stylesheet_path = site_path / SITE_STYLESHEET_PATH
+    write_text_if_changed(stylesheet_path, stylesheet, tracker)
+    if optimize_assets:
+        write_precompressed(stylesheet_path, stylesheet.encode("utf-8"), tracker)
+    elif was_precompressed:
+        # 刚关闭资源优化：删除之前写的副本，服务器不会再返回过期的 .gz/.br
+        remove_precompressed(stylesheet_path, tracker)
+        for path in previous_pages:
+            remove_precompressed(site_path / path, tracker)
+
+    stats = {"rendered": 0, "skipped": 0, "removed": 0}
+    pages = {}
+    for path, (page_hash, post_ids, renderer) in site.pages.items():
+        pages[path] = {"hash": page_hash, "posts": post_ids}
+        page_file = site_path / path
+        previous = previous_pages.get(path)
+        if (
+            previous
+            and previous.get("hash") == page_hash
+            and page_file.exists()
+            and (not optimize_assets or has_precompressed(page_file))
+        ):
+            stats["skipped"] += 1
+            continue
+        content = renderer()
+        write_text_if_changed(page_file, content, tracker)
+        if optimize_assets:
+            write_precompressed(page_file, content.encode("utf-8"), tracker)
+        stats["rendered"] += 1
+
+    for path in previous_pages.keys() - pages.keys():
+        page_file = site_path / path
+        remove_precompressed(page_file, tracker)
+        if page_file.exists() and safe_remove_file(page_file):
+            if tracker is not None:
+                tracker.record_delete(page_file)
+            stats["removed"] += 1
+
+    atomic_write_text(
+        manifest_path,
+        json.dumps(
+            {
+                "version": SITE_RENDER_VERSION,
+                "site_folder": site_folder,
+                "precompressed": optimize_assets,
+                "pages": pages,
+            },
+            ensure_ascii=False,
+        ),
+    )
+    logging.info(
+        f"🗂️ 静态站点已更新：生成 {stats['rendered']} 个页面，"
+        f"跳过 {stats['skipped']} 个未变化页面，删除 {stats['removed']} 个过期页面"
+    )
+    return stats
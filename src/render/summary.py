@@ -7,7 +7,8 @@ from typing import Any, Dict
 
 import yaml
 
-from ..utils import get_color_from_count
+from ..layout import get_media_link_pattern, iter_post_files
+from ..utils import get_color_from_count, write_text_if_changed
 
 
 def generate_heatmap_svg(
@@ -16,6 +17,7 @@ def generate_heatmap_svg(
     output_path: Path,
     username: str = "",
     instance: str = "",
+    tracker: Any = None,
 ) -> None:
     logging.info(f"🎨 正在为 {year} 年生成 SVG 热力图...")
     SQUARE_SIZE, SPACING = 10, 3
@@ -86,9 +88,10 @@ def generate_heatmap_svg(
             f'<text x="{X_OFFSET + week * SQUARE_TOTAL_SIZE}" y="{Y_OFFSET - 8}" class="month-label">{month}</text>'
         )
     svg_parts.append("</svg>")
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(svg_parts))
-    logging.info(f"✅ 热力图已成功生成至 '{output_path.name}'。")
+    if write_text_if_changed(output_path, "\n".join(svg_parts), tracker):
+        logging.info(f"✅ 热力图已成功生成至 '{output_path.name}'。")
+    else:
+        logging.info(f"✅ 热力图 '{output_path.name}' 内容未变化，跳过写入。")
 
 
 def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None:
@@ -96,13 +99,17 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
     backup_config = config["backup"]
     posts_folder_path = backup_path / backup_config["posts_folder"]
     summary_filepath = backup_path / backup_config["summary_filename"]
+    tracker = config.get("change_tracker")
+    media_folder_name = backup_config["media_folder"]
+    media_link_pattern = get_media_link_pattern(media_folder_name)
 
     if not posts_folder_path.exists() or not any(posts_folder_path.iterdir()):
         logging.warning("⚠️ 未找到帖子备份文件夹或文件夹为空，无法生成总结报告。")
         return
 
+    post_files = iter_post_files(posts_folder_path)
     all_posts = []
-    for post_file in sorted(list(posts_folder_path.glob("*.md")), reverse=True):
+    for post_file in reversed(post_files):
         try:
             with open(post_file, "r", encoding="utf-8") as f:
                 content = f.read()
@@ -116,7 +123,10 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
                         frontmatter.get("date") or frontmatter.get("createdAt"),
                         "%Y-%m-%d %H:%M:%S",
                     ).date(),
-                    "content": parts[2].strip().replace("../media/", "./media/"),
+                    "content": media_link_pattern.sub(
+                        lambda match: f"./{media_folder_name}/{match.group(1)}",
+                        parts[2].strip(),
+                    ),
                     "source": frontmatter.get("source", ""),
                     "type": frontmatter.get("type", "toot"),
                 }
@@ -125,8 +135,10 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
             logging.error(f"❌ 处理文件 {post_file.name} 时出错：{e}")
 
     if not all_posts:
-        summary_filepath.write_text(
-            "# Mastodon 活动存档\n\n未找到任何帖子来生成报告。", encoding="utf-8"
+        write_text_if_changed(
+            summary_filepath,
+            "# Mastodon 活动存档\n\n未找到任何帖子来生成报告。",
+            tracker,
         )
         return
 
@@ -135,9 +147,9 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
     instance = config.get("instance", "")
 
     # 如果 config 中没有用户信息，尝试从第一个帖子的 frontmatter source URL 中提取
-    if (not username or not instance) and posts_folder_path.exists():
+    if (not username or not instance) and post_files:
         try:
-            first_post_file = sorted(list(posts_folder_path.glob("*.md")))[0]
+            first_post_file = post_files[0]
             with open(first_post_file, "r", encoding="utf-8") as f:
                 content = f.read()
             parts = content.split("---", 2)
@@ -176,8 +188,12 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
     # 获取所有年份并排序（从新到旧）
     all_years = sorted(posts_by_year.keys(), reverse=True)
 
-    today = date.today()
-    final_md = f"# Mastodon 活动存档\n\n> 最后更新：{today.strftime('%Y-%m-%d')}\n\n"
+    # 使用最新帖子的日期而不是运行当天，内容不变时报告保持不变
+    latest_post_date = max(post["datetime"] for post in all_posts)
+    final_md = (
+        "# Mastodon 活动存档\n\n"
+        f"> 最后更新：{latest_post_date.strftime('%Y-%m-%d')}\n\n"
+    )
 
     # 为每个年份生成热力图
     for year in all_years:
@@ -186,7 +202,12 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
 
         # 生成该年份的热力图
         generate_heatmap_svg(
-            posts_by_year[year], year, heatmap_svg_filepath, username, instance
+            posts_by_year[year],
+            year,
+            heatmap_svg_filepath,
+            username,
+            instance,
+            tracker,
         )
 
         # 计算该年份的总嘟文数
@@ -199,6 +220,6 @@ def generate_activity_summary(config: Dict[str, Any], backup_path: Path) -> None
             f"![{year} Activity Heatmap](./{heatmap_svg_filename})\n\n"
         )
 
-    summary_filepath.write_text(final_md, encoding="utf-8")
+    write_text_if_changed(summary_filepath, final_md, tracker)
     logging.info(f"✅ 活动总结报告已成功更新至 '{summary_filepath.name}'。")
     logging.info(f"✅ 共生成 {len(all_years)} 个年份的热力图。")
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+备份状态快照。
+
+每次同步结束时把帖子数、媒体数和总大小、最新和最早的帖子、上次运行情况以及下载失败
+的媒体写入 .vault-sync/status.json，status 命令直接读取，不必遍历备份目录（在 OneDrive、
+iCloud 等云盘目录中遍历可能很慢，甚至触发下载）。增量同步只按本次的变更清单更新计数；
+全量同步、清理或出现删除时重新扫描一次。
+"""
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .layout import get_layout, iter_media_files, iter_post_files
+from .utils import atomic_write_text, get_state_dir
+
+SNAPSHOT_FILENAME = "status.json"
+SNAPSHOT_VERSION = 1
+FAILED_MEDIA_KEEP = 100
+# 这些模式会大面积改动备份，直接重新扫描
+DEEP_SCAN_MODES = ("full", "cleanup", "import")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def load_snapshot(backup_path: Path) -> Optional[Dict[str, Any]]:
+    path = get_state_dir(backup_path) / SNAPSHOT_FILENAME
+    try:
+        snapshot = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def write_snapshot(backup_path: Path, snapshot: Dict[str, Any]) -> None:
+    atomic_write_text(
+        get_state_dir(backup_path) / SNAPSHOT_FILENAME,
+        json.dumps(snapshot, ensure_ascii=False, indent=2) + "\n",
+    )
+
+
+def _update_post_range(snapshot: Dict[str, Any], names: Iterable[str]) -> None:
+    # 帖子文件名以本地时间开头（YYYY-MM-DD_HHMMSS_id.md），按文件名比较即按时间比较
+    for name in names:
+        if snapshot["newest_post"] is None or name > snapshot["newest_post"]:
+            snapshot["newest_post"] = name
+        if snapshot["oldest_post"] is None or name < snapshot["oldest_post"]:
+            snapshot["oldest_post"] = name
+
+
+def scan_backup(config: Dict[str, Any], backup_path: Path) -> Dict[str, Any]:
+    """遍历帖子和媒体目录，重新统计全部数值"""
+    backup_config = config["backup"]
+    snapshot: Dict[str, Any] = {
+        "version": SNAPSHOT_VERSION,
+        "layout": get_layout(backup_config),
+        "scanned_at": _now(),
+        "posts": 0,
+        "media": 0,
+        "media_bytes": 0,
+        "newest_post": None,
+        "oldest_post": None,
+        "last_run": None,
+        "failed_media": [],
+    }
+    post_files = iter_post_files(backup_path / backup_config["posts_folder"])
+    snapshot["posts"] = len(post_files)
+    _update_post_range(snapshot, (path.name for path in post_files))
+    for path in iter_media_files(backup_path / backup_config["media_folder"]):
+        snapshot["media"] += 1
+        snapshot["media_bytes"] += path.stat().st_size
+    return snapshot
+
+
+def apply_changes(
+    snapshot: Dict[str, Any], config: Dict[str, Any], backup_path: Path, tracker: Any
+) -> bool:
+    """按变更清单更新计数；有删除（无法得知原大小）时返回 False，需要重新扫描"""
+    posts_prefix = f"{config['backup']['posts_folder']}/"
+    media_prefix = f"{config['backup']['media_folder']}/"
+    if any(path.startswith((posts_prefix, media_prefix)) for path in tracker.deleted):
+        return False
+    new_posts = []
+    for path in tracker.added:
+        if path.startswith(posts_prefix) and path.endswith(".md"):
+            new_posts.append(Path(path).name)
+        elif path.startswith(media_prefix):
+            try:
+                size = (backup_path / path).stat().st_size
+            except OSError:
+                return False
+            snapshot["media"] += 1
+            snapshot["media_bytes"] += size
+    snapshot["posts"] += len(new_posts)
+    _update_post_range(snapshot, new_posts)
+    return True
+
+
+def _merge_failed_media(
+    backup_path: Path,
+    media_folder: str,
+    previous: List[Dict[str, str]],
+    new: List[Dict[str, str]],
+) -> List[Dict[str, str]]:
+    """合并下载失败的媒体，去掉之后已经补下载成功的"""
+    merged = {item["path"]: item for item in previous + new}
+    return [
+        item
+        for item in merged.values()
+        if not (backup_path / media_folder / item["path"]).exists()
+    ][-FAILED_MEDIA_KEEP:]
+
+
+def update_snapshot(
+    config: Dict[str, Any],
+    backup_path: Path,
+    mode: str,
+    last_run: Optional[Dict[str, Any]] = None,
+    deep: bool = False,
+) -> Dict[str, Any]:
+    """更新并写入快照；deep 为 True 或无法增量更新时重新扫描。读写失败时抛出 OSError"""
+    backup_config = config["backup"]
+    previous = load_snapshot(backup_path)
+    tracker = config.get("change_tracker")
+    snapshot = None
+    if (
+        not deep
+        and mode not in DEEP_SCAN_MODES
+        and previous is not None
+        and tracker is not None
+        and previous.get("layout") == get_layout(backup_config)
+    ):
+        snapshot = dict(previous)
+        if not apply_changes(snapshot, config, backup_path, tracker):
+            snapshot = None
+    if snapshot is None:
+        snapshot = scan_backup(config, backup_path)
+    snapshot["updated_at"] = _now()
+    snapshot["last_run"] = last_run or (previous or {}).get("last_run")
+    snapshot["failed_media"] = _merge_failed_media(
+        backup_path,
+        backup_config["media_folder"],
+        (previous or {}).get("failed_media", []),
+        config.pop("failed_media", []),
+    )
+    write_snapshot(backup_path, snapshot)
+    return snapshot
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+帖子原始数据存储。
+
+写入帖子文件时，把渲染用到的帖子字段追加到 .vault-sync/statuses.jsonl，删除帖子时
+追加一条删除记录；rebuild 命令据此在本地重新生成全部输出，不必再访问 API。
+
+.vault-sync/status_hashes.json 记录每条帖子最近一次写入内容的哈希和文件的行数、字节数：
+增量同步重新拉取的帖子只有内容变化时才追加，过期记录明显多于有效记录时在写入路径上
+整体重写一次，文件大小与帖子数保持同一量级。读取时同一 ID 以最后一条记录为准，中断
+写入留下的半行会被跳过；文件字节数与记录不符（中断写入或被手动修改）时重新扫描一遍。
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .models import PostLike, Status, as_statuses
+from .utils import atomic_write_text, content_hash, get_state_dir, safe_remove_file
+
+STATUS_STORE_FILENAME = "statuses.jsonl"
+STATUS_STORE_INDEX_FILENAME = "status_hashes.json"
+# 过期记录超过有效记录数且超过这个下限时重写
+STATUS_STORE_COMPACT_MIN_STALE = 1000
+
+
+def get_status_store_path(backup_path: Path) -> Path:
+    return get_state_dir(backup_path) / STATUS_STORE_FILENAME
+
+
+def _get_index_path(backup_path: Path) -> Path:
+    return get_state_dir(backup_path) / STATUS_STORE_INDEX_FILENAME
+
+
+def _dump(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _read_records(path: Path) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """返回 (ID -> 最后一条有效记录, 总行数)；文件不存在时返回空结果"""
+    statuses: Dict[str, Dict[str, Any]] = {}
+    line_count = 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    record = json.loads(line)
+                    post_id = str(record["id"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if record.get("deleted"):
+                    statuses.pop(post_id, None)
+                else:
+                    statuses[post_id] = record
+    except FileNotFoundError:
+        pass
+    return statuses, line_count
+
+
+def _load_index(backup_path: Path) -> Dict[str, Any]:
+    """读取哈希索引；与数据文件对不上时按数据文件重新生成"""
+    path = get_status_store_path(backup_path)
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return {"size": 0, "lines": 0, "hashes": {}}
+    try:
+        index = json.loads(_get_index_path(backup_path).read_text(encoding="utf-8"))
+        if index["size"] == size and isinstance(index["hashes"], dict):
+            return index
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    statuses, line_count = _read_records(path)
+    return {
+        "size": size,
+        "lines": line_count,
+        "hashes": {
+            post_id: content_hash(_dump(record)) for post_id, record in statuses.items()
+        },
+    }
+
+
+def _save_index(backup_path: Path, index: Dict[str, Any]) -> None:
+    atomic_write_text(
+        _get_index_path(backup_path), json.dumps(index, separators=(",", ":"))
+    )
+
+
+def _sort_records(statuses: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(
+        statuses.values(),
+        key=lambda record: (len(str(record["id"])), str(record["id"])),
+        reverse=True,
+    )
+
+
+def _compact(backup_path: Path, ordered: List[Dict[str, Any]]) -> None:
+    """按给定顺序重写数据文件并刷新哈希索引"""
+    lines = [_dump(record) for record in ordered]
+    path = get_status_store_path(backup_path)
+    atomic_write_text(path, "".join(lines))
+    _save_index(
+        backup_path,
+        {
+            "size": path.stat().st_size,
+            "lines": len(lines),
+            "hashes": {
+                str(record["id"]): content_hash(line)
+                for record, line in zip(ordered, lines)
+            },
+        },
+    )
+
+
+def _needs_compaction(line_count: int, live_count: int) -> bool:
+    stale = line_count - live_count
+    return stale > max(live_count, STATUS_STORE_COMPACT_MIN_STALE)
+
+
+def _append_lines(
+    backup_path: Path, records: Iterable[Dict[str, Any]], deleted: bool = False
+) -> None:
+    """只追加内容有变化的记录（deleted 时只为仍存在的 ID 追加删除记录）"""
+    path = get_status_store_path(backup_path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        index = _load_index(backup_path)
+        hashes: Dict[str, str] = index["hashes"]
+        lines = []
+        for record in records:
+            post_id = str(record["id"])
+            line = _dump(record)
+            if deleted:
+                if hashes.pop(post_id, None) is None:
+                    continue
+            else:
+                line_hash = content_hash(line)
+                if hashes.get(post_id) == line_hash:
+                    continue
+                hashes[post_id] = line_hash
+            lines.append(line)
+        if not lines:
+            return
+
+        with open(path, "a+b") as f:
+            # 上次写入中断时文件可能停在半行，先补上换行，新记录不会和半行粘在一起
+            if f.tell() > 0:
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    lines.insert(0, "\n")
+            f.write("".join(lines).encode("utf-8"))
+        index["lines"] += len(lines)
+
+        if _needs_compaction(index["lines"], len(hashes)):
+            _compact(backup_path, _sort_records(_read_records(path)[0]))
+        else:
+            index["size"] = path.stat().st_size
+            _save_index(backup_path, index)
+    except OSError as e:
+        logging.warning(f"⚠️ 写入帖子原始数据失败，rebuild 可能缺少这些帖子：{e}")
+
+
+def append_statuses(backup_path: Path, posts: List[PostLike]) -> None:
+    """追加（或覆盖同 ID 的）帖子原始数据，内容没变的帖子跳过"""
+    _append_lines(backup_path, (post.to_dict() for post in as_statuses(posts)))
+
+
+def delete_statuses(backup_path: Path, post_ids: Iterable[str]) -> None:
+    _append_lines(
+        backup_path,
+        ({"id": str(post_id), "deleted": True} for post_id in post_ids),
+        deleted=True,
+    )
+
+
+def reset_status_store(backup_path: Path) -> None:
+    """全量同步会重新写入全部帖子，先清空旧数据，服务器上已删除的帖子不会残留"""
+    safe_remove_file(get_status_store_path(backup_path))
+    safe_remove_file(_get_index_path(backup_path))
+
+
+def load_statuses(backup_path: Path) -> List[Status]:
+    """读取全部帖子原始数据，按 ID 从新到旧排列（与 API 返回顺序一致）"""
+    path = get_status_store_path(backup_path)
+    try:
+        statuses, line_count = _read_records(path)
+    except OSError as e:
+        logging.warning(f"⚠️ 读取帖子原始数据失败：{e}")
+        return []
+    if not line_count:
+        return []
+
+    ordered = _sort_records(statuses)
+    if _needs_compaction(line_count, len(ordered)):
+        try:
+            _compact(backup_path, ordered)
+        except OSError as e:
+            logging.warning(f"⚠️ 整理帖子原始数据失败：{e}")
+    return as_statuses(ordered)
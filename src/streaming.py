@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Mastodon 流式 API（Server-Sent Events）客户端"""
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+
+from .models import Status, as_status
+
+STREAMING_PATH = "/api/v1/streaming/user"
+STREAM_EVENTS = ("update", "status.update", "delete")
+# 服务器约每 15 秒发送一次心跳，长时间没有任何数据说明连接已失效
+STREAM_READ_TIMEOUT_SECONDS = 90
+STREAM_RECONNECT_BASE_DELAY_SECONDS = 1
+STREAM_RECONNECT_MAX_DELAY_SECONDS = 60
+
+
+def get_reconnect_delay(attempt: int) -> float:
+    """断线后第 attempt 次重连前的等待秒数，指数退避并设置上限"""
+    if attempt <= 0:
+        return 0
+    return min(
+        STREAM_RECONNECT_MAX_DELAY_SECONDS,
+        STREAM_RECONNECT_BASE_DELAY_SECONDS * 2 ** (attempt - 1),
+    )
+
+
+async def get_streaming_base_url(
+    session: aiohttp.ClientSession, config: Dict[str, Any]
+) -> str:
+    """部分实例把流式 API 部署在独立域名上，从实例信息中读取，失败时使用实例地址"""
+    instance_url = config["mastodon"]["instance_url"]
+    try:
+        async with session.get(f"{instance_url}/api/v1/instance") as response:
+            response.raise_for_status()
+            instance = await response.json()
+    except (aiohttp.ClientError, ValueError) as e:
+        logging.warning(f"⚠️ 无法读取实例信息，使用实例地址连接流式 API：{e}")
+        return instance_url
+    streaming_url = (instance.get("urls") or {}).get("streaming_api") or ""
+    if not streaming_url:
+        return instance_url
+    return (
+        streaming_url.replace("wss://", "https://", 1)
+        .replace("ws://", "http://", 1)
+        .rstrip("/")
+    )
+
+
+async def iter_stream_events(
+    session: aiohttp.ClientSession, streaming_base_url: str, access_token: str
+) -> AsyncIterator[Tuple[str, str]]:
+    """连接用户流并逐个产出 (事件名, 数据)；连接被服务器关闭时正常结束"""
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=STREAM_READ_TIMEOUT_SECONDS)
+    async with session.get(
+        f"{streaming_base_url}{STREAMING_PATH}",
+        headers={"Authorization": f"Bearer {access_token}"},
+        timeout=timeout,
+    ) as response:
+        response.raise_for_status()
+        logging.info("📡 已连接流式 API，等待实时事件...")
+        event: Optional[str] = None
+        data_lines = []
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if event and data_lines:
+                    yield event, "\n".join(data_lines)
+                event, data_lines = None, []
+                continue
+            if line.startswith(":"):
+                # 以冒号开头的是心跳注释
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data_lines.append(value)
+
+
+def parse_own_status(data: str, user_id: Any) -> Optional[Status]:
+    """解析 update/status.update 事件；用户流包含关注者的帖子和转嘟，只保留本人原创"""
+    try:
+        status = json.loads(data)
+    except ValueError as e:
+        logging.warning(f"⚠️ 无法解析流式事件数据：{e}")
+        return None
+    if not isinstance(status, dict) or status.get("reblog"):
+        return None
+    if str((status.get("account") or {}).get("id")) != str(user_id):
+        return None
+    return as_status(status)
@@ -1,10 +1,125 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import logging
 import os
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, List, Optional, Tuple
+
+from . import profiling
+
+# 程序内部状态（渲染缓存等）统一存放在备份目录下的隐藏目录中
+STATE_DIR_NAME = ".vault-sync"
+FILE_WRITE_WORKERS = 8
+FILE_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+# mkstemp 创建的临时文件权限为 0600，替换前按当前 umask 恢复常规权限
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def get_state_dir(backup_path: Path) -> Path:
+    return backup_path / STATE_DIR_NAME
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    """先写入同目录临时文件再替换，避免中断时留下半截文件"""
+    _atomic_write_text(path, content)
+    profiling.count("files_written")
+
+
+def _atomic_write_text(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(
+        prefix=f".{path.name}.", suffix=".tmp", dir=path.parent
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(temp_name, 0o666 & ~_UMASK)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def write_text_if_changed(path: Path, content: str, tracker: Any = None) -> bool:
+    """内容变化时才写入，避免无意义的 mtime 变化和 git 提交"""
+    existed = path.exists()
+    if existed:
+        try:
+            profiling.count("files_read")
+            if path.read_text(encoding="utf-8") == content:
+                return False
+        except (OSError, UnicodeDecodeError):
+            pass
+    atomic_write_text(path, content)
+    if tracker is not None:
+        tracker.record_write(path, existed)
+    return True
+
+
+def write_bytes_if_changed(path: Path, data: bytes, tracker: Any = None) -> bool:
+    existed = path.exists()
+    if existed:
+        try:
+            profiling.count("files_read")
+            if path.read_bytes() == data:
+                return False
+        except OSError:
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    profiling.count("files_written")
+    if tracker is not None:
+        tracker.record_write(path, existed)
+    return True
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> Tuple[int, str]:
+    """分块读取文件，返回 (字节数, SHA-256)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(FILE_DIGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def write_text_files(
+    files: List[Tuple[Path, str]], max_workers: int = FILE_WRITE_WORKERS
+) -> List[Tuple[Path, OSError]]:
+    """在线程池中批量原子写入文本文件，返回写入失败的文件和错误"""
+    if not files:
+        return []
+
+    def write_one(item: Tuple[Path, str]) -> Optional[Tuple[Path, OSError]]:
+        path, content = item
+        try:
+            _atomic_write_text(path, content)
+        except OSError as e:
+            return path, e
+        return None
+
+    # 线程池中的线程不继承调用方的上下文，写入计数在调用方线程中累加
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        failures = [failure for failure in executor.map(write_one, files) if failure]
+    profiling.count("files_written", len(files) - len(failures))
+    return failures
 
 
 def get_timezone_aware_datetime(
@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""
+备份完整性校验。
+
+在线程池中并行检查帖子目录、媒体目录、归档、网页和同步状态是否一致：帖子和归档中的
+相对链接能否解析、引用的媒体是否存在、是否有不再被引用的媒体、frontmatter 能否解析、
+媒体的大小和哈希是否与下载时记录的一致（没有记录的单独列出）、归档中每天的条目数是否与帖子文件一致。
+repair_backup 只处理发现的问题，不必为此运行一次全量同步。
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import yaml
+
+from .backup import (
+    download_all_media,
+    get_media_index,
+    get_media_local_filename,
+    rebuild_archive,
+    record_media_digests,
+    save_media_index,
+)
+from .changes import ChangeTracker
+from .layout import (
+    get_layout,
+    get_media_relative_path,
+    iter_media_files,
+    iter_post_files,
+)
+from .snapshot import load_snapshot, update_snapshot
+from .store import load_statuses
+from .utils import file_digest, get_state_dir, safe_remove_file, write_text_if_changed
+
+VERIFY_WORKERS = 8
+ISSUE_KINDS = {
+    "missing_media": "缺失的媒体",
+    "corrupt_media": "大小或哈希与下载记录不符的媒体",
+    "unindexed_media": "没有下载记录、无法确认是否完整的媒体",
+    "orphan_media": "未被引用的媒体",
+    "broken_links": "无法解析的相对链接",
+    "invalid_frontmatter": "frontmatter 无法解析的帖子",
+    "archive_out_of_sync": "与帖子文件不一致的归档日期",
+    "html_out_of_sync": "与帖子文件不一致的网页",
+    "sync_state": "落后于帖子文件的同步状态",
+}
+# 网页背景图由 HTML 生成时单独下载，不被帖子引用
+HEADER_MEDIA_PREFIX = "header-"
+MARKDOWN_LINK_PATTERN = re.compile(r"\]\(([^)\s]+)\)")
+ARCHIVE_DAY_PATTERN = re.compile(r"^# (\d{4}-\d{2}-\d{2})$", re.MULTILINE)
+ARCHIVE_ENTRY_PATTERN = re.compile(r"^## \d{2}:\d{2} ", re.MULTILINE)
+HTML_PAYLOAD_PATTERN = re.compile(
+    r'<script id="posts-data" type="application/json">(.*?)</script>', re.DOTALL
+)
+
+
+def _relative_links(content: str) -> List[str]:
+    links = []
+    for link in MARKDOWN_LINK_PATTERN.findall(content):
+        parsed = urlparse(link)
+        if parsed.scheme or parsed.netloc or link.startswith(("#", "/")):
+            continue
+        links.append(link)
+    return links
+
+
+def _resolve_link(
+    source_folder: Path, link: str, media_folder_path: Path
+) -> Tuple[Path, Optional[str]]:
+    """返回链接指向的路径，以及它位于媒体目录内时的相对路径"""
+    target = Path(os.path.normpath(source_folder / link))
+    try:
+        return target, target.relative_to(media_folder_path).as_posix()
+    except ValueError:
+        return target, None
+
+
+def _check_post_file(post_file_path: Path, media_folder_path: Path) -> Dict[str, Any]:
+    """读取一个帖子文件，解析 frontmatter 并检查其中的相对链接"""
+    result: Dict[str, Any] = {
+        "path": post_file_path,
+        "date": None,
+        "error": None,
+        "readable": True,
+        "media": [],
+        "missing_media": [],
+        "broken_links": [],
+    }
+    try:
+        content = post_file_path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as exc:
+        result["readable"] = False
+        result["error"] = f"无法读取：{exc}"
+        return result
+
+    # 与归档重建的解析方式保持一致，能在这里解析的帖子才会出现在归档中
+    parts = content.split("---", 2)
+    try:
+        if len(parts) < 3:
+            raise ValueError("缺少 frontmatter")
+        frontmatter = yaml.safe_load(parts[1]) or {}
+        date_str = frontmatter.get("date") or frontmatter.get("createdAt")
+        created_at = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+        result["date"] = created_at.strftime("%Y-%m-%d")
+    except (AttributeError, TypeError, ValueError, yaml.YAMLError) as exc:
+        result["error"] = str(exc).splitlines()[0] if str(exc) else type(exc).__name__
+
+    for link in _relative_links(content):
+        target, media_path = _resolve_link(
+            post_file_path.parent, link, media_folder_path
+        )
+        if media_path is not None:
+            result["media"].append(media_path)
+            if not target.is_file():
+                result["missing_media"].append(media_path)
+        elif not target.exists():
+            result["broken_links"].append(link)
+    return result
+
+
+def _check_media_file(
+    media_file_path: Path,
+    media_folder_path: Path,
+    media_index: Dict[str, Dict[str, Any]],
+    quick: bool,
+) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    对照媒体索引检查大小和哈希，返回 (问题类型, 问题)；quick 为 True 时只比较大小。
+    索引中没有记录的文件（旧版本下载、或下载后还没来得及记录就被中断）单独报告。
+    """
+    relative_path = media_file_path.relative_to(media_folder_path).as_posix()
+    entry = media_index.get(relative_path)
+    try:
+        size = media_file_path.stat().st_size
+        if entry is None:
+            if size == 0:
+                return "corrupt_media", {"path": relative_path, "detail": "空文件"}
+            if media_file_path.name.startswith(HEADER_MEDIA_PREFIX):
+                return None
+            return "unindexed_media", {"path": relative_path, "detail": f"{size} 字节"}
+        if size != entry["size"]:
+            return "corrupt_media", {
+                "path": relative_path,
+                "detail": f"大小 {size} 字节，下载时为 {entry['size']} 字节",
+            }
+        if not quick and file_digest(media_file_path)[1] != entry["sha256"]:
+            return "corrupt_media", {
+                "path": relative_path,
+                "detail": "SHA-256 与下载时不一致",
+            }
+    except OSError as exc:
+        return "corrupt_media", {"path": relative_path, "detail": f"无法读取：{exc}"}
+    return None
+
+
+def _check_archive(
+    archive_file_path: Path, backup_path: Path, media_folder_path: Path
+) -> Optional[Dict[str, Any]]:
+    """统计归档中每天的条目数，并检查其中的相对链接；归档不存在时返回 None"""
+    try:
+        content = archive_file_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    day_counts: Counter = Counter()
+    days = list(ARCHIVE_DAY_PATTERN.finditer(content))
+    for index, match in enumerate(days):
+        end = days[index + 1].start() if index + 1 < len(days) else len(content)
+        day_counts[match.group(1)] = len(
+            ARCHIVE_ENTRY_PATTERN.findall(content, match.end(), end)
+        )
+    result: Dict[str, Any] = {"days": day_counts, "missing_media": [], "broken": []}
+    for link in _relative_links(content):
+        target, media_path = _resolve_link(backup_path, link, media_folder_path)
+        if target.exists():
+            continue
+        if media_path is not None:
+            result["missing_media"].append(media_path)
+        else:
+            result["broken"].append(link)
+    return result
+
+
+def _check_html(
+    html_file_path: Path, backup_path: Path, media_folder_path: Path
+) -> Optional[Dict[str, Any]]:
+    """读取网页内嵌的帖子数据，返回帖子 ID 和引用的本地媒体；网页不存在时返回 None"""
+    try:
+        content = html_file_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    result: Dict[str, Any] = {"ids": set(), "media": [], "error": None}
+    match = HTML_PAYLOAD_PATTERN.search(content)
+    try:
+        if match is None:
+            raise ValueError("找不到内嵌的帖子数据")
+        payload = json.loads(match.group(1))
+        media_prefix = payload.get("media_prefix", "")
+        for record in payload["posts"]:
+            result["ids"].add(str(record["i"]))
+            for media in record.get("m", []):
+                if "p" in media:
+                    _, media_path = _resolve_link(
+                        backup_path, media_prefix + media["p"], media_folder_path
+                    )
+                    if media_path is not None:
+                        result["media"].append(media_path)
+    except (KeyError, TypeError, ValueError) as exc:
+        result["error"] = f"内嵌的帖子数据无法解析：{exc}"
+    return result
+
+
+def _get_post_id(post_file_path: Path) -> str:
+    return post_file_path.stem.rsplit("_", 1)[-1]
+
+
+def _check_sync_state(
+    state_file_path: Path, post_files: List[Path]
+) -> Optional[Dict[str, str]]:
+    """同步状态记录的 ID 落后于本地最新帖子时，下次增量同步会重复拉取"""
+    post_ids = [
+        int(_get_post_id(path)) for path in post_files if _get_post_id(path).isdigit()
+    ]
+    if not post_ids:
+        return None
+    newest_id = str(max(post_ids))
+    try:
+        last_synced_id = json.loads(state_file_path.read_text(encoding="utf-8")).get(
+            "last_synced_id"
+        )
+    except (OSError, ValueError, AttributeError):
+        last_synced_id = None
+    if last_synced_id is not None and str(last_synced_id).isdigit():
+        if int(last_synced_id) >= int(newest_id):
+            return None
+        detail = f"记录的 ID {last_synced_id}，本地最新帖子 {newest_id}"
+    else:
+        detail = f"缺少同步状态，本地最新帖子 {newest_id}"
+    return {"path": state_file_path.name, "detail": detail, "post_id": newest_id}
+
+
+def verify_backup(
+    config: Dict[str, Any], backup_path: Path, quick: bool = False
+) -> Dict[str, Any]:
+    """并行检查备份目录，返回检查的文件数和按类型分组的问题"""
+    backup_config = config["backup"]
+    posts_folder_path = backup_path / backup_config["posts_folder"]
+    media_folder_path = backup_path / backup_config["media_folder"]
+    media_index = get_media_index(config, backup_path)
+
+    post_files = iter_post_files(posts_folder_path)
+    media_files = iter_media_files(media_folder_path)
+    with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as executor:
+        archive_future = executor.submit(
+            _check_archive,
+            backup_path / backup_config["filename"],
+            backup_path,
+            media_folder_path,
+        )
+        html_future = executor.submit(
+            _check_html,
+            backup_path / backup_config.get("html_filename", "index.html"),
+            backup_path,
+            media_folder_path,
+        )
+        state_future = executor.submit(
+            _check_sync_state, Path(config["sync"]["state_file"]), post_files
+        )
+        post_results = list(
+            executor.map(
+                partial(_check_post_file, media_folder_path=media_folder_path),
+                post_files,
+            )
+        )
+        media_issues = list(
+            executor.map(
+                partial(
+                    _check_media_file,
+                    media_folder_path=media_folder_path,
+                    media_index=media_index,
+                    quick=quick,
+                ),
+                media_files,
+            )
+        )
+        archive_result = archive_future.result()
+        html_result = html_future.result()
+        state_issue = state_future.result()
+
+    issues: Dict[str, List[Dict[str, str]]] = {kind: [] for kind in ISSUE_KINDS}
+    missing_media: Dict[str, str] = {}
+    referenced_media = set()
+    expected_days: Counter = Counter()
+    for result in post_results:
+        relative_path = result["path"].relative_to(backup_path).as_posix()
+        if result["error"] is not None:
+            issues["invalid_frontmatter"].append(
+                {"path": relative_path, "detail": result["error"]}
+            )
+        if result["date"] is not None:
+            expected_days[result["date"]] += 1
+        referenced_media.update(result["media"])
+        for media_path in result["missing_media"]:
+            missing_media.setdefault(media_path, relative_path)
+        for link in result["broken_links"]:
+            issues["broken_links"].append({"path": relative_path, "detail": link})
+
+    archive_filename = backup_config["filename"]
+    if archive_result is None:
+        if expected_days:
+            issues["archive_out_of_sync"].append(
+                {"path": archive_filename, "detail": "归档文件不存在"}
+            )
+    else:
+        for media_path in archive_result["missing_media"]:
+            missing_media.setdefault(media_path, archive_filename)
+        for link in archive_result["broken"]:
+            issues["broken_links"].append({"path": archive_filename, "detail": link})
+        for day in sorted(
+            set(expected_days) | set(archive_result["days"]), reverse=True
+        ):
+            if expected_days[day] != archive_result["days"][day]:
+                issues["archive_out_of_sync"].append(
+                    {
+                        "path": day,
+                        "detail": f"归档 {archive_result['days'][day]} 条，"
+                        f"帖子文件 {expected_days[day]} 条",
+                    }
+                )
+
+    html_filename = backup_config.get("html_filename", "index.html")
+    if html_result is not None:
+        if html_result["error"]:
+            issues["html_out_of_sync"].append(
+                {"path": html_filename, "detail": html_result["error"]}
+            )
+        else:
+            referenced_media.update(html_result["media"])
+            for media_path in html_result["media"]:
+                if not (media_folder_path / media_path).is_file():
+                    missing_media.setdefault(media_path, html_filename)
+            post_ids = {_get_post_id(path) for path in post_files}
+            absent = len(post_ids - html_result["ids"])
+            if absent:
+                issues["html_out_of_sync"].append(
+                    {"path": html_filename, "detail": f"缺少 {absent} 条本地帖子"}
+                )
+
+    for media_path, source in sorted(missing_media.items()):
+        issues["missing_media"].append(
+            {"path": media_path, "detail": f"被 {source} 引用"}
+        )
+    for media_issue in media_issues:
+        if media_issue is not None:
+            kind, issue = media_issue
+            issues[kind].append(issue)
+
+    # 有帖子读取失败时无法确定引用关系，不报告未引用的媒体，避免修复时误删
+    if post_files and all(result["readable"] for result in post_results):
+        for media_file_path in media_files:
+            relative_path = media_file_path.relative_to(media_folder_path).as_posix()
+            if relative_path in referenced_media or media_file_path.name.startswith(
+                HEADER_MEDIA_PREFIX
+            ):
+                continue
+            issues["orphan_media"].append(
+                {
+                    "path": relative_path,
+                    "detail": f"{media_file_path.stat().st_size} 字节",
+                }
+            )
+
+    if state_issue is not None:
+        issues["sync_state"].append(state_issue)
+
+    return {"posts": len(post_files), "media": len(media_files), "issues": issues}
+
+
+def _get_media_sources(config: Dict[str, Any], backup_path: Path) -> Dict[str, str]:
+    """
+    媒体相对路径到来源 URL 的映射：保存的帖子原始数据、状态快照中下载失败的记录，
+    以及媒体索引
+    """
+    layout = get_layout(config["backup"])
+    sources = {
+        get_media_relative_path(get_media_local_filename(media), layout): media["url"]
+        for status in load_statuses(backup_path)
+        for media in status.media_attachments
+    }
+    for item in (load_snapshot(backup_path) or {}).get("failed_media", []):
+        sources[item["path"]] = item["url"]
+    for relative_path, entry in get_media_index(config, backup_path).items():
+        if entry.get("url"):
+            sources[relative_path] = entry["url"]
+    return sources
+
+
+def _redownload_media(
+    config: Dict[str, Any],
+    backup_path: Path,
+    media_paths: List[str],
+    sources: Dict[str, str],
+    tracker: ChangeTracker,
+    replace: bool = False,
+) -> List[str]:
+    """按来源地址下载，返回下载成功的相对路径；replace 时下载成功才替换已有文件"""
+    backup_config = config["backup"]
+    media_items = []
+    for media_path in media_paths:
+        url = sources.get(media_path)
+        if not url:
+            continue
+        filename = Path(media_path).name
+        media_item = {"id": filename.split("-", 1)[0], "url": url}
+        if get_media_local_filename(media_item) != filename:
+            continue
+        media_items.append(media_item)
+    if not media_items:
+        return []
+    logging.info(f"⬇️  正在重新下载 {len(media_items)} 个媒体文件...")
+    media_file_map = asyncio.run(
+        download_all_media(
+            media_items,
+            backup_path / backup_config["media_folder"],
+            False,
+            tracker,
+            get_layout(backup_config),
+            media_index=get_media_index(config, backup_path),
+            replace=replace,
+        )
+    )
+    return list(media_file_map.values())
+
+
+def repair_backup(
+    config: Dict[str, Any], backup_path: Path, issues: Dict[str, List[Dict[str, str]]]
+) -> Dict[str, int]:
+    """
+    只修复校验发现的问题，返回每类问题修复的数量。
+
+    缺失或损坏的媒体按来源地址重新下载（成功后才替换旧文件），没有下载记录的媒体
+    按现状补录大小和哈希，未引用的媒体被删除，
+    归档按帖子文件重建，同步状态推进到本地最新帖子。frontmatter 损坏、
+    帖子中的失效链接和过期的网页需要服务器上的数据，不在这里处理。
+    """
+    backup_config = config["backup"]
+    media_folder_path = backup_path / backup_config["media_folder"]
+    tracker = ChangeTracker(backup_path)
+    config["change_tracker"] = tracker
+    media_index = get_media_index(config, backup_path)
+    sources = _get_media_sources(config, backup_path)
+    repaired = {kind: 0 for kind in ISSUE_KINDS}
+
+    for issue in issues["orphan_media"]:
+        media_file_path = media_folder_path / issue["path"]
+        if safe_remove_file(media_file_path):
+            media_index.pop(issue["path"], None)
+            tracker.record_delete(media_file_path)
+            repaired["orphan_media"] += 1
+
+    # 任何情况下都不先删除已有文件：下载到临时文件，成功后才替换，下载失败时保留原文件
+    corrupt_paths = [issue["path"] for issue in issues["corrupt_media"]]
+    if corrupt_paths:
+        repaired["corrupt_media"] = len(
+            _redownload_media(
+                config, backup_path, corrupt_paths, sources, tracker, replace=True
+            )
+        )
+    missing_paths = [issue["path"] for issue in issues["missing_media"]]
+    if missing_paths:
+        repaired["missing_media"] = len(
+            _redownload_media(config, backup_path, missing_paths, sources, tracker)
+        )
+    # 没有下载记录的文件（旧版本下载或离线导入）大小正常，按现状补录大小和哈希，
+    # 之后的校验以此为准；不为此重新下载整个媒体目录
+    unindexed = [
+        (issue["path"], sources.get(issue["path"], ""))
+        for issue in issues["unindexed_media"]
+    ]
+    if unindexed:
+        record_media_digests(media_index, media_folder_path, unindexed)
+        repaired["unindexed_media"] = sum(path in media_index for path, _ in unindexed)
+    save_media_index(config, backup_path)
+
+    archive_filename = backup_config["filename"]
+    if issues["archive_out_of_sync"] or any(
+        issue["path"] == archive_filename for issue in issues["broken_links"]
+    ):
+        logging.info("📝 正在基于本地单帖文件重建归档...")
+        rebuild_archive(config, backup_path)
+        repaired["archive_out_of_sync"] = len(issues["archive_out_of_sync"])
+
+    for issue in issues["sync_state"]:
+        write_text_if_changed(
+            Path(config["sync"]["state_file"]),
+            json.dumps({"last_synced_id": issue["post_id"]}),
+            tracker,
+        )
+        repaired["sync_state"] += 1
+
+    tracker.write_manifest(get_state_dir(backup_path))
+    try:
+        update_snapshot(config, backup_path, "verify", deep=True)
+    except OSError as e:
+        logging.warning(f"⚠️ 更新状态快照失败：{e}")
+    return repaired
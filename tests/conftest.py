@@ -71,3 +71,92 @@ def make_post():
         }
 
     return _make_post
+
+
+@pytest.fixture
+def backup_config():
+    """构造以指定目录为备份路径、同步状态文件也放在其中的配置"""
+
+    def _backup_config(
+        backup_path: Path,
+        instance_url: str = "https://example.com",
+        user_id: str = "1",
+        access_token: str = "test_token_12345",
+    ) -> dict:
+        return {
+            "mastodon": {
+                "instance_url": instance_url,
+                "user_id": user_id,
+                "access_token": access_token,
+            },
+            "backup": {
+                "path": str(backup_path),
+                "posts_folder": "mastodon",
+                "filename": "archive.md",
+                "media_folder": "media",
+                "summary_filename": "activity_summary.md",
+                "html_filename": "index.html",
+            },
+            "sync": {
+                "state_file": str(backup_path / "sync_state.json"),
+                "china_timezone": False,
+            },
+        }
+
+    return _backup_config
+
+
+@pytest.fixture
+def with_media():
+    """给帖子附加一张图片媒体"""
+
+    def _with_media(post: dict, media_id: str) -> dict:
+        post["media_attachments"] = [
+            {
+                "id": media_id,
+                "type": "image",
+                "url": f"https://example.com/media/{media_id}.jpg",
+                "preview_url": f"https://example.com/media/{media_id}_small.jpg",
+                "description": "",
+            }
+        ]
+        return post
+
+    return _with_media
+
+
+@pytest.fixture
+def synced_backup(temp_dir, backup_config, monkeypatch):
+    """用模拟的帖子接口和媒体下载把给定帖子同步到临时目录，返回配置和下载记录"""
+    import asyncio
+
+    import main
+    import src.backup
+    from src.backup import get_media_local_filename
+
+    def _synced_backup(posts: list, failing_media=()) -> tuple:
+        config = backup_config(temp_dir)
+        downloads = []
+
+        async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+            _ = config, page_limit, max_posts
+            if since_id:
+                return [post for post in posts if int(post["id"]) > int(since_id)]
+            return posts
+
+        async def fake_download(session, media_item, folder, replace):
+            downloads.append(media_item["id"])
+            if media_item["id"] in failing_media:
+                return None
+            filename = get_media_local_filename(media_item)
+            (folder / filename).write_bytes(media_item["id"].encode() * 50)
+            return filename
+
+        monkeypatch.setattr(main, "get_config", lambda: dict(config))
+        monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+        monkeypatch.setattr(src.backup, "download_media", fake_download)
+        monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+        asyncio.run(main.main_async())
+        return config, downloads
+
+    return _synced_backup
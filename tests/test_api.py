@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 """API 调用测试"""
+import json
+
 import aiohttp
 import pytest
 
@@ -50,8 +52,8 @@ async def test_fetch_mastodon_posts_retries_transient_client_errors(monkeypatch)
         def raise_for_status(self):
             return None
 
-        async def json(self):
-            return [sample_post]
+        async def read(self):
+            return json.dumps([sample_post]).encode("utf-8")
 
     class FakeRequest:
         async def __aenter__(self):
@@ -93,3 +95,35 @@ async def test_fetch_mastodon_posts_retries_transient_client_errors(monkeypatch)
 
     assert [post["id"] for post in posts] == ["123"]
     assert attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_counts_per_instance_and_token(monkeypatch):
+    """共享限流器按 (实例, 令牌) 分别计数，窗口满时等待"""
+    from src import ratelimit
+
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        limiter._windows.clear()
+
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", fake_sleep)
+    limiter = ratelimit.RateLimiter(max_requests=2, window_seconds=60)
+    for token in ("token_a_12345", "token_b_12345"):
+        for _ in range(2):
+            async with limiter.slot("https://example.com", token):
+                pass
+    assert sleeps == []
+
+    async with limiter.slot("https://example.com", "token_a_12345"):
+        pass
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 60
+
+    limiter.record_response("https://example.com", "token_b_12345", 0, None)
+    limiter.record_response(
+        "https://other.example", "token_b_12345", 1, int(ratelimit.time.time()) + 30
+    )
+    async with limiter.slot("https://example.com", "token_b_12345"):
+        pass
+    assert len(sleeps) == 1
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """备份逻辑测试"""
 import asyncio
+import os
+import shutil
 
 import aiohttp
 import pytest
@@ -143,7 +145,7 @@ async def test_download_all_media_limits_concurrency(tmp_path, monkeypatch):
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-    async def fake_download_media(session, media_item, media_folder_path):
+    async def fake_download_media(session, media_item, media_folder_path, replace):
         nonlocal active, max_active
         active += 1
         max_active = max(max_active, active)
@@ -214,3 +216,123 @@ async def test_download_media_retries_transient_errors(tmp_path):
     assert filename == "1-image.png"
     assert attempts == 3
     assert (tmp_path / "1-image.png").read_bytes() == b"data"
+
+
+@pytest.mark.asyncio
+async def test_download_media_never_leaves_partial_file_under_final_name(tmp_path):
+    """下载中途进程被终止时只留下临时文件，正式文件名下的文件总是完整的"""
+    from src.backup import download_media
+
+    media_item = {"id": "1", "url": "https://example.com/image.png"}
+    chunks = []
+
+    class FakeContent:
+        async def read(self, chunk_size):
+            _ = chunk_size
+            if chunks:
+                return chunks.pop(0)
+            raise asyncio.CancelledError()
+
+    class FakeResponse:
+        content = FakeContent()
+
+        def raise_for_status(self):
+            return None
+
+    class FakeRequest:
+        async def __aenter__(self):
+            chunks.append(b"part")
+            return FakeResponse()
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    class FakeSession:
+        def get(self, url):
+            _ = url
+            return FakeRequest()
+
+    with pytest.raises(asyncio.CancelledError):
+        await download_media(FakeSession(), media_item, tmp_path)
+    assert not (tmp_path / "1-image.png").exists()
+
+
+@pytest.mark.asyncio
+async def test_save_posts_skips_unchanged_files_by_hash_index(tmp_path, make_post):
+    """内容未变化的帖子应依据哈希索引跳过写入，并保留原有 mtime"""
+    from src.backup import save_posts
+
+    config = {
+        "backup": {
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+        },
+        "sync": {"china_timezone": False},
+    }
+    post_a = make_post("100", "2024-01-01T10:00:00.000Z", "第一条")
+    post_b = make_post("101", "2024-01-02T10:00:00.000Z", "第二条")
+
+    await save_posts([post_a, post_b], config, tmp_path)
+    post_a_file = next((tmp_path / "mastodon").glob("*_100.md"))
+    os.utime(post_a_file, ns=(1_000_000_000, 1_000_000_000))
+
+    post_b["content"] = "<p>第二条（已编辑）</p>"
+    fresh_config = {
+        key: value for key, value in config.items() if key in ("backup", "sync")
+    }
+    await save_posts([post_a, post_b], fresh_config, tmp_path)
+
+    assert post_a_file.stat().st_mtime_ns == 1_000_000_000
+    post_b_file = next((tmp_path / "mastodon").glob("*_101.md"))
+    assert "已编辑" in post_b_file.read_text(encoding="utf-8")
+    assert (tmp_path / ".vault-sync" / "post_hashes.json").exists()
+    assert not list((tmp_path / "mastodon").glob(".*.tmp"))
+
+
+def test_migrate_backup_layout_round_trip(tmp_path, make_post):
+    """迁移布局应移动帖子和媒体、改写链接，重复执行不做任何改动"""
+    from src.backup import detect_backup_layout, migrate_backup_layout, record_layout
+    from src.layout import get_media_relative_path
+
+    post = make_post("200", "2024-03-05T08:00:00.000Z", "带图")
+    post["media_attachments"] = [
+        {"id": "m1", "type": "image", "url": "https://example.com/photo.jpg"}
+    ]
+    config = {
+        "backup": {
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+        },
+        "sync": {"china_timezone": False},
+        "media_file_map": {"m1": "m1-photo.jpg"},
+    }
+    (tmp_path / "media").mkdir()
+    (tmp_path / "media" / "m1-photo.jpg").write_bytes(b"img")
+    update_archive_file([post], config, tmp_path)
+    flat_post_file = next((tmp_path / "mastodon").glob("*.md"))
+    flat_content = flat_post_file.read_text(encoding="utf-8")
+
+    assert migrate_backup_layout(config, tmp_path, "sharded") == (1, 1)
+
+    sharded_media = get_media_relative_path("m1-photo.jpg", "sharded")
+    assert (tmp_path / "media" / sharded_media).read_bytes() == b"img"
+    assert not flat_post_file.exists()
+    sharded_post_file = tmp_path / "mastodon" / "2024" / "03" / flat_post_file.name
+    assert f"../../../media/{sharded_media}" in sharded_post_file.read_text(
+        encoding="utf-8"
+    )
+    archive = (tmp_path / "archive.md").read_text(encoding="utf-8")
+    assert f"(media/{sharded_media})" in archive
+    assert migrate_backup_layout(config, tmp_path, "sharded") == (0, 0)
+    # .vault-sync 丢失或从旧缓存恢复时，仍按磁盘上的文件识别布局
+    shutil.rmtree(tmp_path / ".vault-sync")
+    assert detect_backup_layout(config, tmp_path) == "sharded"
+
+    assert migrate_backup_layout(config, tmp_path, "flat") == (1, 1)
+    record_layout(tmp_path, "sharded")
+    assert detect_backup_layout(config, tmp_path) == "flat"
+    assert flat_post_file.read_text(encoding="utf-8") == flat_content
+    assert (tmp_path / "media" / "m1-photo.jpg").exists()
+    assert not (tmp_path / "mastodon" / "2024").exists()
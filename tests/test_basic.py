@@ -2,7 +2,7 @@
 """基础测试 - 确保核心功能不被破坏"""
 import pytest
 
-from src.config import validate_config
+from src.config import expand_accounts, get_account_configs, validate_config
 
 
 def test_validate_config_success(sample_config):
@@ -46,3 +46,42 @@ def test_config_has_required_fields(sample_config):
     assert "posts_folder" in sample_config["backup"]
     assert "filename" in sample_config["backup"]
     assert "media_folder" in sample_config["backup"]
+
+
+def test_multi_account_config_inherits_defaults_and_rejects_shared_paths(tmp_path):
+    """多账户配置应继承顶层 backup/sync 设置，并拒绝共用同一备份目录"""
+    account = {
+        "instance_url": "https://example.com",
+        "user_id": 1,
+        "access_token": "test_token_12345",
+    }
+    config_data = {
+        "backup": {"layout": "sharded"},
+        "sync": {"china_timezone": True},
+        "accounts": [
+            {
+                "name": "alice",
+                "mastodon": account,
+                "backup": {"path": str(tmp_path / "a")},
+            },
+            {
+                "name": "bob",
+                "mastodon": account,
+                "backup": {"path": str(tmp_path / "b")},
+            },
+        ],
+    }
+
+    config = validate_config(expand_accounts(config_data)).model_dump()
+    alice, bob = get_account_configs(config)
+    assert alice["account_name"] == "alice"
+    assert alice["backup"]["layout"] == "sharded"
+    assert alice["sync"]["china_timezone"] is True
+    assert alice["sync"]["state_file"] != bob["sync"]["state_file"]
+    assert [c["account_name"] for c in get_account_configs(config, "bob")] == ["bob"]
+    with pytest.raises(ValueError):
+        get_account_configs(config, "carol")
+
+    config_data["accounts"][1]["backup"]["path"] = str(tmp_path / "a")
+    with pytest.raises(ValueError):
+        validate_config(expand_accounts(config_data))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""性能基准工具测试"""
+import json
+
+from benchmarks.run import STAGE_NAMES, compare_results, main, run_benchmarks
+from benchmarks.synthetic import build_media_file_map, generate_posts, parse_size
+
+
+def test_generate_posts_is_deterministic_and_realistic():
+    """同一 seed 生成相同的帖子，且覆盖中文、提及、表情、媒体和回复"""
+    posts = generate_posts(500, seed=7)
+
+    assert posts == generate_posts(500, seed=7)
+    assert posts != generate_posts(500, seed=8)
+    assert [post["id"] for post in posts] == sorted(
+        (post["id"] for post in posts), key=int, reverse=True
+    )
+    assert len({post["id"] for post in posts}) == 500
+    contents = "".join(post["content"] for post in posts)
+    assert "今天" in contents
+    assert 'class="u-url mention"' in contents
+    assert "🐘" in contents or "🎉" in contents
+    assert "RE: " in contents
+    assert any(post["emojis"] for post in posts)
+    assert any(post["in_reply_to_id"] for post in posts)
+    media_posts = [post for post in posts if post["media_attachments"]]
+    assert media_posts
+    assert len(build_media_file_map(posts)) == sum(
+        len(post["media_attachments"]) for post in media_posts
+    )
+    assert parse_size("10k") == 10000
+    assert parse_size("250") == 250
+
+
+def test_run_benchmarks_times_every_stage():
+    """每个阶段都在合成备份上运行并给出耗时"""
+    messages = []
+    results = run_benchmarks([30], repeat=1, progress=messages.append)
+
+    assert set(results["results"]["30"]) == set(STAGE_NAMES)
+    for result in results["results"]["30"].values():
+        assert result["median_seconds"] >= 0
+        assert len(result["runs"]) == 1
+    assert len(messages) == len(STAGE_NAMES)
+
+
+def test_compare_results_flags_only_significant_regressions():
+    """只有超过阈值且差值足够大的阶段才算回退"""
+    baseline = {
+        "results": {
+            "1000": {
+                "html": {"median_seconds": 1.0},
+                "cleanup": {"median_seconds": 0.01},
+                "save_posts": {"median_seconds": 2.0},
+            }
+        }
+    }
+    current = {
+        "results": {
+            "1000": {
+                "html": {"median_seconds": 1.5},
+                "cleanup": {"median_seconds": 0.03},
+                "save_posts": {"median_seconds": 2.2},
+                "format_post": {"median_seconds": 9.0},
+            }
+        }
+    }
+
+    regressions = compare_results(current, baseline, threshold=0.25)
+
+    assert [(item["size"], item["stage"]) for item in regressions] == [("1000", "html")]
+    assert regressions[0]["ratio"] == 1.5
+
+
+def test_main_fails_when_stage_regresses(temp_dir, monkeypatch):
+    """基线缺失或出现回退时返回非零状态，--update-baseline 时保存基线"""
+    fast = {"results": {"10": {"html": {"median_seconds": 0.0}}}}
+    slow = {"version": 1, "results": {"10": {"html": {"median_seconds": 1.0}}}}
+    monkeypatch.setattr("benchmarks.run.run_benchmarks", lambda *args: slow)
+    output = temp_dir / "latest.json"
+    baseline = temp_dir / "baseline.json"
+    argv = ["--sizes", "10", "--output", str(output), "--baseline", str(baseline)]
+
+    assert main(argv) == 2
+    assert output.exists()
+    assert not baseline.exists()
+
+    assert main(argv + ["--update-baseline"]) == 0
+    assert baseline.exists()
+    assert main(argv) == 0
+
+    baseline.write_text(json.dumps(fast), encoding="utf-8")
+    assert main(argv) == 1
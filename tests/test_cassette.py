@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""HTTP 录制与回放测试：对模拟实例录制一次同步，断网后回放得到相同的备份"""
+import gzip
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+import main
+import src.api
+import src.backup
+from benchmarks.fake_mastodon import ACCESS_TOKEN, FakeMastodon
+from benchmarks.synthetic import ACCOUNT_ID, generate_posts
+from src.cassette import (
+    REDACTED,
+    REPLAY_MODE,
+    Cassette,
+    CassetteMissError,
+    active_cassette,
+    redact_headers,
+    redact_url,
+)
+
+
+def read_backup_files(backup_path):
+    folders = [backup_path / "mastodon", backup_path / "media"]
+    return {
+        str(path.relative_to(backup_path)): path.read_bytes()
+        for folder in folders
+        for path in sorted(folder.rglob("*"))
+        if path.is_file()
+    }
+
+
+def test_redaction_removes_tokens_and_normalizes_query():
+    """令牌类查询参数和请求头被替换，查询参数排序后作为匹配键"""
+    url = redact_url("https://example.com/api?max_id=5&access_token=secret&limit=40")
+    headers = redact_headers({"Authorization": "Bearer secret", "Accept": "*/*"})
+
+    assert url == f"https://example.com/api?access_token={REDACTED}&limit=40&max_id=5"
+    assert headers == [("Authorization", REDACTED), ("Accept", "*/*")]
+
+
+@pytest.mark.asyncio
+async def test_replay_session_repeats_recorded_responses_in_order(temp_dir):
+    """同一请求按录制顺序应答，次数用完后沿用最后一次；未录制的请求按连接失败处理"""
+    cassette = Cassette(temp_dir / "http.jsonl.gz", "record")
+    url = "https://example.com/api/v1/statuses"
+    cassette.record("GET", url, {}, cassette.started, 0.1, 503, "Unavailable")
+    cassette.record("GET", url, {}, cassette.started, 0.1, 200, "OK", {}, b"[1]")
+    cassette.save()
+
+    replay = Cassette.load(cassette.path, speed=0)
+    session = replay.wrap_session(None)
+    assert replay.mode == REPLAY_MODE
+    async with session.get(url) as response:
+        assert response.status == 503
+    for _ in range(2):
+        async with session.get(url) as response:
+            assert await response.json() == [1]
+    with pytest.raises(CassetteMissError):
+        async with session.get(url + "?limit=1"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_replay_scales_recorded_retry_after_waits(temp_dir, monkeypatch):
+    """录制中的 429 和 Retry-After 在回放时按 --replay-speed 缩放，speed 为 0 时不等待"""
+    cassette = Cassette(temp_dir / "http.jsonl.gz", "record")
+    url = "https://example.com/api/v1/accounts/1/statuses"
+    cassette.record(
+        "GET",
+        url,
+        {},
+        cassette.started,
+        0.1,
+        429,
+        "Too Many Requests",
+        {"Retry-After": "120"},
+    )
+    cassette.record("GET", url, {}, cassette.started, 0.1, 200, "OK", {}, b"[1]")
+    cassette.save()
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(src.api.asyncio, "sleep", fake_sleep)
+    for speed, expected in ((0, 0.0), (4, 30.0)):
+        replay = Cassette.load(cassette.path, speed=speed)
+        token = active_cassette.set(replay)
+        try:
+            posts, _ = await src.api._fetch_posts_page(
+                replay.wrap_session(None), url, {}, {}
+            )
+        finally:
+            active_cassette.reset(token)
+        assert posts == [1]
+        # 其余等待是按录制耗时回放的响应延迟
+        assert max(waits) == expected
+        waits.clear()
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline_reproduces_backup(
+    temp_dir, backup_config, monkeypatch
+):
+    """录制包含 API 失败和媒体断流的同步，关闭服务器后以 0 等待回放，备份完全一致"""
+    fake = FakeMastodon(
+        generate_posts(60, seed=5),
+        api_failure_rate=0.2,
+        media_size=40 * 1024,
+        media_failure_rate=0.2,
+        media_reset_rate=0.2,
+    )
+    monkeypatch.setattr(src.api, "RETRY_BASE_DELAY_SECONDS", 0)
+    monkeypatch.setattr(src.backup, "MEDIA_DOWNLOAD_RETRY_BASE_DELAY_SECONDS", 0)
+    cassette_path = temp_dir / "sync.jsonl.gz"
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    instance_url = str(server.make_url("")).rstrip("/")
+    try:
+        config = backup_config(
+            temp_dir / "recorded", instance_url, ACCOUNT_ID, ACCESS_TOKEN
+        )
+        monkeypatch.setattr(main, "get_config", lambda: dict(config))
+        monkeypatch.setattr(
+            main.sys, "argv", ["main.py", "--record", str(cassette_path)]
+        )
+        await main.main_async()
+    finally:
+        await server.close()
+
+    assert fake.stats["api_failures"] > 0
+    assert fake.stats["media_resets"] > 0
+    raw = gzip.decompress(cassette_path.read_bytes())
+    assert ACCESS_TOKEN.encode() not in raw
+    assert b"Bearer" not in raw
+
+    replay_config = backup_config(
+        temp_dir / "replay", instance_url, ACCOUNT_ID, ACCESS_TOKEN
+    )
+    monkeypatch.setattr(main, "get_config", lambda: dict(replay_config))
+    monkeypatch.setattr(
+        main.sys,
+        "argv",
+        ["main.py", "--replay", str(cassette_path), "--replay-speed", "0"],
+    )
+    await main.main_async()
+
+    recorded = read_backup_files(temp_dir / "recorded")
+    assert len([name for name in recorded if name.startswith("mastodon")]) == 60
+    assert read_backup_files(temp_dir / "replay") == recorded
@@ -27,3 +27,12 @@ def test_config_example_uses_cli_commands():
     assert "python3 main.py sync" in content
     assert "python3 main.py sync --full" in content
     assert "python3 main.py --full-sync" not in content
+
+
+def test_sync_workflow_commits_only_manifest_paths():
+    """同步工作流应按变更清单暂存文件，而不是 git add 整个目录"""
+    content = (PROJECT_ROOT / ".github" / "workflows" / "sync.yml").read_text(
+        encoding="utf-8"
+    )
+    assert "--pathspec-from-file" in content
+    assert "git add -A" not in content
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""对本地模拟 Mastodon 实例的端到端测试：真实分页、速率限制和媒体故障"""
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+import main
+import src.api
+import src.backup
+from benchmarks.fake_mastodon import ACCESS_TOKEN, FakeMastodon
+from benchmarks.synthetic import ACCOUNT_ID, generate_posts
+from src.api import _fetch_posts_page, fetch_mastodon_posts
+from src.backup import download_all_media
+
+
+def test_select_statuses_follows_mastodon_pagination():
+    """max_id/since_id 取最新一页，min_id 取紧挨着的较旧一页，limit 上限为 40"""
+    fake = FakeMastodon(generate_posts(100))
+    ids = [post["id"] for post in fake.posts]
+
+    assert [p["id"] for p in fake.select_statuses({})] == ids[:20]
+    assert len(fake.select_statuses({"limit": "100"})) == 40
+    assert [p["id"] for p in fake.select_statuses({"max_id": ids[9]})] == ids[10:30]
+    assert [p["id"] for p in fake.select_statuses({"since_id": ids[50]})] == ids[:20]
+    assert [p["id"] for p in fake.select_statuses({"min_id": ids[50]})] == ids[30:50]
+    assert (
+        fake.select_statuses({"max_id": ids[5], "since_id": ids[8]}) == fake.posts[6:8]
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetch_follows_link_headers_and_stops_at_since_id(
+    temp_dir, backup_config, monkeypatch
+):
+    """全量拉取按 Link 翻页；since_id 不出现在下一页链接中，客户端应在已同步处停止"""
+    fake = FakeMastodon(generate_posts(95), api_failure_rate=0.3)
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    monkeypatch.setattr(src.api, "RETRY_BASE_DELAY_SECONDS", 0)
+    try:
+        config = backup_config(
+            temp_dir, str(server.make_url("")).rstrip("/"), ACCOUNT_ID, ACCESS_TOKEN
+        )
+        posts = await fetch_mastodon_posts(config)
+        # 客户端按从旧到新返回
+        assert [post.id for post in posts] == [post["id"] for post in fake.posts][::-1]
+        assert fake.stats["api_failures"] > 0
+
+        requests_before = fake.stats["api_requests"] - fake.stats["api_failures"]
+        since_id = fake.posts[60]["id"]
+        new_posts = await fetch_mastodon_posts(config, since_id=since_id)
+        assert [post.id for post in new_posts] == [
+            post["id"] for post in fake.posts[:60]
+        ][::-1]
+        # 60 条新帖子需要 2 页，不应继续翻到更早的历史
+        successful = fake.stats["api_requests"] - fake.stats["api_failures"]
+        assert successful - requests_before == 2
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_request_waits_for_retry_after():
+    """超过速率限制时返回 429，客户端按 Retry-After 等待后重试成功"""
+    fake = FakeMastodon(generate_posts(10), rate_limit=1, rate_limit_window=0.5)
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    try:
+        url = str(server.make_url(f"/api/v1/accounts/{ACCOUNT_ID}/statuses"))
+        headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, headers=headers) as response:
+                assert response.status == 200
+                assert response.headers["X-RateLimit-Remaining"] == "0"
+            async with session.get(url, headers=headers) as response:
+                assert response.status == 429
+                assert response.headers["Retry-After"] == "1"
+
+            posts, _ = await _fetch_posts_page(session, url, headers, {})
+        assert len(posts) == 10
+        assert fake.stats["rate_limited"] == 2
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_media_download_survives_failures_and_connection_resets(
+    temp_dir, monkeypatch
+):
+    """媒体下载遇到 503 和中途断开时重试，最终文件完整"""
+    posts = [post for post in generate_posts(60) if post["media_attachments"]]
+    fake = FakeMastodon(
+        posts, media_size=40 * 1024, media_failure_rate=0.3, media_reset_rate=0.3
+    )
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    monkeypatch.setattr(src.backup, "MEDIA_DOWNLOAD_RETRY_BASE_DELAY_SECONDS", 0)
+    try:
+        origin = str(server.make_url("")).rstrip("/")
+        media_items = [
+            dict(media, url=media["url"].replace("https://bench.example", origin))
+            for post in posts
+            for media in post["media_attachments"]
+        ]
+        media_file_map = await download_all_media(media_items, temp_dir / "media")
+    finally:
+        await server.close()
+
+    assert len(media_file_map) == len(media_items)
+    assert fake.stats["media_failures"] > 0
+    assert fake.stats["media_resets"] > 0
+    for filename in media_file_map.values():
+        assert (temp_dir / "media" / filename).stat().st_size == 40 * 1024
+
+
+@pytest.mark.asyncio
+async def test_main_sync_against_fake_instance(temp_dir, backup_config, monkeypatch):
+    """完整的 main.py 同步流程：首次全量同步后，增量同步只拉取新帖子"""
+    dataset = generate_posts(120, seed=3)
+    fake = FakeMastodon(dataset[20:], media_size=1024)
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    backup_path = temp_dir / "backup"
+    config = backup_config(
+        backup_path, str(server.make_url("")).rstrip("/"), ACCOUNT_ID, ACCESS_TOKEN
+    )
+    monkeypatch.setattr(main, "get_config", lambda: dict(config))
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+    try:
+        await main.main_async()
+        assert len(list((backup_path / "mastodon").glob("*.md"))) == 100
+        media_count = sum(len(post["media_attachments"]) for post in fake.posts)
+        assert len(list((backup_path / "media").iterdir())) == media_count
+
+        fake.add_posts(dataset[:20])
+        requests_before = fake.stats["api_requests"]
+        await main.main_async()
+    finally:
+        await server.close()
+
+    assert len(list((backup_path / "mastodon").glob("*.md"))) == 120
+    # 增量拉取 1 页 + 最近 5 页复查编辑 + 网页生成拉取全部 3 页
+    assert fake.stats["api_requests"] - requests_before <= 9
+    archive = (backup_path / "archive.md").read_text(encoding="utf-8")
+    assert dataset[0]["url"].rsplit("/", 1)[-1] in archive
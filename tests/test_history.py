@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""同步历史、趋势汇总和 Prometheus 指标导出测试"""
+import pytest
+
+import main
+import src.history
+from src.cli import show_stats
+from src.history import (
+    HISTORY_FILENAME,
+    append_record,
+    format_prometheus,
+    load_history,
+    percentile,
+    summarize,
+)
+
+
+def make_record(index, wall_seconds, status="ok", **fields):
+    return {
+        "started_at": f"2025-01-{index + 1:02d}T00:00:00+00:00",
+        "account": "",
+        "mode": "incremental",
+        "status": status,
+        "wall_seconds": wall_seconds,
+        "bytes_downloaded": 1000 * index,
+        "rate_limit_wait_seconds": 0,
+        "archive_bytes": 100 + 10 * index,
+        **fields,
+    }
+
+
+def test_append_record_keeps_only_recent_runs(temp_dir, monkeypatch):
+    """超过保留条数时丢弃最早的记录，损坏的行在读取时跳过"""
+    monkeypatch.setattr(src.history, "HISTORY_KEEP", 5)
+    state_dir = temp_dir / ".vault-sync"
+    for index in range(8):
+        append_record(state_dir, make_record(index, float(index)))
+    with (state_dir / HISTORY_FILENAME).open("a", encoding="utf-8") as f:
+        f.write('{"started_at": "2025-02')
+
+    records = load_history(temp_dir)
+
+    assert [record["wall_seconds"] for record in records] == [3, 4, 5, 6, 7]
+
+
+def test_summarize_reports_percentiles_and_trend():
+    """p50/p95 使用最近秩法；近半数运行变慢时趋势大于 1"""
+    records = [make_record(i, 10.0) for i in range(10)]
+    records += [make_record(10 + i, 20.0) for i in range(9)]
+    records.append(make_record(19, 60.0, status="failed", rate_limit_wait_seconds=30))
+
+    summary = summarize(records)
+
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([], 95) is None
+    assert summary["runs"] == 20
+    assert summary["failed_runs"] == 1
+    assert summary["wall_seconds_p50"] == 10.0
+    assert summary["wall_seconds_p95"] == 20.0
+    assert summary["wall_seconds_trend"] == 2.0
+    assert summary["rate_limited_runs"] == 1
+    assert summary["archive_growth_bytes"] == 190
+
+
+def test_format_prometheus_exports_last_run_and_quantiles():
+    """每个账户导出最近一次运行的数值和历史耗时分位数，标签值转义"""
+    text = format_prometheus(
+        {
+            'a"b': [make_record(0, 5.0), make_record(1, 7.5, api_calls=3)],
+            "empty": [],
+        }
+    )
+
+    assert "# TYPE vault_sync_last_run_wall_seconds gauge" in text
+    assert 'vault_sync_last_run_wall_seconds{account="a\\"b"} 7.5' in text
+    assert 'vault_sync_last_run_api_calls{account="a\\"b"} 3' in text
+    assert 'vault_sync_last_run_success{account="a\\"b"} 1' in text
+    assert 'vault_sync_run_wall_seconds{account="a\\"b",quantile="0.95"} 7.5' in text
+    assert "vault_sync_last_run_timestamp_seconds" in text
+    assert "empty" not in text
+    assert text.count("# HELP vault_sync_last_run_wall_seconds") == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_appends_history_and_refreshes_metrics(
+    temp_dir, make_post, monkeypatch, capsys
+):
+    """每次同步追加一条历史并刷新 metrics_file；stats 命令汇总历史"""
+    metrics_file = temp_dir / "metrics" / "vault_sync.prom"
+    config = {
+        "mastodon": {
+            "instance_url": "https://example.com",
+            "user_id": "1",
+            "access_token": "test_token_12345",
+        },
+        "backup": {
+            "path": str(temp_dir),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+        },
+        "sync": {
+            "state_file": str(temp_dir / "sync_state.json"),
+            "china_timezone": False,
+            "metrics_file": str(metrics_file),
+        },
+    }
+    posts = [
+        make_post(str(100 + i), f"2024-01-0{i + 1}T10:00:00.000Z", f"第{i}条")
+        for i in range(3)
+    ]
+
+    async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+        _ = config, page_limit, max_posts
+        return [] if since_id else posts
+
+    monkeypatch.setattr(main, "get_config", lambda: dict(config))
+    monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+    await main.main_async()
+    await main.main_async()
+
+    records = load_history(temp_dir)
+    assert [record["mode"] for record in records] == ["full", "incremental"]
+    assert [record["status"] for record in records] == ["ok", "ok"]
+    assert records[0]["posts_processed"] == 3
+    assert records[0]["files_added"] >= 3
+    assert records[0]["archive_bytes"] > 0
+    assert "fetch" in records[0]["stages"]
+    assert 'vault_sync_history_runs{account=""} 2' in metrics_file.read_text(
+        encoding="utf-8"
+    )
+
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+    export_path = temp_dir / "export.prom"
+    show_stats(["stats", "--last", "5", "--prometheus", str(export_path)])
+
+    output = capsys.readouterr().out
+    assert "记录的运行：2 次" in output
+    assert "incremental: 1 次" in output
+    assert "vault_sync_last_run_posts_processed" in export_path.read_text(
+        encoding="utf-8"
+    )
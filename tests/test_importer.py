@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""账户导出离线导入测试"""
+import io
+import json
+import zipfile
+
+import pytest
+
+import main
+from src.importer import _get_media_id, iter_outbox_items
+
+ACTOR_ID = "https://example.com/users/test"
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+def make_activity(status_id, published, content, **note_fields):
+    note = {
+        "id": f"{ACTOR_ID}/statuses/{status_id}",
+        "type": "Note",
+        "published": published,
+        "url": f"https://example.com/@test/{status_id}",
+        "attributedTo": ACTOR_ID,
+        "to": [PUBLIC],
+        "cc": [f"{ACTOR_ID}/followers"],
+        "content": f"<p>{content}</p>",
+        "attachment": [],
+        "tag": [],
+    }
+    note.update(note_fields)
+    return {"type": "Create", "published": published, "object": note}
+
+
+def test_iter_outbox_items_parses_across_chunk_boundaries():
+    """小块读取时跨块的条目也应完整解析，截断的文件应报错"""
+    items = [{"id": index, "text": "内容，含 ] 和 , 符号"} for index in range(5)]
+    outbox = json.dumps(
+        {"@context": "x", "totalItems": 5, "orderedItems": items}, ensure_ascii=False
+    )
+
+    assert list(iter_outbox_items(io.StringIO(outbox), chunk_size=7)) == items
+    with pytest.raises(ValueError):
+        list(iter_outbox_items(io.StringIO(outbox[:-20]), chunk_size=7))
+
+
+def test_get_media_id_strips_partition_padding():
+    """按三位补零的分段路径去掉前导零后与 API 的媒体 ID 一致"""
+    assert _get_media_id("media_attachments/files/000/000/123/original/a.jpg") == "123"
+    assert (
+        _get_media_id("media_attachments/files/110/000/001/original/a.jpg")
+        == "110000001"
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_archive_writes_posts_media_and_sync_state(temp_dir, monkeypatch):
+    """离线导入应写出帖子和媒体、跳过转嘟和私信，并记录增量同步起点"""
+    backup_path = temp_dir / "backup"
+    state_file = temp_dir / "sync_state.json"
+    config = {
+        "mastodon": {
+            "instance_url": "https://example.com",
+            "user_id": "1",
+            "access_token": "test_token_12345",
+        },
+        "backup": {
+            "path": str(backup_path),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+        },
+        "sync": {"state_file": str(state_file), "china_timezone": False},
+    }
+    media_path = "media_attachments/files/110/000/001/original/photo.jpg"
+    activities = [
+        make_activity(
+            "200",
+            "2024-01-01T10:00:00Z",
+            "带图",
+            attachment=[
+                {
+                    "type": "Document",
+                    "mediaType": "image/jpeg",
+                    "url": f"/{media_path}",
+                    "name": "一张图",
+                }
+            ],
+            tag=[
+                {
+                    "type": "Hashtag",
+                    "name": "#test",
+                    "href": "https://example.com/tags/test",
+                }
+            ],
+        ),
+        make_activity(
+            "201",
+            "2024-01-02T10:00:00Z",
+            "回复自己",
+            inReplyTo=f"{ACTOR_ID}/statuses/200",
+        ),
+        make_activity("202", "2024-01-03T10:00:00Z", "私信", to=[], cc=[]),
+        {"type": "Announce", "published": "2024-01-04T10:00:00Z", "object": "x"},
+    ]
+    zip_path = temp_dir / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("outbox.json", json.dumps({"orderedItems": activities}))
+        archive.writestr(
+            "actor.json", json.dumps({"id": ACTOR_ID, "preferredUsername": "test"})
+        )
+        archive.writestr(media_path, b"jpeg-bytes")
+
+    monkeypatch.setattr(main, "get_config", lambda: config)
+
+    await main.import_archive_async(zip_path)
+
+    post_files = sorted((backup_path / "mastodon").glob("*.md"))
+    assert [path.name for path in post_files] == [
+        "2024-01-01_100000_200.md",
+        "2024-01-02_100000_201.md",
+    ]
+    first_post = post_files[0].read_text(encoding="utf-8")
+    assert "![一张图](../media/110000001-photo.jpg)" in first_post
+    assert "- test" in first_post
+    assert "type: reply" in post_files[1].read_text(encoding="utf-8")
+    assert (backup_path / "media" / "110000001-photo.jpg").read_bytes() == b"jpeg-bytes"
+    assert "私信" not in (backup_path / "archive.md").read_text(encoding="utf-8")
+    assert json.loads(state_file.read_text(encoding="utf-8")) == {
+        "last_synced_id": "201"
+    }
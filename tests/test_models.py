@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""精简帖子模型测试"""
+import json
+import pickle
+import tracemalloc
+
+from src.models import Status, as_status, as_statuses
+from src.render import format_post_for_single_file
+from src.render.cache import fingerprint
+
+
+def make_api_post(post_id):
+    """带有完整账户信息的 API 风格帖子，账户简介和资料字段每条各一份"""
+    return {
+        "id": str(post_id),
+        "created_at": "2024-01-01T10:00:00.000Z",
+        "content": f"<p>帖子 {post_id}</p>",
+        "url": f"https://example.com/@test/{post_id}",
+        "uri": f"https://example.com/users/test/statuses/{post_id}",
+        "media_attachments": [
+            {
+                "id": f"m{post_id}",
+                "type": "image",
+                "url": f"https://example.com/media/{post_id}.png",
+                "description": None,
+            }
+        ],
+        "tags": [{"name": "test", "url": "https://example.com/tags/test"}],
+        "emojis": [],
+        "mentions": [],
+        "visibility": "public",
+        "language": "zh",
+        "application": {"name": "Web", "website": None},
+        "in_reply_to_id": None,
+        "in_reply_to_account_id": None,
+        "account": {
+            "id": "1",
+            "username": "test",
+            "display_name": "Test User",
+            "note": "<p>" + "个人简介" * 100 + "</p>",
+            "url": "https://example.com/@test",
+            "avatar": "https://example.com/avatar.png",
+            "header": "",
+            "followers_count": 5,
+            "following_count": 3,
+            "fields": [{"name": "网站", "value": "<a href='https://x'>x</a>"}],
+            "emojis": [],
+        },
+    }
+
+
+def test_status_shares_account_and_supports_mapping_access():
+    """账户和标签应被复用，并兼容 dict 式读取和跨进程序列化"""
+    first, second = as_statuses([make_api_post(1), make_api_post(2)])
+
+    assert first.account is second.account
+    assert first.tags[0] is second.tags[0]
+    assert first["id"] == "1"
+    assert first.get("language") is None
+    assert "account" in first and "language" not in first
+    assert first["media_attachments"][0]["description"] is None
+    assert as_status(first) is first
+    assert pickle.loads(pickle.dumps(first)) == first
+
+
+def test_renderers_produce_same_output_for_dict_and_status():
+    """渲染器接受模型或 dict，输出和渲染指纹一致"""
+    post = make_api_post(1)
+    status = Status.from_dict(post)
+    media_map = {"m1": "m1-1.png"}
+
+    assert format_post_for_single_file(
+        post, "media", media_map
+    ) == format_post_for_single_file(status, "media", media_map)
+    assert fingerprint(as_status(post)) == fingerprint(status)
+
+
+def test_status_list_uses_a_fraction_of_raw_dict_memory():
+    """全量同步的帖子表改用模型后，内存占用应明显低于原始 API dict"""
+    payload = json.dumps([make_api_post(index) for index in range(1000)])
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        raw_posts = json.loads(payload)
+        raw_size = tracemalloc.get_traced_memory()[0] - baseline
+        del raw_posts
+
+        baseline = tracemalloc.get_traced_memory()[0]
+        statuses = as_statuses(json.loads(payload))
+        status_size = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    assert len(statuses) == 1000
+    assert status_size * 3 < raw_size
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""离线重建测试：按本地原始数据重新生成输出，不访问网络"""
+import pytest
+
+import main
+import src.backup
+import src.render.html
+import src.store
+from src.backup import delete_posts
+from src.cli import run_rebuild
+from src.rebuild import parse_targets
+from src.store import append_statuses, get_status_store_path, load_statuses
+
+
+def sync_backup(synced_backup, make_post, with_media):
+    posts = [
+        make_post("101", "2024-01-02T10:00:00.000Z", "第二条"),
+        with_media(make_post("100", "2024-01-01T20:00:00.000Z", "第一条"), "m1"),
+    ]
+    config, _ = synced_backup(posts)
+    return config
+
+
+def forbid_network(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("rebuild 不应访问网络")
+
+    monkeypatch.setattr(main, "fetch_mastodon_posts", no_network)
+    monkeypatch.setattr(src.backup, "download_media", no_network)
+    monkeypatch.setattr(src.render.html, "http_get", no_network)
+
+
+def test_rebuild_regenerates_outputs_after_timezone_change(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """切换时区后帖子文件改名、归档按新日期分组，媒体链接保持有效"""
+    config = sync_backup(synced_backup, make_post, with_media)
+    posts_folder = temp_dir / "mastodon"
+    assert (posts_folder / "2024-01-01_200000_100.md").exists()
+    (temp_dir / "index.html").unlink()
+
+    config["sync"]["china_timezone"] = True
+    forbid_network(monkeypatch)
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+
+    assert run_rebuild(["rebuild"]) is True
+
+    assert sorted(path.name for path in posts_folder.glob("*.md")) == [
+        "2024-01-02_040000_100.md",
+        "2024-01-02_180000_101.md",
+    ]
+    post = (posts_folder / "2024-01-02_040000_100.md").read_text(encoding="utf-8")
+    assert "../media/m1-m1.jpg" in post
+    archive = (temp_dir / "archive.md").read_text(encoding="utf-8")
+    assert "# 2024-01-01" not in archive
+    assert archive.count("## ") == 2
+    assert "2024-01-02" in (temp_dir / "activity_summary.md").read_text(
+        encoding="utf-8"
+    )
+    html = (temp_dir / "index.html").read_text(encoding="utf-8")
+    assert '"i":"100"' in html and '"i":"101"' in html
+
+
+def test_rebuild_only_selected_targets(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """--only 只重建指定目标，未知目标直接报错"""
+    config = sync_backup(synced_backup, make_post, with_media)
+    forbid_network(monkeypatch)
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+    (temp_dir / "archive.md").write_text("损坏的归档", encoding="utf-8")
+    summary_path = temp_dir / "activity_summary.md"
+    summary_path.unlink()
+
+    assert run_rebuild(["rebuild", "--only", "archive"]) is True
+
+    assert "## " in (temp_dir / "archive.md").read_text(encoding="utf-8")
+    assert not summary_path.exists()
+    with pytest.raises(ValueError):
+        parse_targets("archive,feeds")
+
+
+def test_status_store_drops_deleted_posts_and_compacts(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """删除的帖子不会在重建时复活；过期记录过多时在写入时整体重写"""
+    config = sync_backup(synced_backup, make_post, with_media)
+    delete_posts(["101"], dict(config), temp_dir)
+    assert [status.id for status in load_statuses(temp_dir)] == ["100"]
+
+    monkeypatch.setattr(src.store, "STATUS_STORE_COMPACT_MIN_STALE", 2)
+    for index in range(5):
+        post = make_post("102", "2024-01-03T10:00:00.000Z", f"第三条（{index}）")
+        append_statuses(temp_dir, [post])
+        assert len(get_status_store_path(temp_dir).read_text().splitlines()) <= 5
+    assert [status.id for status in load_statuses(temp_dir)] == ["102", "100"]
+    assert load_statuses(temp_dir)[0].content == "<p>第三条（4）</p>"
+
+
+def test_status_store_skips_unchanged_posts_and_torn_lines(temp_dir, make_post):
+    """增量同步重新拉取的帖子内容没变时不追加；中断写入留下的半行不影响新记录"""
+    posts = [
+        make_post("100", "2024-01-01T20:00:00.000Z", "第一条"),
+        make_post("101", "2024-01-02T10:00:00.000Z", "第二条"),
+    ]
+    store_path = get_status_store_path(temp_dir)
+    append_statuses(temp_dir, posts)
+    size = store_path.stat().st_size
+    append_statuses(temp_dir, posts)
+    assert store_path.stat().st_size == size
+
+    with open(store_path, "a", encoding="utf-8") as f:
+        f.write('{"id":"102","content":"写了一半')
+    append_statuses(temp_dir, [make_post("101", "2024-01-02T10:00:00.000Z", "改过")])
+    append_statuses(temp_dir, posts[:1])
+
+    statuses = load_statuses(temp_dir)
+    assert [status.id for status in statuses] == ["101", "100"]
+    assert statuses[0].content == "<p>改过</p>"
+    assert len(store_path.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_migrate_layout_regenerates_html_and_summary(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """迁移布局后离线重新生成网页和活动总结，其中的媒体和帖子链接指向新位置"""
+    from src.cli import run_migrate_layout
+    from src.layout import get_media_relative_path
+
+    config = sync_backup(synced_backup, make_post, with_media)
+    forbid_network(monkeypatch)
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+
+    (temp_dir / "activity_summary.md").unlink()
+
+    run_migrate_layout("sharded")
+
+    sharded_media = get_media_relative_path("m1-m1.jpg", "sharded")
+    assert sharded_media in (temp_dir / "index.html").read_text(encoding="utf-8")
+    assert (temp_dir / "activity_summary.md").exists()
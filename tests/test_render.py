@@ -244,10 +244,104 @@ def test_generate_mastodon_html_preserves_video_attachment_type(tmp_path, monkey
         html,
         re.S,
     ).group(1)
-    media = json.loads(posts_json)[0]["media_attachments"][0]
+    payload = json.loads(posts_json)
+    media = payload["posts"][0]["m"][0]
 
-    assert media["type"] == "video"
-    assert media["url"] == "media/media-1-video.mp4"
+    assert media["y"] == "video"
+    assert payload["media_prefix"] + media["p"] == "media/media-1-video.mp4"
+
+
+def test_build_posts_payload_normalizes_accounts_and_omits_defaults():
+    """网页数据应只存一份账户信息，省略默认值，时间存为整数时间戳"""
+    from src.render.html import build_posts_payload
+
+    account = {
+        "id": "1",
+        "username": "alice",
+        "display_name": "Alice",
+        "url": "https://example.com/@alice",
+        "avatar": "https://example.com/avatar.png",
+    }
+    posts_data = [
+        {
+            "id": str(post_id),
+            "content": f"<p>{post_id}</p>",
+            "created_at": "2024-01-01 20:00:00",
+            "timestamp": "2024-01-01T12:00:00.000Z",
+            "url": f"https://example.com/@alice/{post_id}",
+            "sensitive": False,
+            "spoiler_text": "",
+            "visibility": "public",
+            "media_attachments": [],
+            "reblogs_count": 0,
+            "favourites_count": 2 if post_id == 2 else 0,
+            "replies_count": 0,
+            "in_reply_to_id": "1" if post_id == 2 else None,
+            "in_reply_to_account_id": None,
+            "account": dict(account),
+            "tags": [{"name": "test"}] if post_id == 2 else [],
+        }
+        for post_id in (1, 2)
+    ]
+
+    payload = build_posts_payload(posts_data, "media", utc_offset_minutes=480)
+
+    assert payload["accounts"] == [
+        {key: account[key] for key in ("username", "display_name", "url", "avatar")}
+    ]
+    assert payload["utc_offset"] == 480
+    assert payload["posts"][0] == {
+        "i": "2",
+        "t": 1704110400,
+        "c": "<p>2</p>",
+        "fv": 2,
+        "r": "1",
+        "rx": 1,
+        "g": ["test"],
+    }
+    assert payload["posts"][1] == {"i": "1", "t": 1704110400, "c": "<p>1</p>"}
+
+
+def test_build_posts_payload_sorts_posts_and_resolves_reference_graph():
+    """生成时应按时间倒序排列，并解析回复和引用对应的帖子下标"""
+    from src.render.html import build_posts_payload
+
+    account = {"username": "alice", "url": "https://example.com/@alice"}
+    quote_line = (
+        '<p class="quote-inline">RE: <a href="https://example.com/@alice/1">'
+        '<span class="invisible">https://</span>example.com/@alice/1</a></p>'
+    )
+
+    def make_record(post_id, day, content, in_reply_to_id=None):
+        return {
+            "id": post_id,
+            "content": content,
+            "timestamp": f"2024-01-0{day}T12:00:00.000Z",
+            "url": f"https://example.com/@alice/{post_id}",
+            "in_reply_to_id": in_reply_to_id,
+            "account": account,
+        }
+
+    posts_data = [
+        make_record("1", 1, "<p>原帖</p>"),
+        make_record("3", 3, quote_line + "<p>引用原帖</p>"),
+        make_record("2", 2, "<p>回复</p>", in_reply_to_id="1"),
+        make_record(
+            "4", 4, '<p>RE: <a href="https://other.example/@bob/9">链接</a></p>'
+        ),
+        make_record("5", 5, "<p>回复站外帖子</p>", in_reply_to_id="99"),
+    ]
+
+    posts = build_posts_payload(posts_data, "media")["posts"]
+
+    assert [post["i"] for post in posts] == ["5", "4", "3", "2", "1"]
+    assert posts[3]["rx"] == 4
+    assert posts[2]["qx"] == 4 and posts[2]["q"] == 1
+    assert posts[2]["c"] == "<p>引用原帖</p>"
+    # 找不到原帖时保留「RE:」段落，只标记含引用链接
+    assert "qx" not in posts[1] and posts[1]["q"] == 1
+    assert "RE:" in posts[1]["c"]
+    assert "rx" not in posts[0] and "qx" not in posts[0]
 
 
 def test_frontend_renders_video_and_gifv_media():
@@ -265,9 +359,254 @@ def test_frontend_renders_reply_and_quote_as_embedded_reference_cards():
     script = Path("src/assets/script.js").read_text(encoding="utf-8")
 
     assert "getReferencePost(post)" in script
-    assert "removeReferenceLine(post.content)" in script
+    assert "postsData[post.reply_index]" in script
+    assert "postsData[post.quote_index]" in script
+    # 引用关系和排序在生成时完成，网页端不再解析全部帖子的 HTML
+    assert "getPostLookup" not in script
+    assert "postsData.sort" not in script
     assert "status-reference" in script
     assert "回复内容" in script
     assert "引用内容" in script
     assert 'href="${post.account.url}" class="status-name"' not in script
     assert 'href="${post.account.url}" class="status-handle"' not in script
+
+
+def test_render_post_files_process_pool_matches_serial_output(monkeypatch, make_post):
+    """进程池并行渲染应保持输入顺序，且输出与单进程渲染逐字节一致"""
+    from src.render import executor
+
+    posts = [
+        make_post(
+            str(100 + index), f"2024-01-{index + 1:02d}T10:00:00.000Z", f"帖子{index}"
+        )
+        for index in range(7)
+    ]
+    posts[3]["media_attachments"] = [
+        {"id": "m1", "url": "https://example.com/a.png", "description": "图"}
+    ]
+    media_file_map = {"m1": "m1-a.png"}
+
+    serial = executor.render_post_files(posts, "media", media_file_map, True)
+
+    monkeypatch.setattr(executor, "PARALLEL_RENDER_THRESHOLD", 0)
+    monkeypatch.setattr(executor, "RENDER_BATCH_SIZE", 2)
+    monkeypatch.setattr(executor, "get_render_workers", lambda: 2)
+    parallel = executor.render_post_files(posts, "media", media_file_map, True)
+
+    assert parallel == serial
+    assert [name.rsplit("_", 1)[-1] for name, _ in parallel] == [
+        f"{post['id']}.md" for post in posts
+    ]
+    assert "../media/m1-a.png" in parallel[3][1]
+
+
+def test_render_cache_hits_unchanged_posts_and_persists(
+    tmp_path, monkeypatch, make_post
+):
+    """未变化的帖子应命中渲染缓存，且缓存可落盘后重新加载"""
+    from src.render import executor
+    from src.render.cache import RenderCache
+
+    cache_path = tmp_path / "render_cache.json"
+    cache = RenderCache.load(cache_path)
+    posts = [make_post("1", "2024-01-01T10:00:00.000Z", "第一条")]
+    first = executor.render_post_files(posts, "media", {}, False, cache)
+    cache.save()
+
+    def fail_render(*args, **kwargs):
+        raise AssertionError("缓存命中时不应重新渲染")
+
+    monkeypatch.setattr(executor, "format_post_for_single_file", fail_render)
+    reloaded = RenderCache.load(cache_path)
+    assert executor.render_post_files(posts, "media", {}, False, reloaded) == first
+    assert reloaded.hits == 1
+
+    monkeypatch.undo()
+    posts[0]["content"] = "<p>已编辑</p>"
+    edited = executor.render_post_files(posts, "media", {}, False, reloaded)
+    assert "已编辑" in edited[0][1]
+
+
+def test_render_cache_ignores_fields_the_renderer_does_not_read(monkeypatch, make_post):
+    """粉丝数、互动数等不参与单帖渲染的字段变化时，仍应命中渲染缓存"""
+    from src.render import executor
+    from src.render.cache import RenderCache
+
+    cache = RenderCache()
+    posts = [make_post("1", "2024-01-01T10:00:00.000Z", "第一条")]
+    first = executor.render_post_files(posts, "media", {}, False, cache)
+
+    def fail_render(*args, **kwargs):
+        raise AssertionError("缓存命中时不应重新渲染")
+
+    monkeypatch.setattr(executor, "format_post_for_single_file", fail_render)
+    posts[0]["account"]["followers_count"] = 500
+    posts[0]["account"]["note"] = "新的简介"
+    posts[0]["favourites_count"] = 9
+    assert executor.render_post_files(posts, "media", {}, False, cache) == first
+    assert cache.hits == 1
+
+
+def test_render_cache_evicts_least_recently_used_entries():
+    """渲染缓存超过大小上限时应淘汰最久未使用的条目"""
+    from src.render.cache import RenderCache
+
+    cache = RenderCache(max_bytes=10)
+    cache.put("single_file", "a", "fp", "aaaa")
+    cache.put("single_file", "b", "fp", "bbbb")
+    assert cache.get("single_file", "a", "fp") == "aaaa"
+    cache.put("single_file", "c", "fp", "cccc")
+
+    assert cache.get("single_file", "b", "fp") is None
+    assert cache.get("single_file", "a", "fp") == "aaaa"
+    assert cache.get("single_file", "c", "fp") == "cccc"
+    assert cache.get("single_file", "c", "other") is None
+
+
+def test_optimize_assets_writes_hashed_minified_assets_and_precompressed_html(
+    tmp_path, monkeypatch, make_post
+):
+    """开启资源优化后，CSS/JS 为带哈希的外部文件，数据变化不改变资源文件名"""
+    import gzip
+
+    from src.render.assets import minify_css
+
+    monkeypatch.setattr(
+        "src.render.html.requests.get",
+        lambda *args, **kwargs: (_ for _ in ()).throw(OSError("offline")),
+    )
+    config = {
+        "backup": {
+            "html_filename": "index.html",
+            "media_folder": "media",
+            "optimize_assets": True,
+        },
+        "sync": {"china_timezone": False},
+    }
+    post = make_post("1", "2024-01-01T10:00:00.000Z", "第一条")
+
+    generate_mastodon_html([post], config, Path(tmp_path))
+    html = (tmp_path / "index.html").read_text(encoding="utf-8")
+    css_href = re.search(r'<link rel="stylesheet" href="([^"]+)">', html).group(1)
+    js_src = re.search(r'<script src="([^"]+)"></script>', html).group(1)
+
+    assert "<style>" not in html
+    assert re.fullmatch(r"assets/style\.[0-9a-f]{10}\.css", css_href)
+    assert re.fullmatch(r"assets/script\.[0-9a-f]{10}\.js", js_src)
+    assert "function decodePost" in (tmp_path / js_src).read_text(encoding="utf-8")
+    assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == html.encode()
+    assert (tmp_path / (css_href + ".gz")).exists()
+
+    generate_mastodon_html(
+        [make_post("2", "2024-01-02T10:00:00.000Z", "第二条"), post],
+        config,
+        Path(tmp_path),
+    )
+    new_html = (tmp_path / "index.html").read_text(encoding="utf-8")
+    assert css_href in new_html and js_src in new_html
+    assert (
+        "第二条" in gzip.decompress((tmp_path / "index.html.gz").read_bytes()).decode()
+    )
+    assert minify_css("a > b {\n  color: red;\n  /* 注释 */\n}") == "a>b{color:red}"
+
+
+def test_precompressed_variants_follow_optimize_assets(
+    tmp_path, monkeypatch, make_post
+):
+    """缺少任一种预压缩副本都会补写；关闭资源优化后删除全部副本和带哈希的外部资源"""
+    import src.render.assets
+
+    monkeypatch.setattr(
+        "src.render.html.requests.get",
+        lambda *args, **kwargs: (_ for _ in ()).throw(OSError("offline")),
+    )
+    monkeypatch.setattr(
+        src.render.assets,
+        "brotli",
+        type("FakeBrotli", (), {"compress": staticmethod(lambda data: b"br" + data)}),
+    )
+    config = {
+        "backup": {
+            "html_filename": "index.html",
+            "media_folder": "media",
+            "optimize_assets": True,
+            "static_site": True,
+        },
+        "sync": {"china_timezone": False},
+    }
+    posts = [make_post("1", "2024-01-01T10:00:00.000Z", "第一条")]
+
+    generate_mastodon_html(posts, config, Path(tmp_path))
+    (tmp_path / "index.html.br").unlink()
+    (tmp_path / "site" / "index.html.br").unlink()
+    generate_mastodon_html(posts, config, Path(tmp_path))
+    assert (tmp_path / "index.html.br").exists()
+    assert (tmp_path / "site" / "index.html.br").exists()
+
+    config["backup"]["optimize_assets"] = False
+    generate_mastodon_html(posts, config, Path(tmp_path))
+    leftovers = [
+        path.relative_to(tmp_path).as_posix()
+        for path in tmp_path.rglob("*")
+        if path.suffix in (".gz", ".br") or path.parent == tmp_path / "assets"
+    ]
+    assert leftovers == []
+    assert "<style>" in (tmp_path / "index.html").read_text(encoding="utf-8")
+
+
+def test_service_worker_precache_manifest_tracks_page_shell_hashes(
+    tmp_path, monkeypatch, make_post
+):
+    """开启离线缓存后写入 sw.js 和预缓存清单，数据更新只改变 index.html 的哈希"""
+    monkeypatch.setattr(
+        "src.render.html.requests.get",
+        lambda *args, **kwargs: (_ for _ in ()).throw(OSError("offline")),
+    )
+    config = {
+        "backup": {
+            "html_filename": "index.html",
+            "media_folder": "media",
+            "optimize_assets": True,
+            "service_worker": True,
+        },
+        "sync": {"china_timezone": False},
+    }
+    post = make_post("1", "2024-01-01T10:00:00.000Z", "第一条")
+
+    generate_mastodon_html([post], config, Path(tmp_path))
+    manifest = json.loads((tmp_path / "precache-manifest.json").read_text())
+    service_worker = (tmp_path / "sw.js").read_text(encoding="utf-8")
+
+    assert "navigator.serviceWorker.register('sw.js')" in (
+        tmp_path / "index.html"
+    ).read_text(encoding="utf-8")
+    assert f"const PRECACHE_VERSION = '{manifest['version']}';" in service_worker
+    assert "const MEDIA_PREFIX = 'media/';" in service_worker
+    urls = [entry["url"] for entry in manifest["entries"]]
+    assert urls[0] == "index.html"
+    assert any(url.startswith("assets/script.") for url in urls)
+
+    generate_mastodon_html(
+        [make_post("2", "2024-01-02T10:00:00.000Z", "第二条"), post],
+        config,
+        Path(tmp_path),
+    )
+    new_manifest = json.loads((tmp_path / "precache-manifest.json").read_text())
+    changed = {
+        new["url"]
+        for old, new in zip(manifest["entries"], new_manifest["entries"])
+        if old != new
+    }
+    assert new_manifest["version"] != manifest["version"]
+    assert changed == {"index.html"}
+
+    # 关闭后 sw.js 换成自我注销版本，已安装的浏览器会清空缓存，不再显示旧页面
+    config["backup"]["service_worker"] = False
+    generate_mastodon_html([post], config, Path(tmp_path))
+    service_worker = (tmp_path / "sw.js").read_text(encoding="utf-8")
+    assert "self.registration.unregister()" in service_worker
+    assert "name.startsWith('vault-')" in service_worker
+    assert not (tmp_path / "precache-manifest.json").exists()
+    assert "serviceWorker.register" not in (tmp_path / "index.html").read_text(
+        encoding="utf-8"
+    )
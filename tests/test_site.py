@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""多页静态站点生成测试"""
+import json
+import re
+
+from src.render.html import build_posts_payload
+from src.render.site import SITE_POSTS_PER_PAGE, generate_static_site
+
+ACCOUNT = {
+    "username": "alice",
+    "display_name": "Alice",
+    "url": "https://example.com/@alice",
+    "avatar": "https://example.com/avatar.png",
+}
+PROFILE = {"username": "alice", "display_name": "Alice", "total_posts": 0}
+
+
+def make_record(post_id, day, tags=(), media=False, in_reply_to_id=None):
+    return {
+        "id": str(post_id),
+        "content": f"<p>帖子 {post_id}</p>",
+        "timestamp": f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}T{post_id % 24:02d}:00:00.000Z",
+        "url": f"https://example.com/@alice/{post_id}",
+        "media_attachments": (
+            [{"url": f"media/{post_id}.png", "type": "image", "description": ""}]
+            if media
+            else []
+        ),
+        "in_reply_to_id": in_reply_to_id,
+        "tags": [{"name": name} for name in tags],
+        "account": ACCOUNT,
+    }
+
+
+def build_site(tmp_path, records):
+    config = {"backup": {"static_site": True, "site_folder": "site"}}
+    payload = build_posts_payload(records, "media")
+    profile = dict(PROFILE, total_posts=len(records))
+    return generate_static_site(payload, profile, config, tmp_path, "body {}")
+
+
+def test_static_site_generates_browsable_pages_with_relative_links(tmp_path):
+    """应生成时间线、月/年归档、标签和单帖页面，链接均为可本地打开的相对路径"""
+    (tmp_path / "media").mkdir()
+    (tmp_path / "media" / "2.png").write_bytes(b"png")
+    records = [
+        make_record(1, 0, tags=["Python"]),
+        make_record(2, 40, tags=["python"], media=True, in_reply_to_id="1"),
+    ]
+
+    build_site(tmp_path, records)
+    site = tmp_path / "site"
+
+    for path in (
+        "index.html",
+        "page/1.html",
+        "archive/index.html",
+        "archive/2024/index.html",
+        "archive/2024/01/index.html",
+        "archive/2024/02/1.html",
+        "tags/index.html",
+        "tags/python/index.html",
+        "posts/1.html",
+        "posts/2.html",
+        "assets/style.css",
+    ):
+        assert (site / path).exists(), path
+
+    post_page = (site / "posts" / "2.html").read_text(encoding="utf-8")
+    assert 'href="../assets/style.css"' in post_page
+    assert "回复内容" in post_page and 'href="../posts/1.html"' in post_page
+    media_src = re.search(r'<img src="([^"]+)"[^>]*class="media-item"', post_page)
+    assert (site / "posts" / media_src.group(1)).resolve() == (
+        tmp_path / "media" / "2.png"
+    ).resolve()
+    # 大小写不同的同名标签合并到同一页
+    tag_page = (site / "tags" / "python" / "index.html").read_text(encoding="utf-8")
+    assert "帖子 1" in tag_page and "帖子 2" in tag_page
+
+
+def test_static_site_regenerates_only_pages_that_include_new_posts(tmp_path):
+    """新增帖子只重新生成包含它的页面，旧分页、旧帖子页面和其中的回复卡片保持不变"""
+    records = [
+        make_record(
+            post_id,
+            0,
+            tags=["old"] if post_id == 1 else (),
+            in_reply_to_id=str(post_id - 1) if post_id % 3 == 0 else None,
+        )
+        for post_id in range(1, SITE_POSTS_PER_PAGE + 6)
+    ]
+    first = build_site(tmp_path, records)
+    assert first["skipped"] == 0
+
+    old_page = tmp_path / "site" / "page" / "1.html"
+    old_content = old_page.read_text(encoding="utf-8")
+    second = build_site(tmp_path, [make_record(100, 1), *records])
+
+    manifest = json.loads(
+        (tmp_path / ".vault-sync" / "site_manifest.json").read_text(encoding="utf-8")
+    )
+    # 首页、时间线最新页、所在月份和年份的入口页与最新页、归档索引、新帖页面
+    assert second["rendered"] == 8
+    assert second["skipped"] > SITE_POSTS_PER_PAGE
+    assert old_page.read_text(encoding="utf-8") == old_content
+    assert "回复内容" in old_content
+    assert "100" in manifest["pages"]["index.html"]["posts"]
+
+    # 帖子去掉标签后，不再需要的标签页被清理
+    records[0] = make_record(1, 0)
+    third = build_site(tmp_path, [make_record(100, 1), *records])
+    assert third["removed"] == 2
+    assert not (tmp_path / "site" / "tags" / "old" / "index.html").exists()
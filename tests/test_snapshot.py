@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""状态快照测试：同步时增量维护，status 直接读取，--deep 重新扫描"""
+import asyncio
+
+import main
+import src.layout
+import src.snapshot
+from src.cli import format_post_name, show_status
+from src.snapshot import load_snapshot
+
+
+def test_sync_maintains_snapshot_incrementally(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """全量同步扫描一次；之后的增量同步只按变更清单更新，并记录下载失败的媒体"""
+    server_posts = [
+        with_media(make_post("100", "2024-01-01T10:00:00.000Z", "第一条"), "m1"),
+        with_media(make_post("101", "2024-01-02T10:00:00.000Z", "第二条"), "m2"),
+    ]
+    # m2 始终下载失败
+    synced_backup(server_posts, failing_media={"m2"})
+
+    snapshot = load_snapshot(temp_dir)
+    assert snapshot["posts"] == 2
+    assert (snapshot["media"], snapshot["media_bytes"]) == (1, 100)
+    assert snapshot["newest_post"].endswith("_101.md")
+    assert snapshot["oldest_post"].endswith("_100.md")
+    assert snapshot["last_run"]["mode"] == "full"
+    assert snapshot["last_run"]["status"] == "ok"
+    assert [item["url"] for item in snapshot["failed_media"]] == [
+        "https://example.com/media/m2.jpg"
+    ]
+
+    def no_scan(*args):
+        raise AssertionError("增量同步不应重新扫描")
+
+    server_posts.append(make_post("102", "2024-01-03T10:00:00.000Z", "第三条"))
+    monkeypatch.setattr(src.snapshot, "scan_backup", no_scan)
+    asyncio.run(main.main_async())
+
+    snapshot = load_snapshot(temp_dir)
+    assert snapshot["posts"] == 3
+    assert snapshot["newest_post"].endswith("_102.md")
+    assert snapshot["last_run"]["mode"] == "incremental"
+    assert len(snapshot["failed_media"]) == 1
+
+
+def test_status_reads_snapshot_and_deep_rescans(
+    temp_dir, backup_config, monkeypatch, capsys
+):
+    """status 不遍历目录；--deep 重新扫描并刷新快照"""
+    config = backup_config(temp_dir)
+    posts_folder = temp_dir / "mastodon"
+    posts_folder.mkdir()
+    (posts_folder / "2024-01-01_100000_100.md").write_text("a", encoding="utf-8")
+    (temp_dir / "sync_state.json").write_text('{"last_synced_id": "100"}')
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+
+    show_status()
+    assert "帖子总数：1 条" in capsys.readouterr().out
+
+    (posts_folder / "2024-01-02_100000_101.md").write_text("b", encoding="utf-8")
+
+    def no_scan(*args):
+        raise AssertionError("status 应直接读取快照")
+
+    monkeypatch.setattr(src.layout, "iter_post_files", no_scan)
+    monkeypatch.setattr(src.snapshot, "iter_post_files", no_scan)
+    show_status()
+    output = capsys.readouterr().out
+    assert "帖子总数：1 条" in output
+    assert "最新帖子：2024-01-01 10:00:00（ID 100）" in output
+
+    monkeypatch.undo()
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+    show_status(deep=True)
+    assert "帖子总数：2 条" in capsys.readouterr().out
+    assert load_snapshot(temp_dir)["posts"] == 2
+
+
+def test_format_post_name_falls_back_for_unknown_names():
+    """不符合命名规则的文件名原样显示"""
+    assert format_post_name("2024-05-06_070809_42.md") == "2024-05-06 07:08:09（ID 42）"
+    assert format_post_name("notes.md") == "notes.md"
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""启动开销测试：轻量命令不应加载网络、校验和渲染依赖"""
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = (
+    "aiohttp",
+    "requests",
+    "pydantic",
+    "yaml",
+    "markdownify",
+    "src.api",
+    "src.config",
+    "src.render.html",
+    "src.render.archive",
+)
+# 导入 main 模块（不含解释器自身启动）的累计耗时上限；完整依赖栈约为其两倍以上
+IMPORT_BUDGET_MS = 250
+
+RUN_COMMAND = """
+import json, runpy, sys
+sys.argv = ["main.py", *sys.argv[1:]]
+runpy.run_path("main.py", run_name="__main__")
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def loaded_modules(*args):
+    result = subprocess.run(
+        [sys.executable, "-c", RUN_COMMAND, *args],
+        cwd=PROJECT_ROOT,
+        text=True,
+        capture_output=True,
+        check=True,
+    )
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "args, allowed",
+    [
+        (("version",), ()),
+        (("help",), ()),
+        (("status",), ("pydantic", "yaml", "src.config")),
+    ],
+)
+def test_lightweight_commands_skip_heavy_imports(args, allowed):
+    """version/help 只需要版本号，status 只额外需要读取配置"""
+    modules = loaded_modules(*args)
+
+    assert modules & set(HEAVY_MODULES) - set(allowed) == set()
+
+
+def test_main_import_stays_within_budget():
+    """用 -X importtime 统计导入 main 的累计耗时，取三次中的最小值"""
+    timings = []
+    for _ in range(3):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=PROJECT_ROOT,
+            text=True,
+            capture_output=True,
+            check=True,
+        )
+        match = re.search(r"\|\s*(\d+)\s*\|\s*main$", result.stderr, re.MULTILINE)
+        assert match, result.stderr[-500:]
+        timings.append(int(match.group(1)) / 1000)
+
+    assert min(timings) < IMPORT_BUDGET_MS
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""流式 API 实时同步测试（使用本地模拟流式服务器）"""
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import main
+from src.streaming import get_reconnect_delay
+
+
+def test_get_reconnect_delay_backs_off_with_cap():
+    """重连等待时间应指数增长并有上限"""
+    assert get_reconnect_delay(0) == 0
+    assert get_reconnect_delay(1) < get_reconnect_delay(2) < get_reconnect_delay(3)
+    assert get_reconnect_delay(100) == get_reconnect_delay(101)
+
+
+def make_fake_mastodon(server_posts, stream_batches):
+    """模拟实例：statuses 接口按 since_id 返回帖子，每次流式连接依次发送一批事件后断开"""
+
+    async def statuses(request):
+        since_id = request.query.get("since_id")
+        posts = [
+            post
+            for post in server_posts
+            if since_id is None or int(post["id"]) > int(since_id)
+        ]
+        return web.json_response(sorted(posts, key=lambda post: -int(post["id"])))
+
+    async def streaming(request):
+        assert request.headers["Authorization"] == "Bearer test_token_12345"
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b":thump\n\n")
+        batch, after_disconnect = stream_batches.pop(0)
+        for event, payload in batch:
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            await response.write(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+            await asyncio.sleep(0.05)
+        # 断线期间服务器上出现的新帖子，应在重连前通过 since_id 补齐
+        server_posts.extend(after_disconnect)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/api/v1/accounts/1/statuses", statuses)
+    app.router.add_get("/api/v1/streaming/user", streaming)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_stream_async_applies_events_and_catches_up_after_disconnect(
+    temp_dir, make_post, monkeypatch
+):
+    """实时模式应写入新增/编辑、删除帖子，忽略他人帖子，并在断线后补齐"""
+    post_a = make_post("100", "2024-01-01T10:00:00.000Z", "第一条")
+    post_b = make_post("101", "2024-01-02T10:00:00.000Z", "第二条")
+    post_c = make_post("102", "2024-01-03T10:00:00.000Z", "断线期间发布")
+    edited_a = dict(post_a, content="<p>第一条（已编辑）</p>")
+    other = make_post("900", "2024-01-02T11:00:00.000Z", "别人的帖子")
+    other["account"] = dict(other["account"], id="2")
+    server_posts = [post_a]
+    stream_batches = [
+        (
+            [("update", post_b), ("update", other), ("status.update", edited_a)],
+            [post_c],
+        ),
+        ([("delete", "101")], []),
+    ]
+
+    server = TestServer(make_fake_mastodon(server_posts, stream_batches))
+    await server.start_server()
+    try:
+        state_file = temp_dir / "sync_state.json"
+        config = {
+            "mastodon": {
+                "instance_url": str(server.make_url("")).rstrip("/"),
+                "user_id": "1",
+                "access_token": "test_token_12345",
+            },
+            "backup": {
+                "path": str(temp_dir),
+                "posts_folder": "mastodon",
+                "filename": "archive.md",
+                "media_folder": "media",
+                "summary_filename": "activity_summary.md",
+                "html_filename": "index.html",
+            },
+            "sync": {"state_file": str(state_file), "china_timezone": False},
+        }
+        monkeypatch.setattr(main, "get_config", lambda: dict(config))
+        monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+        monkeypatch.setattr("src.streaming.get_reconnect_delay", lambda attempt: 0)
+
+        await main.main_async()
+        await main.stream_async(max_connections=2)
+    finally:
+        await server.close()
+
+    post_ids = sorted(
+        path.stem.rsplit("_", 1)[-1] for path in (temp_dir / "mastodon").glob("*.md")
+    )
+    assert post_ids == ["100", "102"]
+    archive = (temp_dir / "archive.md").read_text(encoding="utf-8")
+    assert "第一条（已编辑）" in archive
+    assert "别人的帖子" not in archive
+    assert "第二条" not in archive
+    assert json.loads(state_file.read_text(encoding="utf-8"))["last_synced_id"] == "102"
+
+
+@pytest.mark.asyncio
+async def test_stream_async_skips_bad_event_and_applies_following_ones(
+    temp_dir, make_post, monkeypatch
+):
+    """单个无法处理的事件只记录日志，同一连接上之后的事件仍应正常写入"""
+    post_a = make_post("100", "2024-01-01T10:00:00.000Z", "第一条")
+    broken = make_post("101", "not-a-date", "时间无法解析")
+    post_b = make_post("102", "2024-01-02T10:00:00.000Z", "第二条")
+    stream_batches = [([("update", broken), ("update", post_b)], [])]
+
+    server = TestServer(make_fake_mastodon([post_a], stream_batches))
+    await server.start_server()
+    try:
+        state_file = temp_dir / "sync_state.json"
+        config = {
+            "mastodon": {
+                "instance_url": str(server.make_url("")).rstrip("/"),
+                "user_id": "1",
+                "access_token": "test_token_12345",
+            },
+            "backup": {
+                "path": str(temp_dir),
+                "posts_folder": "mastodon",
+                "filename": "archive.md",
+                "media_folder": "media",
+                "summary_filename": "activity_summary.md",
+                "html_filename": "index.html",
+            },
+            "sync": {"state_file": str(state_file), "china_timezone": False},
+        }
+        monkeypatch.setattr(main, "get_config", lambda: dict(config))
+        monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+
+        await main.main_async()
+        await main.stream_async(max_connections=1)
+    finally:
+        await server.close()
+
+    archive = (temp_dir / "archive.md").read_text(encoding="utf-8")
+    assert "第二条" in archive
+    assert "时间无法解析" not in archive
+    assert json.loads(state_file.read_text(encoding="utf-8"))["last_synced_id"] == "102"
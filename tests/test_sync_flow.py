@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """同步主流程端到端测试"""
+import asyncio
 import json
+import tracemalloc
 
 import pytest
 
@@ -70,3 +72,311 @@ async def test_main_async_preserves_history_across_full_and_incremental_sync(
     assert "第二条" in archive_content
     assert "第三条" in archive_content
     assert json.loads(state_file.read_text(encoding="utf-8"))["last_synced_id"] == "102"
+
+
+@pytest.mark.asyncio
+async def test_main_async_writes_manifest_of_changed_paths_only(
+    temp_dir, make_post, monkeypatch
+):
+    """同步应输出变更清单，内容未变化的重复运行不应产生任何变更路径"""
+    state_file = temp_dir / "sync_state.json"
+    config = {
+        "mastodon": {
+            "instance_url": "https://example.com",
+            "user_id": "1",
+            "access_token": "test_token_12345",
+        },
+        "backup": {
+            "path": str(temp_dir),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+        },
+        "sync": {"state_file": str(state_file), "china_timezone": False},
+    }
+    post_a = make_post("100", "2024-01-01T10:00:00.000Z", "第一条")
+
+    async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+        _ = config, page_limit, max_posts
+        return [] if since_id else [post_a]
+
+    monkeypatch.setattr(main, "get_config", lambda: dict(config))
+    monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+
+    await main.main_async()
+
+    manifest_dir = temp_dir / ".vault-sync"
+    changes = json.loads((manifest_dir / "changes.json").read_text(encoding="utf-8"))
+    assert "archive.md" in changes["added"]
+    assert "sync_state.json" in changes["added"]
+    assert any(path.startswith("mastodon/") for path in changes["added"])
+    changed_paths = (manifest_dir / "changed_paths.txt").read_text(encoding="utf-8")
+    assert "index.html\n" in changed_paths
+
+    await main.main_async()
+
+    changes = json.loads((manifest_dir / "changes.json").read_text(encoding="utf-8"))
+    assert changes == {"added": [], "modified": [], "deleted": []}
+    assert (manifest_dir / "changed_paths.txt").read_text(encoding="utf-8") == ""
+
+    # 全量同步重建目录后，重新写入的原有文件应归为修改，而不是目录删除加文件新增
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync", "--full"])
+    await main.main_async()
+
+    changes = json.loads((manifest_dir / "changes.json").read_text(encoding="utf-8"))
+    post_path = next(
+        path for path in changes["modified"] if path.startswith("mastodon/")
+    )
+    assert post_path.endswith("_100.md")
+    assert not any(path.startswith("mastodon") for path in changes["added"])
+    assert "mastodon" not in changes["deleted"]
+
+
+@pytest.mark.asyncio
+async def test_main_async_writes_stage_profile_report(temp_dir, make_post, monkeypatch):
+    """每次同步都写入分阶段报告；--profile 时导出最慢阶段的 pstats，--memprofile 时附带内存快照"""
+    config = {
+        "mastodon": {
+            "instance_url": "https://example.com",
+            "user_id": "1",
+            "access_token": "test_token_12345",
+        },
+        "backup": {
+            "path": str(temp_dir),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+        },
+        "sync": {
+            "state_file": str(temp_dir / "sync_state.json"),
+            "china_timezone": False,
+        },
+    }
+    posts = [
+        make_post(str(100 + i), f"2024-01-0{i + 1}T10:00:00.000Z", f"第{i}条")
+        for i in range(3)
+    ]
+
+    async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+        _ = config, page_limit, max_posts
+        return [] if since_id else posts
+
+    monkeypatch.setattr(main, "get_config", lambda: dict(config))
+    monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync", "--profile"])
+
+    await main.main_async()
+
+    profiles_dir = temp_dir / ".vault-sync" / "profiles"
+    reports = list(profiles_dir.glob("run-*.json"))
+    assert len(reports) == 1
+    report = json.loads(reports[0].read_text(encoding="utf-8"))
+    stages = {stage["name"]: stage for stage in report["stages"]}
+    assert {"fetch", "render", "write", "archive", "summary", "html"} <= set(stages)
+    assert stages["write"]["files_written"] == 3
+    assert report["totals"]["files_written"] >= 3
+    assert all(stage["wall_seconds"] >= 0 for stage in stages.values())
+    assert (profiles_dir / report["pstats"]["path"]).exists()
+    assert report["pstats"]["stage"] in stages
+
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+    await main.main_async()
+
+    reports = sorted(profiles_dir.glob("run-*.json"))
+    assert len(reports) == 2
+    assert "pstats" not in json.loads(reports[-1].read_text(encoding="utf-8"))
+    assert (
+        "memory" not in json.loads(reports[-1].read_text(encoding="utf-8"))["stages"][0]
+    )
+
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync", "--full", "--memprofile"])
+    await main.main_async()
+
+    report = json.loads(
+        sorted(profiles_dir.glob("run-*.json"))[-1].read_text(encoding="utf-8")
+    )
+    stages = {stage["name"]: stage for stage in report["stages"]}
+    memory = stages["render"]["memory"]
+    assert memory["traced_peak_mb"] >= memory["traced_current_mb"] >= 0
+    assert memory["top_allocations"]
+    assert all(":" in site["site"] for site in memory["top_allocations"])
+    assert all(item["size_diff_kb"] > 0 for item in memory["growth"])
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.asyncio
+async def test_watch_async_reuses_session_and_applies_new_posts(
+    temp_dir, make_post, monkeypatch
+):
+    """watch 模式应在多轮之间复用同一 HTTP 会话，只增量写入新帖子"""
+    state_file = temp_dir / "sync_state.json"
+    config = {
+        "mastodon": {
+            "instance_url": "https://example.com",
+            "user_id": "1",
+            "access_token": "test_token_12345",
+        },
+        "backup": {
+            "path": str(temp_dir),
+            "posts_folder": "mastodon",
+            "filename": "archive.md",
+            "media_folder": "media",
+            "summary_filename": "activity_summary.md",
+            "html_filename": "index.html",
+        },
+        "sync": {"state_file": str(state_file), "china_timezone": False},
+    }
+    post_a = make_post("100", "2024-01-01T10:00:00.000Z", "第一条")
+    post_b = make_post("101", "2024-01-02T10:00:00.000Z", "第二条")
+    server_posts = [post_a]
+    sessions = []
+    full_fetches = []
+
+    async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+        _ = page_limit, max_posts
+        sessions.append(config.get("http_session"))
+        if since_id is None:
+            full_fetches.append(since_id)
+            return list(server_posts)
+        return [post for post in server_posts if int(post["id"]) > int(since_id)]
+
+    monkeypatch.setattr(main, "get_config", lambda: config)
+    monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+    await main.main_async()
+
+    sessions.clear()
+    full_fetches.clear()
+    server_posts.append(post_b)
+    monkeypatch.setattr(main, "get_watch_delay", lambda *args: 0)
+    await main.watch_async(max_iterations=2)
+
+    assert sessions and all(session is sessions[0] for session in sessions)
+    assert sessions[0] is not None
+    assert len(full_fetches) == 1
+    assert "第二条" in (temp_dir / "archive.md").read_text(encoding="utf-8")
+    assert json.loads(state_file.read_text(encoding="utf-8"))["last_synced_id"] == "101"
+
+
+@pytest.mark.asyncio
+async def test_main_async_syncs_multiple_accounts_concurrently(
+    temp_dir, make_post, monkeypatch
+):
+    """多账户应在同一事件循环中并发同步到各自目录，并共享会话和限流器"""
+    from src.config import expand_accounts, validate_config
+
+    metrics_file = temp_dir / "vault_sync.prom"
+
+    def make_account(name, user_id):
+        return {
+            "name": name,
+            "mastodon": {
+                "instance_url": "https://example.com",
+                "user_id": user_id,
+                "access_token": f"test_token_{name}_12345",
+            },
+            "backup": {"path": str(temp_dir / name)},
+        }
+
+    config = validate_config(
+        expand_accounts(
+            {
+                "backup": {"summary_filename": "activity_summary.md"},
+                "sync": {"metrics_file": str(metrics_file)},
+                "accounts": [make_account("alice", 1), make_account("bob", 2)],
+            }
+        )
+    ).model_dump()
+    account_posts = {
+        "alice": [make_post("100", "2024-01-01T10:00:00.000Z", "alice 的帖子")],
+        "bob": [make_post("200", "2024-01-02T10:00:00.000Z", "bob 的帖子")],
+    }
+    shared = []
+    in_flight = []
+    max_in_flight = []
+
+    async def fake_fetch(config, since_id=None, page_limit=None, max_posts=None):
+        _ = since_id, page_limit, max_posts
+        shared.append((config.get("http_session"), config.get("rate_limiter")))
+        in_flight.append(config["account_name"])
+        max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(config["account_name"])
+        return account_posts[config["account_name"]]
+
+    monkeypatch.setattr(main, "get_config", lambda: config)
+    monkeypatch.setattr(main, "fetch_mastodon_posts", fake_fetch)
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync"])
+
+    await main.main_async()
+
+    assert max(max_in_flight) == 2
+    assert shared[0][0] is not None and shared[0][1] is not None
+    assert all(item == shared[0] for item in shared)
+    for name in ("alice", "bob"):
+        archive = (temp_dir / name / "archive.md").read_text(encoding="utf-8")
+        assert f"{name} 的帖子" in archive
+        assert (temp_dir / name / "sync_state.json").exists()
+    assert "bob" not in (temp_dir / "alice" / "archive.md").read_text(encoding="utf-8")
+    # 共用的指标文件包含全部账户，不会被后结束的账户覆盖
+    metrics = metrics_file.read_text(encoding="utf-8")
+    assert 'vault_sync_history_runs{account="alice"} 1' in metrics
+    assert 'vault_sync_history_runs{account="bob"} 1' in metrics
+
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync", "--account", "bob"])
+    shared.clear()
+    await main.main_async()
+    assert shared and all(item == (None, None) for item in shared)
+    metrics = metrics_file.read_text(encoding="utf-8")
+    assert 'vault_sync_history_runs{account="alice"} 1' in metrics
+    assert 'vault_sync_history_runs{account="bob"} 2' in metrics
+
+    # 并发同步时不启用 cProfile，进程级 CPU 时间也不计入各账户，报告中只有阶段耗时
+    monkeypatch.setattr(main.sys, "argv", ["main.py", "sync", "--profile"])
+    await main.main_async()
+    for name in ("alice", "bob"):
+        profiles_dir = temp_dir / name / ".vault-sync" / "profiles"
+        report_path = sorted(profiles_dir.glob("run-*.json"))[-1]
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        assert "pstats" not in report
+        assert report["cpu_seconds"] is None
+        assert all(stage["cpu_seconds"] is None for stage in report["stages"])
+        assert not list(profiles_dir.glob("*.pstats"))
+
+
+def test_profile_span_tolerates_active_profiler(monkeypatch):
+    """已有 cProfile 在采样时（Python 3.12+ 会抛出 ValueError）阶段照常计时"""
+    from src import profiling
+
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    profile = profiling.RunProfile(with_cprofile=True)
+
+    with profile.span("fetch") as span:
+        pass
+
+    assert span.profilers == []
+    assert profile.slowest_span() is span
+
+
+def test_memory_trackers_share_tracing_until_last_one_stops():
+    """并发账户的内存追踪共用 tracemalloc，先结束的账户不会停掉其他账户的追踪"""
+    from src.profiling import MemoryTracker
+
+    first = MemoryTracker()
+    second = MemoryTracker()
+    first.stop()
+    first.stop()
+
+    assert tracemalloc.is_tracing()
+    assert second.end_stage() is not None
+    second.stop()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""备份完整性校验测试：发现各类不一致，--repair 只修复发现的问题"""
+import json
+
+import src.backup
+from src.backup import get_media_index
+from src.cli import run_verify
+from src.verify import repair_backup, verify_backup
+
+
+def build_posts(make_post, with_media):
+    return [
+        with_media(make_post("100", "2024-01-01T10:00:00.000Z", "第一条"), "m1"),
+        with_media(make_post("101", "2024-01-02T10:00:00.000Z", "第二条"), "m2"),
+        make_post("102", "2024-01-02T11:00:00.000Z", "第三条"),
+    ]
+
+
+def issue_paths(report, kind):
+    return [item["path"] for item in report["issues"][kind]]
+
+
+def test_verify_detects_and_repairs_broken_items(
+    temp_dir, make_post, with_media, synced_backup
+):
+    """截断、缺失、多余的媒体和过期的归档、同步状态都能被发现并只修复这些项"""
+    config, downloads = synced_backup(build_posts(make_post, with_media))
+    media_folder = temp_dir / "media"
+    assert set(get_media_index(dict(config), temp_dir)) == {"m1-m1.jpg", "m2-m2.jpg"}
+    assert not any(verify_backup(dict(config), temp_dir)["issues"].values())
+
+    (media_folder / "m1-m1.jpg").write_bytes(b"m1" * 10)
+    (media_folder / "m2-m2.jpg").unlink()
+    (media_folder / "stray.jpg").write_bytes(b"x")
+    archive_path = temp_dir / "archive.md"
+    archive = archive_path.read_text(encoding="utf-8")
+    archive_path.write_text(archive.split("# 2024-01-01")[0], encoding="utf-8")
+    (temp_dir / "sync_state.json").write_text('{"last_synced_id": "100"}')
+    untouched_post = next((temp_dir / "mastodon").glob("*_102.md"))
+    untouched_mtime = untouched_post.stat().st_mtime_ns
+
+    report = verify_backup(dict(config), temp_dir)
+    assert issue_paths(report, "corrupt_media") == ["m1-m1.jpg"]
+    assert issue_paths(report, "missing_media") == ["m2-m2.jpg"]
+    assert issue_paths(report, "orphan_media") == ["stray.jpg"]
+    assert issue_paths(report, "archive_out_of_sync") == ["2024-01-01"]
+    assert issue_paths(report, "sync_state") == ["sync_state.json"]
+
+    downloads.clear()
+    repaired = repair_backup(dict(config), temp_dir, report["issues"])
+
+    assert sorted(downloads) == ["m1", "m2"]
+    assert repaired["corrupt_media"] == repaired["missing_media"] == 1
+    assert not (media_folder / "stray.jpg").exists()
+    assert "# 2024-01-01" in archive_path.read_text(encoding="utf-8")
+    state = json.loads((temp_dir / "sync_state.json").read_text())
+    assert state["last_synced_id"] == "102"
+    assert untouched_post.stat().st_mtime_ns == untouched_mtime
+    assert not any(verify_backup(dict(config), temp_dir)["issues"].values())
+
+
+def test_repair_never_deletes_media_before_replacement_exists(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch
+):
+    """
+    没有下载记录的文件按现状补录，不重新下载；损坏文件重新下载失败时保留原文件，
+    本地唯一的副本不会因为来源地址失效而丢失
+    """
+    config, _ = synced_backup(build_posts(make_post, with_media))
+    media_folder = temp_dir / "media"
+    index_path = temp_dir / ".vault-sync" / "media_index.json"
+    media_index = json.loads(index_path.read_text(encoding="utf-8"))
+    del media_index["m1-m1.jpg"]
+    index_path.write_text(json.dumps(media_index), encoding="utf-8")
+    (media_folder / "m2-m2.jpg").write_bytes(b"m2" * 3)
+
+    report = verify_backup(dict(config), temp_dir)
+    assert issue_paths(report, "unindexed_media") == ["m1-m1.jpg"]
+    assert issue_paths(report, "corrupt_media") == ["m2-m2.jpg"]
+
+    attempts = []
+
+    async def unreachable(session, media_item, folder, replace):
+        attempts.append((media_item["id"], replace))
+        return None
+
+    monkeypatch.setattr(src.backup, "download_media", unreachable)
+    repaired = repair_backup(dict(config), temp_dir, report["issues"])
+
+    assert attempts == [("m2", True)]
+    assert repaired["unindexed_media"] == 1
+    assert repaired["corrupt_media"] == 0
+    assert (media_folder / "m1-m1.jpg").read_bytes() == b"m1" * 50
+    assert (media_folder / "m2-m2.jpg").read_bytes() == b"m2" * 3
+    report = verify_backup(dict(config), temp_dir)
+    assert not report["issues"]["unindexed_media"]
+    assert issue_paths(report, "corrupt_media") == ["m2-m2.jpg"]
+
+
+def test_verify_reports_problems_that_need_server_data(
+    temp_dir, make_post, with_media, synced_backup, monkeypatch, capsys
+):
+    """frontmatter 损坏和帖子中的失效链接只报告，verify 以失败结束"""
+    config, _ = synced_backup(build_posts(make_post, with_media))
+    post_path = next((temp_dir / "mastodon").glob("*_102.md"))
+    post_path.write_text("---\nid: [\n---\n见 [附件](../notes/missing.md)\n")
+    monkeypatch.setattr("src.config.get_config", lambda: dict(config))
+
+    assert run_verify(["verify", "--repair"]) is False
+
+    output = capsys.readouterr().out
+    assert "frontmatter 无法解析的帖子：1 项" in output
+    assert "../notes/missing.md" in output
+    assert "修复后仍有以下问题" in output
+    assert post_path.read_text().startswith("---\nid: [")